@@ -8,6 +8,8 @@ from pydantic import BaseModel
 
 router = APIRouter(tags=["Gamification"])
 
+MAX_BATCH_ACTIONS = 100
+
 class RankResponse(BaseModel):
     id: int
     name: str
@@ -49,6 +51,12 @@ class LeaderboardEntry(BaseModel):
     username: str
     total_xp: int
     current_rank: Optional[RankResponse]
+    position: Optional[int] = None
+
+class LeaderboardPositionResponse(BaseModel):
+    position: int
+    total_players: int
+    entries: List[LeaderboardEntry]
 
 class ActionResult(BaseModel):
     message: str
@@ -56,6 +64,12 @@ class ActionResult(BaseModel):
     achievements_earned: List[str]
     total_xp: int
 
+class BatchActionRequest(BaseModel):
+    actions: List[str]
+
+class BatchActionResult(ActionResult):
+    actions_processed: int
+
 @router.get("/initialize")
 async def initialize_gamification(db: db_dependency, current_user: user_dependency):
     """Initialize ranks and achievements (admin only)"""
@@ -174,35 +188,93 @@ async def add_xp(
 
 # ... existing imports and code ...
 
+def _leaderboard_entry(entry_data) -> LeaderboardEntry:
+    current_rank = None
+    if entry_data["current_rank"]:
+        current_rank = RankResponse(**entry_data["current_rank"])
+    
+    return LeaderboardEntry(
+        user_id=entry_data["user_id"],
+        username=entry_data["username"],
+        total_xp=entry_data["total_xp"],
+        current_rank=current_rank,
+        position=entry_data["position"]
+    )
+
 @router.get("/leaderboard", response_model=List[LeaderboardEntry])
-async def get_leaderboard(db: db_dependency, limit: int = 50):
+async def get_leaderboard(db: db_dependency, limit: int = 50, offset: int = 0):
     """Get XP leaderboard"""
     try:
         if limit <= 0 or limit > 100:
             raise HTTPException(status_code=400, detail="Limit must be between 1 and 100")
+        if offset < 0:
+            raise HTTPException(status_code=400, detail="Offset must not be negative")
         
         service = GamificationService(db)
-        leaderboard_data = service.get_leaderboard(limit)
-        
-        result = []
-        for entry_data in leaderboard_data:
-            current_rank = None
-            if entry_data["current_rank"]:
-                current_rank = RankResponse(**entry_data["current_rank"])
-            
-            entry = LeaderboardEntry(
-                user_id=entry_data["user_id"],
-                username=entry_data["username"],
-                total_xp=entry_data["total_xp"],
-                current_rank=current_rank
-            )
-            result.append(entry)
+        leaderboard_data = service.get_leaderboard(limit, offset)
         
-        return result
+        return [_leaderboard_entry(entry_data) for entry_data in leaderboard_data]
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get leaderboard: {str(e)}")
 
+@router.get("/leaderboard/me", response_model=LeaderboardPositionResponse)
+async def get_my_leaderboard_position(db: db_dependency, current_user: user_dependency, radius: int = 5):
+    """Get the current user's leaderboard position and the players around them"""
+    try:
+        if radius < 0 or radius > 50:
+            raise HTTPException(status_code=400, detail="Radius must be between 0 and 50")
+        
+        service = GamificationService(db)
+        position = service.get_leaderboard_position(current_user["user_id"], radius)
+        if position is None:
+            raise HTTPException(status_code=404, detail="No XP recorded for this user yet")
+        
+        return LeaderboardPositionResponse(
+            position=position["position"],
+            total_players=position["total_players"],
+            entries=[_leaderboard_entry(entry_data) for entry_data in position["entries"]]
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get leaderboard position: {str(e)}")
+
+
+@router.post("/actions/batch", response_model=BatchActionResult)
+async def trigger_actions(
+    db: db_dependency,
+    current_user: user_dependency,
+    request: BatchActionRequest
+):
+    """Apply many gamification actions at once (one transaction; any unknown action rejects the batch)"""
+    try:
+        if not request.actions or len(request.actions) > MAX_BATCH_ACTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Send between 1 and {MAX_BATCH_ACTIONS} actions"
+            )
+        
+        service = GamificationService(db)
+        result = service.process_actions(current_user["user_id"], request.actions)
+        
+        return BatchActionResult(
+            message=f"Processed {result['actions_processed']} actions",
+            xp_added=result["xp_added"],
+            achievements_earned=result["achievements_earned"],
+            total_xp=result["total_xp"],
+            actions_processed=result["actions_processed"]
+        )
+    
+    except HTTPException:
+        raise
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to process actions: {str(e)}")
 
 @router.post("/actions/{action}", response_model=ActionResult)
 async def trigger_action(
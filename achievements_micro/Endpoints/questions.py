@@ -172,6 +172,18 @@ async def delete_question(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/usage")
+async def record_question_usage(answers_data: RecordAnswersRequest, db: db_dependency):
+    """Record answered questions; usage counters are written in batches"""
+    try:
+        service = QuestionService(db)
+        flushed = service.record_answers(
+            [(answer.question_id, answer.was_correct) for answer in answers_data.answers]
+        )
+        return {"recorded": len(answers_data.answers), "flushed": flushed}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.get("/stats/overview", response_model=QuestionStatsResponse)
 async def get_question_stats(db: db_dependency):
     """Get question bank statistics"""
@@ -188,7 +200,9 @@ async def get_random_questions(
     db: db_dependency,
     subject: Optional[str] = None,
     difficulty_level: Optional[str] = None,
-    topics: Optional[str] = None  # Comma-separated topics
+    topics: Optional[str] = None,  # Comma-separated topics
+    stratify: bool = False,  # Even split across difficulty levels
+    user_id: Optional[int] = None  # Skip questions this user was served recently
 ):
     """Get random questions for tournaments or practice"""
     try:
@@ -203,7 +217,9 @@ async def get_random_questions(
             count=count,
             subject=subject,
             difficulty_level=difficulty_level,
-            topics=topic_list
+            topics=topic_list,
+            stratify=stratify,
+            user_id=user_id
         )
         
         # Return questions without correct answers for practice mode
@@ -0,0 +1,266 @@
+"""Single-transaction XP and achievement processing.
+
+An action (or a batch of actions) for one user is applied as:
+
+1. one ``UPDATE user_progress ... RETURNING`` that increments the counters
+   and XP in the database, so concurrent actions cannot overwrite each
+   other's totals, and the row lock it takes serializes the rest of the
+   transaction per user;
+2. milestone achievements found in memory from the returned counters (a
+   threshold is crossed by exactly one transaction);
+3. at most one more ``UPDATE`` for achievement XP and the rank, with the rank
+   looked up by ``bisect`` in a cached threshold table;
+4. bulk inserts for the earned achievements and XP transactions, then one
+   commit.
+
+Ranks and achievements are read once per process (``gamification_rules``)
+and reloaded when the seed data is re-initialised.
+"""
+
+import bisect
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+
+# Namespace for pg_advisory_xact_lock(namespace, user_id) while creating a progress row
+# (users_micro's school_analytics uses 4243 for its rollup refreshes)
+PROGRESS_LOCK_NAMESPACE = 4242
+
+
+@dataclass(frozen=True)
+class ActionRule:
+    counter: Optional[str] = None
+    xp: int = 0
+    source: Optional[str] = None
+    description: Optional[str] = None
+    # (counter value, achievement name) awarded when the counter reaches the value
+    milestones: Tuple[Tuple[int, str], ...] = ()
+    # (first hour, last hour, achievement name), inclusive, in server local time
+    hour_achievements: Tuple[Tuple[int, int, str], ...] = ()
+    records_login: bool = False
+
+
+ACTION_RULES: Dict[str, ActionRule] = {
+    "quiz_completed": ActionRule(
+        counter="total_quiz_completed", xp=100, source="quiz_completion", description="Completed a quiz",
+        milestones=((1, "First Spark"), (10, "Knowledge Seeker")),
+    ),
+    "tournament_entered": ActionRule(
+        counter="tournaments_entered", milestones=((1, "First Blood"),),
+    ),
+    "tournament_won": ActionRule(
+        counter="tournaments_won", xp=1000, source="tournament_win", description="Won a tournament",
+        milestones=((1, "Clash Champion"),),
+    ),
+    "course_completed": ActionRule(
+        counter="courses_completed", xp=500, source="course_completion", description="Completed a course",
+    ),
+    "login": ActionRule(
+        records_login=True, hour_achievements=((2, 5, "Night Owl"),),
+    ),
+}
+
+COUNTER_MILESTONES: Dict[str, Tuple[Tuple[int, str], ...]] = {
+    rule.counter: rule.milestones for rule in ACTION_RULES.values() if rule.counter
+}
+
+
+class GamificationRules:
+    """Rank thresholds and the achievement catalogue, cached per process."""
+
+    def __init__(self):
+        self._thresholds: Optional[List[int]] = None
+        self._ranks: List[Dict[str, Any]] = []
+        self._achievements: Dict[str, Dict[str, Any]] = {}
+
+    def invalidate(self) -> None:
+        self._thresholds = None
+
+    def load(self, db) -> "GamificationRules":
+        if self._thresholds is None:
+            ranks = db.execute(text(
+                "SELECT id, name, tier, level, required_xp, emoji FROM ranks ORDER BY required_xp, id"
+            )).fetchall()
+            achievements = db.execute(text("SELECT id, name, xp_reward FROM achievements")).fetchall()
+            self._ranks = [dict(row._mapping) for row in ranks]
+            self._achievements = {
+                row.name: {"id": row.id, "xp_reward": row.xp_reward or 0} for row in achievements
+            }
+            self._thresholds = [rank["required_xp"] for rank in self._ranks]
+        return self
+
+    def rank_for(self, total_xp: int) -> Optional[Dict[str, Any]]:
+        """Highest rank whose required XP is at most ``total_xp``"""
+        position = bisect.bisect_right(self._thresholds or [], total_xp)
+        return self._ranks[position - 1] if position else None
+
+    def rank_by_id(self, rank_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        return next((rank for rank in self._ranks if rank["id"] == rank_id), None)
+
+    def achievement(self, name: str) -> Optional[Dict[str, Any]]:
+        return self._achievements.get(name)
+
+
+gamification_rules = GamificationRules()
+
+
+class ActionEngine:
+    def __init__(
+        self,
+        db,
+        rules: GamificationRules = gamification_rules,
+        clock: Callable[[], datetime] = datetime.now,
+    ):
+        self.db = db
+        self.rules = rules
+        self.clock = clock
+
+    def process_actions(self, user_id: int, actions: Sequence[str]) -> Dict[str, Any]:
+        """Apply actions in order as one transaction; unknown actions reject the whole batch"""
+        unknown = [action for action in actions if action not in ACTION_RULES]
+        if unknown:
+            raise ValueError(f"Unknown action: {unknown[0]}")
+
+        deltas: Dict[str, int] = {}
+        xp_entries: List[Tuple[int, str, str]] = []
+        achievements: List[str] = []
+        login = False
+        hour = self.clock().hour
+        for action in actions:
+            rule = ACTION_RULES[action]
+            if rule.counter:
+                deltas[rule.counter] = deltas.get(rule.counter, 0) + 1
+            if rule.xp:
+                xp_entries.append((rule.xp, rule.source, rule.description))
+            login = login or rule.records_login
+            achievements.extend(name for first, last, name in rule.hour_achievements if first <= hour <= last)
+
+        result = self._apply(user_id, deltas, xp_entries, achievements, login)
+        result["actions_processed"] = len(actions)
+        return result
+
+    def grant_xp(self, user_id: int, amount: int, source: str, description: str = None) -> Dict[str, Any]:
+        return self._apply(user_id, {}, [(amount, source, description)], [], False)
+
+    def award(self, user_id: int, achievement_name: str) -> bool:
+        """Award an achievement (and its XP) unless already earned"""
+        if not self.rules.load(self.db).achievement(achievement_name):
+            return False
+        return achievement_name in self._apply(user_id, {}, [], [achievement_name], False)["achievements_earned"]
+
+    # ---- transaction ------------------------------------------------------
+
+    def _increment(self, user_id: int, deltas: Dict[str, int], xp: int, login: bool, now: datetime):
+        assignments = [f"{column} = COALESCE({column}, 0) + :d_{column}" for column in deltas]
+        assignments.append("total_xp = COALESCE(total_xp, 0) + :xp")
+        assignments.append("updated_at = :now")
+        if login:
+            assignments.append("last_login = :now")
+        returning = ", ".join(["id", "total_xp", "current_rank_id", *deltas])
+        params = {f"d_{column}": delta for column, delta in deltas.items()}
+        params.update(user_id=user_id, xp=xp, now=now)
+        return self.db.execute(text(
+            f"UPDATE user_progress SET {', '.join(assignments)} WHERE user_id = :user_id RETURNING {returning}"
+        ), params).first()
+
+    def _create_progress(self, user_id: int, now: datetime) -> None:
+        if self.db.get_bind().dialect.name == "postgresql":
+            self.db.execute(text("SELECT pg_advisory_xact_lock(:namespace, :user_id)"), {
+                "namespace": PROGRESS_LOCK_NAMESPACE, "user_id": user_id
+            })
+        starting_rank = self.rules.rank_for(0)
+        self.db.execute(text("""
+            INSERT INTO user_progress (
+                user_id, total_xp, current_rank_id, login_streak, total_quiz_completed,
+                tournaments_won, tournaments_entered, courses_completed, time_spent_hours,
+                created_at, updated_at
+            )
+            SELECT :user_id, 0, :rank_id, 0, 0, 0, 0, 0, 0, :now, :now
+            WHERE NOT EXISTS (SELECT 1 FROM user_progress WHERE user_id = :user_id)
+        """), {"user_id": user_id, "rank_id": starting_rank["id"] if starting_rank else None, "now": now})
+
+    def _apply(
+        self,
+        user_id: int,
+        deltas: Dict[str, int],
+        xp_entries: List[Tuple[int, str, str]],
+        achievements: List[str],
+        login: bool,
+    ) -> Dict[str, Any]:
+        rules = self.rules.load(self.db)
+        now = datetime.utcnow()
+        action_xp = sum(amount for amount, _, _ in xp_entries)
+        try:
+            row = self._increment(user_id, deltas, action_xp, login, now)
+            if row is None:
+                self._create_progress(user_id, now)
+                row = self._increment(user_id, deltas, action_xp, login, now)
+
+            # Milestones crossed by this transaction's increments
+            candidates = list(dict.fromkeys(achievements))
+            for column, delta in deltas.items():
+                reached = getattr(row, column)
+                for threshold, name in COUNTER_MILESTONES[column]:
+                    if reached - delta < threshold <= reached and name not in candidates:
+                        candidates.append(name)
+
+            earned = self._new_achievements(user_id, candidates)
+            bonus_xp = sum(achievement["xp_reward"] for _, achievement in earned)
+            total_xp = row.total_xp + bonus_xp
+            rank = rules.rank_for(total_xp)
+            rank_id = rank["id"] if rank else row.current_rank_id
+            if bonus_xp or rank_id != row.current_rank_id:
+                self.db.execute(text("""
+                    UPDATE user_progress
+                    SET total_xp = total_xp + :bonus_xp, current_rank_id = :rank_id
+                    WHERE id = :progress_id
+                """), {"bonus_xp": bonus_xp, "rank_id": rank_id, "progress_id": row.id})
+
+            if earned:
+                self.db.execute(text("""
+                    INSERT INTO user_achievements (user_id, achievement_id, earned_at)
+                    VALUES (:user_id, :achievement_id, :now)
+                """), [{"user_id": user_id, "achievement_id": achievement["id"], "now": now} for _, achievement in earned])
+
+            transactions = xp_entries + [
+                (achievement["xp_reward"], "achievement", f"Earned achievement: {name}")
+                for name, achievement in earned if achievement["xp_reward"] > 0
+            ]
+            if transactions:
+                self.db.execute(text("""
+                    INSERT INTO xp_transactions (user_id, amount, source, description, created_at)
+                    VALUES (:user_id, :amount, :source, :description, :now)
+                """), [
+                    {"user_id": user_id, "amount": amount, "source": source, "description": description, "now": now}
+                    for amount, source, description in transactions
+                ])
+
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            raise
+
+        return {
+            "xp_added": action_xp,
+            "achievements_earned": [name for name, _ in earned],
+            "total_xp": total_xp,
+            "current_rank": rules.rank_by_id(rank_id),
+        }
+
+    def _new_achievements(self, user_id: int, names: List[str]) -> List[Tuple[str, Dict[str, Any]]]:
+        """Catalogue entries for names the user has not earned yet"""
+        known = [(name, self.rules.achievement(name)) for name in names]
+        known = [(name, achievement) for name, achievement in known if achievement]
+        if not known:
+            return []
+        earned_ids = {
+            row.achievement_id
+            for row in self.db.execute(text(
+                "SELECT achievement_id FROM user_achievements WHERE user_id = :user_id AND achievement_id IN :ids"
+            ).bindparams(bindparam("ids", expanding=True)), {
+                "user_id": user_id, "ids": [achievement["id"] for _, achievement in known]
+            })
+        }
+        return [(name, achievement) for name, achievement in known if achievement["id"] not in earned_ids]
@@ -3,7 +3,11 @@ from models.models import Rank, Achievement, UserProgress, UserAchievement, XPTr
 from models.other_models import User
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from functions.leaderboard import leaderboards, resolve_entries
+from functions.action_engine import ActionEngine, gamification_rules
+
+GLOBAL_BOARD = "global_xp"
 
 class GamificationService:
     def __init__(self, db: Session):
@@ -76,6 +80,7 @@ class GamificationService:
                     self.db.add(rank)
             
             self.db.commit()
+            gamification_rules.invalidate()
             return True
         except Exception as e:
             self.db.rollback()
@@ -126,6 +131,7 @@ class GamificationService:
                     self.db.add(achievement)
             
             self.db.commit()
+            gamification_rules.invalidate()
             return True
         except Exception as e:
             self.db.rollback()
@@ -144,130 +150,37 @@ class GamificationService:
             self.db.add(progress)
             self.db.commit()
             self.db.refresh(progress)
+            leaderboards.update(GLOBAL_BOARD, user_id, progress.total_xp or 0)
         return progress
     
     def add_xp(self, user_id: int, amount: int, source: str, description: str = None) -> UserProgress:
         """Add XP to user and check for rank up"""
-        progress = self.get_user_progress(user_id)
-        old_xp = progress.total_xp
-        progress.total_xp += amount
-        
-        # Log XP transaction
-        xp_transaction = XPTransaction(
-            user_id=user_id,
-            amount=amount,
-            source=source,
-            description=description
-        )
-        self.db.add(xp_transaction)
-        
-        # Check for rank up
-        new_rank = self.check_rank_up(progress.total_xp)
-        if new_rank and (not progress.current_rank_id or new_rank.id != progress.current_rank_id):
-            old_rank = progress.current_rank_id
-            progress.current_rank_id = new_rank.id
-            
-        self.db.commit()
-        return progress
+        result = ActionEngine(self.db).grant_xp(user_id, amount, source, description)
+        leaderboards.update(GLOBAL_BOARD, user_id, result["total_xp"])
+        return self.db.query(UserProgress).filter(UserProgress.user_id == user_id).first()
     
     def check_rank_up(self, total_xp: int) -> Optional[Rank]:
         """Check what rank the user should have based on XP"""
-        return self.db.query(Rank).filter(
-            Rank.required_xp <= total_xp
-        ).order_by(Rank.required_xp.desc()).first()
+        rank = gamification_rules.load(self.db).rank_for(total_xp)
+        return self.db.get(Rank, rank["id"]) if rank else None
     
     def award_achievement(self, user_id: int, achievement_name: str) -> bool:
         """Award achievement to user if not already earned"""
-        achievement = self.db.query(Achievement).filter(Achievement.name == achievement_name).first()
-        if not achievement:
-            return False
-            
-        # Check if user already has this achievement
-        existing = self.db.query(UserAchievement).filter(
-            UserAchievement.user_id == user_id,
-            UserAchievement.achievement_id == achievement.id
-        ).first()
-        
-        if existing:
-            return False
-            
-        # Award achievement
-        user_achievement = UserAchievement(
-            user_id=user_id,
-            achievement_id=achievement.id
-        )
-        self.db.add(user_achievement)
-        
-        # Award XP
-        if achievement.xp_reward > 0:
-            self.add_xp(user_id, achievement.xp_reward, "achievement", f"Earned achievement: {achievement_name}")
-            
-        self.db.commit()
-        return True
+        awarded = ActionEngine(self.db).award(user_id, achievement_name)
+        if awarded:
+            progress = self.db.query(UserProgress.total_xp).filter(UserProgress.user_id == user_id).first()
+            leaderboards.update(GLOBAL_BOARD, user_id, progress.total_xp)
+        return awarded
+    
+    def process_actions(self, user_id: int, actions: List[str]) -> Dict[str, Any]:
+        """Process several gamification actions in one transaction and return the combined results"""
+        result = ActionEngine(self.db).process_actions(user_id, actions)
+        leaderboards.update(GLOBAL_BOARD, user_id, result["total_xp"])
+        return result
     
     def process_action(self, user_id: int, action: str) -> Dict[str, Any]:
         """Process gamification action and return results"""
-        progress = self.get_user_progress(user_id)
-        xp_added = 0
-        achievements_earned = []
-        
-        # Update progress based on action
-        if action == "quiz_completed":
-            progress.total_quiz_completed += 1
-            xp_added = 100
-            self.add_xp(user_id, xp_added, "quiz_completion", "Completed a quiz")
-            
-            # Check achievements
-            if progress.total_quiz_completed == 1:
-                if self.award_achievement(user_id, "First Spark"):
-                    achievements_earned.append("First Spark")
-            elif progress.total_quiz_completed == 10:
-                if self.award_achievement(user_id, "Knowledge Seeker"):
-                    achievements_earned.append("Knowledge Seeker")
-                    
-        elif action == "tournament_entered":
-            progress.tournaments_entered += 1
-            
-            # Check achievements
-            if progress.tournaments_entered == 1:
-                if self.award_achievement(user_id, "First Blood"):
-                    achievements_earned.append("First Blood")
-                    
-        elif action == "tournament_won":
-            progress.tournaments_won += 1
-            xp_added = 1000
-            self.add_xp(user_id, xp_added, "tournament_win", "Won a tournament")
-            
-            # Check achievements
-            if progress.tournaments_won == 1:
-                if self.award_achievement(user_id, "Clash Champion"):
-                    achievements_earned.append("Clash Champion")
-                    
-        elif action == "course_completed":
-            progress.courses_completed += 1
-            xp_added = 500
-            self.add_xp(user_id, xp_added, "course_completion", "Completed a course")
-            
-        elif action == "login":
-            # Update last login
-            progress.last_login = datetime.utcnow()
-            
-            # Check for night owl achievement
-            current_hour = datetime.now().hour
-            if 2 <= current_hour <= 5:
-                if self.award_achievement(user_id, "Night Owl"):
-                    achievements_earned.append("Night Owl")
-        else:
-            raise ValueError(f"Unknown action: {action}")
-        
-        self.db.commit()
-        
-        return {
-            "xp_added": xp_added,
-            "achievements_earned": achievements_earned,
-            "total_xp": progress.total_xp,
-            "current_rank": progress.current_rank
-        }
+        return self.process_actions(user_id, [action])
     
     def get_all_ranks(self) -> List[Rank]:
         """Get all ranks ordered by required XP"""
@@ -285,9 +198,20 @@ class GamificationService:
             Achievement.is_hidden == False
         ).all()
     
-    def get_leaderboard(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get leaderboard data using raw SQL to avoid ORM complications"""
+    def _global_board(self):
+        """Sorted total XP board of every user with progress"""
+        def load():
+            rows = self.db.execute(text("""
+                SELECT up.user_id, COALESCE(up.total_xp, 0) AS total_xp
+                FROM user_progress up
+                JOIN users u ON up.user_id = u.id
+            """)).fetchall()
+            return [(row.user_id, row.total_xp) for row in rows]
         
+        return leaderboards.get(GLOBAL_BOARD, load)
+    
+    def _leaderboard_rows(self, user_ids: List[int]) -> Dict[int, Any]:
+        """User and rank details of board members, by user id"""
         # Use raw SQL to join across tables
         result = self.db.execute(
             text("""
@@ -304,14 +228,16 @@ class GamificationService:
                 FROM user_progress up
                 JOIN users u ON up.user_id = u.id
                 LEFT JOIN ranks r ON up.current_rank_id = r.id
-                ORDER BY up.total_xp DESC
-                LIMIT :limit
-            """),
-            {"limit": limit}
+                WHERE up.user_id IN :user_ids
+            """).bindparams(bindparam("user_ids", expanding=True)),
+            {"user_ids": user_ids}
         ).fetchall()
-        
+        return {row.user_id: row for row in result}
+    
+    def _leaderboard_entries(self, board, read) -> List[Dict[str, Any]]:
+        """Details for the entries ``read(board)`` returns, in board order (see resolve_entries)"""
         leaderboard_data = []
-        for row in result:
+        for (position, _, _), row in resolve_entries(board, read, self._leaderboard_rows):
             rank_data = None
             if row.rank_id:
                 rank_data = {
@@ -327,7 +253,27 @@ class GamificationService:
                 "user_id": row.user_id,
                 "username": row.username,
                 "total_xp": row.total_xp,
-                "current_rank": rank_data
+                "current_rank": rank_data,
+                "position": position
             })
         
-        return leaderboard_data
\ No newline at end of file
+        return leaderboard_data
+    
+    def get_leaderboard(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get leaderboard data from the in-memory XP board"""
+        return self._leaderboard_entries(self._global_board(), lambda board: board.page(offset, limit))
+    
+    def get_leaderboard_position(self, user_id: int, radius: int = 5) -> Optional[Dict[str, Any]]:
+        """A user's leaderboard position with the users just above and below them"""
+        board = self._global_board()
+        # Resolved first: dropping members without a user can move this user up
+        entries = self._leaderboard_entries(board, lambda board: board.around(user_id, radius))
+        position = board.rank(user_id)
+        if position is None:
+            return None
+        
+        return {
+            "position": position,
+            "total_players": len(board),
+            "entries": entries
+        }
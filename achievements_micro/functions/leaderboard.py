@@ -0,0 +1,20 @@
+"""The global XP leaderboard registry for this service.
+
+The boards themselves live in ``common/leaderboard.py``, shared with
+freinds_micro. ``add_xp`` and the other XP write paths call
+``leaderboards.update(...)`` with the committed total; ``leaderboard_channel``
+(Postgres LISTEN/NOTIFY, started from main.py) carries those updates to the
+other replicas so their boards do not wait for the TTL reload.
+"""
+
+from common.leaderboard import (  # noqa: F401 - re-exported for the service modules
+    Entry,
+    LeaderboardRegistry,
+    Score,
+    SortedLeaderboard,
+    leaderboard_channel_from_env,
+    resolve_entries,
+)
+
+leaderboards = LeaderboardRegistry()
+leaderboard_channel = leaderboard_channel_from_env()
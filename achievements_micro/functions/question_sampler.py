@@ -0,0 +1,188 @@
+"""Random question sampling without loading the question bank.
+
+Active question ids are held in memory in pools keyed by
+``(subject, difficulty_level, topic)`` (one narrow indexed query per refresh,
+no question text). A draw picks ``k`` positions over the concatenation of the
+matching pools with ``random.sample(range(n), k)`` - O(k), nothing is copied -
+and maps each position back to an id with ``bisect`` over the pool offsets.
+Only the chosen ids are then fetched.
+
+Draws can be stratified (an even split across difficulty levels) and can skip
+the questions a user saw recently; when too few unseen questions remain the
+draw is topped up with seen ones rather than coming back short.
+"""
+
+import os
+import random
+import time
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict, deque
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import text
+
+POOL_REFRESH_SECONDS = float(os.getenv("QUESTION_POOL_REFRESH_SECONDS", "300"))
+RECENT_QUESTIONS_PER_USER = int(os.getenv("RECENT_QUESTIONS_PER_USER", "200"))
+RECENT_QUESTIONS_MAX_USERS = int(os.getenv("RECENT_QUESTIONS_MAX_USERS", "10000"))
+
+PoolKey = Tuple[str, str, str]  # (subject, difficulty_level, topic)
+
+
+class QuestionPools:
+    """Active question ids grouped by (subject, difficulty_level, topic)."""
+
+    def __init__(self, refresh_seconds: float = POOL_REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._pools: Dict[PoolKey, array] = {}
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def load(self, rows: Iterable[Tuple[int, str, str, str]]) -> None:
+        pools: Dict[PoolKey, array] = {}
+        for question_id, subject, difficulty_level, topic in rows:
+            pools.setdefault((subject, difficulty_level, topic), array("l")).append(question_id)
+        self._pools = pools
+        self._loaded_at = time.monotonic()
+
+    def ensure_loaded(self, db) -> "QuestionPools":
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self.load(db.execute(text(
+                "SELECT id, subject, difficulty_level, topic FROM question_bank WHERE is_active = true"
+            )))
+        return self
+
+    def matching(
+        self,
+        subject: Optional[str] = None,
+        difficulty_level: Optional[str] = None,
+        topics: Optional[Sequence[str]] = None,
+    ) -> List[Tuple[PoolKey, array]]:
+        """Pools for the filters; ``subject`` is a case-insensitive substring, as in the list endpoints"""
+        subject = subject.lower() if subject else None
+        topics = set(topics) if topics else None
+        return [
+            (key, ids)
+            for key, ids in self._pools.items()
+            if (subject is None or subject in key[0].lower())
+            and (difficulty_level is None or key[1] == difficulty_level)
+            and (topics is None or key[2] in topics)
+        ]
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._pools.values())
+
+
+def sample_ids(
+    pools: Sequence[array],
+    count: int,
+    exclude: Optional[Set[int]] = None,
+    rng: Optional[random.Random] = None,
+) -> List[int]:
+    """Up to ``count`` distinct ids drawn uniformly from the union of ``pools``, preferring ids not in ``exclude``"""
+    rng = rng or random
+    offsets = list(accumulate(len(ids) for ids in pools))
+    total = offsets[-1] if offsets else 0
+    if not total or count <= 0:
+        return []
+
+    def id_at(position: int) -> int:
+        pool = bisect_right(offsets, position)
+        start = offsets[pool - 1] if pool else 0
+        return pools[pool][position - start]
+
+    exclude = exclude or set()
+    # Over-draw by the excluded count so that skipping seen ids still fills the request
+    positions = rng.sample(range(total), min(total, count + len(exclude)))
+    chosen = [question_id for question_id in map(id_at, positions) if question_id not in exclude][:count]
+    if len(chosen) < count:
+        taken = set(chosen)
+        chosen.extend(
+            question_id for question_id in map(id_at, positions) if question_id not in taken
+        )
+        chosen = chosen[:count]
+    return chosen
+
+
+def stratified_counts(capacities: Dict[str, int], count: int) -> Dict[str, int]:
+    """Split ``count`` evenly across strata, moving any shortfall to strata with questions left"""
+    allocation = {stratum: 0 for stratum in capacities}
+    remaining = min(count, sum(capacities.values()))
+    while remaining:
+        open_strata = [stratum for stratum in capacities if allocation[stratum] < capacities[stratum]]
+        share, extra = divmod(remaining, len(open_strata))
+        for index, stratum in enumerate(sorted(open_strata)):
+            grant = min(share + (1 if index < extra else 0), capacities[stratum] - allocation[stratum])
+            allocation[stratum] += grant
+            remaining -= grant
+    return allocation
+
+
+class RecentQuestions:
+    """The last few question ids served to each user, for repeat avoidance."""
+
+    def __init__(self, per_user: int = RECENT_QUESTIONS_PER_USER, max_users: int = RECENT_QUESTIONS_MAX_USERS):
+        self.per_user = per_user
+        self.max_users = max_users
+        self._seen: "OrderedDict[int, deque]" = OrderedDict()
+
+    def get(self, user_id: int) -> Set[int]:
+        seen = self._seen.get(user_id)
+        if seen is None:
+            return set()
+        self._seen.move_to_end(user_id)
+        return set(seen)
+
+    def record(self, user_id: int, question_ids: Iterable[int]) -> None:
+        seen = self._seen.get(user_id)
+        if seen is None:
+            seen = self._seen[user_id] = deque(maxlen=self.per_user)
+        seen.extend(question_ids)
+        self._seen.move_to_end(user_id)
+        while len(self._seen) > self.max_users:
+            self._seen.popitem(last=False)
+
+
+class QuestionSampler:
+    def __init__(self, pools: Optional[QuestionPools] = None, recent: Optional[RecentQuestions] = None):
+        self.pools = pools or QuestionPools()
+        self.recent = recent or RecentQuestions()
+
+    def sample(
+        self,
+        db,
+        count: int,
+        subject: Optional[str] = None,
+        difficulty_level: Optional[str] = None,
+        topics: Optional[Sequence[str]] = None,
+        stratify: bool = False,
+        user_id: Optional[int] = None,
+        rng: Optional[random.Random] = None,
+    ) -> List[int]:
+        """Ids of a random draw; records them as seen when ``user_id`` is given"""
+        matching = self.pools.ensure_loaded(db).matching(subject, difficulty_level, topics)
+        exclude = self.recent.get(user_id) if user_id is not None else set()
+
+        if stratify and not difficulty_level:
+            by_difficulty: Dict[str, List[array]] = {}
+            for (_, difficulty, _), ids in matching:
+                by_difficulty.setdefault(difficulty, []).append(ids)
+            allocation = stratified_counts(
+                {difficulty: sum(map(len, pools)) for difficulty, pools in by_difficulty.items()}, count
+            )
+            chosen = []
+            for difficulty, pools in by_difficulty.items():
+                chosen.extend(sample_ids(pools, allocation[difficulty], exclude, rng))
+            (rng or random).shuffle(chosen)
+        else:
+            chosen = sample_ids([ids for _, ids in matching], count, exclude, rng)
+
+        if user_id is not None:
+            self.recent.record(user_id, chosen)
+        return chosen
+
+
+question_sampler = QuestionSampler()
@@ -1,9 +1,10 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Optional
-import random
+from sqlalchemy import desc
+from typing import List, Optional, Tuple
 from datetime import datetime
 from models.question_bank import QuestionBank
+from functions.question_sampler import question_sampler
+from functions.question_stats import question_stats
 from schemas.question_schemas import CreateQuestionRequest, UpdateQuestionRequest, QuestionStatsResponse
 
 class QuestionService:
@@ -32,6 +33,7 @@ class QuestionService:
             self.db.add(question)
             self.db.commit()
             self.db.refresh(question)
+            question_sampler.pools.invalidate()
             return question
             
         except Exception as e:
@@ -80,6 +82,7 @@ class QuestionService:
             question.updated_at = datetime.utcnow()
             self.db.commit()
             self.db.refresh(question)
+            question_sampler.pools.invalidate()
             return question
             
         except Exception as e:
@@ -96,6 +99,7 @@ class QuestionService:
             question.is_active = False
             question.updated_at = datetime.utcnow()
             self.db.commit()
+            question_sampler.pools.invalidate()
             return True
             
         except Exception as e:
@@ -106,26 +110,35 @@ class QuestionService:
                            count: int = 30,
                            subject: Optional[str] = None,
                            difficulty_level: Optional[str] = None,
-                           topics: Optional[List[str]] = None) -> List[QuestionBank]:
-        """Get random questions from the question bank"""
-        query = self.db.query(QuestionBank).filter(QuestionBank.is_active == True)
+                           topics: Optional[List[str]] = None,
+                           stratify: bool = False,
+                           user_id: Optional[int] = None) -> List[QuestionBank]:
+        """Get random questions from the question bank
         
-        # Apply filters
-        if subject:
-            query = query.filter(QuestionBank.subject.ilike(f"%{subject}%"))
-        if difficulty_level:
-            query = query.filter(QuestionBank.difficulty_level == difficulty_level)
-        if topics:
-            query = query.filter(QuestionBank.topic.in_(topics))
+        Ids are drawn from the in-memory pools (see functions/question_sampler.py) and only
+        the chosen rows are loaded. ``stratify`` spreads the draw evenly across difficulty
+        levels; ``user_id`` avoids questions that user was served recently.
+        """
+        question_ids = question_sampler.sample(
+            self.db,
+            count,
+            subject=subject,
+            difficulty_level=difficulty_level,
+            topics=topics,
+            stratify=stratify,
+            user_id=user_id
+        )
+        if not question_ids:
+            return []
         
-        # Get all matching questions
-        all_questions = query.all()
+        questions = self.db.query(QuestionBank).filter(
+            QuestionBank.id.in_(question_ids),
+            QuestionBank.is_active == True
+        ).all()
         
-        # Return random sample
-        if len(all_questions) <= count:
-            return all_questions
-        else:
-            return random.sample(all_questions, count)
+        # Keep the sampled order
+        position = {question_id: index for index, question_id in enumerate(question_ids)}
+        return sorted(questions, key=lambda question: position[question.id])
     
     def get_questions_by_subject(self, subject: str) -> List[QuestionBank]:
         """Get all questions for a specific subject"""
@@ -135,73 +148,11 @@ class QuestionService:
         ).all()
     
     def get_question_stats(self) -> QuestionStatsResponse:
-        """Get statistics about the question bank"""
-        total_questions = self.db.query(QuestionBank).count()
-        active_questions = self.db.query(QuestionBank).filter(QuestionBank.is_active == True).count()
-        
-        # By subject
-        subjects = self.db.query(
-            QuestionBank.subject, 
-            func.count(QuestionBank.id)
-        ).filter(
-            QuestionBank.is_active == True
-        ).group_by(QuestionBank.subject).all()
-        
-        # By difficulty
-        difficulties = self.db.query(
-            QuestionBank.difficulty_level, 
-            func.count(QuestionBank.id)
-        ).filter(
-            QuestionBank.is_active == True
-        ).group_by(QuestionBank.difficulty_level).all()
+        """Get statistics about the question bank
         
-        # By topic (top 20)
-        topics = self.db.query(
-            QuestionBank.topic, 
-            func.count(QuestionBank.id)
-        ).filter(
-            QuestionBank.is_active == True
-        ).group_by(QuestionBank.topic).order_by(
-            desc(func.count(QuestionBank.id))
-        ).limit(20).all()
-        
-        # Most used questions
-        most_used = self.db.query(QuestionBank).filter(
-            QuestionBank.is_active == True
-        ).order_by(desc(QuestionBank.times_used)).limit(10).all()
-        
-        # Highest correct rate
-        highest_correct = self.db.query(QuestionBank).filter(
-            QuestionBank.is_active == True,
-            QuestionBank.times_used >= 5  # Only questions used at least 5 times
-        ).order_by(desc(QuestionBank.correct_rate)).limit(10).all()
-        
-        return QuestionStatsResponse(
-            total_questions=total_questions,
-            active_questions=active_questions,
-            by_subject=dict(subjects),
-            by_difficulty=dict(difficulties),
-            by_topic=dict(topics),
-            most_used_questions=[
-                {
-                    "id": q.id,
-                    "question_text": q.question_text[:100] + "..." if len(q.question_text) > 100 else q.question_text,
-                    "times_used": q.times_used,
-                    "subject": q.subject,
-                    "topic": q.topic
-                } for q in most_used
-            ],
-            highest_correct_rate=[
-                {
-                    "id": q.id,
-                    "question_text": q.question_text[:100] + "..." if len(q.question_text) > 100 else q.question_text,
-                    "correct_rate": q.correct_rate,
-                    "times_used": q.times_used,
-                    "subject": q.subject,
-                    "topic": q.topic
-                } for q in highest_correct
-            ]
-        )
+        Served from the periodically refreshed overview (see functions/question_stats.py).
+        """
+        return QuestionStatsResponse(**question_stats.overview(self.db))
     
     def get_unique_subjects(self) -> List[str]:
         """Get list of unique subjects"""
@@ -222,22 +173,12 @@ class QuestionService:
     
     def increment_question_usage(self, question_id: int, was_correct: bool):
         """Increment usage stats for a question"""
+        self.record_answers([(question_id, was_correct)])
+    
+    def record_answers(self, answers: List[Tuple[int, bool]]) -> int:
+        """Buffer ``(question_id, was_correct)`` answers; counters are written in batches"""
         try:
-            question = self.get_question_by_id(question_id)
-            if question:
-                question.times_used += 1
-                
-                # Update correct rate
-                if question.times_used == 1:
-                    question.correct_rate = 100.0 if was_correct else 0.0
-                else:
-                    # Recalculate correct rate
-                    total_correct = (question.correct_rate / 100.0) * (question.times_used - 1)
-                    if was_correct:
-                        total_correct += 1
-                    question.correct_rate = (total_correct / question.times_used) * 100.0
-                
-                self.db.commit()
+            return question_stats.record(self.db, answers)
         except Exception as e:
-            self.db.rollback()
-            print(f"Error updating question usage: {e}")
\ No newline at end of file
+            print(f"Error updating question usage: {e}")
+            return 0
@@ -0,0 +1,275 @@
+"""Buffered question usage statistics and a cached stats overview.
+
+Answer events are aggregated in memory per question, as ``(answered, correct)``,
+and written by ``flush`` in one set-based statement that adds to
+``times_used``/``times_correct``. Increments are relative, so counters stay
+exact across threads and replicas. ``correct_rate`` is derived from the two
+exact counters rather than re-averaged in floating point. A failed flush puts
+its events back in the buffer.
+
+The overview (``/questions/stats/overview``) reads per-(subject, difficulty,
+topic) counts from the ``question_bank_stats`` materialized view on Postgres
+(a plain GROUP BY elsewhere) plus two top-10 queries. A background loop
+flushes, refreshes the view and rebuilds the cached overview every
+``QUESTION_STATS_REFRESH_SECONDS``.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import text
+
+STATS_REFRESH_SECONDS = float(os.getenv("QUESTION_STATS_REFRESH_SECONDS", "60"))
+USAGE_FLUSH_THRESHOLD = int(os.getenv("QUESTION_USAGE_FLUSH_THRESHOLD", "1000"))
+STATS_VIEW = "question_bank_stats"
+
+# SET expressions read the pre-update row, so the rate uses the old counters plus the increment
+POSTGRES_FLUSH_SQL = text("""
+    UPDATE question_bank AS q
+    SET times_used = COALESCE(times_used, 0) + v.answered,
+        times_correct = COALESCE(times_correct, 0) + v.correct,
+        correct_rate = (COALESCE(times_correct, 0) + v.correct) * 100.0 / (COALESCE(times_used, 0) + v.answered)
+    FROM unnest(CAST(:ids AS integer[]), CAST(:answered AS integer[]), CAST(:correct AS integer[]))
+         AS v(id, answered, correct)
+    WHERE q.id = v.id
+""")
+
+ROW_FLUSH_SQL = text("""
+    UPDATE question_bank
+    SET times_used = COALESCE(times_used, 0) + :answered,
+        times_correct = COALESCE(times_correct, 0) + :correct,
+        correct_rate = (COALESCE(times_correct, 0) + :correct) * 100.0 / (COALESCE(times_used, 0) + :answered)
+    WHERE id = :id
+""")
+
+STATS_VIEW_QUERIES = [
+    f"""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {STATS_VIEW} AS
+    SELECT subject, difficulty_level, topic,
+           COUNT(*) AS total,
+           COUNT(*) FILTER (WHERE is_active) AS active
+    FROM question_bank
+    GROUP BY subject, difficulty_level, topic
+    """,
+    # Required for REFRESH ... CONCURRENTLY
+    f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{STATS_VIEW}_key ON {STATS_VIEW} (subject, difficulty_level, topic);",
+]
+
+SCHEMA_QUERIES = [
+    "ALTER TABLE question_bank ADD COLUMN IF NOT EXISTS times_correct INTEGER",
+    # Rows that predate the column: recover the count from the stored rate
+    """
+    UPDATE question_bank
+    SET times_correct = ROUND(COALESCE(correct_rate, 0) * COALESCE(times_used, 0) / 100.0)
+    WHERE times_correct IS NULL
+    """,
+    "ALTER TABLE question_bank ALTER COLUMN times_correct SET DEFAULT 0",
+] + STATS_VIEW_QUERIES
+
+GROUPED_COUNTS_SQL = """
+    SELECT subject, difficulty_level, topic,
+           COUNT(*) AS total,
+           SUM(CASE WHEN is_active THEN 1 ELSE 0 END) AS active
+    FROM question_bank
+    GROUP BY subject, difficulty_level, topic
+"""
+
+
+def ensure_schema(engine) -> None:
+    """Add ``times_correct`` and create the stats view (Postgres only, idempotent)"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for query in SCHEMA_QUERIES:
+            connection.execute(text(query))
+
+
+class QuestionUsageBuffer:
+    """Thread-safe ``question_id -> [answered, correct]`` accumulator."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[int, list] = {}
+        self._events = 0
+
+    def record(self, question_id: int, was_correct: bool) -> int:
+        """Add one answer; returns the number of buffered events."""
+        with self._lock:
+            counts = self._counts.setdefault(question_id, [0, 0])
+            counts[0] += 1
+            counts[1] += 1 if was_correct else 0
+            self._events += 1
+            return self._events
+
+    def record_many(self, answers: Iterable[Tuple[int, bool]]) -> int:
+        with self._lock:
+            for question_id, was_correct in answers:
+                counts = self._counts.setdefault(question_id, [0, 0])
+                counts[0] += 1
+                counts[1] += 1 if was_correct else 0
+                self._events += 1
+            return self._events
+
+    def drain(self) -> Dict[int, list]:
+        with self._lock:
+            counts, self._counts, self._events = self._counts, {}, 0
+            return counts
+
+    def restore(self, counts: Dict[int, list]) -> None:
+        """Put back events from a flush that did not commit."""
+        with self._lock:
+            for question_id, (answered, correct) in counts.items():
+                current = self._counts.setdefault(question_id, [0, 0])
+                current[0] += answered
+                current[1] += correct
+                self._events += answered
+
+    def __len__(self) -> int:
+        return self._events
+
+
+class QuestionStatsPipeline:
+    def __init__(
+        self,
+        refresh_seconds: float = STATS_REFRESH_SECONDS,
+        flush_threshold: int = USAGE_FLUSH_THRESHOLD,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.flush_threshold = flush_threshold
+        self.buffer = QuestionUsageBuffer()
+        self._flush_lock = threading.Lock()
+        self._overview: Optional[Dict[str, Any]] = None
+        self._overview_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- usage ------------------------------------------------------------
+
+    def record(self, db, answers: Iterable[Tuple[int, bool]]) -> int:
+        """Buffer answers, flushing when the buffer is over the threshold; returns events flushed"""
+        if self.buffer.record_many(answers) >= self.flush_threshold:
+            return self.flush(db)
+        return 0
+
+    def flush(self, db) -> int:
+        """Apply buffered answers in one statement and commit; returns events applied"""
+        with self._flush_lock:
+            counts = self.buffer.drain()
+            if not counts:
+                return 0
+            question_ids = sorted(counts)  # fixed lock order across concurrent flushes
+            try:
+                if db.get_bind().dialect.name == "postgresql":
+                    db.execute(POSTGRES_FLUSH_SQL, {
+                        "ids": question_ids,
+                        "answered": [counts[i][0] for i in question_ids],
+                        "correct": [counts[i][1] for i in question_ids],
+                    })
+                else:
+                    db.execute(ROW_FLUSH_SQL, [
+                        {"id": i, "answered": counts[i][0], "correct": counts[i][1]} for i in question_ids
+                    ])
+                db.commit()
+            except Exception:
+                db.rollback()
+                self.buffer.restore(counts)
+                raise
+            return sum(answered for answered, _ in counts.values())
+
+    # ---- overview ---------------------------------------------------------
+
+    def refresh_view(self, db) -> None:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {STATS_VIEW}"))
+            db.commit()
+
+    def build_overview(self, db) -> Dict[str, Any]:
+        source = STATS_VIEW if db.get_bind().dialect.name == "postgresql" else f"({GROUPED_COUNTS_SQL}) AS grouped"
+        rows = db.execute(text(f"SELECT subject, difficulty_level, topic, total, active FROM {source}")).fetchall()
+
+        by_subject: Dict[str, int] = {}
+        by_difficulty: Dict[str, int] = {}
+        by_topic: Dict[str, int] = {}
+        for row in rows:
+            if row.active:
+                by_subject[row.subject] = by_subject.get(row.subject, 0) + row.active
+                by_difficulty[row.difficulty_level] = by_difficulty.get(row.difficulty_level, 0) + row.active
+                by_topic[row.topic] = by_topic.get(row.topic, 0) + row.active
+
+        def summary(row, with_rate: bool) -> Dict[str, Any]:
+            entry = {
+                "id": row.id,
+                "question_text": row.question_text[:100] + "..." if len(row.question_text) > 100 else row.question_text,
+                "times_used": row.times_used,
+                "subject": row.subject,
+                "topic": row.topic
+            }
+            if with_rate:
+                entry["correct_rate"] = row.correct_rate
+            return entry
+
+        columns = "id, question_text, times_used, correct_rate, subject, topic"
+        most_used = db.execute(text(
+            f"SELECT {columns} FROM question_bank WHERE is_active = true ORDER BY times_used DESC LIMIT 10"
+        )).fetchall()
+        # Only questions used at least 5 times
+        highest_correct = db.execute(text(
+            f"SELECT {columns} FROM question_bank WHERE is_active = true AND times_used >= 5 "
+            f"ORDER BY correct_rate DESC LIMIT 10"
+        )).fetchall()
+
+        return {
+            "total_questions": sum(row.total for row in rows),
+            "active_questions": sum(row.active or 0 for row in rows),
+            "by_subject": by_subject,
+            "by_difficulty": by_difficulty,
+            "by_topic": dict(sorted(by_topic.items(), key=lambda item: -item[1])[:20]),
+            "most_used_questions": [summary(row, False) for row in most_used],
+            "highest_correct_rate": [summary(row, True) for row in highest_correct],
+        }
+
+    def overview(self, db) -> Dict[str, Any]:
+        """The cached overview, rebuilt when older than the refresh interval"""
+        if self._overview is None or time.monotonic() - self._overview_at > self.refresh_seconds:
+            self._overview = self.build_overview(db)
+            self._overview_at = time.monotonic()
+        return self._overview
+
+    def refresh(self, db) -> None:
+        """Flush usage, refresh the view and rebuild the overview"""
+        self.flush(db)
+        self.refresh_view(db)
+        self._overview = self.build_overview(db)
+        self._overview_at = time.monotonic()
+
+    # ---- background loop --------------------------------------------------
+
+    def start(self, session_factory) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(session_factory))
+
+    async def stop(self, session_factory) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        db = session_factory()
+        try:
+            await asyncio.to_thread(self.flush, db)
+        finally:
+            db.close()
+
+    async def _run(self, session_factory) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            db = session_factory()
+            try:
+                await asyncio.to_thread(self.refresh, db)
+            except Exception as e:
+                print(f"❌ Question stats refresh failed: {e}")
+            finally:
+                db.close()
+
+
+question_stats = QuestionStatsPipeline()
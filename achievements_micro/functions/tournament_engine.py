@@ -0,0 +1,377 @@
+"""Tournament brackets: seeding, pairing and automatic advancement.
+
+A bracket is a set of matches wired together: each match knows where its
+winner (and, in double elimination, its loser) plays next. Reporting a result
+fills those slots, and a match becomes ready as soon as both of its slots are
+known. Byes are ``None`` entrants - a match against a bye completes on its
+own - so fields that are not a power of two need no special cases.
+
+- single elimination: the field is padded to a power of two and placed by
+  standard seeding, so seeds 1 and 2 can only meet in the final;
+- double elimination: a winners bracket, a losers bracket fed by its losers,
+  and a grand final with a reset match when the losers-bracket champion wins
+  the first one;
+- round robin: every pairing, scheduled up front with the circle method.
+
+The engine holds no database state. Matches are keyed
+``(round_number, match_number)`` exactly as they are stored in
+``tournament_matches``. ``to_state`` snapshots a bracket as plain JSON data and
+``from_state`` restores it, so a result only touches the matches it changes;
+``TournamentService`` stores the snapshot on the tournament row.
+"""
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+SINGLE_ELIMINATION = "single_elimination"
+DOUBLE_ELIMINATION = "double_elimination"
+ROUND_ROBIN = "round_robin"
+BRACKET_TYPES = (SINGLE_ELIMINATION, DOUBLE_ELIMINATION, ROUND_ROBIN)
+
+MatchKey = Tuple[int, int]  # (round_number, match_number)
+Slot = Tuple[MatchKey, int]  # (match, 0 or 1)
+
+
+def seed_positions(size: int) -> List[int]:
+    """Seeds in bracket order for a power-of-two ``size``: 1 v size, and each half mirrors the other"""
+    positions = [1]
+    while len(positions) < size:
+        total = len(positions) * 2 + 1
+        positions = [seed for top in positions for seed in (top, total - top)]
+    return positions
+
+
+def round_question_slice(question_ids: Sequence[int], round_number: int, per_round: int) -> List[int]:
+    """The questions for every match of a round: consecutive rounds take consecutive slices, wrapping around"""
+    if not question_ids or per_round <= 0:
+        return []
+    count = min(per_round, len(question_ids))
+    start = (round_number - 1) * count % len(question_ids)
+    return [question_ids[(start + offset) % len(question_ids)] for offset in range(count)]
+
+
+@dataclass
+class BracketMatch:
+    round_number: int
+    match_number: int
+    players: List[Optional[int]] = field(default_factory=lambda: [None, None])
+    filled: int = 0  # slots assigned so far; a bye counts
+    winner_to: Optional[Slot] = None
+    loser_to: Optional[Slot] = None
+    eliminates_loser: bool = True
+    completed: bool = False
+    winner: Optional[int] = None
+    scores: Tuple[int, int] = (0, 0)
+
+    @property
+    def key(self) -> MatchKey:
+        return self.round_number, self.match_number
+
+    @property
+    def is_bye(self) -> bool:
+        return None in self.players
+
+    @property
+    def loser(self) -> Optional[int]:
+        if not self.completed or self.winner is None:
+            return None
+        return self.players[1] if self.players[0] == self.winner else self.players[0]
+
+
+class Bracket:
+    """One tournament's matches; ``players`` are user ids in seed order (best first)."""
+
+    def __init__(self, bracket_type: str, players: Sequence[int]):
+        if bracket_type not in BRACKET_TYPES:
+            raise ValueError(f"Unknown bracket type: {bracket_type}")
+        if len(players) < 2:
+            raise ValueError("A tournament needs at least 2 players")
+        if len(set(players)) != len(players):
+            raise ValueError("Players must be unique")
+
+        self.bracket_type = bracket_type
+        self.players = list(players)
+        self.seeds = {player: seed for seed, player in enumerate(self.players, start=1)}
+        self.matches: Dict[MatchKey, BracketMatch] = {}
+        self.round_names: Dict[int, str] = {}
+        self.eliminated: Dict[int, int] = {}  # player -> round_number of the last loss
+        self.wins: Counter = Counter()
+        self.points: Counter = Counter()
+        self.champion: Optional[int] = None
+        self._ready: Dict[MatchKey, BracketMatch] = {}
+        self._grand_final: Optional[MatchKey] = None
+        self._touched: List[MatchKey] = []
+
+        if bracket_type == ROUND_ROBIN:
+            self._build_round_robin()
+        else:
+            self._build_elimination()
+        self._settle_byes(self.matches.values())
+
+    # ---- queries ------------------------------------------------------------
+
+    @property
+    def is_complete(self) -> bool:
+        if self.bracket_type == ROUND_ROBIN:
+            return all(match.completed for match in self.matches.values())
+        return self.champion is not None
+
+    def ready_matches(self) -> List[BracketMatch]:
+        """Matches with both players known and no result yet"""
+        return list(self._ready.values())
+
+    def decide(self, key: MatchKey, scores: Tuple[int, int], times: Tuple[int, int] = (0, 0)) -> int:
+        """Winner of a played match: higher score, then the faster time, then the better seed"""
+        first, second = self.matches[key].players
+        ranked = sorted(
+            ((first, scores[0], times[0]), (second, scores[1], times[1])),
+            key=lambda entry: (-entry[1], entry[2], self.seeds[entry[0]]),
+        )
+        return ranked[0][0]
+
+    def decide_at_deadline(self, key: MatchKey, submitted: Tuple[bool, bool], scores: Tuple[int, int],
+                           times: Tuple[int, int] = (0, 0)) -> int:
+        """Winner of a match whose deadline passed: a player who never submitted forfeits to one who did"""
+        if submitted[0] != submitted[1]:
+            return self.matches[key].players[0 if submitted[0] else 1]
+        # Nobody played: the better seed goes through rather than stalling the bracket
+        return self.decide(key, scores, times)
+
+    def placements(self) -> Dict[int, int]:
+        """Final position per player; players knocked out in the same round share a position"""
+        if self.bracket_type == ROUND_ROBIN:
+            order = sorted(self.players, key=lambda player: (-self.wins[player], -self.points[player], self.seeds[player]))
+            return {player: position for position, player in enumerate(order, start=1)}
+
+        last_round = float("inf")
+        out_rounds = {player: self.eliminated.get(player, last_round) for player in self.players}
+        per_round = Counter(out_rounds.values())
+        positions, better = {}, 0
+        for round_number in sorted(per_round, reverse=True):
+            for player, out_round in out_rounds.items():
+                if out_round == round_number:
+                    positions[player] = better + 1
+            better += per_round[round_number]
+        return positions
+
+    # ---- snapshots ----------------------------------------------------------
+
+    def to_state(self) -> Dict[str, Any]:
+        """Everything needed to carry on from here, as JSON-serialisable data"""
+        return {
+            "bracket_type": self.bracket_type,
+            "players": self.players,
+            "round_names": [[round_number, name] for round_number, name in self.round_names.items()],
+            # round, match, players, filled, winner_to, loser_to, eliminates_loser, completed, winner, scores
+            "matches": [
+                [match.round_number, match.match_number, match.players, match.filled, match.winner_to,
+                 match.loser_to, match.eliminates_loser, match.completed, match.winner, match.scores]
+                for match in self.matches.values()
+            ],
+            "eliminated": [[player, round_number] for player, round_number in self.eliminated.items()],
+            "wins": [[player, count] for player, count in self.wins.items()],
+            "points": [[player, count] for player, count in self.points.items()],
+            "champion": self.champion,
+            "grand_final": self._grand_final,
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Bracket":
+        """Restore a bracket saved with ``to_state``"""
+        def slot(value) -> Optional[Slot]:
+            return ((value[0][0], value[0][1]), value[1]) if value else None
+
+        bracket = cls.__new__(cls)
+        bracket.bracket_type = state["bracket_type"]
+        bracket.players = list(state["players"])
+        bracket.seeds = {player: seed for seed, player in enumerate(bracket.players, start=1)}
+        bracket.round_names = {round_number: name for round_number, name in state["round_names"]}
+        bracket.matches = {}
+        bracket._ready = {}
+        for (round_number, match_number, players, filled, winner_to, loser_to,
+             eliminates_loser, completed, winner, scores) in state["matches"]:
+            match = BracketMatch(
+                round_number, match_number, list(players), filled, slot(winner_to), slot(loser_to),
+                # Round-robin snapshots saved before losses stopped eliminating still say True
+                eliminates_loser and bracket.bracket_type != ROUND_ROBIN, completed, winner, (scores[0], scores[1]),
+            )
+            bracket.matches[match.key] = match
+            if filled == 2 and not completed and not match.is_bye:
+                bracket._ready[match.key] = match
+        bracket.eliminated = {} if bracket.bracket_type == ROUND_ROBIN else {
+            player: round_number for player, round_number in state["eliminated"]
+        }
+        bracket.wins = Counter({player: count for player, count in state["wins"]})
+        bracket.points = Counter({player: count for player, count in state["points"]})
+        bracket.champion = state["champion"]
+        bracket._grand_final = tuple(state["grand_final"]) if state["grand_final"] else None
+        bracket._touched = []
+        return bracket
+
+    # ---- results ------------------------------------------------------------
+
+    def report(self, key: MatchKey, winner: int, scores: Tuple[int, int] = (0, 0)) -> List[MatchKey]:
+        """Record a result and advance both players; returns every match that changed"""
+        match = self.matches.get(key)
+        if match is None:
+            raise ValueError(f"Unknown match {key}")
+        if key not in self._ready:
+            raise ValueError(f"Match {key} is not ready to be played")
+        if winner not in match.players:
+            raise ValueError(f"Player {winner} is not in match {key}")
+
+        self._touched = []
+        match.scores = (scores[0], scores[1])
+        for player, score in zip(match.players, match.scores):
+            self.points[player] += score
+        self.wins[winner] += 1
+        self._complete(match, winner)
+        self._settle_byes([self.matches[key] for key in self._touched])
+        return list(dict.fromkeys(self._touched))
+
+    def _complete(self, match: BracketMatch, winner: Optional[int]) -> None:
+        match.completed = True
+        match.winner = winner
+        self._ready.pop(match.key, None)
+        self._touched.append(match.key)
+
+        loser = match.loser
+        if match.key == self._grand_final and loser is not None:
+            if winner == match.players[0]:
+                self.eliminated[loser] = match.round_number
+                self.champion = winner
+            else:
+                # The winners-bracket champion has not lost yet: play once more
+                reset = self._add_match(match.round_number + 1, 1, "Grand Final Reset")
+                self._fill((reset.key, 0), winner)
+                self._fill((reset.key, 1), loser)
+            return
+
+        if loser is not None and match.eliminates_loser:
+            self.eliminated[loser] = match.round_number
+        if match.winner_to:
+            self._fill(match.winner_to, winner)
+        elif self.bracket_type != ROUND_ROBIN:
+            self.champion = winner
+        if match.loser_to:
+            self._fill(match.loser_to, loser)
+
+    def _fill(self, slot: Slot, player: Optional[int]) -> None:
+        key, index = slot
+        match = self.matches[key]
+        match.players[index] = player
+        match.filled += 1
+        self._touched.append(key)
+        if match.filled == 2 and not match.is_bye:
+            self._ready[key] = match
+
+    def _settle_byes(self, matches: Iterable[BracketMatch]) -> None:
+        """Complete the given matches, and any they feed, that have both slots filled and a bye"""
+        pending = [match for match in matches if match.filled == 2 and match.is_bye and not match.completed]
+        while pending:
+            match = pending.pop()
+            if match.completed:
+                continue
+            present = [player for player in match.players if player is not None]
+            self._complete(match, present[0] if present else None)
+            for target in (match.winner_to, match.loser_to):
+                if target:
+                    follow = self.matches[target[0]]
+                    if follow.filled == 2 and follow.is_bye and not follow.completed:
+                        pending.append(follow)
+
+    # ---- construction -------------------------------------------------------
+
+    def _add_match(self, round_number: int, match_number: int, round_name: str) -> BracketMatch:
+        match = BracketMatch(round_number, match_number)
+        self.matches[match.key] = match
+        self.round_names.setdefault(round_number, round_name)
+        return match
+
+    def _entrants(self) -> List[Optional[int]]:
+        size = 1
+        while size < len(self.players):
+            size *= 2
+        return [self.players[seed - 1] if seed <= len(self.players) else None for seed in seed_positions(size)]
+
+    def _build_elimination(self) -> None:
+        entrants = self._entrants()
+        rounds = len(entrants).bit_length() - 1
+        double = self.bracket_type == DOUBLE_ELIMINATION
+
+        # Winners bracket (the whole bracket in single elimination)
+        for round_number in range(1, rounds + 1):
+            name = self._winners_round_name(round_number, rounds, double)
+            for index in range(len(entrants) >> round_number):
+                match = self._add_match(round_number, index + 1, name)
+                match.eliminates_loser = not double
+                if round_number < rounds:
+                    match.winner_to = ((round_number + 1, index // 2 + 1), index % 2)
+
+        if not double:
+            for index, player in enumerate(entrants):
+                self._fill(((1, index // 2 + 1), index % 2), player)
+            return
+
+        # Losers bracket: odd rounds pair up survivors, even rounds take the next winners-round losers
+        losers_rounds = 2 * (rounds - 1)
+        for losers_round in range(1, losers_rounds + 1):
+            round_number = rounds + losers_round
+            name = "Losers Final" if losers_round == losers_rounds else f"Losers Round {losers_round}"
+            count = len(entrants) >> (losers_round // 2 + 1 + losers_round % 2)
+            for index in range(count):
+                match = self._add_match(round_number, index + 1, name)
+                if losers_round < losers_rounds:
+                    if losers_round % 2:
+                        match.winner_to = ((round_number + 1, index + 1), 0)
+                    else:
+                        match.winner_to = ((round_number + 1, index // 2 + 1), index % 2)
+
+        grand_final = self._add_match(rounds + losers_rounds + 1, 1, "Grand Final")
+        self._grand_final = grand_final.key
+        self.matches[(rounds, 1)].winner_to = (grand_final.key, 0)
+        if losers_rounds:
+            self.matches[(rounds + losers_rounds, 1)].winner_to = (grand_final.key, 1)
+
+        for round_number in range(1, rounds + 1):
+            for index in range(len(entrants) >> round_number):
+                match = self.matches[(round_number, index + 1)]
+                if not losers_rounds:
+                    match.loser_to = (grand_final.key, 1)
+                elif round_number == 1:
+                    match.loser_to = ((rounds + 1, index // 2 + 1), index % 2)
+                else:
+                    # Crossed over so that early rematches are unlikely
+                    count = len(entrants) >> round_number
+                    match.loser_to = ((rounds + 2 * (round_number - 1), count - index), 1)
+
+        for index, player in enumerate(entrants):
+            self._fill(((1, index // 2 + 1), index % 2), player)
+
+    @staticmethod
+    def _winners_round_name(round_number: int, rounds: int, double: bool) -> str:
+        if double:
+            return "Winners Final" if round_number == rounds else f"Winners Round {round_number}"
+        if round_number == rounds:
+            return "Finals"
+        if round_number == rounds - 1:
+            return "Semifinals"
+        if round_number == rounds - 2:
+            return "Quarterfinals"
+        return f"Round {round_number}"
+
+    def _build_round_robin(self) -> None:
+        circle: List[Optional[int]] = list(self.players)
+        if len(circle) % 2:
+            circle.append(None)
+        half = len(circle) // 2
+        for round_number in range(1, len(circle)):
+            for index in range(half):
+                match = self._add_match(round_number, index + 1, f"Round {round_number}")
+                # Everyone plays their whole schedule; standings come from wins
+                match.eliminates_loser = False
+                self._fill((match.key, 0), circle[index])
+                self._fill((match.key, 1), circle[-1 - index])
+            # Keep the first player fixed and rotate everyone else one place
+            circle = [circle[0], circle[-1]] + circle[1:-1]
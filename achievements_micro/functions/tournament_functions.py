@@ -1,495 +1,733 @@
-# from sqlalchemy.orm import Session
-# from sqlalchemy import and_, or_, desc
-# from typing import List, Dict, Optional, Tuple
-# from datetime import datetime, timedelta
-# import math
-# import random
-# import asyncio
-# from models.tournament_models import *
-# from models.models import User  # Import your main User model
-# from schemas.tournament_schemas import *
-# from services.chainlink_service import KanaAIQuestionService
-# import logging
-
-# logger = logging.getLogger(__name__)
-
-# class TournamentService:
-#     def __init__(self, db: Session, ai_api_url: Optional[str] = None):
-#         self.db = db
-#         # This will connect to your other repo's Kana AI question generation API
-#         self.question_service = KanaAIQuestionService(
-#             ai_api_url or "http://localhost:10000/api/generate-quiz"
-#         )
-    
-#     def create_tournament(self, creator_id: int, tournament_data: CreateTournamentRequest) -> Tournament:
-#         """Create a new tournament"""
-#         try:
-#             # Validate max_players is a power of 2 for single elimination
-#             if tournament_data.bracket_type == BracketTypeEnum.SINGLE_ELIMINATION:
-#                 if not self._is_power_of_2(tournament_data.max_players):
-#                     # Round up to next power of 2
-#                     tournament_data.max_players = self._next_power_of_2(tournament_data.max_players)
-            
-#             tournament = Tournament(
-#                 name=tournament_data.name,
-#                 description=tournament_data.description,
-#                 creator_id=creator_id,
-#                 max_players=tournament_data.max_players,
-#                 tournament_type=tournament_data.tournament_type.value,  # Convert enum to string
-#                 bracket_type=tournament_data.bracket_type.value,  # Convert enum to string
-                
-#                 # Prize configuration
-#                 has_prizes=tournament_data.prize_config.has_prizes,
-#                 first_place_prize=tournament_data.prize_config.first_place_prize,
-#                 second_place_prize=tournament_data.prize_config.second_place_prize,
-#                 third_place_prize=tournament_data.prize_config.third_place_prize,
-#                 prize_type=tournament_data.prize_config.prize_type,
-                
-#                 # Question configuration
-#                 total_questions=tournament_data.question_config.total_questions,
-#                 time_limit_minutes=tournament_data.question_config.time_limit_minutes,
-#                 difficulty_level=tournament_data.question_config.difficulty_level.value,  # Convert enum to string
-#                 subject_category=tournament_data.question_config.subject_category,
-#                 custom_topics=','.join(tournament_data.question_config.custom_topics or []),
-                
-#                 # Timing
-#                 registration_end=tournament_data.registration_end,
-#                 tournament_start=tournament_data.tournament_start,
-#                 status="draft"  # Use string instead of enum
-#             )
-            
-#             self.db.add(tournament)
-#             self.db.commit()
-#             self.db.refresh(tournament)
-            
-#             # Manually add creator info
-#             creator = self.db.query(User).filter(User.id == creator_id).first()
-#             tournament.creator = creator
-            
-#             # Send invitations if specified
-#             if tournament_data.invited_users:
-#                 # Convert string IDs to integers
-#                 user_ids = [int(user_id) for user_id in tournament_data.invited_users]
-#                 self._send_invitations(tournament.id, creator_id, user_ids)
-            
-#             # Generate questions using AI (placeholder for now)
-#             self._generate_tournament_questions(tournament.id, tournament_data.question_config)
-            
-#             return tournament
-            
-#         except Exception as e:
-#             self.db.rollback()
-#             raise Exception(f"Failed to create tournament: {str(e)}")
-    
-#     async def create_tournament_async(self, creator_id: int, tournament_data: CreateTournamentRequest) -> Tournament:
-#         """Create a new tournament with async question generation"""
-#         try:
-#             # Create tournament first
-#             tournament = Tournament(
-#                 name=tournament_data.name,
-#                 description=tournament_data.description,
-#                 creator_id=creator_id,
-#                 max_players=tournament_data.max_players,
-#                 tournament_type=tournament_data.tournament_type.value,
-#                 bracket_type=tournament_data.bracket_type.value,
-                
-#                 # Prize configuration
-#                 has_prizes=tournament_data.prize_config.has_prizes,
-#                 first_place_prize=tournament_data.prize_config.first_place_prize,
-#                 second_place_prize=tournament_data.prize_config.second_place_prize,
-#                 third_place_prize=tournament_data.prize_config.third_place_prize,
-#                 prize_type=tournament_data.prize_config.prize_type,
-                
-#                 # Question configuration
-#                 total_questions=tournament_data.question_config.total_questions,
-#                 time_limit_minutes=tournament_data.question_config.time_limit_minutes,
-#                 difficulty_level=tournament_data.question_config.difficulty_level.value,
-#                 subject_category=tournament_data.question_config.subject_category,
-#                 custom_topics=','.join(tournament_data.question_config.custom_topics or []),
-                
-#                 # Timing
-#                 registration_end=tournament_data.registration_end,
-#                 tournament_start=tournament_data.tournament_start,
-#                 status="draft"
-#             )
-            
-#             self.db.add(tournament)
-#             self.db.commit()
-#             self.db.refresh(tournament)
-            
-#             # Generate questions asynchronously
-#             try:
-#                 await self._generate_tournament_questions(tournament.id, tournament_data.question_config)
-#                 logger.info(f"Questions generated successfully for tournament {tournament.id}")
-#             except Exception as e:
-#                 logger.error(f"Failed to generate questions for tournament {tournament.id}: {e}")
-#                 # Don't fail tournament creation if question generation fails
-#                 # Questions can be generated later or use fallback
-            
-#             # Get creator info
-#             creator = self.db.query(User).filter(User.id == creator_id).first()
-#             tournament.creator = creator
-            
-#             return tournament
-            
-#         except Exception as e:
-#             self.db.rollback()
-#             raise Exception(f"Failed to create tournament: {str(e)}")
-    
-#     def get_tournament(self, tournament_id: int, user_id: Optional[int] = None) -> Optional[Tournament]:
-#         """Get tournament details"""
-#         tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).first()
-#         if not tournament:
-#             return None
-        
-#         if user_id:
-#             # Check if user is participant
-#             tournament.is_participant = self._is_user_participant(tournament_id, user_id)
-#             tournament.can_join = self._can_user_join(tournament, user_id)
-        
-#         return tournament
-    
-#     def get_tournament_with_creator(self, tournament_id: int, user_id: Optional[int] = None) -> Optional[Tournament]:
-#         """Get tournament with creator information"""
-#         tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).first()
-#         if not tournament:
-#             return None
-        
-#         # Manually query creator
-#         creator = self.db.query(User).filter(User.id == tournament.creator_id).first()
-#         tournament.creator = creator
-        
-#         if user_id:
-#             tournament.is_participant = self._is_user_participant(tournament_id, user_id)
-#             tournament.can_join = self._can_user_join(tournament, user_id)
-        
-#         return tournament
-    
-#     def get_tournaments(self, 
-#                        status: Optional[TournamentStatusEnum] = None,
-#                        tournament_type: Optional[TournamentTypeEnum] = None,
-#                        limit: int = 50,
-#                        offset: int = 0) -> List[Tournament]:
-#         """Get tournaments with filters"""
-#         query = self.db.query(Tournament)
-        
-#         if status:
-#             query = query.filter(Tournament.status == status.value)  # Convert enum to string
-#         if tournament_type:
-#             query = query.filter(Tournament.tournament_type == tournament_type.value)  # Convert enum to string
-        
-#         return query.order_by(desc(Tournament.created_at)).offset(offset).limit(limit).all()
-    
-#     def get_tournaments_with_creators(self, 
-#                                     status: Optional[TournamentStatusEnum] = None,
-#                                     tournament_type: Optional[TournamentTypeEnum] = None,
-#                                     limit: int = 50,
-#                                     offset: int = 0) -> List[Tournament]:
-#         """Get tournaments with creator information"""
-#         query = self.db.query(Tournament)
-        
-#         if status:
-#             query = query.filter(Tournament.status == status.value)
-#         if tournament_type:
-#             query = query.filter(Tournament.tournament_type == tournament_type.value)
-        
-#         tournaments = query.order_by(desc(Tournament.created_at)).offset(offset).limit(limit).all()
-        
-#         # Manually add creator to each tournament
-#         for tournament in tournaments:
-#             creator = self.db.query(User).filter(User.id == tournament.creator_id).first()
-#             tournament.creator = creator
-        
-#         return tournaments
-    
-#     def join_tournament(self, tournament_id: int, user_id: int) -> bool:
-#         """Join a tournament"""
-#         try:
-#             tournament = self.get_tournament(tournament_id)
-#             if not tournament:
-#                 raise ValueError("Tournament not found")
-            
-#             if not self._can_user_join(tournament, user_id):
-#                 raise ValueError("Cannot join this tournament")
-            
-#             # Check if already participating
-#             existing = self.db.query(TournamentParticipant).filter(
-#                 and_(
-#                     TournamentParticipant.tournament_id == tournament_id,
-#                     TournamentParticipant.user_id == user_id
-#                 )
-#             ).first()
-            
-#             if existing:
-#                 raise ValueError("Already participating in this tournament")
-            
-#             # Add participant
-#             participant = TournamentParticipant(
-#                 tournament_id=tournament_id,
-#                 user_id=user_id
-#             )
-#             self.db.add(participant)
-            
-#             # Update tournament participant count
-#             tournament.current_players += 1
-            
-#             # If tournament is full, change status to ready
-#             if tournament.current_players >= tournament.max_players:
-#                 tournament.status = "open"  # Use string instead of enum
-            
-#             self.db.commit()
-#             return True
-            
-#         except Exception as e:
-#             self.db.rollback()
-#             raise Exception(f"Failed to join tournament: {str(e)}")
-    
-#     def start_tournament(self, tournament_id: int) -> bool:
-#         """Start a tournament and generate brackets"""
-#         try:
-#             tournament = self.get_tournament(tournament_id)
-#             if not tournament:
-#                 raise ValueError("Tournament not found")
-            
-#             if tournament.status != "open":  # Use string instead of enum
-#                 raise ValueError("Tournament is not ready to start")
-            
-#             # Generate brackets
-#             self._generate_brackets(tournament_id)
-            
-#             # Update tournament status
-#             tournament.status = "in_progress"  # Use string instead of enum
-#             tournament.tournament_start = datetime.utcnow()
-            
-#             self.db.commit()
-#             return True
-            
-#         except Exception as e:
-#             self.db.rollback()
-#             raise Exception(f"Failed to start tournament: {str(e)}")
-    
-#     def get_tournament_bracket(self, tournament_id: int) -> Optional[TournamentBracketResponse]:
-#         """Get tournament bracket structure"""
-#         tournament = self.get_tournament(tournament_id)
-#         if not tournament:
-#             return None
-        
-#         brackets = self.db.query(TournamentBracket).filter(
-#             TournamentBracket.tournament_id == tournament_id
-#         ).order_by(TournamentBracket.round_number).all()
-        
-#         rounds = []
-#         for bracket in brackets:
-#             matches = self.db.query(TournamentMatch).filter(
-#                 TournamentMatch.bracket_id == bracket.id
-#             ).order_by(TournamentMatch.match_number).all()
-            
-#             match_responses = []
-#             for match in matches:
-#                 player1 = self.db.query(User).filter(User.id == match.player1_id).first() if match.player1_id else None
-#                 player2 = self.db.query(User).filter(User.id == match.player2_id).first() if match.player2_id else None
-#                 winner = self.db.query(User).filter(User.id == match.winner_id).first() if match.winner_id else None
-                
-#                 match_response = MatchResponse(
-#                     id=match.id,
-#                     match_number=match.match_number,
-#                     round_number=match.round_number,
-#                     player1_id=match.player1_id,
-#                     player1_username=player1.username if player1 else None,
-#                     player2_id=match.player2_id,
-#                     player2_username=player2.username if player2 else None,
-#                     winner_id=match.winner_id,
-#                     winner_username=winner.username if winner else None,
-#                     player1_score=match.player1_score,
-#                     player2_score=match.player2_score,
-#                     player1_time=match.player1_time,
-#                     player2_time=match.player2_time,
-#                     is_completed=match.is_completed,
-#                     started_at=match.started_at,
-#                     completed_at=match.completed_at
-#                 )
-#                 match_responses.append(match_response)
-            
-#             round_response = BracketRoundResponse(
-#                 round_number=bracket.round_number,
-#                 round_name=bracket.round_name,
-#                 total_matches=bracket.total_matches,
-#                 matches=match_responses
-#             )
-#             rounds.append(round_response)
-        
-#         return TournamentBracketResponse(
-#             tournament_id=tournament_id,
-#             tournament_name=tournament.name,
-#             bracket_type=tournament.bracket_type,
-#             total_rounds=len(rounds),
-#             rounds=rounds
-#         )
-    
-#     def get_user_tournaments(self, user_id: int) -> Dict[str, List[Tournament]]:
-#         """Get tournaments for a specific user"""
-#         # Created tournaments
-#         created = self.db.query(Tournament).filter(Tournament.creator_id == user_id).all()
-        
-#         # Participating tournaments
-#         participant_tournaments = self.db.query(Tournament).join(TournamentParticipant).filter(
-#             TournamentParticipant.user_id == user_id
-#         ).all()
-        
-#         # Invited tournaments
-#         invited_tournaments = self.db.query(Tournament).join(TournamentInvitation).filter(
-#             and_(
-#                 TournamentInvitation.invitee_id == user_id,
-#                 TournamentInvitation.status == "pending"
-#             )
-#         ).all()
-        
-#         return {
-#             "created": created,
-#             "participating": participant_tournaments,
-#             "invited": invited_tournaments
-#         }
-    
-#     # Helper methods
-#     def _is_power_of_2(self, n: int) -> bool:
-#         return n > 0 and (n & (n - 1)) == 0
-    
-#     def _next_power_of_2(self, n: int) -> int:
-#         return 2 ** math.ceil(math.log2(n))
-    
-#     def _can_user_join(self, tournament: Tournament, user_id: int) -> bool:
-#         if tournament.status not in ["draft", "open"]:  # Use strings instead of enums
-#             return False
-#         if tournament.current_players >= tournament.max_players:
-#             return False
-#         if tournament.tournament_type == "invite_only":  # Use string instead of enum
-#             # Check if user has invitation
-#             invitation = self.db.query(TournamentInvitation).filter(
-#                 and_(
-#                     TournamentInvitation.tournament_id == tournament.id,
-#                     TournamentInvitation.invitee_id == user_id,
-#                     TournamentInvitation.status == "pending"
-#                 )
-#             ).first()
-#             return invitation is not None
-#         return True
-    
-#     def _is_user_participant(self, tournament_id: int, user_id: int) -> bool:
-#         participant = self.db.query(TournamentParticipant).filter(
-#             and_(
-#                 TournamentParticipant.tournament_id == tournament_id,
-#                 TournamentParticipant.user_id == user_id
-#             )
-#         ).first()
-#         return participant is not None
-    
-#     def _send_invitations(self, tournament_id: int, inviter_id: int, user_ids: List[int]):
-#         """Send tournament invitations"""
-#         for user_id in user_ids:
-#             invitation = TournamentInvitation(
-#                 tournament_id=tournament_id,
-#                 inviter_id=inviter_id,
-#                 invitee_id=user_id
-#             )
-#             self.db.add(invitation)
-    
-#     def _generate_brackets(self, tournament_id: int):
-#         """Generate tournament brackets"""
-#         participants = self.db.query(TournamentParticipant).filter(
-#             TournamentParticipant.tournament_id == tournament_id
-#         ).all()
-        
-#         # Assign seed numbers
-#         random.shuffle(participants)
-#         for i, participant in enumerate(participants):
-#             participant.seed_number = i + 1
-        
-#         # Generate bracket structure for single elimination
-#         total_players = len(participants)
-#         total_rounds = math.ceil(math.log2(total_players))
-        
-#         for round_num in range(1, total_rounds + 1):
-#             round_name = self._get_round_name(round_num, total_rounds)
-#             matches_in_round = total_players // (2 ** round_num)
-            
-#             if matches_in_round < 1:
-#                 matches_in_round = 1
-            
-#             bracket = TournamentBracket(
-#                 tournament_id=tournament_id,
-#                 round_number=round_num,
-#                 round_name=round_name,
-#                 total_matches=matches_in_round
-#             )
-#             self.db.add(bracket)
-#             self.db.flush()
-            
-#             # Generate matches for first round
-#             if round_num == 1:
-#                 self._generate_first_round_matches(tournament_id, bracket.id, participants)
-    
-#     def _get_round_name(self, round_num: int, total_rounds: int) -> str:
-#         """Get appropriate round name"""
-#         if round_num == total_rounds:
-#             return "Finals"
-#         elif round_num == total_rounds - 1:
-#             return "Semifinals"
-#         elif round_num == total_rounds - 2:
-#             return "Quarterfinals"
-#         else:
-#             return f"Round {round_num}"
-    
-#     def _generate_first_round_matches(self, tournament_id: int, bracket_id: int, participants: List[TournamentParticipant]):
-#         """Generate first round matches"""
-#         for i in range(0, len(participants), 2):
-#             player1 = participants[i] if i < len(participants) else None
-#             player2 = participants[i + 1] if i + 1 < len(participants) else None
-            
-#             match = TournamentMatch(
-#                 tournament_id=tournament_id,                bracket_id=bracket_id,
-#                 match_number=i // 2 + 1,
-#                 round_number=1,
-#                 player1_id=player1.user_id if player1 else None,
-#                 player2_id=player2.user_id if player2 else None
-#             )
-#             self.db.add(match)
-    
-#     async def _generate_tournament_questions(self, tournament_id: int, question_config: QuestionConfiguration):
-#         """Generate questions for tournament using Kana AI service"""
-#         try:
-#             # Prepare topics - convert to format expected by React component
-#             topics = question_config.custom_topics or [question_config.subject_category or "general_knowledge"]
-            
-#             # Normalize topic names to match React component format
-#             normalized_topics = []
-#             for topic in topics:
-#                 # Convert spaces to hyphens and lowercase for consistency
-#                 normalized_topic = topic.lower().replace(' ', '-').replace('_', '-')
-#                 normalized_topics.append(normalized_topic)
-            
-#             # Generate questions using Kana AI service
-#             questions = await self.question_service.generate_tournament_questions(
-#                 db=self.db,
-#                 tournament_id=tournament_id,
-#                 topics=normalized_topics,
-#                 difficulty_level=question_config.difficulty_level.value,
-#                 question_count=question_config.total_questions,
-#                 subject_category=question_config.subject_category,
-#                 time_limit_minutes=question_config.time_limit_minutes
-#             )
-            
-#             logger.info(f"Successfully generated {len(questions)} questions for tournament {tournament_id}")
-#             return questions
-            
-#         except Exception as e:
-#             logger.error(f"Failed to generate questions via Kana AI service: {e}")
-#             logger.info("Falling back to local question generation")
-            
-#             # Fallback to local questions if Kana AI service fails
-#             return self.question_service.create_fallback_questions(
-#                 db=self.db,
-#                 tournament_id=tournament_id,
-#                 question_count=question_config.total_questions,
-#                 topics=question_config.custom_topics or [question_config.subject_category or "general_knowledge"],
-#                 difficulty_level=question_config.difficulty_level.value
-#             )
\ No newline at end of file
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, desc, func, text, tuple_
+from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+import asyncio
+import os
+from models.tournament_models import *
+from models.models import User, UserProgress
+from schemas.tournament_schemas import *
+from functions.action_engine import ActionEngine
+from functions.question_service import QuestionService
+from functions.question_stats import question_stats
+from functions.tournament_engine import Bracket, round_question_slice
+
+QUESTIONS_PER_MATCH = int(os.getenv("TOURNAMENT_QUESTIONS_PER_MATCH", "10"))
+# How long both players of a ready match have to submit before the absent one forfeits
+MATCH_DEADLINE_MINUTES = int(os.getenv("TOURNAMENT_MATCH_DEADLINE_MINUTES", "1440"))
+FORFEIT_SWEEP_SECONDS = float(os.getenv("TOURNAMENT_FORFEIT_SWEEP_SECONDS", "60"))
+
+# Columns added after the tournament tables were first created
+SCHEMA_QUERIES = [
+    "ALTER TABLE tournament_matches ADD COLUMN IF NOT EXISTS player1_submitted_at TIMESTAMP",
+    "ALTER TABLE tournament_matches ADD COLUMN IF NOT EXISTS player2_submitted_at TIMESTAMP",
+    "ALTER TABLE tournament_questions ADD COLUMN IF NOT EXISTS question_bank_id INTEGER",
+    "ALTER TABLE tournament_matches ADD COLUMN IF NOT EXISTS deadline_at TIMESTAMP",
+    "ALTER TABLE tournaments ADD COLUMN IF NOT EXISTS bracket_state JSON",
+    # Matches that were already waiting for players when deadlines were introduced
+    f"""UPDATE tournament_matches SET deadline_at = NOW() + make_interval(mins => {MATCH_DEADLINE_MINUTES})
+        WHERE deadline_at IS NULL AND is_completed = false
+          AND player1_id IS NOT NULL AND player2_id IS NOT NULL""",
+    # Round-robin losses used to mark the loser eliminated; nobody is knocked out of one
+    """UPDATE tournament_participants SET is_eliminated = false
+        WHERE is_eliminated = true
+          AND tournament_id IN (SELECT id FROM tournaments WHERE bracket_type = 'round_robin')""",
+]
+
+
+def ensure_schema(engine) -> None:
+    """Add the live-match columns to existing tournament tables (Postgres only, idempotent)"""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as connection:
+        for query in SCHEMA_QUERIES:
+            connection.execute(text(query))
+
+
+class TournamentService:
+    """Tournaments on top of ``functions/tournament_engine.py``.
+
+    Starting a tournament seeds the participants by XP, builds the bracket and
+    stores every match along with a snapshot of the bracket. Each match result
+    is written as it comes in; once a match is decided (under a lock on the
+    tournament row) the result is reported to the restored snapshot, and the
+    matches it changes - the next opponents, byes, a grand-final reset - and
+    the new snapshot are written back. A match that is still open at its
+    deadline is decided by ``forfeit_expired_matches``. Questions are drawn
+    from the question bank when the tournament is created; every match in a
+    round plays the same slice of them.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def create_tournament(self, creator_id: int, tournament_data: CreateTournamentRequest) -> Tournament:
+        """Create a new tournament"""
+        try:
+            tournament = Tournament(
+                name=tournament_data.name,
+                description=tournament_data.description,
+                creator_id=creator_id,
+                max_players=tournament_data.max_players,
+                tournament_type=tournament_data.tournament_type.value,  # Convert enum to string
+                bracket_type=tournament_data.bracket_type.value,  # Convert enum to string
+
+                # Prize configuration
+                has_prizes=tournament_data.prize_config.has_prizes,
+                first_place_prize=tournament_data.prize_config.first_place_prize,
+                second_place_prize=tournament_data.prize_config.second_place_prize,
+                third_place_prize=tournament_data.prize_config.third_place_prize,
+                prize_type=tournament_data.prize_config.prize_type,
+
+                # Question configuration
+                total_questions=tournament_data.question_config.total_questions,
+                time_limit_minutes=tournament_data.question_config.time_limit_minutes,
+                difficulty_level=tournament_data.question_config.difficulty_level.value,  # Convert enum to string
+                subject_category=tournament_data.question_config.subject_category,
+                custom_topics=','.join(tournament_data.question_config.custom_topics or []),
+
+                # Timing
+                registration_end=tournament_data.registration_end,
+                tournament_start=tournament_data.tournament_start,
+                status="draft"  # Use string instead of enum
+            )
+
+            self.db.add(tournament)
+            self.db.flush()
+
+            # Send invitations if specified
+            if tournament_data.invited_users:
+                self._send_invitations(tournament.id, creator_id, [int(user_id) for user_id in tournament_data.invited_users])
+
+            self._generate_tournament_questions(tournament.id, tournament_data.question_config)
+            self.db.commit()
+            self.db.refresh(tournament)
+
+            # Manually add creator info
+            tournament.creator = self.db.query(User).filter(User.id == creator_id).first()
+            return tournament
+
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Failed to create tournament: {str(e)}")
+
+    def get_tournament(self, tournament_id: int, user_id: Optional[int] = None) -> Optional[Tournament]:
+        """Get tournament details"""
+        tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).first()
+        if not tournament:
+            return None
+
+        if user_id:
+            # Check if user is participant
+            tournament.is_participant = self._is_user_participant(tournament_id, user_id)
+            tournament.can_join = self._can_user_join(tournament, user_id)
+
+        return tournament
+
+    def get_tournament_with_creator(self, tournament_id: int, user_id: Optional[int] = None) -> Optional[Tournament]:
+        """Get tournament with creator information"""
+        tournament = self.get_tournament(tournament_id, user_id)
+        if tournament:
+            tournament.creator = self.db.query(User).filter(User.id == tournament.creator_id).first()
+        return tournament
+
+    def get_tournaments_with_creators(self,
+                                    status: Optional[TournamentStatusEnum] = None,
+                                    tournament_type: Optional[TournamentTypeEnum] = None,
+                                    limit: int = 50,
+                                    offset: int = 0) -> List[Tournament]:
+        """Get tournaments with creator information"""
+        query = self.db.query(Tournament)
+
+        if status:
+            query = query.filter(Tournament.status == status.value)
+        if tournament_type:
+            query = query.filter(Tournament.tournament_type == tournament_type.value)
+
+        tournaments = query.order_by(desc(Tournament.created_at)).offset(offset).limit(limit).all()
+
+        creators = self._users({tournament.creator_id for tournament in tournaments})
+        for tournament in tournaments:
+            tournament.creator = creators.get(tournament.creator_id)
+
+        return tournaments
+
+    def join_tournament(self, tournament_id: int, user_id: int) -> bool:
+        """Join a tournament"""
+        try:
+            # Lock the row so concurrent joins cannot overfill the tournament
+            tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).with_for_update().first()
+            if not tournament:
+                raise ValueError("Tournament not found")
+
+            if self._is_user_participant(tournament_id, user_id):
+                raise ValueError("Already participating in this tournament")
+
+            if not self._can_user_join(tournament, user_id):
+                raise ValueError("Cannot join this tournament")
+
+            self.db.add(TournamentParticipant(tournament_id=tournament_id, user_id=user_id))
+            tournament.current_players = (tournament.current_players or 0) + 1
+
+            # If tournament is full, change status to ready
+            if tournament.current_players >= tournament.max_players:
+                tournament.status = "open"  # Use string instead of enum
+
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Failed to join tournament: {str(e)}")
+
+        self._process_action(user_id, "tournament_entered")
+        return True
+
+    def start_tournament(self, tournament_id: int) -> bool:
+        """Seed the participants by XP, build the bracket and store its rounds and matches"""
+        try:
+            tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).with_for_update().first()
+            if not tournament:
+                raise ValueError("Tournament not found")
+
+            if tournament.status not in ["draft", "open"]:  # Use strings instead of enums
+                raise ValueError("Tournament is not ready to start")
+
+            participants = self._seed_participants(tournament_id)
+            bracket = Bracket(tournament.bracket_type, [participant.user_id for participant in participants])
+            self._store_bracket(tournament, bracket)
+
+            tournament.status = "in_progress"  # Use string instead of enum
+            tournament.tournament_start = datetime.utcnow()
+
+            self.db.commit()
+            return True
+
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Failed to start tournament: {str(e)}")
+
+    def get_tournament_bracket(self, tournament_id: int) -> Optional[TournamentBracketResponse]:
+        """Get tournament bracket structure"""
+        tournament = self.get_tournament(tournament_id)
+        if not tournament:
+            return None
+
+        brackets = self.db.query(TournamentBracket).filter(
+            TournamentBracket.tournament_id == tournament_id
+        ).order_by(TournamentBracket.round_number).all()
+        matches = self._matches(tournament_id)
+
+        by_round: Dict[int, List[MatchResponse]] = {}
+        for response in self.match_responses(matches):
+            by_round.setdefault(response.round_number, []).append(response)
+
+        rounds = [
+            BracketRoundResponse(
+                round_number=bracket.round_number,
+                round_name=bracket.round_name,
+                total_matches=bracket.total_matches,
+                matches=by_round.get(bracket.round_number, [])
+            )
+            for bracket in brackets
+        ]
+
+        return TournamentBracketResponse(
+            tournament_id=tournament_id,
+            tournament_name=tournament.name,
+            bracket_type=tournament.bracket_type,
+            total_rounds=len(rounds),
+            rounds=rounds
+        )
+
+    def match_responses(self, matches: List[TournamentMatch]) -> List[MatchResponse]:
+        """Matches with player usernames, looked up in one query"""
+        usernames = {
+            user.id: user.username
+            for user in self._users(
+                {player for match in matches for player in (match.player1_id, match.player2_id) if player}
+            ).values()
+        }
+        return [
+            MatchResponse(
+                id=match.id,
+                match_number=match.match_number,
+                round_number=match.round_number,
+                player1_id=match.player1_id,
+                player1_username=usernames.get(match.player1_id),
+                player2_id=match.player2_id,
+                player2_username=usernames.get(match.player2_id),
+                winner_id=match.winner_id,
+                winner_username=usernames.get(match.winner_id),
+                player1_score=match.player1_score or 0,
+                player2_score=match.player2_score or 0,
+                player1_time=match.player1_time or 0,
+                player2_time=match.player2_time or 0,
+                is_completed=bool(match.is_completed),
+                started_at=match.started_at,
+                completed_at=match.completed_at,
+                deadline_at=match.deadline_at
+            )
+            for match in matches
+        ]
+
+    def get_user_tournaments(self, user_id: int) -> Dict[str, List[Tournament]]:
+        """Get tournaments for a specific user"""
+        # Created tournaments
+        created = self.db.query(Tournament).filter(Tournament.creator_id == user_id).all()
+
+        # Participating tournaments
+        participant_tournaments = self.db.query(Tournament).join(TournamentParticipant).filter(
+            TournamentParticipant.user_id == user_id
+        ).all()
+
+        # Invited tournaments
+        invited_tournaments = self.db.query(Tournament).join(TournamentInvitation).filter(
+            and_(
+                TournamentInvitation.invitee_id == user_id,
+                TournamentInvitation.status == "pending"
+            )
+        ).all()
+
+        return {
+            "created": created,
+            "participating": participant_tournaments,
+            "invited": invited_tournaments
+        }
+
+    # Live matches
+    def get_current_match(self, tournament_id: int, user_id: int) -> Optional[TournamentMatch]:
+        """The user's match that is waiting for their answers, if any"""
+        return self.db.query(TournamentMatch).filter(
+            TournamentMatch.tournament_id == tournament_id,
+            TournamentMatch.is_completed == False,
+            TournamentMatch.player1_id.isnot(None),
+            TournamentMatch.player2_id.isnot(None),
+            (
+                ((TournamentMatch.player1_id == user_id) & TournamentMatch.player1_submitted_at.is_(None))
+                | ((TournamentMatch.player2_id == user_id) & TournamentMatch.player2_submitted_at.is_(None))
+            )
+        ).order_by(TournamentMatch.round_number, TournamentMatch.match_number).first()
+
+    def get_match_questions(self, tournament_id: int, match_id: int, user_id: int) -> MatchQuestionsResponse:
+        """Questions for a player's match; the first request starts the match clock"""
+        match = self._playable_match(tournament_id, match_id, user_id)
+        if match.started_at is None:
+            match.started_at = datetime.utcnow()
+            self.db.commit()
+
+        questions = self._match_questions(tournament_id, match.round_number)
+        bracket = self.db.query(TournamentBracket).filter(TournamentBracket.id == match.bracket_id).first()
+        return MatchQuestionsResponse(
+            match_id=match.id,
+            round_number=match.round_number,
+            round_name=bracket.round_name if bracket else f"Round {match.round_number}",
+            opponent_id=match.player2_id if match.player1_id == user_id else match.player1_id,
+            time_limit_seconds=sum(question.time_limit_seconds or 0 for question in questions),
+            questions=[TournamentQuestionResponse.model_validate(question) for question in questions]
+        )
+
+    def submit_match_answers(self, tournament_id: int, match_id: int, user_id: int,
+                             submission: SubmitMatchAnswersRequest) -> MatchResultResponse:
+        """Score a player's answers; the second submission decides the match and advances the bracket"""
+        try:
+            # One result at a time per tournament: advancing rewrites matches both players may feed
+            tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).with_for_update().first()
+            if not tournament:
+                raise ValueError("Tournament not found")
+            if tournament.status != "in_progress":
+                raise ValueError("Tournament is not in progress")
+            match = self._playable_match(tournament_id, match_id, user_id)
+
+            questions = self._match_questions(tournament_id, match.round_number)
+            answers = {question_id: answer.strip().upper() for question_id, answer in submission.answers.items()}
+            graded = [
+                (question, answers[question.id] == (question.correct_answer or "").upper())
+                for question in questions if question.id in answers
+            ]
+            score = sum(question.points_value or 0 for question, correct in graded if correct)
+            correct_answers = sum(1 for _, correct in graded if correct)
+
+            now = datetime.utcnow()
+            if match.player1_id == user_id:
+                match.player1_score, match.player1_time, match.player1_submitted_at = score, submission.time_seconds, now
+            else:
+                match.player2_score, match.player2_time, match.player2_submitted_at = score, submission.time_seconds, now
+
+            participant = self._participant(tournament_id, user_id)
+            participant.total_score = (participant.total_score or 0) + score
+            participant.questions_answered = (participant.questions_answered or 0) + len(graded)
+            participant.correct_answers = (participant.correct_answers or 0) + correct_answers
+            participant.time_spent_seconds = (participant.time_spent_seconds or 0) + submission.time_seconds
+
+            winner_id = None
+            if match.player1_submitted_at and match.player2_submitted_at:
+                winner_id = self._advance(tournament, match)
+
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Failed to submit answers: {str(e)}")
+
+        question_stats.record(self.db, [
+            (question.question_bank_id, correct) for question, correct in graded if question.question_bank_id
+        ])
+        if winner_id is not None and tournament.status == "completed":
+            self._award_champion(tournament_id)
+
+        return MatchResultResponse(
+            match_id=match.id,
+            score=score,
+            correct_answers=correct_answers,
+            questions_answered=len(graded),
+            is_completed=bool(match.is_completed),
+            winner_id=winner_id,
+            tournament_completed=tournament.status == "completed"
+        )
+
+    def forfeit_expired_matches(self, now: Optional[datetime] = None) -> int:
+        """Decide every open match past its deadline: whoever did not submit forfeits; returns matches decided"""
+        now = now or datetime.utcnow()
+        tournament_ids = [
+            row.tournament_id for row in self.db.query(TournamentMatch.tournament_id).filter(
+                TournamentMatch.is_completed == False,
+                TournamentMatch.deadline_at < now
+            ).distinct().all()
+        ]
+
+        decided = 0
+        for tournament_id in tournament_ids:
+            try:
+                tournament = self.db.query(Tournament).filter(Tournament.id == tournament_id).with_for_update().first()
+                if not tournament or tournament.status != "in_progress":
+                    self.db.rollback()
+                    continue
+                # Read again under the lock: a submission or another replica's sweep may have got there first
+                expired = self.db.query(TournamentMatch).filter(
+                    TournamentMatch.tournament_id == tournament_id,
+                    TournamentMatch.is_completed == False,
+                    TournamentMatch.deadline_at < now
+                ).order_by(TournamentMatch.round_number, TournamentMatch.match_number).all()
+                for match in expired:
+                    if not match.is_completed:
+                        self._advance(tournament, match, at_deadline=True)
+                        decided += 1
+                self.db.commit()
+            except Exception as e:
+                self.db.rollback()
+                print(f"❌ Failed to settle expired matches of tournament {tournament_id}: {e}")
+                continue
+
+            if tournament.status == "completed":
+                self._award_champion(tournament_id)
+        return decided
+
+    # Helper methods
+    def _award_champion(self, tournament_id: int):
+        champion = self.db.query(TournamentParticipant).filter(
+            TournamentParticipant.tournament_id == tournament_id,
+            TournamentParticipant.final_position == 1
+        ).first()
+        if champion:
+            self._process_action(champion.user_id, "tournament_won")
+
+    def _process_action(self, user_id: int, action: str):
+        """XP and achievements for a tournament action; runs in its own transaction after ours"""
+        try:
+            ActionEngine(self.db).process_actions(user_id, [action])
+        except Exception as e:
+            self.db.rollback()
+            print(f"⚠️ Failed to process {action} for user {user_id}: {e}")
+
+    def _can_user_join(self, tournament: Tournament, user_id: int) -> bool:
+        if tournament.status not in ["draft", "open"]:  # Use strings instead of enums
+            return False
+        if (tournament.current_players or 0) >= tournament.max_players:
+            return False
+        if tournament.tournament_type == "invite_only":  # Use string instead of enum
+            # Check if user has invitation
+            invitation = self.db.query(TournamentInvitation).filter(
+                and_(
+                    TournamentInvitation.tournament_id == tournament.id,
+                    TournamentInvitation.invitee_id == user_id,
+                    TournamentInvitation.status.in_(["pending", "accepted"])
+                )
+            ).first()
+            return invitation is not None
+        return True
+
+    def _is_user_participant(self, tournament_id: int, user_id: int) -> bool:
+        return self._participant(tournament_id, user_id) is not None
+
+    def _participant(self, tournament_id: int, user_id: int) -> Optional[TournamentParticipant]:
+        return self.db.query(TournamentParticipant).filter(
+            and_(
+                TournamentParticipant.tournament_id == tournament_id,
+                TournamentParticipant.user_id == user_id
+            )
+        ).first()
+
+    def _users(self, user_ids) -> Dict[int, User]:
+        if not user_ids:
+            return {}
+        return {user.id: user for user in self.db.query(User).filter(User.id.in_(list(user_ids))).all()}
+
+    def _send_invitations(self, tournament_id: int, inviter_id: int, user_ids: List[int]):
+        """Send tournament invitations"""
+        for user_id in user_ids:
+            invitation = TournamentInvitation(
+                tournament_id=tournament_id,
+                inviter_id=inviter_id,
+                invitee_id=user_id
+            )
+            self.db.add(invitation)
+
+    def _seed_participants(self, tournament_id: int) -> List[TournamentParticipant]:
+        """Number participants by XP rank (earlier joiners first on ties)"""
+        rows = self.db.query(TournamentParticipant).outerjoin(
+            UserProgress, UserProgress.user_id == TournamentParticipant.user_id
+        ).filter(
+            TournamentParticipant.tournament_id == tournament_id
+        ).order_by(
+            desc(func.coalesce(UserProgress.total_xp, 0)),
+            TournamentParticipant.joined_at,
+            TournamentParticipant.id
+        ).all()
+
+        for seed, participant in enumerate(rows, start=1):
+            participant.seed_number = seed
+        return rows
+
+    def _matches(self, tournament_id: int) -> List[TournamentMatch]:
+        return self.db.query(TournamentMatch).filter(
+            TournamentMatch.tournament_id == tournament_id
+        ).order_by(TournamentMatch.round_number, TournamentMatch.match_number).all()
+
+    def _store_bracket(self, tournament: Tournament, bracket: Bracket):
+        """Insert a round row and a match row for everything the bracket has scheduled, and its snapshot"""
+        rounds = {}
+        for round_number, round_name in sorted(bracket.round_names.items()):
+            rounds[round_number] = TournamentBracket(
+                tournament_id=tournament.id,
+                round_number=round_number,
+                round_name=round_name,
+                total_matches=sum(1 for key in bracket.matches if key[0] == round_number)
+            )
+        self.db.add_all(rounds.values())
+        self.db.flush()
+
+        now = datetime.utcnow()
+        deadline = now + timedelta(minutes=MATCH_DEADLINE_MINUTES)
+        ready = {ready_match.key for ready_match in bracket.ready_matches()}
+        self.db.add_all([
+            TournamentMatch(
+                tournament_id=tournament.id,
+                bracket_id=rounds[round_number].id,
+                round_number=round_number,
+                match_number=match_number,
+                player1_id=match.players[0],
+                player2_id=match.players[1],
+                winner_id=match.winner,
+                is_completed=match.completed,
+                completed_at=now if match.completed else None,
+                deadline_at=deadline if match.key in ready else None
+            )
+            for (round_number, match_number), match in sorted(bracket.matches.items())
+        ])
+        tournament.bracket_state = bracket.to_state()
+
+    def _load_bracket(self, tournament: Tournament) -> Bracket:
+        """The bracket as of the last result; tournaments started before snapshots were kept are replayed once"""
+        if tournament.bracket_state:
+            return Bracket.from_state(tournament.bracket_state)
+
+        seeded = self.db.query(TournamentParticipant.user_id).filter(
+            TournamentParticipant.tournament_id == tournament.id,
+            TournamentParticipant.seed_number.isnot(None)
+        ).order_by(TournamentParticipant.seed_number).all()
+        bracket = Bracket(tournament.bracket_type, [row.user_id for row in seeded])
+
+        for match in self._matches(tournament.id):
+            key = (match.round_number, match.match_number)
+            if match.is_completed and match.winner_id is not None and not bracket.matches[key].completed:
+                bracket.report(key, match.winner_id, (match.player1_score or 0, match.player2_score or 0))
+        return bracket
+
+    def _advance(self, tournament: Tournament, match: TournamentMatch, at_deadline: bool = False) -> int:
+        """Decide a match, report it and write back every match it changes and the new snapshot"""
+        bracket = self._load_bracket(tournament)
+        key = (match.round_number, match.match_number)
+        scores = (match.player1_score or 0, match.player2_score or 0)
+        times = (match.player1_time or 0, match.player2_time or 0)
+        if at_deadline:
+            submitted = (match.player1_submitted_at is not None, match.player2_submitted_at is not None)
+            winner_id = bracket.decide_at_deadline(key, submitted, scores, times)
+        else:
+            winner_id = bracket.decide(key, scores, times)
+        eliminated_before = set(bracket.eliminated)
+        changed = bracket.report(key, winner_id, scores)
+
+        now = datetime.utcnow()
+        stored = {
+            (row.round_number, row.match_number): row
+            for row in self.db.query(TournamentMatch).filter(
+                TournamentMatch.tournament_id == tournament.id,
+                tuple_(TournamentMatch.round_number, TournamentMatch.match_number).in_(changed)
+            ).all()
+        }
+        new_rounds = {key[0] for key in changed if key not in stored}
+        if new_rounds:
+            # A grand-final reset is only scheduled once it is needed
+            for round_number in sorted(new_rounds):
+                round_row = TournamentBracket(
+                    tournament_id=tournament.id,
+                    round_number=round_number,
+                    round_name=bracket.round_names[round_number],
+                    total_matches=sum(1 for match_key in bracket.matches if match_key[0] == round_number)
+                )
+                self.db.add(round_row)
+                self.db.flush()
+                for match_key in changed:
+                    if match_key[0] == round_number and match_key not in stored:
+                        stored[match_key] = TournamentMatch(
+                            tournament_id=tournament.id,
+                            bracket_id=round_row.id,
+                            round_number=round_number,
+                            match_number=match_key[1]
+                        )
+                        self.db.add(stored[match_key])
+
+        deadline = now + timedelta(minutes=MATCH_DEADLINE_MINUTES)
+        ready = {ready_match.key for ready_match in bracket.ready_matches()}
+        for match_key in changed:
+            row, state = stored[match_key], bracket.matches[match_key]
+            row.player1_id, row.player2_id, row.winner_id = state.players[0], state.players[1], state.winner
+            if state.completed and not row.is_completed:
+                row.is_completed = True
+                row.completed_at = now
+            if match_key in ready and row.deadline_at is None:
+                row.deadline_at = deadline
+        tournament.bracket_state = bracket.to_state()
+
+        newly_eliminated = set(bracket.eliminated) - eliminated_before
+        finished = bracket.placements() if bracket.is_complete else {}
+        affected = newly_eliminated | set(finished)
+        if affected:
+            for participant in self.db.query(TournamentParticipant).filter(
+                TournamentParticipant.tournament_id == tournament.id,
+                TournamentParticipant.user_id.in_(list(affected))
+            ).all():
+                if participant.user_id in newly_eliminated:
+                    participant.is_eliminated = True
+                if participant.user_id in finished:
+                    participant.final_position = finished[participant.user_id]
+
+        if bracket.is_complete:
+            tournament.status = "completed"
+            tournament.tournament_end = now
+
+        return winner_id
+
+    def _playable_match(self, tournament_id: int, match_id: int, user_id: int) -> TournamentMatch:
+        match = self.db.query(TournamentMatch).filter(
+            TournamentMatch.id == match_id,
+            TournamentMatch.tournament_id == tournament_id
+        ).first()
+        if not match:
+            raise ValueError("Match not found")
+        if user_id not in (match.player1_id, match.player2_id):
+            raise ValueError("You are not playing in this match")
+        if match.is_completed or match.player1_id is None or match.player2_id is None:
+            raise ValueError("Match is not in progress")
+        submitted = match.player1_submitted_at if match.player1_id == user_id else match.player2_submitted_at
+        if submitted:
+            raise ValueError("Answers already submitted for this match")
+        return match
+
+    def _match_questions(self, tournament_id: int, round_number: int) -> List[TournamentQuestion]:
+        question_ids = [
+            row.id for row in self.db.query(TournamentQuestion.id).filter(
+                TournamentQuestion.tournament_id == tournament_id
+            ).order_by(TournamentQuestion.id).all()
+        ]
+        chosen = round_question_slice(question_ids, round_number, QUESTIONS_PER_MATCH)
+        if not chosen:
+            return []
+
+        questions = self.db.query(TournamentQuestion).filter(TournamentQuestion.id.in_(chosen)).all()
+        position = {question_id: index for index, question_id in enumerate(chosen)}
+        return sorted(questions, key=lambda question: position[question.id])
+
+    def _generate_tournament_questions(self, tournament_id: int, question_config: QuestionConfiguration):
+        """Copy a draw from the question bank into the tournament, so later bank edits do not change it"""
+        difficulty = None if question_config.difficulty_level == DifficultyLevelEnum.MIXED else question_config.difficulty_level.value
+        service = QuestionService(self.db)
+        draw = dict(
+            count=question_config.total_questions,
+            difficulty_level=difficulty,
+            topics=question_config.custom_topics or None,
+            stratify=difficulty is None
+        )
+        questions = service.get_random_questions(subject=question_config.subject_category, **draw)
+        if not questions and question_config.subject_category:
+            # "general_knowledge" and other free-form categories are not bank subjects
+            questions = service.get_random_questions(**draw)
+
+        self.db.add_all([
+            TournamentQuestion(
+                tournament_id=tournament_id,
+                question_text=question.question_text,
+                option_a=question.option_a,
+                option_b=question.option_b,
+                option_c=question.option_c,
+                option_d=question.option_d,
+                correct_answer=question.correct_answer,
+                category=question.subject,
+                difficulty=question.difficulty_level,
+                points_value=question.points_value or 10,
+                time_limit_seconds=question.time_limit_seconds or 30,
+                generated_by_ai=False,
+                question_bank_id=question.id,
+                source_topic=question.topic
+            )
+            for question in questions
+        ])
+        return questions
+
+
+class ForfeitSweeper:
+    """Background loop that runs ``TournamentService.forfeit_expired_matches`` every ``interval_seconds``.
+
+    Every replica runs one; the tournament row lock keeps them from deciding a match twice.
+    """
+
+    def __init__(self, interval_seconds: float = FORFEIT_SWEEP_SECONDS):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, session_factory) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def sweep(self, session_factory) -> int:
+        db = session_factory()
+        try:
+            return TournamentService(db).forfeit_expired_matches()
+        finally:
+            db.close()
+
+    async def _run(self, session_factory) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                decided = await asyncio.to_thread(self.sweep, session_factory)
+                if decided:
+                    print(f"⏱️ Decided {decided} tournament matches at their deadline")
+            except Exception as e:
+                print(f"❌ Tournament forfeit sweep failed: {e}")
+
+
+forfeit_sweeper = ForfeitSweeper()
@@ -1,15 +1,26 @@
+import os
+import sys
+
+# Modules shared between services (common/) sit in the repository root; the
+# Docker image copies them next to this file instead
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from Endpoints import achivements as auth
-# from Endpoints import tournaments
+from Endpoints import tournaments
 from Endpoints import questions
 from Endpoints import chainlink  # Add this
 from Endpoints import question_converter  # Add this
-from db.connection import engine
+from db.connection import engine, SessionLocal
 from db.database import test_connection
 import models.models as models  # This now includes QuestionBank
 import models.tournament_models as tournament_models
 from models.question_bank import QuestionBank, Base as QuestionBankBase  # Add Base import
+from functions.question_sampler import question_sampler
+from functions.question_stats import question_stats, ensure_schema as ensure_question_stats_schema
+from functions.tournament_functions import ensure_schema as ensure_tournament_schema, forfeit_sweeper
+from functions.leaderboard import leaderboards, leaderboard_channel
 
 from sqlalchemy import text
 
@@ -43,13 +54,36 @@ async def startup_event():
         models.Base.metadata.create_all(bind=engine)
         tournament_models.Base.metadata.create_all(bind=engine)
         QuestionBankBase.metadata.create_all(bind=engine)  # <-- Explicitly create QuestionBank table
+        ensure_tournament_schema(engine)
+        # create_all skips indexes on tables that already exist
+        for index in [*QuestionBank.__table__.indexes, *tournament_models.TournamentMatch.__table__.indexes]:
+            index.create(bind=engine, checkfirst=True)
+        ensure_question_stats_schema(engine)
         print("✅ All database tables created successfully!")
     except Exception as e:
         print(f"❌ Supabase connection failed: {e}")
+    # Flushes buffered question usage and refreshes the stats overview
+    question_stats.start(SessionLocal)
+    # Decides matches a player never submitted to, so the bracket keeps moving
+    forfeit_sweeper.start(SessionLocal)
+    # Keeps the XP board of every replica current, not just the one that took the write
+    if leaderboard_channel is not None:
+        try:
+            await leaderboard_channel.start(leaderboards)
+            print("✅ Leaderboard updates shared across replicas")
+        except Exception as e:
+            print(f"⚠️ Leaderboard sync unavailable, other replicas catch up on reload: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await question_stats.stop(SessionLocal)
+    await forfeit_sweeper.stop()
+    if leaderboard_channel is not None:
+        await leaderboard_channel.stop()
 
 # Include routers
 app.include_router(auth.router)
-# app.include_router(tournaments.router)
+app.include_router(tournaments.router)
 app.include_router(questions.router)
 app.include_router(chainlink.router)
 app.include_router(question_converter.router)
@@ -102,6 +136,7 @@ def populate_question_bank_endpoint():
     try:
         from utils.populate_questions import populate_question_bank
         populate_question_bank()
+        question_sampler.pools.invalidate()
         return {"message": "Question bank populated successfully!", "questions_added": 50}
     except Exception as e:
         return {"error": f"Failed to populate questions: {str(e)}"}
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Float, Index
 from datetime import datetime
 from models.models import Base  # Use the same Base as your other models
 
@@ -28,9 +28,15 @@ class QuestionBank(Base):
     
     # Usage Stats
     times_used = Column(Integer, default=0)
+    times_correct = Column(Integer, default=0)
     correct_rate = Column(Float, default=0.0)  # Percentage of correct answers
     
     # Metadata
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Covers the sampler's pool load (active ids by subject/difficulty/topic) as an index-only scan
+        Index("ix_question_bank_pool", "is_active", "subject", "difficulty_level", "topic", "id"),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, Table, MetaData
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Float, Table, MetaData, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
@@ -72,6 +72,9 @@ class Tournament(Base):
     registration_end = Column(DateTime)
     tournament_start = Column(DateTime)
     tournament_end = Column(DateTime)
+
+    # Bracket snapshot (functions/tournament_engine.py Bracket.to_state), updated with every result
+    bracket_state = Column(JSON)
     
     # Metadata
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -144,6 +147,11 @@ class TournamentMatch(Base):
     player1_time = Column(Integer, default=0)
     player2_time = Column(Integer, default=0)
     
+    player1_submitted_at = Column(DateTime)
+    player2_submitted_at = Column(DateTime)
+    # Set once both players are known; a player who has not submitted by then forfeits
+    deadline_at = Column(DateTime)
+    
     # Status
     is_completed = Column(Boolean, default=False)
     started_at = Column(DateTime)
@@ -153,6 +161,13 @@ class TournamentMatch(Base):
     tournament = relationship("Tournament", back_populates="matches")
     bracket = relationship("TournamentBracket", back_populates="matches")  # ✅ This should match the above
 
+    __table_args__ = (
+        # Bracket view reads a tournament's matches in (round, match) order; results look them up by key
+        Index("ix_tournament_matches_tournament_round", "tournament_id", "round_number", "match_number"),
+        # Forfeit sweep: open matches past their deadline
+        Index("ix_tournament_matches_open_deadline", "is_completed", "deadline_at"),
+    )
+
 class TournamentInvitation(Base):
     __tablename__ = "tournament_invitations"
     
@@ -191,6 +206,7 @@ class TournamentQuestion(Base):
     
     # AI Generation Info
     generated_by_ai = Column(Boolean, default=False)
+    question_bank_id = Column(Integer)  # Source row when drawn from the question bank
     source_topic = Column(String(255))
     
     created_at = Column(DateTime, default=datetime.utcnow)
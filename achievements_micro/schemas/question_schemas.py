@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -73,6 +73,13 @@ class QuestionStatsResponse(BaseModel):
     most_used_questions: list
     highest_correct_rate: list
 
+class QuestionAnswer(BaseModel):
+    question_id: int
+    was_correct: bool
+
+class RecordAnswersRequest(BaseModel):
+    answers: List[QuestionAnswer] = Field(..., min_length=1, max_length=1000)
+
 class UpdateQuestionRequest(BaseModel):
     question_text: Optional[str] = Field(None, min_length=10, max_length=1000)
     option_a: Optional[str] = Field(None, min_length=1, max_length=500)
@@ -0,0 +1,113 @@
+"""Tests for the single-transaction XP/achievement engine."""
+
+import os
+import tempfile
+import threading
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from achievements_micro.functions.action_engine import ActionEngine, GamificationRules
+
+SCHEMA = [
+    """CREATE TABLE ranks (id INTEGER PRIMARY KEY, name TEXT, tier TEXT, level INTEGER,
+                           required_xp INTEGER, emoji TEXT)""",
+    "CREATE TABLE achievements (id INTEGER PRIMARY KEY, name TEXT, xp_reward INTEGER)",
+    """CREATE TABLE user_progress (
+           id INTEGER PRIMARY KEY, user_id INTEGER, total_xp INTEGER, current_rank_id INTEGER,
+           login_streak INTEGER, last_login TIMESTAMP, total_quiz_completed INTEGER,
+           tournaments_won INTEGER, tournaments_entered INTEGER, courses_completed INTEGER,
+           time_spent_hours INTEGER, created_at TIMESTAMP, updated_at TIMESTAMP)""",
+    "CREATE TABLE user_achievements (id INTEGER PRIMARY KEY, user_id INTEGER, achievement_id INTEGER, earned_at TIMESTAMP)",
+    """CREATE TABLE xp_transactions (id INTEGER PRIMARY KEY, user_id INTEGER, amount INTEGER,
+                                     source TEXT, description TEXT, created_at TIMESTAMP)""",
+    """INSERT INTO ranks VALUES (1, 'Novice III', 'Starter', 3, 0, NULL), (2, 'Novice II', 'Starter', 2, 500, NULL),
+                                (3, 'Novice I', 'Starter', 1, 1500, NULL), (4, 'Apprentice III', 'Starter', 3, 3500, NULL)""",
+    """INSERT INTO achievements VALUES (1, 'First Spark', 500), (2, 'Knowledge Seeker', 1000),
+                                       (3, 'First Blood', 500), (4, 'Night Owl', 1000)""",
+]
+
+NOON = lambda: datetime(2024, 1, 1, 12)
+
+
+@pytest.fixture()
+def session_factory():
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60, "check_same_thread": False})
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+    os.remove(path)
+
+
+def scalar(db, sql):
+    return db.execute(text(sql)).scalar()
+
+
+def test_first_action_creates_progress_awards_milestone_and_ranks_up(session_factory):
+    db = session_factory()
+    result = ActionEngine(db, GamificationRules(), clock=NOON).process_actions(7, ["quiz_completed"])
+
+    assert result["xp_added"] == 100
+    assert result["achievements_earned"] == ["First Spark"]
+    assert result["total_xp"] == 600
+    assert result["current_rank"]["name"] == "Novice II"
+    assert scalar(db, "SELECT current_rank_id FROM user_progress WHERE user_id = 7") == 2
+    assert scalar(db, "SELECT COUNT(*) FROM xp_transactions") == 2
+
+
+def test_batch_crosses_each_milestone_once_and_rejects_unknown_actions(session_factory):
+    db = session_factory()
+    engine = ActionEngine(db, GamificationRules(), clock=lambda: datetime(2024, 1, 1, 3))
+
+    result = engine.process_actions(7, ["quiz_completed"] * 10 + ["login", "login"])
+    assert result["achievements_earned"] == ["Night Owl", "First Spark", "Knowledge Seeker"]
+    assert result["total_xp"] == 10 * 100 + 1000 + 500 + 1000
+    assert engine.process_actions(7, ["quiz_completed"])["achievements_earned"] == []
+
+    with pytest.raises(ValueError):
+        engine.process_actions(7, ["quiz_completed", "teleported"])
+    assert scalar(db, "SELECT total_quiz_completed FROM user_progress WHERE user_id = 7") == 11
+
+
+def test_concurrent_actions_lose_no_updates(session_factory):
+    rules = GamificationRules()
+    setup = session_factory()
+    ActionEngine(setup, rules.load(setup), clock=NOON).process_actions(7, ["tournament_entered"])
+    setup.close()
+
+    threads_count, actions_per_thread = 8, 25
+    observed_totals, errors = [], []
+
+    def worker():
+        db = session_factory()
+        try:
+            engine = ActionEngine(db, rules, clock=NOON)
+            for _ in range(actions_per_thread):
+                observed_totals.append(engine.process_actions(7, ["quiz_completed"])["total_xp"])
+        except Exception as e:  # pragma: no cover - surfaced by the assertion below
+            errors.append(e)
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    db = session_factory()
+    quizzes = threads_count * actions_per_thread
+    assert scalar(db, "SELECT total_quiz_completed FROM user_progress WHERE user_id = 7") == quizzes
+    # 500 (First Blood) + quiz XP + First Spark + Knowledge Seeker, each milestone exactly once
+    assert scalar(db, "SELECT total_xp FROM user_progress WHERE user_id = 7") == 500 + quizzes * 100 + 500 + 1000
+    assert scalar(db, "SELECT COUNT(*) FROM user_achievements") == 3
+    assert scalar(db, "SELECT COUNT(*) FROM xp_transactions") == 1 + quizzes + 2
+    # Every action saw a distinct running total: no two increments read the same value
+    assert len(set(observed_totals)) == quizzes
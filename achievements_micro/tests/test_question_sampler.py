@@ -0,0 +1,64 @@
+"""Tests for pooled random question sampling."""
+
+import random
+from collections import Counter
+
+from achievements_micro.functions.question_sampler import (
+    QuestionPools,
+    QuestionSampler,
+    sample_ids,
+    stratified_counts,
+)
+
+ROWS = (
+    [(i, "Mathematics", "elementary", "Algebra") for i in range(1, 41)]
+    + [(i, "Mathematics", "university", "Calculus") for i in range(41, 51)]
+    + [(i, "Applied Mathematics", "university", "Statistics") for i in range(51, 61)]
+    + [(i, "History", "high_school", "World War II") for i in range(61, 91)]
+)
+
+
+def make_sampler():
+    pools = QuestionPools(refresh_seconds=3600)
+    pools.load(ROWS)
+    return QuestionSampler(pools)
+
+
+def test_draws_are_distinct_filtered_and_roughly_uniform():
+    sampler = make_sampler()
+    rng = random.Random(1)
+
+    ids = sampler.sample(None, 25, subject="math", rng=rng)
+    assert len(set(ids)) == 25 and all(1 <= i <= 60 for i in ids)
+    assert set(sampler.sample(None, 100, subject="MATH", topics=["Calculus"], rng=rng)) == set(range(41, 51))
+
+    counts = Counter()
+    for _ in range(3000):
+        counts.update(sample_ids([ids for _, ids in sampler.pools.matching()], 3, rng=rng))
+    assert min(counts.values()) > 0.6 * max(counts.values())
+
+
+def test_recently_seen_questions_are_skipped_until_the_pool_runs_out():
+    sampler = make_sampler()
+    rng = random.Random(2)
+
+    first = sampler.sample(None, 20, subject="History", user_id=9, rng=rng)
+    second = sampler.sample(None, 10, subject="History", user_id=9, rng=rng)
+    assert not set(first) & set(second)
+
+    # Only 30 History questions: the third draw tops up with seen ones
+    third = sampler.sample(None, 15, subject="History", user_id=9, rng=rng)
+    assert len(set(third)) == 15
+
+    assert sampler.sample(None, 5, subject="Chemistry") == []
+
+
+def test_stratified_draw_splits_evenly_across_difficulties():
+    assert stratified_counts({"a": 40, "b": 20, "c": 3}, 12) == {"a": 5, "b": 4, "c": 3}
+    assert stratified_counts({"a": 2, "b": 1}, 10) == {"a": 2, "b": 1}
+
+    ids = make_sampler().sample(None, 9, stratify=True, rng=random.Random(3))
+    by_difficulty = Counter(
+        "elementary" if i <= 40 else "university" if i <= 60 else "high_school" for i in ids
+    )
+    assert by_difficulty == {"elementary": 3, "university": 3, "high_school": 3}
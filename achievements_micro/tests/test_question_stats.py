@@ -0,0 +1,114 @@
+"""Tests for buffered question usage counters and the stats overview."""
+
+import os
+import tempfile
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from achievements_micro.functions.question_stats import QuestionStatsPipeline
+
+SCHEMA = [
+    """CREATE TABLE question_bank (
+           id INTEGER PRIMARY KEY, question_text TEXT, subject TEXT, topic TEXT, difficulty_level TEXT,
+           times_used INTEGER, times_correct INTEGER, correct_rate FLOAT, is_active BOOLEAN)""",
+    """INSERT INTO question_bank VALUES
+           (1, 'What is 2 + 2?', 'Math', 'Arithmetic', 'elementary', 0, 0, 0.0, 1),
+           (2, 'What is 3 * 3?', 'Math', 'Arithmetic', 'elementary', 4, 1, 25.0, 1),
+           (3, 'What is H2O?', 'Science', 'Chemistry', 'middle_school', 0, 0, 0.0, 1),
+           (4, 'Retired question', 'Science', 'Chemistry', 'middle_school', 0, 0, 0.0, 0)""",
+]
+
+
+@pytest.fixture()
+def session_factory():
+    handle, path = tempfile.mkstemp(suffix=".db")
+    os.close(handle)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 60, "check_same_thread": False})
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+    os.remove(path)
+
+
+def counters(db, question_id):
+    return db.execute(text(
+        "SELECT times_used, times_correct, correct_rate FROM question_bank WHERE id = :id"
+    ), {"id": question_id}).first()
+
+
+def test_concurrent_recording_and_flushing_keeps_counters_exact(session_factory):
+    pipeline = QuestionStatsPipeline(flush_threshold=25)
+    workers, answers_each = 8, 150
+
+    def worker(index):
+        db = session_factory()
+        try:
+            for n in range(answers_each):
+                # Question 2 is always right, question 3 right every other time
+                pipeline.record(db, [(2, True), (3, (index + n) % 2 == 0)])
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = session_factory()
+    pipeline.flush(db)
+    total = workers * answers_each
+
+    used, correct, rate = counters(db, 2)
+    assert (used, correct) == (4 + total, 1 + total)
+    assert rate == pytest.approx(correct * 100.0 / used)
+
+    used, correct, rate = counters(db, 3)
+    assert (used, correct) == (total, total // 2)
+    assert rate == pytest.approx(50.0)
+    assert len(pipeline.buffer) == 0
+
+
+def test_failed_flush_keeps_events_for_the_next_one(session_factory):
+    pipeline = QuestionStatsPipeline()
+    db = session_factory()
+    pipeline.record(db, [(1, True), (1, False), (3, True)])
+
+    db.execute(text("ALTER TABLE question_bank RENAME TO question_bank_moved"))
+    db.commit()
+    with pytest.raises(Exception):
+        pipeline.flush(db)
+    assert len(pipeline.buffer) == 3
+
+    db.execute(text("ALTER TABLE question_bank_moved RENAME TO question_bank"))
+    db.commit()
+    assert pipeline.flush(db) == 3
+    assert tuple(counters(db, 1)) == (2, 1, 50.0)
+    assert tuple(counters(db, 3)) == (1, 1, 100.0)
+
+
+def test_overview_counts_active_questions_and_is_cached(session_factory):
+    pipeline = QuestionStatsPipeline(refresh_seconds=3600)
+    db = session_factory()
+    pipeline.record(db, [(2, True)] * 6)
+    pipeline.flush(db)
+
+    overview = pipeline.overview(db)
+    assert overview["total_questions"] == 4
+    assert overview["active_questions"] == 3
+    assert overview["by_subject"] == {"Math": 2, "Science": 1}
+    assert overview["by_difficulty"] == {"elementary": 2, "middle_school": 1}
+    assert overview["most_used_questions"][0]["id"] == 2
+    assert [entry["id"] for entry in overview["highest_correct_rate"]] == [2]
+    assert overview["highest_correct_rate"][0]["correct_rate"] == pytest.approx(70.0)
+
+    db.execute(text("UPDATE question_bank SET is_active = 0 WHERE id = 1"))
+    db.commit()
+    assert pipeline.overview(db)["active_questions"] == 3
+    pipeline.refresh(db)
+    assert pipeline.overview(db)["active_questions"] == 2
@@ -0,0 +1,167 @@
+"""Tests for tournament bracket generation and advancement."""
+
+import json
+import random
+import time
+from collections import Counter
+from itertools import combinations
+
+from achievements_micro.functions.tournament_engine import (
+    DOUBLE_ELIMINATION,
+    ROUND_ROBIN,
+    SINGLE_ELIMINATION,
+    Bracket,
+    round_question_slice,
+    seed_positions,
+)
+
+PLAYERS = list(range(1001, 2025))  # 1024 user ids, best seed first
+
+
+def play_out(bracket, rng=None):
+    """Play every ready match until the bracket is done; returns the results in play order"""
+    results = []
+    while not bracket.is_complete:
+        ready = bracket.ready_matches()
+        assert ready, "bracket stalled"
+        for match in ready:
+            if rng is None:
+                winner = min(match.players, key=bracket.seeds.get)
+                scores = (1, 0) if winner == match.players[0] else (0, 1)
+            else:
+                scores = (rng.randint(0, 10), rng.randint(0, 10))
+                winner = bracket.decide(match.key, scores, (rng.randint(1, 99), rng.randint(1, 99)))
+            bracket.report(match.key, winner, scores)
+            results.append((match.key, winner, scores))
+    return results
+
+
+def test_seeded_brackets_keep_top_seeds_apart():
+    assert seed_positions(8) == [1, 8, 4, 5, 2, 7, 3, 6]
+
+    bracket = Bracket(SINGLE_ELIMINATION, PLAYERS[:6])
+    # Seeds 1 and 2 get the byes; 3 v 6 and 4 v 5 are the only first-round games
+    assert sorted(sorted(bracket.seeds[p] for p in match.players) for match in bracket.ready_matches()) == [[3, 6], [4, 5]]
+    assert bracket.round_names == {1: "Quarterfinals", 2: "Semifinals", 3: "Finals"}
+
+    play_out(bracket)
+    placements = bracket.placements()
+    assert bracket.champion == PLAYERS[0]
+    assert [placements[player] for player in PLAYERS[:6]] == [1, 2, 3, 3, 5, 5]
+
+
+def test_1024_player_brackets_run_end_to_end_within_budget():
+    started = time.perf_counter()
+
+    single = Bracket(SINGLE_ELIMINATION, PLAYERS)
+    assert len(play_out(single)) == 1023
+    assert single.champion == PLAYERS[0]
+    assert Counter(single.placements().values())[2] == 1
+
+    double = Bracket(DOUBLE_ELIMINATION, PLAYERS)
+    results = play_out(double, random.Random(7))
+    assert len(results) in (2046, 2047)  # one more when the grand final is reset
+    losses = Counter(
+        next(player for player in double.matches[key].players if player != winner) for key, winner, _ in results
+    )
+    assert all(losses[player] == 2 for player in PLAYERS if player != double.champion)
+    assert losses[double.champion] <= 1
+    assert sorted(double.placements().values())[:3] == [1, 2, 3]
+
+    assert time.perf_counter() - started < 5.0
+
+    # The service rebuilds brackets from the seeds and the stored results in round order
+    replayed = Bracket(DOUBLE_ELIMINATION, PLAYERS)
+    for key, winner, scores in sorted(results):
+        replayed.report(key, winner, scores)
+    assert replayed.champion == double.champion
+    assert replayed.placements() == double.placements()
+
+
+def test_losers_bracket_champion_forces_a_grand_final_reset():
+    players = PLAYERS[:4]
+    bracket = Bracket(DOUBLE_ELIMINATION, players)
+    underdog = players[3]
+
+    # The underdog loses its first match, then wins everything else
+    lost_once = False
+    while not bracket.is_complete:
+        for match in bracket.ready_matches():
+            if underdog in match.players and lost_once:
+                chosen = underdog
+            else:
+                chosen = min(match.players, key=bracket.seeds.get)
+                lost_once = lost_once or underdog in match.players
+            bracket.report(match.key, chosen)
+
+    assert bracket.round_names[max(bracket.round_names)] == "Grand Final Reset"
+    assert bracket.champion == underdog
+    assert bracket.placements()[players[0]] == 2
+
+
+def test_snapshots_carry_on_exactly_where_the_bracket_left_off():
+    for bracket_type in (SINGLE_ELIMINATION, DOUBLE_ELIMINATION, ROUND_ROBIN):
+        rng = random.Random(7)
+        live = Bracket(bracket_type, PLAYERS[:13])
+        restored = Bracket.from_state(json.loads(json.dumps(live.to_state())))
+        while not live.is_complete:
+            ready = live.ready_matches()
+            assert sorted(match.key for match in restored.ready_matches()) == sorted(match.key for match in ready)
+            match = ready[0]
+            scores = (rng.randint(0, 10), rng.randint(0, 10))
+            winner = live.decide(match.key, scores)
+            changed = live.report(match.key, winner, scores)
+            assert restored.report(match.key, winner, scores) == changed
+            # Each result is applied to the previous result's snapshot, as the service does
+            restored = Bracket.from_state(json.loads(json.dumps(restored.to_state())))
+
+        assert restored.is_complete
+        assert restored.placements() == live.placements()
+
+
+def test_an_absent_player_forfeits_at_the_deadline():
+    bracket = Bracket(SINGLE_ELIMINATION, PLAYERS[:2])
+    key = bracket.ready_matches()[0].key
+    first, second = bracket.matches[key].players
+
+    assert bracket.decide_at_deadline(key, (False, True), (0, 3)) == second
+    assert bracket.decide_at_deadline(key, (True, False), (0, 0)) == first
+    assert bracket.decide_at_deadline(key, (False, False), (0, 0)) == min(first, second, key=bracket.seeds.get)
+
+
+def test_round_robin_pairs_everyone_once():
+    players = PLAYERS[:7]
+    bracket = Bracket(ROUND_ROBIN, players)
+    played = [match for match in bracket.matches.values() if not match.is_bye]
+
+    assert len(bracket.round_names) == 7
+    assert sorted(tuple(sorted(match.players)) for match in played) == sorted(combinations(players, 2))
+    byes = Counter(player for match in bracket.matches.values() if match.is_bye for player in match.players if player)
+    assert byes == Counter(players)
+
+    play_out(bracket)
+    placements = bracket.placements()
+    assert [placements[player] for player in players] == [1, 2, 3, 4, 5, 6, 7]
+    assert bracket.wins[players[0]] == 6
+
+
+def test_round_robin_losers_stay_in_and_play_their_whole_schedule():
+    players = PLAYERS[:4]
+    bracket = Bracket(ROUND_ROBIN, players)
+    first = sorted(bracket.ready_matches(), key=lambda match: match.key)[0]
+    loser = max(first.players, key=bracket.seeds.get)
+    bracket.report(first.key, min(first.players, key=bracket.seeds.get))
+
+    assert bracket.eliminated == {}
+    play_out(bracket)
+    assert bracket.eliminated == {}
+    assert sum(loser in match.players for match in bracket.matches.values() if match.completed) == 3
+
+
+def test_rounds_take_consecutive_question_slices():
+    questions = list(range(100, 125))
+    assert round_question_slice(questions, 1, 10) == list(range(100, 110))
+    assert round_question_slice(questions, 2, 10) == list(range(110, 120))
+    assert round_question_slice(questions, 3, 10) == list(range(120, 125)) + list(range(100, 105))
+    assert round_question_slice(questions[:4], 2, 10) == questions[:4]
+    assert round_question_slice([], 1, 10) == []
@@ -0,0 +1 @@
+"""Modules shared by the BrainInk services; each service image copies this package next to its own code."""
@@ -0,0 +1,312 @@
+"""In-memory leaderboards with incremental rank maintenance, shared by services.
+
+Each board is a sorted set of ``member -> score`` where the score is a tuple
+compared best-first (e.g. league ``(score, accuracy, questions_answered)``).
+Members live in a ``sortedcontainers.SortedList``, so rank-of-member, a page
+by rank and an around-me window cost O(log n) plus the window size instead of
+sorting the whole table per request.
+
+Boards are loaded from the database on first read and then follow writes:
+services call ``registry.update(...)`` with the committed score. Updates
+carry absolute scores, so applying one twice is harmless. A registry's
+``broadcast`` hook sends them to other replicas, which ``apply`` them; a
+service without a backplane of its own uses ``PostgresLeaderboardChannel``.
+A TTL reload bounds drift if an update is ever missed.
+
+Each service wires its own registry in ``functions/leaderboard.py``.
+"""
+
+import asyncio
+import json
+import os
+import queue
+import select
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+LEADERBOARD_TTL_SECONDS = float(os.getenv("LEADERBOARD_TTL_SECONDS", "600"))
+LEADERBOARD_MAX_BOARDS = int(os.getenv("LEADERBOARD_MAX_BOARDS", "500"))
+LEADERBOARD_CHANNEL = os.getenv("LEADERBOARD_CHANNEL", "leaderboard_updates")
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+
+Score = Tuple[Any, ...]
+Entry = Tuple[int, Hashable, Score]  # (rank, member, score)
+
+
+class SortedLeaderboard:
+    """Sorted set of members ordered by descending score, ties broken by member."""
+
+    def __init__(self, items: Iterable[Tuple[Hashable, Any]] = ()):
+        self._scores: Dict[Hashable, Score] = {}
+        self._order = SortedList()
+        for member, score in items:
+            self.set(member, score)
+
+    @staticmethod
+    def _normalize(score: Any) -> Score:
+        """Score as a tuple; NULL components (e.g. an unset column) count as 0 so they can be negated"""
+        values = score if isinstance(score, (tuple, list)) else (score,)
+        return tuple(0 if value is None else value for value in values)
+
+    @staticmethod
+    def _key(member: Hashable, score: Score) -> Tuple[Tuple[Any, ...], Hashable]:
+        return tuple(-value for value in score), member
+
+    def set(self, member: Hashable, score: Any) -> None:
+        score = self._normalize(score)
+        previous = self._scores.get(member)
+        if previous == score:
+            return
+        if previous is not None:
+            self._order.remove(self._key(member, previous))
+        self._scores[member] = score
+        self._order.add(self._key(member, score))
+
+    def remove(self, member: Hashable) -> bool:
+        previous = self._scores.pop(member, None)
+        if previous is None:
+            return False
+        self._order.remove(self._key(member, previous))
+        return True
+
+    def score(self, member: Hashable) -> Optional[Score]:
+        return self._scores.get(member)
+
+    def rank(self, member: Hashable) -> Optional[int]:
+        """1-based position of a member (no shared ranks, like ROW_NUMBER)."""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return self._order.index(self._key(member, score)) + 1
+
+    def page(self, offset: int = 0, limit: int = 50) -> List[Entry]:
+        offset = max(offset, 0)
+        return [
+            (offset + position + 1, member, self._scores[member])
+            for position, (_, member) in enumerate(self._order.islice(offset, offset + limit))
+        ]
+
+    def around(self, member: Hashable, radius: int = 5) -> List[Entry]:
+        """Entries from ``radius`` places above the member to ``radius`` places below."""
+        rank = self.rank(member)
+        if rank is None:
+            return []
+        start = max(rank - 1 - radius, 0)
+        return self.page(start, rank - start + radius)
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, member: Hashable) -> bool:
+        return member in self._scores
+
+
+class LeaderboardRegistry:
+    """Named boards loaded on demand, capped in number and reloaded after a TTL."""
+
+    def __init__(
+        self,
+        ttl_seconds: float = LEADERBOARD_TTL_SECONDS,
+        max_boards: int = LEADERBOARD_MAX_BOARDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_boards = max_boards
+        self._boards: "OrderedDict[str, Tuple[float, SortedLeaderboard]]" = OrderedDict()
+        # Called with [[board, member, score-or-None], ...] to notify other replicas
+        self.broadcast: Optional[Callable[[list], object]] = None
+
+    def peek(self, name: str) -> Optional[SortedLeaderboard]:
+        """The board if it is loaded and fresh, without loading it."""
+        entry = self._boards.get(name)
+        if entry is None:
+            return None
+        loaded_at, board = entry
+        if time.monotonic() - loaded_at > self.ttl_seconds:
+            del self._boards[name]
+            return None
+        self._boards.move_to_end(name)
+        return board
+
+    def get(self, name: str, loader: Callable[[], Iterable[Tuple[Hashable, Any]]]) -> SortedLeaderboard:
+        board = self.peek(name)
+        if board is None:
+            board = SortedLeaderboard(loader())
+            self._boards[name] = (time.monotonic(), board)
+            while len(self._boards) > self.max_boards:
+                self._boards.popitem(last=False)
+        return board
+
+    def update(self, name: str, member: Hashable, score: Any) -> None:
+        """Apply a committed score to a loaded board here and on other replicas."""
+        self.apply([[name, member, score]])
+        self._broadcast([[name, member, score]])
+
+    def remove(self, name: str, member: Hashable) -> None:
+        self.apply([[name, member, None]])
+        self._broadcast([[name, member, None]])
+
+    def drop(self, *names: str) -> None:
+        """Forget whole boards (here and on other replicas); the next read reloads them."""
+        for name in names:
+            self._boards.pop(name, None)
+        self._broadcast([[name] for name in names])
+
+    def apply(self, updates: Iterable[list]) -> None:
+        """Apply ``[board, member, score]`` updates (score None removes, bare ``[board]`` drops)."""
+        for update in updates:
+            name = update[0]
+            if len(update) == 1:
+                self._boards.pop(name, None)
+                continue
+            entry = self._boards.get(name)
+            if entry is None:
+                continue
+            member, score = update[1], update[2]
+            if score is None:
+                entry[1].remove(member)
+            else:
+                entry[1].set(member, score)
+
+    def _broadcast(self, updates: list) -> None:
+        if self.broadcast is None:
+            return
+        result = self.broadcast(updates)
+        if asyncio.iscoroutine(result):
+            try:
+                asyncio.get_running_loop().create_task(result)
+            except RuntimeError:
+                result.close()  # No event loop (e.g. a script): nothing to deliver it
+
+    def __len__(self) -> int:
+        return len(self._boards)
+
+
+
+def resolve_entries(
+    board: SortedLeaderboard,
+    read: Callable[[SortedLeaderboard], List[Entry]],
+    lookup: Callable[[List[Hashable]], Dict[Hashable, Any]],
+) -> List[Tuple[Entry, Any]]:
+    """``(entry, details)`` for the entries ``read(board)`` returns, in board order.
+
+    ``lookup`` maps members to their details (e.g. user rows). A member it
+    cannot find, such as a deleted user, is removed from the board and the
+    read repeated, so a page still holds ``limit`` entries when enough exist
+    and ranks stay contiguous.
+    """
+    while True:
+        entries = read(board)
+        details = lookup([member for _, member, _ in entries]) if entries else {}
+        missing = [member for _, member, _ in entries if member not in details]
+        if not missing:
+            return [(entry, details[entry[1]]) for entry in entries]
+        for member in missing:
+            board.remove(member)
+
+
+# ===============================
+# CROSS-REPLICA UPDATES
+# ===============================
+
+class PostgresLeaderboardChannel:
+    """Carries registry updates between replicas over Postgres LISTEN/NOTIFY.
+
+    ``start`` makes it the registry's ``broadcast`` hook. Publishing only
+    queues the updates for a background thread, so write paths never wait on
+    the database and need no event loop. Received updates, including this
+    replica's own, are applied on the event loop that called ``start``.
+    """
+
+    def __init__(self, dsn: str, channel: str = LEADERBOARD_CHANNEL, application_name: str = "leaderboards"):
+        # SQLAlchemy URLs may carry a driver suffix psycopg2 does not understand
+        scheme, sep, rest = dsn.partition("://")
+        self.dsn = scheme.split("+")[0] + sep + rest
+        self.channel = channel
+        self.application_name = application_name
+        self._outbox: "queue.Queue[Optional[list]]" = queue.Queue()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn, application_name=self.application_name)
+        conn.autocommit = True
+        return conn
+
+    @staticmethod
+    def encode(updates: list) -> str:
+        payload = json.dumps(updates, separators=(",", ":"))
+        if len(payload.encode("utf-8")) > NOTIFY_MAX_BYTES:
+            # Too big for NOTIFY: have other replicas reload the boards instead
+            payload = json.dumps([[name] for name in dict.fromkeys(update[0] for update in updates)])
+        return payload
+
+    async def start(self, registry: "LeaderboardRegistry") -> None:
+        loop = asyncio.get_running_loop()
+        listen_conn = await asyncio.to_thread(self._connect)
+        with listen_conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+
+        def listen():
+            try:
+                while not self._stopping.is_set():
+                    if select.select([listen_conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    listen_conn.poll()
+                    while listen_conn.notifies:
+                        try:
+                            updates = json.loads(listen_conn.notifies.pop(0).payload)
+                        except ValueError:
+                            continue
+                        loop.call_soon_threadsafe(registry.apply, updates)
+            except Exception as e:
+                print(f"Leaderboard listener stopped: {e}")
+            finally:
+                listen_conn.close()
+
+        def publish():
+            conn = None
+            while True:
+                updates = self._outbox.get()
+                if updates is None:
+                    break
+                try:
+                    if conn is None or conn.closed:
+                        conn = self._connect()
+                    with conn.cursor() as cursor:
+                        cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, self.encode(updates)))
+                except Exception as e:
+                    print(f"Leaderboard update publish failed: {e}")
+            if conn is not None and not conn.closed:
+                conn.close()
+
+        self._threads = [
+            threading.Thread(target=listen, name="leaderboard-listener", daemon=True),
+            threading.Thread(target=publish, name="leaderboard-publisher", daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+        registry.broadcast = self.publish
+
+    def publish(self, updates: list) -> None:
+        self._outbox.put(updates)
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        self._outbox.put(None)
+        for thread in self._threads:
+            await asyncio.to_thread(thread.join, 2.0)
+
+
+def leaderboard_channel_from_env(database_url: Optional[str] = None) -> Optional[PostgresLeaderboardChannel]:
+    """``LEADERBOARD_SYNC=postgres|off``; defaults to postgres when the database is Postgres."""
+    database_url = database_url if database_url is not None else os.getenv("DATABASE_URL", "")
+    choice = os.getenv("LEADERBOARD_SYNC") or ("postgres" if database_url.startswith("postgres") else "off")
+    if choice == "postgres" and database_url:
+        return PostgresLeaderboardChannel(database_url)
+    return None
@@ -0,0 +1,140 @@
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query
+from typing import Dict, List, Optional
+from datetime import datetime
+import asyncio
+import time
+
+from db.database import SessionLocal
+from Endpoints.auth import get_current_user
+from functions.friends_functions import FriendsService
+from functions.squad_functions import SquadService
+from functions.chat_gateway import chat_gateway
+
+router = APIRouter(prefix="/chat", tags=["Chat"])
+
+# How long a connection trusts a squad member list before re-reading it
+SQUAD_MEMBERS_TTL_SECONDS = 60
+
+
+class _ConnectionContext:
+    """Per-socket memo of friends and squads, so typing events do not hit the database
+
+    Lookups that do reach the database run in a worker thread, so one socket's
+    queries never stall the other sockets on the event loop.
+    """
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self.friend_ids: Dict[str, Optional[int]] = {}
+        self.squad_members: Dict[str, tuple] = {}
+
+    async def resolve_friend(self, friend_username: str) -> Optional[int]:
+        if friend_username not in self.friend_ids:
+            self.friend_ids[friend_username] = await asyncio.to_thread(self._load_friend_id, friend_username)
+        return self.friend_ids[friend_username]
+
+    async def squad_member_ids(self, squad_id: str) -> List[int]:
+        cached = self.squad_members.get(squad_id)
+        if cached and time.monotonic() - cached[0] < SQUAD_MEMBERS_TTL_SECONDS:
+            return cached[1]
+        member_ids = await asyncio.to_thread(self._load_squad_member_ids, squad_id)
+        # Non-members get an empty list, so their events go nowhere
+        members = member_ids if self.user_id in member_ids else []
+        self.squad_members[squad_id] = (time.monotonic(), members)
+        return members
+
+    async def mark_read(self, friend_id: int) -> int:
+        return await asyncio.to_thread(self._mark_read, friend_id)
+
+    def _load_friend_id(self, friend_username: str) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            service = FriendsService(db)
+            friend = service.get_user_by_username(friend_username)
+            friend_id = friend["id"] if friend else None
+            if friend_id is not None and not service.are_friends(self.user_id, friend_id):
+                friend_id = None
+            return friend_id
+        finally:
+            db.close()
+
+    def _load_squad_member_ids(self, squad_id: str) -> List[int]:
+        db = SessionLocal()
+        try:
+            return SquadService(db).get_squad_member_ids(squad_id)
+        finally:
+            db.close()
+
+    def _mark_read(self, friend_id: int) -> int:
+        db = SessionLocal()
+        try:
+            return FriendsService(db).mark_conversation_read(self.user_id, friend_id) or 0
+        finally:
+            db.close()
+
+
+@router.websocket("/ws")
+async def chat_websocket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Real-time chat connection.
+
+    Connect with ``/chat/ws?token=<jwt>``. The server pushes:
+    - ``friend_message`` / ``squad_message``: a new message row
+    - ``typing``: ``{user_id, is_typing, squad_id?}``
+    - ``read_receipt``: ``{reader_id, friend_id, read_at}``
+    - ``resync``: fetch the conversation over REST (event too large to push)
+
+    The client may send:
+    - ``{"type": "typing", "friend_username": ..., "is_typing": true}``
+    - ``{"type": "typing", "squad_id": ..., "is_typing": true}``
+    - ``{"type": "read", "friend_username": ...}``
+    - ``{"type": "ping"}``
+
+    Messages are still sent with the REST endpoints; they are pushed here once saved.
+    """
+    try:
+        user = await get_current_user(token)
+        user_id = int(user["user_id"])
+    except (HTTPException, TypeError, ValueError):
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    await chat_gateway.connect(user_id, websocket)
+    context = _ConnectionContext(user_id)
+
+    try:
+        await websocket.send_json({"type": "connected", "user_id": user_id})
+        while True:
+            frame = await websocket.receive_json()
+            frame_type = frame.get("type") if isinstance(frame, dict) else None
+
+            if frame_type == "ping":
+                await websocket.send_json({"type": "pong"})
+
+            elif frame_type == "typing":
+                is_typing = bool(frame.get("is_typing", True))
+                if frame.get("squad_id"):
+                    squad_id = str(frame["squad_id"])
+                    await chat_gateway.publish_typing(
+                        user_id, await context.squad_member_ids(squad_id), is_typing, squad_id=squad_id
+                    )
+                elif frame.get("friend_username"):
+                    friend_id = await context.resolve_friend(str(frame["friend_username"]))
+                    if friend_id is not None:
+                        await chat_gateway.publish_typing(user_id, [friend_id], is_typing)
+
+            elif frame_type == "read" and frame.get("friend_username"):
+                friend_id = await context.resolve_friend(str(frame["friend_username"]))
+                if friend_id is not None and await context.mark_read(friend_id):
+                    await chat_gateway.publish_read_receipt(user_id, friend_id, datetime.utcnow())
+
+            else:
+                await websocket.send_json({"type": "error", "detail": "Unsupported frame"})
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Chat websocket error for user {user_id}: {e}")
+    finally:
+        await chat_gateway.disconnect(user_id, websocket)
@@ -4,6 +4,9 @@ from sqlalchemy.exc import OperationalError, DisconnectionError
 from typing import List, Optional
 from db.connection import db_dependency
 from functions.friends_functions import FriendsService
+from functions.chat_gateway import chat_gateway
+from functions.pagination import InvalidCursorError
+from functions.user_search import user_search
 from schemas.friends_schemas import *
 from models.friends_models import FriendshipStatus, MessageStatus
 from sqlalchemy import text
@@ -88,7 +91,7 @@ async def get_friends_list(
         friends = service.get_friends_list(user_id)
         
         return FriendsListResponse(
-            friends=[UserBasicInfo(**friend) for friend in friends],
+            friends=[FriendListEntry(**friend) for friend in friends],
             total_count=len(friends)
         )
     
@@ -117,9 +120,11 @@ async def get_pending_requests(
         service = FriendsService(db)
         requests = service.get_pending_requests(user_id)
         
+        users = service.get_users_by_ids([req.requester_id for req in requests])
+        
         result = []
         for req in requests:
-            requester_info = service.get_user_by_id(req.requester_id)
+            requester_info = users.get(req.requester_id)
             friendship_response = FriendshipResponse(
                 id=req.id,
                 requester_id=req.requester_id,
@@ -160,9 +165,11 @@ async def get_sent_requests(
         service = FriendsService(db)
         requests = service.get_sent_requests(user_id)
         
+        users = service.get_users_by_ids([req.addressee_id for req in requests])
+        
         result = []
         for req in requests:
-            addressee_info = service.get_user_by_id(req.addressee_id)
+            addressee_info = users.get(req.addressee_id)
             friendship_response = FriendshipResponse(
                 id=req.id,
                 requester_id=req.requester_id,
@@ -207,6 +214,7 @@ async def send_message(
         )
         
         if success:
+            await chat_gateway.publish_friend_message(friend_message)
             return {"success": True, "message": message, "message_id": friend_message.id}
         else:
             raise HTTPException(status_code=400, detail=message)
@@ -238,10 +246,11 @@ async def get_conversation(
     try:
         service = FriendsService(db)
         messages, total_count = service.get_conversation(user_id, friend_username, page, page_size)
+        senders = service.get_users_by_ids([msg.sender_id for msg in messages])
         
         message_responses = []
         for msg in messages:
-            sender_info = service.get_user_by_id(msg.sender_id)
+            sender_info = senders.get(msg.sender_id)
             message_response = FriendMessageResponse(
                 id=msg.id,
                 sender_id=msg.sender_id,
@@ -278,6 +287,58 @@ async def get_conversation(
             detail="An unexpected error occurred. Please try again."
         )
 
+@router.get("/conversation/{user_id}/{friend_username}/history", response_model=MessageHistoryResponse)
+async def get_conversation_history(
+    user_id: int,
+    friend_username: str,
+    db: db_dependency,
+    before: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=100),
+    include_total: bool = Query(False, description="Include an approximate message count"),
+):
+    """Get conversation with a friend, newest first, using cursor pagination"""
+    try:
+        service = FriendsService(db)
+        history = service.get_conversation_history(user_id, friend_username, before, limit, include_total)
+        senders = history["senders"]
+        
+        message_responses = [
+            FriendMessageResponse(
+                id=msg.id,
+                sender_id=msg.sender_id,
+                receiver_id=msg.receiver_id,
+                content=msg.content,
+                message_type=msg.message_type,
+                status=msg.status,
+                created_at=msg.created_at,
+                read_at=msg.read_at,
+                sender_info=UserBasicInfo(**senders[msg.sender_id]) if msg.sender_id in senders else None
+            )
+            for msg in history["messages"]
+        ]
+        
+        return MessageHistoryResponse(
+            messages=message_responses,
+            next_cursor=history["next_cursor"],
+            has_more=history["next_cursor"] is not None,
+            approximate_total=history["approximate_total"]
+        )
+    
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (OperationalError, DisconnectionError) as e:
+        print(f"Database connection error in get_conversation_history: {e}")
+        raise HTTPException(
+            status_code=503, 
+            detail="Database connection error. Please try again."
+        )
+    except Exception as e:
+        print(f"Unexpected error in get_conversation_history: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail="An unexpected error occurred. Please try again."
+        )
+
 @router.post("/message/mark-read/{user_id}/{friend_username}")
 async def mark_messages_as_read(
     user_id: int,
@@ -287,9 +348,12 @@ async def mark_messages_as_read(
     """Mark all messages from a friend as read"""
     try:
         service = FriendsService(db)
-        success = service.mark_messages_as_read(user_id, friend_username)
+        friend = service.get_user_by_username(friend_username)
+        updated = service.mark_conversation_read(user_id, friend["id"]) if friend else None
         
-        if success:
+        if updated is not None:
+            if updated:
+                await chat_gateway.publish_read_receipt(user_id, friend["id"], datetime.utcnow())
             return {"success": True, "message": "Messages marked as read"}
         else:
             raise HTTPException(status_code=400, detail="Failed to mark messages as read")
@@ -384,27 +448,35 @@ async def use_invite(
 async def search_users(
     db: db_dependency,
     username: str = Query(..., min_length=1),
+    user_id: Optional[int] = Query(None, description="Searching user; ranks friends-of-friends first and hides the user"),
+    limit: int = Query(10, ge=1, le=50),
 ):
-    """Search for users by username"""
+    """Search for users by username or name (exact, then prefix, then substring, then fuzzy matches)"""
     try:
-        result = db.execute(
-            text("SELECT id, username, fname, lname, avatar FROM users WHERE username ILIKE :username AND is_active = true LIMIT 10"),
-            {"username": f"%{username}%"}
-        )
-        users = result.fetchall()
+        friend_ids, friends_of_friends = set(), set()
+        if user_id is not None:
+            friends_service = FriendsService(db)
+            friend_ids, friends_of_friends = user_search.social_context(
+                user_id, friends_service.get_friends_of_friends
+            )
         
-        user_list = []
-        for user in users:
-            user_list.append({
-                "id": user.id,
-                "username": user.username,
-                "fname": user.fname,
-                "lname": user.lname,
-                "avatar": user.avatar
-            })
+        user_list = user_search.search(
+            db,
+            username,
+            limit=limit,
+            viewer_id=user_id,
+            friend_ids=friend_ids,
+            friends_of_friends=friends_of_friends,
+        )
         
         return {"users": user_list, "total_count": len(user_list)}
     
+    except OperationalError as e:
+        print(f"Database connection error in search_users: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="Database temporarily unavailable. Please try again in a moment."
+        )
     except Exception as e:
         print(f"Error searching users: {e}")
         raise HTTPException(status_code=500, detail="Failed to search users")
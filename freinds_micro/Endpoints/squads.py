@@ -4,6 +4,8 @@ from sqlalchemy.exc import OperationalError, DisconnectionError
 from typing import List, Optional
 from db.connection import db_dependency
 from functions.squad_functions import SquadService
+from functions.chat_gateway import chat_gateway
+from functions.pagination import InvalidCursorError
 from schemas.squad_schemas import *
 from datetime import datetime
 import json  # Add this missing import
@@ -162,6 +164,11 @@ async def send_squad_message(
         })
         
         if success and squad_message:
+            await chat_gateway.publish_squad_message(
+                squad_message,
+                service.get_squad_member_ids(request.squad_id),
+                service.get_user_by_id(request.sender_id)
+            )
             return {
                 "success": True,
                 "message": message,
@@ -223,6 +230,42 @@ async def get_squad_messages(
             detail="An unexpected error occurred. Please try again."
         )
 
+@router.get("/messages/{squad_id}/history", response_model=MessageHistoryResponse)
+async def get_squad_message_history(
+    squad_id: str,
+    db: db_dependency,
+    user_id: int = Query(...),
+    before: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    limit: int = Query(50, ge=1, le=100),
+    include_total: bool = Query(False, description="Include an approximate message count"),
+):
+    """Get squad messages, newest first, using cursor pagination"""
+    try:
+        service = SquadService(db)
+        history = service.get_squad_message_history(squad_id, user_id, before, limit, include_total)
+        
+        return MessageHistoryResponse(
+            messages=[SquadMessageResponse(**msg) for msg in history["messages"]],
+            next_cursor=history["next_cursor"],
+            has_more=history["next_cursor"] is not None,
+            approximate_total=history["approximate_total"]
+        )
+    
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except (OperationalError, DisconnectionError) as e:
+        print(f"Database connection error in get_squad_message_history: {e}")
+        raise HTTPException(
+            status_code=503, 
+            detail="Database connection error. Please try again."
+        )
+    except Exception as e:
+        print(f"Unexpected error in get_squad_message_history: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail="An unexpected error occurred. Please try again."
+        )
+
 @router.post("/squad/{squad_id}/promote")
 async def promote_member(
     squad_id: str,
@@ -548,6 +591,41 @@ async def get_league_leaderboard(
             detail="An unexpected error occurred. Please try again."
         )
 
+@router.get("/study-leagues/{league_id}/leaderboard/me", response_model=LeagueStandingResponse)
+async def get_league_standing(
+    league_id: str,
+    db: db_dependency,
+    user_id: int = Query(...),
+    radius: int = Query(5, ge=0, le=50),
+):
+    """Get a participant's league rank with the participants around them"""
+    try:
+        service = SquadService(db)
+        standing = service.get_league_standing(league_id, user_id, radius)
+        if standing is None:
+            raise HTTPException(status_code=404, detail="User is not participating in this league")
+        
+        return LeagueStandingResponse(
+            rank=standing["rank"],
+            total_participants=standing["total_participants"],
+            participants=[LeagueParticipantResponse(**participant) for participant in standing["participants"]]
+        )
+    
+    except HTTPException:
+        raise
+    except (OperationalError, DisconnectionError) as e:
+        print(f"Database connection error in get_league_standing: {e}")
+        raise HTTPException(
+            status_code=503, 
+            detail="Database connection error. Please try again."
+        )
+    except Exception as e:
+        print(f"Unexpected error in get_league_standing: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail="An unexpected error occurred. Please try again."
+        )
+
 @router.post("/study-leagues/{league_id}/stats")
 async def update_participant_stats(
     league_id: str,
@@ -716,6 +794,37 @@ async def get_squad_detail(
             detail="An unexpected error occurred. Please try again."
         )
 
+@router.get("/squad/{squad_id}/leaderboard", response_model=SquadLeaderboardResponse)
+async def get_squad_leaderboard(
+    squad_id: str,
+    db: db_dependency,
+    user_id: Optional[int] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """Get squad members ranked by weekly XP"""
+    try:
+        service = SquadService(db)
+        leaderboard = service.get_squad_leaderboard(squad_id, user_id, limit)
+        if not leaderboard["total_members"]:
+            raise HTTPException(status_code=404, detail="Squad not found")
+        
+        return SquadLeaderboardResponse(**leaderboard)
+    
+    except HTTPException:
+        raise
+    except (OperationalError, DisconnectionError) as e:
+        print(f"Database connection error in get_squad_leaderboard: {e}")
+        raise HTTPException(
+            status_code=503, 
+            detail="Database connection error. Please try again."
+        )
+    except Exception as e:
+        print(f"Unexpected error in get_squad_leaderboard: {e}")
+        raise HTTPException(
+            status_code=500, 
+            detail="An unexpected error occurred. Please try again."
+        )
+
 @router.put("/squad/{squad_id}", response_model=SquadResponse)
 async def update_squad(
     squad_id: str,
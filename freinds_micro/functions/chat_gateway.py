@@ -0,0 +1,387 @@
+"""WebSocket chat gateway for friend and squad messaging.
+
+Each replica keeps the WebSocket connections of the users attached to it.
+Events (new messages, typing, read receipts, presence, cache invalidations)
+are published to a backplane and every replica -- including the publisher --
+handles them, delivering chat events to the sockets it holds, so a message
+reaches the receiver whichever replica they are connected to.
+
+Backplanes:
+- ``InMemoryBackplane``: single process; also lets tests wire several
+  gateways together as if they were separate replicas.
+- ``PostgresBackplane``: LISTEN/NOTIFY on the service database, so multiple
+  replicas need no extra infrastructure.
+
+This module has no database imports; callers resolve recipients (friend id,
+squad member ids) and pass plain dicts.
+"""
+
+import asyncio
+import json
+import os
+import select
+import threading
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+CHAT_CHANNEL = os.getenv("CHAT_BACKPLANE_CHANNEL", "chat_events")
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_MAX_BYTES = 7900
+SEND_TIMEOUT_SECONDS = float(os.getenv("CHAT_SEND_TIMEOUT_SECONDS", "5"))
+
+EventHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_event(envelope: Dict[str, Any]) -> str:
+    return json.dumps(envelope, default=_json_default, separators=(",", ":"))
+
+
+def serialize_friend_message(message: Any) -> Dict[str, Any]:
+    """Wire format for a ``FriendMessage`` row."""
+    return {
+        "id": message.id,
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        "content": message.content,
+        "message_type": message.message_type,
+        "status": message.status,
+        "created_at": message.created_at,
+        "read_at": message.read_at,
+    }
+
+
+def serialize_squad_message(message: Any, sender_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Wire format for a ``SquadMessage`` row, matching ``SquadMessageResponse``."""
+    return {
+        "id": message.id,
+        "squad_id": message.squad_id,
+        "sender_id": message.sender_id,
+        "sender_name": f"{sender_info.get('fname', '')} {sender_info.get('lname', '')}" if sender_info else "Unknown",
+        "sender_avatar": sender_info.get("avatar") if sender_info else None,
+        "content": message.content,
+        "message_type": message.message_type,
+        "metadata": json.loads(message.message_metadata) if message.message_metadata else {},
+        "created_at": message.created_at,
+        "reactions": [],
+    }
+
+
+# ===============================
+# BACKPLANES
+# ===============================
+
+class ChatBackplane:
+    """Fan-out transport between gateway replicas."""
+
+    async def start(self, handler: EventHandler) -> None:
+        raise NotImplementedError
+
+    async def publish(self, envelope: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    async def stop(self) -> None:
+        raise NotImplementedError
+
+
+class InMemoryBackplane(ChatBackplane):
+    """Delivers to every handler started on this instance (one per "replica")."""
+
+    def __init__(self):
+        self._handlers: List[EventHandler] = []
+
+    async def start(self, handler: EventHandler) -> None:
+        self._handlers.append(handler)
+
+    async def publish(self, envelope: Dict[str, Any]) -> None:
+        # Round-trip through JSON so tests see exactly what a real backplane carries
+        decoded = json.loads(encode_event(envelope))
+        for handler in list(self._handlers):
+            await handler(decoded)
+
+    async def stop(self) -> None:
+        self._handlers.clear()
+
+
+class PostgresBackplane(ChatBackplane):
+    """LISTEN/NOTIFY backplane using a dedicated psycopg2 connection."""
+
+    def __init__(self, dsn: str, channel: str = CHAT_CHANNEL):
+        # SQLAlchemy URLs may carry a driver suffix psycopg2 does not understand
+        scheme, sep, rest = dsn.partition("://")
+        self.dsn = scheme.split("+")[0] + sep + rest
+        self.channel = channel
+        self._listen_conn = None
+        self._publish_conn = None
+        self._publish_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def _connect(self):
+        import psycopg2
+        conn = psycopg2.connect(self.dsn, application_name="friends_chat_gateway")
+        conn.autocommit = True
+        return conn
+
+    async def start(self, handler: EventHandler) -> None:
+        loop = asyncio.get_running_loop()
+        self._listen_conn = await asyncio.to_thread(self._connect)
+        with self._listen_conn.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+
+        def listen():
+            while not self._stopping.is_set():
+                try:
+                    if select.select([self._listen_conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    self._listen_conn.poll()
+                except Exception as e:
+                    print(f"Chat backplane listener stopped: {e}")
+                    return
+                while self._listen_conn.notifies:
+                    notify = self._listen_conn.notifies.pop(0)
+                    try:
+                        envelope = json.loads(notify.payload)
+                    except ValueError:
+                        continue
+                    asyncio.run_coroutine_threadsafe(handler(envelope), loop)
+
+        self._thread = threading.Thread(target=listen, name="chat-backplane", daemon=True)
+        self._thread.start()
+
+    def _notify(self, payload: str) -> None:
+        with self._publish_lock:
+            if self._publish_conn is None or self._publish_conn.closed:
+                self._publish_conn = self._connect()
+            with self._publish_conn.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    async def publish(self, envelope: Dict[str, Any]) -> None:
+        payload = encode_event(envelope)
+        if len(payload.encode("utf-8")) > NOTIFY_MAX_BYTES:
+            # Too big for NOTIFY: tell recipients to fetch the conversation over REST instead
+            event = envelope.get("event", {})
+            envelope = {
+                **envelope,
+                "event": {
+                    "type": "resync",
+                    "reason": "payload_too_large",
+                    "original_type": event.get("type"),
+                    "squad_id": event.get("squad_id"),
+                    "message_id": (event.get("message") or {}).get("id"),
+                },
+            }
+            payload = encode_event(envelope)
+        await asyncio.to_thread(self._notify, payload)
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._thread:
+            await asyncio.to_thread(self._thread.join, 2.0)
+        for conn in (self._listen_conn, self._publish_conn):
+            if conn is not None and not conn.closed:
+                conn.close()
+
+
+def create_backplane_from_env() -> ChatBackplane:
+    """``CHAT_BACKPLANE=memory|postgres``; defaults to postgres when the database is Postgres."""
+    database_url = os.getenv("DATABASE_URL", "")
+    choice = os.getenv("CHAT_BACKPLANE") or ("postgres" if database_url.startswith("postgres") else "memory")
+    if choice == "postgres" and database_url:
+        return PostgresBackplane(database_url)
+    return InMemoryBackplane()
+
+
+# ===============================
+# GATEWAY
+# ===============================
+
+class ChatGateway:
+    """Tracks local WebSocket connections and delivers backplane events to them."""
+
+    def __init__(self, backplane: ChatBackplane):
+        self.backplane = backplane
+        self.replica_id = uuid.uuid4().hex
+        self._connections: Dict[int, Set[Any]] = {}
+        # Users connected to other replicas, as announced by presence events
+        self._remote_online: Dict[str, Set[int]] = {}
+        self._invalidation_listeners: Dict[str, List[Callable[[List[int]], None]]] = {}
+        self._started = False
+
+    @property
+    def is_started(self) -> bool:
+        return self._started
+
+    async def start(self) -> None:
+        if not self._started:
+            await self.backplane.start(self._on_envelope)
+            self._started = True
+
+    async def stop(self) -> None:
+        if self._started:
+            self._started = False
+            await self.backplane.stop()
+
+    # ---- connections ----------------------------------------------------
+
+    async def connect(self, user_id: int, websocket: Any) -> None:
+        sockets = self._connections.setdefault(user_id, set())
+        first_connection = not sockets
+        sockets.add(websocket)
+        if first_connection:
+            await self._publish_presence(user_id, online=True)
+
+    async def disconnect(self, user_id: int, websocket: Any) -> None:
+        sockets = self._connections.get(user_id)
+        if not sockets:
+            return
+        sockets.discard(websocket)
+        if not sockets:
+            del self._connections[user_id]
+            await self._publish_presence(user_id, online=False)
+
+    def local_connection_count(self, user_id: Optional[int] = None) -> int:
+        if user_id is not None:
+            return len(self._connections.get(user_id, ()))
+        return sum(len(sockets) for sockets in self._connections.values())
+
+    def is_online(self, user_id: int) -> bool:
+        if user_id in self._connections:
+            return True
+        return any(user_id in users for users in self._remote_online.values())
+
+    # ---- publishing -----------------------------------------------------
+
+    async def publish_to_users(self, user_ids: Iterable[int], event: Dict[str, Any]) -> None:
+        recipients = sorted({int(user_id) for user_id in user_ids})
+        if not recipients or not self._started:
+            return
+        try:
+            await self.backplane.publish({"users": recipients, "event": event, "origin": self.replica_id})
+        except Exception as e:
+            # Push is best effort: the row is committed and REST history still has it
+            print(f"Chat gateway publish failed: {e}")
+
+    async def publish_friend_message(self, message: Any) -> None:
+        await self.publish_to_users(
+            [message.sender_id, message.receiver_id],
+            {"type": "friend_message", "message": serialize_friend_message(message)},
+        )
+
+    async def publish_squad_message(
+        self,
+        message: Any,
+        member_ids: Iterable[int],
+        sender_info: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        await self.publish_to_users(
+            member_ids,
+            {
+                "type": "squad_message",
+                "squad_id": message.squad_id,
+                "message": serialize_squad_message(message, sender_info),
+            },
+        )
+
+    async def publish_read_receipt(self, reader_id: int, friend_id: int, read_at: datetime) -> None:
+        await self.publish_to_users(
+            [friend_id, reader_id],
+            {"type": "read_receipt", "reader_id": reader_id, "friend_id": friend_id, "read_at": read_at},
+        )
+
+    async def publish_typing(
+        self,
+        sender_id: int,
+        recipient_ids: Iterable[int],
+        is_typing: bool = True,
+        squad_id: Optional[str] = None,
+    ) -> None:
+        event = {"type": "typing", "user_id": sender_id, "is_typing": is_typing}
+        if squad_id is not None:
+            event["squad_id"] = squad_id
+        await self.publish_to_users([uid for uid in recipient_ids if uid != sender_id], event)
+
+    def add_invalidation_listener(self, topic: str, callback: Callable[[List[int]], None]) -> None:
+        """Run ``callback(ids)`` whenever any replica publishes an invalidation for ``topic``."""
+        self._invalidation_listeners.setdefault(topic, []).append(callback)
+
+    async def publish_invalidation(self, topic: str, ids: Iterable[int]) -> None:
+        """Tell every replica's caches for ``topic`` to forget ``ids``."""
+        if not self._started:
+            return
+        try:
+            await self.backplane.publish({
+                "invalidate": {"topic": topic, "ids": list(ids)},
+                "origin": self.replica_id,
+            })
+        except Exception as e:
+            print(f"Chat gateway invalidation publish failed: {e}")
+
+    async def _publish_presence(self, user_id: int, online: bool) -> None:
+        if not self._started:
+            return
+        try:
+            await self.backplane.publish({
+                "presence": {"user_id": user_id, "online": online},
+                "origin": self.replica_id,
+            })
+        except Exception as e:
+            print(f"Chat gateway presence publish failed: {e}")
+
+    # ---- delivery -------------------------------------------------------
+
+    async def _on_envelope(self, envelope: Dict[str, Any]) -> None:
+        invalidate = envelope.get("invalidate")
+        if invalidate is not None:
+            for callback in self._invalidation_listeners.get(invalidate.get("topic"), []):
+                callback(invalidate.get("ids", []))
+            return
+
+        presence = envelope.get("presence")
+        if presence is not None:
+            origin = envelope.get("origin")
+            if origin and origin != self.replica_id:
+                users = self._remote_online.setdefault(origin, set())
+                if presence.get("online"):
+                    users.add(presence["user_id"])
+                else:
+                    users.discard(presence["user_id"])
+            return
+
+        event = envelope.get("event")
+        if not event:
+            return
+        await self.deliver_local(envelope.get("users", []), event)
+
+    async def deliver_local(self, user_ids: Iterable[int], event: Dict[str, Any]) -> int:
+        """Send ``event`` to every local socket of ``user_ids``; returns sockets reached."""
+        targets = [
+            (user_id, websocket)
+            for user_id in user_ids
+            for websocket in list(self._connections.get(user_id, ()))
+        ]
+        if not targets:
+            return 0
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(websocket.send_json(event), SEND_TIMEOUT_SECONDS) for _, websocket in targets),
+            return_exceptions=True,
+        )
+        delivered = 0
+        for (user_id, websocket), result in zip(targets, results):
+            if isinstance(result, BaseException):
+                # A dead or stalled socket is dropped; the client reconnects and resyncs over REST
+                await self.disconnect(user_id, websocket)
+            else:
+                delivered += 1
+        return delivered
+
+
+# Shared gateway for this process; started and stopped from the app lifespan
+chat_gateway = ChatGateway(create_backplane_from_env())
@@ -0,0 +1,81 @@
+"""Per-process cache of accepted friendships.
+
+Maps each cached user to ``{friend_id: friendship_id}`` so "are these two
+friends?" (checked on every message send, conversation read and typing
+event) is a dict lookup, and sending a message does not need to re-query the
+friendship row.
+
+Entries are dropped when a friend request is answered. The drop is also
+broadcast over the chat backplane so other replicas forget their copy; a TTL
+bounds staleness if a broadcast is ever missed.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from functions.chat_gateway import chat_gateway
+
+FRIEND_GRAPH_TTL_SECONDS = float(os.getenv("FRIEND_GRAPH_TTL_SECONDS", "300"))
+FRIEND_GRAPH_MAX_USERS = int(os.getenv("FRIEND_GRAPH_MAX_USERS", "50000"))
+INVALIDATION_TOPIC = "friend_graph"
+
+Adjacency = Dict[int, int]
+
+
+class FriendAdjacencyCache:
+    def __init__(
+        self,
+        ttl_seconds: float = FRIEND_GRAPH_TTL_SECONDS,
+        max_users: int = FRIEND_GRAPH_MAX_USERS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self._entries: "OrderedDict[int, Tuple[float, Adjacency]]" = OrderedDict()
+        # Called with the user ids whose entries were invalidated, to notify other replicas
+        self.broadcast: Optional[Callable[[list], object]] = None
+
+    def get(self, user_id: int) -> Optional[Adjacency]:
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        loaded_at, adjacency = entry
+        if time.monotonic() - loaded_at > self.ttl_seconds:
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return adjacency
+
+    def set(self, user_id: int, adjacency: Adjacency) -> None:
+        self._entries[user_id] = (time.monotonic(), dict(adjacency))
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    def drop(self, user_ids: Iterable[int]) -> None:
+        """Forget cached entries locally."""
+        for user_id in user_ids:
+            self._entries.pop(int(user_id), None)
+
+    def invalidate(self, *user_ids: int) -> None:
+        """Forget entries here and, when running inside the event loop, on other replicas."""
+        self.drop(user_ids)
+        if self.broadcast is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        result = self.broadcast(list(user_ids))
+        if asyncio.iscoroutine(result):
+            loop.create_task(result)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+friend_graph_cache = FriendAdjacencyCache()
+friend_graph_cache.broadcast = lambda user_ids: chat_gateway.publish_invalidation(INVALIDATION_TOPIC, user_ids)
+chat_gateway.add_invalidation_listener(INVALIDATION_TOPIC, friend_graph_cache.drop)
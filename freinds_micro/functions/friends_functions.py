@@ -1,8 +1,11 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text, or_, and_
+from sqlalchemy import text, or_, and_, bindparam
 from sqlalchemy.exc import OperationalError, DisconnectionError
 from models.friends_models import Friendship, FriendMessage, FriendInvite, InviteUsage, FriendshipStatus, MessageStatus
-from typing import List, Optional, Dict, Any, Tuple
+from functions.pagination import conversation_key, conversation_filter, conversation_keys, keyset_page, approximate_count, DEFAULT_PAGE_SIZE
+from functions.friend_graph import friend_graph_cache
+from functions.chat_gateway import chat_gateway
+from typing import List, Optional, Dict, Any, Set, Tuple
 from datetime import datetime, timedelta
 import secrets
 import string
@@ -77,6 +80,29 @@ class FriendsService:
             print(f"Error getting user by ID '{user_id}': {e}")
             return None
     
+    def get_users_by_ids(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Get user info for many IDs in one query, keyed by ID"""
+        if not user_ids:
+            return {}
+        try:
+            query = text(
+                "SELECT id, username, fname, lname, avatar FROM users WHERE id IN :user_ids AND is_active = true"
+            ).bindparams(bindparam("user_ids", expanding=True))
+            result = self._execute_with_retry(query, {"user_ids": list(set(user_ids))})
+            return {
+                row.id: {
+                    "id": row.id,
+                    "username": row.username,
+                    "fname": row.fname,
+                    "lname": row.lname,
+                    "avatar": row.avatar
+                }
+                for row in result.fetchall()
+            }
+        except Exception as e:
+            print(f"Error getting users by IDs: {e}")
+            return {}
+    
     def send_friend_request(self, requester_id: int, addressee_username: str, message: str = None) -> Tuple[bool, str, Optional[Friendship]]:
         """Send a friend request with better error handling"""
         try:
@@ -152,6 +178,7 @@ class FriendsService:
                 friendship.accepted_at = datetime.utcnow()
             
             self.db.commit()
+            friend_graph_cache.invalidate(friendship.requester_id, friendship.addressee_id)
             
             return True, f"Friend request {status_str}"
             
@@ -161,28 +188,99 @@ class FriendsService:
             return False, f"Failed to respond to friend request: {str(e)}"
     
     def get_friends_list(self, user_id: int) -> List[Dict[str, Any]]:
-        """Get list of user's friends with error handling"""
+        """Get list of user's friends with presence and last message, most recent chat first
+        
+        One query: friendships, user rows and each conversation's latest message
+        (an index seek per friend on the conversation history index).
+        """
         try:
-            friendships = self.db.query(Friendship).filter(
-                or_(
-                    and_(Friendship.requester_id == user_id, Friendship.status == "accepted"),
-                    and_(Friendship.addressee_id == user_id, Friendship.status == "accepted")
+            unkeyed_match = "" if conversation_keys.complete else """
+                       OR (m.conversation_key IS NULL
+                           AND ((m.sender_id = :user_id AND m.receiver_id = f.friend_id)
+                                OR (m.sender_id = f.friend_id AND m.receiver_id = :user_id)))"""
+            query = text(f"""
+                WITH friend_links AS (
+                    SELECT id AS friendship_id,
+                           CASE WHEN requester_id = :user_id THEN addressee_id ELSE requester_id END AS friend_id,
+                           accepted_at
+                    FROM friendships
+                    WHERE status = 'accepted' AND (requester_id = :user_id OR addressee_id = :user_id)
                 )
-            ).all()
-            
-            friends = []
-            for friendship in friendships:
-                friend_id = friendship.addressee_id if friendship.requester_id == user_id else friendship.requester_id
-                friend_info = self.get_user_by_id(friend_id)
-                if friend_info:
-                    friends.append(friend_info)
-            
-            return friends
+                SELECT f.friendship_id, f.friend_id, f.accepted_at,
+                       u.id, u.username, u.fname, u.lname, u.avatar,
+                       lm.content AS last_message, lm.created_at AS last_message_at,
+                       lm.sender_id AS last_message_sender_id
+                FROM friend_links f
+                LEFT JOIN users u ON u.id = f.friend_id AND u.is_active = true
+                LEFT JOIN LATERAL (
+                    SELECT m.content, m.created_at, m.sender_id
+                    FROM friend_messages m
+                    WHERE m.conversation_key = LEAST(:user_id, f.friend_id) || ':' || GREATEST(:user_id, f.friend_id){unkeyed_match}
+                    ORDER BY m.created_at DESC, m.id DESC
+                    LIMIT 1
+                ) lm ON true
+                ORDER BY lm.created_at DESC NULLS LAST, u.username
+            """)
+            rows = self._execute_with_retry(query, {"user_id": user_id}).fetchall()
+            
+            # The same rows answer are_friends for this user until the next change
+            friend_graph_cache.set(user_id, {row.friend_id: row.friendship_id for row in rows})
+            
+            return [
+                {
+                    "id": row.id,
+                    "username": row.username,
+                    "fname": row.fname,
+                    "lname": row.lname,
+                    "avatar": row.avatar,
+                    "is_online": chat_gateway.is_online(row.id),
+                    "friends_since": row.accepted_at,
+                    "last_message": row.last_message,
+                    "last_message_at": row.last_message_at,
+                    "last_message_sender_id": row.last_message_sender_id
+                }
+                for row in rows
+                if row.id is not None
+            ]
             
         except Exception as e:
             print(f"Error getting friends list: {e}")
             return []
     
+    def get_friend_adjacency(self, user_id: int) -> Dict[int, int]:
+        """Accepted friends of a user as {friend_id: friendship_id}, served from the friend graph cache"""
+        adjacency = friend_graph_cache.get(user_id)
+        if adjacency is not None:
+            return adjacency
+        
+        rows = self.db.query(
+            Friendship.id, Friendship.requester_id, Friendship.addressee_id
+        ).filter(
+            Friendship.status == "accepted",
+            or_(Friendship.requester_id == user_id, Friendship.addressee_id == user_id)
+        ).all()
+        
+        adjacency = {
+            row.addressee_id if row.requester_id == user_id else row.requester_id: row.id
+            for row in rows
+        }
+        friend_graph_cache.set(user_id, adjacency)
+        return adjacency
+    
+    def get_friends_of_friends(self, user_id: int) -> Tuple[Set[int], Set[int]]:
+        """(friend ids, friends-of-friends ids) of a user; the second set excludes the user and their friends"""
+        friend_ids = set(self.get_friend_adjacency(user_id))
+        if not friend_ids:
+            return friend_ids, set()
+        
+        rows = self.db.query(Friendship.requester_id, Friendship.addressee_id).filter(
+            Friendship.status == "accepted",
+            or_(Friendship.requester_id.in_(friend_ids), Friendship.addressee_id.in_(friend_ids))
+        ).all()
+        
+        second_degree = {row.requester_id for row in rows} | {row.addressee_id for row in rows}
+        return friend_ids, second_degree - friend_ids - {user_id}
+    
     def get_pending_requests(self, user_id: int) -> List[Friendship]:
         """Get pending friend requests received by user"""
         try:
@@ -208,15 +306,7 @@ class FriendsService:
     def are_friends(self, user_id1: int, user_id2: int) -> bool:
         """Check if two users are friends with error handling"""
         try:
-            friendship = self.db.query(Friendship).filter(
-                or_(
-                    and_(Friendship.requester_id == user_id1, Friendship.addressee_id == user_id2),
-                    and_(Friendship.requester_id == user_id2, Friendship.addressee_id == user_id1)
-                ),
-                Friendship.status == "accepted"
-            ).first()
-            
-            return friendship is not None
+            return user_id2 in self.get_friend_adjacency(user_id1)
             
         except Exception as e:
             print(f"Error checking friendship: {e}")
@@ -233,23 +323,16 @@ class FriendsService:
             receiver_id = receiver["id"]
             
             # Check if they are friends
-            if not self.are_friends(sender_id, receiver_id):
+            friendship_id = self.get_friend_adjacency(sender_id).get(receiver_id)
+            if friendship_id is None:
                 return False, "You can only message friends", None
             
-            # Get friendship
-            friendship = self.db.query(Friendship).filter(
-                or_(
-                    and_(Friendship.requester_id == sender_id, Friendship.addressee_id == receiver_id),
-                    and_(Friendship.requester_id == receiver_id, Friendship.addressee_id == sender_id)
-                ),
-                Friendship.status == "accepted"
-            ).first()
-            
             # Create message
             message = FriendMessage(
                 sender_id=sender_id,
                 receiver_id=receiver_id,
-                friendship_id=friendship.id,
+                friendship_id=friendship_id,
+                conversation_key=conversation_key(sender_id, receiver_id),
                 content=content,
                 message_type=message_type,
                 status="sent"  # Use string instead of enum
@@ -279,22 +362,16 @@ class FriendsService:
             if not self.are_friends(user_id, friend_id):
                 return [], 0
             
+            conversation = self._conversation_query(user_id, friend_id)
+            
             # Get total count
-            total_count = self.db.query(FriendMessage).filter(
-                or_(
-                    and_(FriendMessage.sender_id == user_id, FriendMessage.receiver_id == friend_id),
-                    and_(FriendMessage.sender_id == friend_id, FriendMessage.receiver_id == user_id)
-                )
-            ).count()
+            total_count = conversation.count()
             
             # Get messages with pagination
             offset = (page - 1) * page_size
-            messages = self.db.query(FriendMessage).filter(
-                or_(
-                    and_(FriendMessage.sender_id == user_id, FriendMessage.receiver_id == friend_id),
-                    and_(FriendMessage.sender_id == friend_id, FriendMessage.receiver_id == user_id)
-                )
-            ).order_by(FriendMessage.created_at.desc()).offset(offset).limit(page_size).all()
+            messages = conversation.order_by(
+                FriendMessage.created_at.desc(), FriendMessage.id.desc()
+            ).offset(offset).limit(page_size).all()
             
             return messages, total_count
             
@@ -302,17 +379,56 @@ class FriendsService:
             print(f"Error getting conversation: {e}")
             return [], 0
     
+    def _conversation_query(self, user_id: int, friend_id: int):
+        return self.db.query(FriendMessage).filter(conversation_filter(FriendMessage, user_id, friend_id))
+    
+    def get_conversation_history(
+        self,
+        user_id: int,
+        friend_username: str,
+        before: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        include_total: bool = False
+    ) -> Dict[str, Any]:
+        """Cursor-paginated conversation, newest first
+        
+        Pass the returned ``next_cursor`` as ``before`` to load older messages.
+        Raises InvalidCursorError for a malformed cursor.
+        """
+        empty = {"messages": [], "senders": {}, "next_cursor": None, "approximate_total": 0 if include_total else None}
+        
+        friend = self.get_user_by_username(friend_username)
+        if not friend or not self.are_friends(user_id, friend["id"]):
+            return empty
+        
+        conversation = self._conversation_query(user_id, friend["id"])
+        messages, next_cursor = keyset_page(
+            conversation, FriendMessage.created_at, FriendMessage.id, before=before, limit=limit
+        )
+        
+        # Only two people talk in a conversation; we already hold the friend's row
+        senders = {friend["id"]: friend}
+        if any(message.sender_id == user_id for message in messages):
+            senders.update(self.get_users_by_ids([user_id]))
+        
+        return {
+            "messages": messages,
+            "senders": senders,
+            "next_cursor": next_cursor,
+            "approximate_total": approximate_count(self.db, conversation) if include_total else None
+        }
+    
     def mark_messages_as_read(self, user_id: int, friend_username: str) -> bool:
         """Mark all messages from a friend as read"""
+        friend = self.get_user_by_username(friend_username)
+        if not friend:
+            return False
+        return self.mark_conversation_read(user_id, friend["id"]) is not None
+    
+    def mark_conversation_read(self, user_id: int, friend_id: int) -> Optional[int]:
+        """Mark unread messages from a friend as read; returns rows updated, None on error"""
         try:
-            friend = self.get_user_by_username(friend_username)
-            if not friend:
-                return False
-            
-            friend_id = friend["id"]
-            
-            # Update unread messages
-            self.db.query(FriendMessage).filter(
+            updated = self.db.query(FriendMessage).filter(
                 FriendMessage.sender_id == friend_id,
                 FriendMessage.receiver_id == user_id,
                 FriendMessage.status != "read"
@@ -322,11 +438,12 @@ class FriendsService:
             })
             
             self.db.commit()
-            return True
+            return updated
             
         except Exception as e:
+            self.db.rollback()
             print(f"Error marking messages as read: {e}")
-            return False
+            return None
     
     def create_invite(self, inviter_id: int, max_uses: int = 1, expires_in_hours: int = 24, message: str = None) -> FriendInvite:
         """Create a friend invite code"""
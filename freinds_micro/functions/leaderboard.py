@@ -0,0 +1,21 @@
+"""League and squad leaderboards for this service.
+
+The boards themselves live in ``common/leaderboard.py``, shared with
+achievements_micro. Here updates are broadcast over the chat backplane, which
+already connects the replicas, so every replica applies them incrementally.
+"""
+
+from common.leaderboard import (  # noqa: F401 - re-exported for the service modules
+    Entry,
+    LeaderboardRegistry,
+    Score,
+    SortedLeaderboard,
+    resolve_entries,
+)
+from functions.chat_gateway import chat_gateway
+
+UPDATE_TOPIC = "leaderboard"
+
+leaderboards = LeaderboardRegistry()
+leaderboards.broadcast = lambda updates: chat_gateway.publish_invalidation(UPDATE_TOPIC, updates)
+chat_gateway.add_invalidation_listener(UPDATE_TOPIC, leaderboards.apply)
@@ -1,7 +1,9 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import text, or_, and_, func, desc
+from sqlalchemy import text, or_, and_, func, desc, bindparam
 from sqlalchemy.exc import OperationalError, DisconnectionError
 from models.squad_models import Squad, SquadMembership, SquadMessage, SquadBattle, StudyLeague, LeagueParticipation
+from functions.pagination import keyset_page, approximate_count, DEFAULT_PAGE_SIZE
+from functions.leaderboard import leaderboards, resolve_entries
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import secrets
@@ -57,6 +59,33 @@ class SquadService:
             print(f"Error getting user by ID '{user_id}': {e}")
             return None
 
+    def get_users_by_ids(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Get user info for many IDs in one query, keyed by ID"""
+        try:
+            return self._load_users_by_ids(user_ids)
+        except Exception as e:
+            print(f"Error getting users by IDs: {e}")
+            return {}
+
+    def _load_users_by_ids(self, user_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """get_users_by_ids that raises on errors, for callers that act on missing users"""
+        if not user_ids:
+            return {}
+        query = text(
+            "SELECT id, username, fname, lname, avatar FROM users WHERE id IN :user_ids AND is_active = true"
+        ).bindparams(bindparam("user_ids", expanding=True))
+        result = self._execute_with_retry(query, {"user_ids": list(set(user_ids))})
+        return {
+            row.id: {
+                "id": row.id,
+                "username": row.username,
+                "fname": row.fname,
+                "lname": row.lname,
+                "avatar": row.avatar
+            }
+            for row in result.fetchall()
+        }
+
     def create_squad(self, squad_data: Dict[str, Any]) -> Tuple[bool, str, Optional[Squad]]:
         """Create a new squad"""
         try:
@@ -222,6 +251,7 @@ class SquadService:
             
             self.db.add(membership)
             self.db.commit()
+            leaderboards.drop(f"squad:{squad_id}")
             
             return True, "Successfully joined squad"
             
@@ -270,6 +300,17 @@ class SquadService:
             print(f"Error sending squad message: {e}")
             return False, f"Failed to send message: {str(e)}", None
 
+    def get_squad_member_ids(self, squad_id: str) -> List[int]:
+        """Get ids of all members of a squad (chat fan-out)"""
+        try:
+            rows = self.db.query(SquadMembership.user_id).filter(
+                SquadMembership.squad_id == squad_id
+            ).all()
+            return [row.user_id for row in rows]
+        except Exception as e:
+            print(f"Error getting squad member ids: {e}")
+            return []
+
     def get_squad_messages(self, squad_id: str, user_id: int, page: int = 1, page_size: int = 50) -> Tuple[List[Dict[str, Any]], int]:
         """Get messages from a squad"""
         try:
@@ -282,41 +323,76 @@ class SquadService:
             if not membership:
                 return [], 0
             
+            squad_messages = self.db.query(SquadMessage).filter(SquadMessage.squad_id == squad_id)
+            
             # Get total count
-            total_count = self.db.query(SquadMessage).filter(
-                SquadMessage.squad_id == squad_id
-            ).count()
+            total_count = squad_messages.count()
             
             # Get messages with pagination
             offset = (page - 1) * page_size
-            messages = self.db.query(SquadMessage).filter(
-                SquadMessage.squad_id == squad_id
-            ).order_by(SquadMessage.created_at.desc()).offset(offset).limit(page_size).all()
-            
-            # Enrich messages with sender info
-            message_responses = []
-            for msg in messages:
-                sender_info = self.get_user_by_id(msg.sender_id)
-                message_data = {
-                    "id": msg.id,
-                    "squad_id": msg.squad_id,
-                    "sender_id": msg.sender_id,
-                    "sender_name": f"{sender_info.get('fname', '')} {sender_info.get('lname', '')}" if sender_info else "Unknown",
-                    "sender_avatar": sender_info.get('avatar') if sender_info else None,
-                    "content": msg.content,
-                    "message_type": msg.message_type,
-                    "metadata": json.loads(msg.message_metadata) if msg.message_metadata else {},  # Changed from metadata to message_metadata
-                    "created_at": msg.created_at.isoformat(),
-                    "reactions": []  # TODO: Implement reactions
-                }
-                message_responses.append(message_data)
+            messages = squad_messages.order_by(
+                SquadMessage.created_at.desc(), SquadMessage.id.desc()
+            ).offset(offset).limit(page_size).all()
             
-            return message_responses, total_count
+            return self._enrich_squad_messages(messages), total_count
             
         except Exception as e:
             print(f"Error getting squad messages: {e}")
             return [], 0
 
+    def get_squad_message_history(
+        self,
+        squad_id: str,
+        user_id: int,
+        before: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        include_total: bool = False
+    ) -> Dict[str, Any]:
+        """Cursor-paginated squad messages, newest first
+        
+        Pass the returned ``next_cursor`` as ``before`` to load older messages.
+        Raises InvalidCursorError for a malformed cursor.
+        """
+        membership = self.db.query(SquadMembership.id).filter(
+            SquadMembership.squad_id == squad_id,
+            SquadMembership.user_id == user_id
+        ).first()
+        
+        if not membership:
+            return {"messages": [], "next_cursor": None, "approximate_total": 0 if include_total else None}
+        
+        squad_messages = self.db.query(SquadMessage).filter(SquadMessage.squad_id == squad_id)
+        messages, next_cursor = keyset_page(
+            squad_messages, SquadMessage.created_at, SquadMessage.id, before=before, limit=limit
+        )
+        
+        return {
+            "messages": self._enrich_squad_messages(messages),
+            "next_cursor": next_cursor,
+            "approximate_total": approximate_count(self.db, squad_messages) if include_total else None
+        }
+
+    def _enrich_squad_messages(self, messages: List[SquadMessage]) -> List[Dict[str, Any]]:
+        """Attach sender name/avatar, looking up all senders in one query"""
+        senders = self.get_users_by_ids([msg.sender_id for msg in messages])
+        
+        message_responses = []
+        for msg in messages:
+            sender_info = senders.get(msg.sender_id)
+            message_responses.append({
+                "id": msg.id,
+                "squad_id": msg.squad_id,
+                "sender_id": msg.sender_id,
+                "sender_name": f"{sender_info.get('fname', '')} {sender_info.get('lname', '')}" if sender_info else "Unknown",
+                "sender_avatar": sender_info.get('avatar') if sender_info else None,
+                "content": msg.content,
+                "message_type": msg.message_type,
+                "metadata": json.loads(msg.message_metadata) if msg.message_metadata else {},  # Changed from metadata to message_metadata
+                "created_at": msg.created_at.isoformat(),
+                "reactions": []  # TODO: Implement reactions
+            })
+        return message_responses
+
     def promote_member(self, squad_id: str, member_id: int, promoter_id: int) -> Tuple[bool, str]:
         """Promote a squad member"""
         try:
@@ -372,6 +448,7 @@ class SquadService:
             ).delete()
             
             self.db.commit()
+            leaderboards.drop(f"squad:{squad_id}")
             return True, "Member removed successfully"
             
         except Exception as e:
@@ -456,6 +533,7 @@ class SquadService:
             
             self.db.add(participation)
             self.db.commit()
+            leaderboards.update(f"league:{league_id}", user_id, (0, 0.0, 0))
             
             return True, "Successfully joined league"
             
@@ -724,6 +802,7 @@ class SquadService:
             # Delete league
             self.db.delete(league)
             self.db.commit()
+            leaderboards.drop(f"league:{league_id}")
             
             return True, "League deleted successfully"
             
@@ -786,55 +865,79 @@ class SquadService:
             print(f"Error getting paginated study leagues: {e}")
             return [], 0
 
+    def _league_board(self, league_id: str):
+        """Sorted (score, accuracy, questions_answered) board of a league's active participants"""
+        def load():
+            rows = self._execute_with_retry(text("""
+                SELECT lp.user_id, COALESCE(lp.score, 0) AS score, COALESCE(lp.accuracy, 0) AS accuracy,
+                       COALESCE(lp.questions_answered, 0) AS questions_answered
+                FROM league_participations lp
+                JOIN users u ON lp.user_id = u.id
+                WHERE lp.league_id = :league_id AND u.is_active = true
+            """), {"league_id": league_id}).fetchall()
+            return [(row.user_id, (row.score, row.accuracy, row.questions_answered)) for row in rows]
+        
+        return leaderboards.get(f"league:{league_id}", load)
+    
+    def _league_entries(self, league_id: str, board, read) -> List[Dict[str, Any]]:
+        """Participant rows for the entries ``read(board)`` returns, in board order (see resolve_entries)"""
+        query = text("""
+            SELECT lp.user_id, lp.score, lp.questions_answered, lp.accuracy, lp.xp_earned,
+                   u.username, u.fname, u.lname, u.avatar
+            FROM league_participations lp
+            JOIN users u ON lp.user_id = u.id
+            WHERE lp.league_id = :league_id AND lp.user_id IN :user_ids
+        """).bindparams(bindparam("user_ids", expanding=True))
+        
+        def lookup(user_ids):
+            return {
+                row.user_id: row
+                for row in self._execute_with_retry(query, {"league_id": league_id, "user_ids": user_ids}).fetchall()
+            }
+        
+        return [
+            {
+                "id": row.user_id,
+                "username": row.username,
+                "fname": row.fname,
+                "lname": row.lname,
+                "avatar": row.avatar,
+                "score": row.score,
+                "rank": rank,
+                "questions_answered": row.questions_answered,
+                "accuracy": row.accuracy,
+                "xp_earned": row.xp_earned
+            }
+            for (rank, _, _), row in resolve_entries(board, read, lookup)
+        ]
+
     def get_league_leaderboard(self, league_id: str, page: int = 1, page_size: int = 50) -> Tuple[List[Dict[str, Any]], int]:
         """Get league leaderboard with participant rankings"""
         try:
-            # Get total count
-            total_count = self.db.query(LeagueParticipation).filter(
-                LeagueParticipation.league_id == league_id
-            ).count()
-            
-            # Get participants with ranking
+            board = self._league_board(league_id)
             offset = (page - 1) * page_size
-            query = text("""
-                SELECT lp.*, u.username, u.fname, u.lname, u.avatar,
-                       ROW_NUMBER() OVER (ORDER BY lp.score DESC, lp.accuracy DESC, lp.questions_answered DESC) as rank
-                FROM league_participations lp
-                JOIN users u ON lp.user_id = u.id
-                WHERE lp.league_id = :league_id AND u.is_active = true
-                ORDER BY lp.score DESC, lp.accuracy DESC, lp.questions_answered DESC
-                LIMIT :limit OFFSET :offset
-            """)
-            
-            result = self._execute_with_retry(query, {
-                "league_id": league_id,
-                "limit": page_size,
-                "offset": offset
-            })
-            rows = result.fetchall()
-            
-            participants = []
-            for row in rows:
-                participant = {
-                    "id": row.user_id,
-                    "username": row.username,
-                    "fname": row.fname,
-                    "lname": row.lname,
-                    "avatar": row.avatar,
-                    "score": row.score,
-                    "rank": row.rank,
-                    "questions_answered": row.questions_answered,
-                    "accuracy": row.accuracy,
-                    "xp_earned": row.xp_earned
-                }
-                participants.append(participant)
-            
-            return participants, total_count
+            participants = self._league_entries(league_id, board, lambda board: board.page(offset, page_size))
+            return participants, len(board)
             
         except Exception as e:
             print(f"Error getting league leaderboard: {e}")
             return [], 0
 
+    def get_league_standing(self, league_id: str, user_id: int, radius: int = 5) -> Optional[Dict[str, Any]]:
+        """A participant's rank and the participants ranked just above and below them"""
+        board = self._league_board(league_id)
+        # Resolved first: dropping participants without a user can move this one up
+        participants = self._league_entries(league_id, board, lambda board: board.around(user_id, radius))
+        rank = board.rank(user_id)
+        if rank is None:
+            return None
+        
+        return {
+            "rank": rank,
+            "total_participants": len(board),
+            "participants": participants
+        }
+
     def update_participant_stats(self, league_id: str, user_id: int, stats_data: Dict[str, Any]) -> Tuple[bool, str]:
         """Update participant statistics in a league"""
         try:
@@ -862,7 +965,37 @@ class SquadService:
             # Update last activity
             participation.last_activity = datetime.utcnow()
             
+            # League XP also counts towards the weekly XP of the user's squads
+            squad_xp = []
+            xp_earned = stats_data.get("xp_earned", 0)
+            if xp_earned > 0:
+                squad_xp = self.db.execute(text("""
+                    UPDATE squad_memberships
+                    SET weekly_xp = COALESCE(weekly_xp, 0) + :xp, total_xp = COALESCE(total_xp, 0) + :xp
+                    WHERE user_id = :user_id
+                    RETURNING squad_id, weekly_xp
+                """), {"xp": xp_earned, "user_id": user_id}).fetchall()
+                if squad_xp:
+                    self.db.execute(text("""
+                        UPDATE squads
+                        SET weekly_xp = COALESCE(weekly_xp, 0) + :xp, total_xp = COALESCE(total_xp, 0) + :xp
+                        WHERE id IN :squad_ids
+                    """).bindparams(bindparam("squad_ids", expanding=True)), {
+                        "xp": xp_earned,
+                        "squad_ids": [row.squad_id for row in squad_xp]
+                    })
+            
             self.db.commit()
+            
+            # Committed values (score is an integer column) feed the in-memory boards
+            leaderboards.update(
+                f"league:{league_id}",
+                user_id,
+                (participation.score or 0, participation.accuracy or 0.0, participation.questions_answered or 0)
+            )
+            for row in squad_xp:
+                leaderboards.update(f"squad:{row.squad_id}", user_id, (row.weekly_xp,))
+            
             return True, "Participant stats updated successfully"
             
         except Exception as e:
@@ -870,6 +1003,41 @@ class SquadService:
             print(f"Error updating participant stats: {e}")
             return False, f"Failed to update stats: {str(e)}"
 
+    def _squad_board(self, squad_id: str):
+        """Sorted weekly XP board of a squad's members"""
+        def load():
+            rows = self.db.query(SquadMembership.user_id, SquadMembership.weekly_xp).filter(
+                SquadMembership.squad_id == squad_id
+            ).all()
+            return [(row.user_id, (row.weekly_xp or 0,)) for row in rows]
+        
+        return leaderboards.get(f"squad:{squad_id}", load)
+
+    def get_squad_leaderboard(self, squad_id: str, user_id: Optional[int] = None, limit: int = 20) -> Dict[str, Any]:
+        """Squad members ranked by weekly XP, plus the requesting member's rank"""
+        board = self._squad_board(squad_id)
+        
+        members = []
+        for (rank, member_id, (weekly_xp,)), user in resolve_entries(
+            board, lambda board: board.page(0, limit), self._load_users_by_ids
+        ):
+            members.append({
+                "id": member_id,
+                "username": user["username"],
+                "fname": user["fname"],
+                "lname": user["lname"],
+                "avatar": user["avatar"],
+                "weekly_xp": weekly_xp,
+                "rank": rank
+            })
+        
+        return {
+            "squad_id": squad_id,
+            "members": members,
+            "total_members": len(board),
+            "my_rank": board.rank(user_id) if user_id is not None else None
+        }
+
     def get_user_leagues(self, user_id: int, status_filter: str = "all") -> List[Dict[str, Any]]:
         """Get leagues that a user is participating in"""
         try:
@@ -1026,6 +1194,7 @@ class SquadService:
                 ).delete()
                 
                 self.db.commit()
+                leaderboards.drop(f"squad:{squad_id}")
                 return True, f"Leadership transferred to user {transfer_leadership}. You have left the squad."
             
             # If no transfer needed or only creator in squad, delete everything
@@ -1052,6 +1221,7 @@ class SquadService:
                 self.db.delete(squad)
                 
                 self.db.commit()
+                leaderboards.drop(f"squad:{squad_id}")
                 
                 print(f"Squad {squad_id} deleted by creator {user_id}")
                 return True, "Squad deleted successfully"
@@ -1092,11 +1262,13 @@ class SquadService:
                     self.db.delete(membership)
                     self.db.delete(squad)
                     self.db.commit()
+                    leaderboards.drop(f"squad:{squad_id}")
                     return True, "You were the last member. Squad has been deleted."
             
             # Regular member leaving
             self.db.delete(membership)
             self.db.commit()
+            leaderboards.drop(f"squad:{squad_id}")
             
             return True, "Successfully left the squad"
             
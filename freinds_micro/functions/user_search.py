@@ -0,0 +1,486 @@
+"""Ranked user search for the friend-search box.
+
+Two candidate backends share one ranking function:
+
+- ``TrigramUserSearch``: Postgres ``pg_trgm`` GIN indexes over the username
+  and the full name (substring + fuzzy), plus ``text_pattern_ops`` b-tree
+  indexes for one- and two-character prefixes, which trigrams cannot serve.
+- ``PrefixIndexUserSearch``: an in-process sorted token index used when the
+  extension is unavailable. It answers prefix queries with ``bisect`` and
+  fuzzy queries among tokens sharing the first two characters. The index is
+  (re)loaded in a background thread; until the first load finishes, queries
+  fall back to a plain prefix ``LIKE``.
+
+Results rank exact > prefix > substring > fuzzy. Within a tier,
+friends-of-friends come first, then closer trigram similarity.
+
+Candidate sets are cached per query string for a short time and shared by
+every viewer (social ranking is applied afterwards). As a user types, a
+cached shorter prefix whose candidate set was complete answers the longer
+query without touching the database, as long as the tiers that set covers
+(prefix only, or also substring) fill the page.
+"""
+
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import text
+
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("USER_SEARCH_CACHE_TTL_SECONDS", "30"))
+SEARCH_CACHE_MAX_QUERIES = int(os.getenv("USER_SEARCH_CACHE_MAX_QUERIES", "2000"))
+CANDIDATE_LIMIT = int(os.getenv("USER_SEARCH_CANDIDATE_LIMIT", "200"))
+PREFIX_INDEX_REFRESH_SECONDS = float(os.getenv("USER_SEARCH_PREFIX_REFRESH_SECONDS", "600"))
+# pg_trgm's default similarity threshold for the % operator
+FUZZY_THRESHOLD = 0.3
+# Trigrams need three characters; shorter queries are prefix-only
+MIN_FUZZY_LENGTH = 3
+
+TIER_EXACT, TIER_PREFIX, TIER_CONTAINS, TIER_FUZZY = 4, 3, 2, 1
+
+UserRow = Dict[str, Any]
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigram set as pg_trgm computes it: per word, padded with two leading spaces and one trailing."""
+    grams: Set[str] = set()
+    for word in _NON_WORD.split(value.lower()):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(a: str, b: str, b_grams: Optional[Set[str]] = None) -> float:
+    grams_a = trigrams(a)
+    grams_b = b_grams if b_grams is not None else trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    shared = len(grams_a & grams_b)
+    return shared / (len(grams_a) + len(grams_b) - shared)
+
+
+def _full_name(row: UserRow) -> str:
+    return f"{row.get('fname') or ''} {row.get('lname') or ''}".strip().lower()
+
+
+def match_tier(row: UserRow, query: str, query_grams: Optional[Set[str]] = None) -> Tuple[int, float]:
+    """(tier, similarity) of one user for a normalized query; tier 0 means no match.
+
+    Similarity is the best of the username and each name word, the in-process
+    counterpart of ``%`` on the username and ``<%`` (word similarity) on the name.
+    """
+    if query_grams is None:
+        query_grams = trigrams(query)
+    username = (row.get("username") or "").lower()
+    fname = (row.get("fname") or "").lower()
+    lname = (row.get("lname") or "").lower()
+    full_name = _full_name(row)
+
+    if query in (username, full_name):
+        tier = TIER_EXACT
+    elif any(name.startswith(query) for name in (username, fname, lname, full_name)):
+        tier = TIER_PREFIX
+    elif query in username or query in full_name:
+        tier = TIER_CONTAINS
+    else:
+        tier = 0
+
+    words = [username, *full_name.split()]
+    score = max(similarity(word, query, query_grams) for word in words) if words else 0.0
+    if not tier and len(query) >= MIN_FUZZY_LENGTH and score >= FUZZY_THRESHOLD:
+        tier = TIER_FUZZY
+    return tier, score
+
+
+def rank_users(
+    candidates: Iterable[UserRow],
+    query: str,
+    *,
+    limit: int = 10,
+    friend_ids: Optional[Set[int]] = None,
+    friends_of_friends: Optional[Set[int]] = None,
+    exclude_ids: Optional[Set[int]] = None,
+) -> List[UserRow]:
+    """Rank candidates for ``query``; returns copies flagged with ``is_friend``/``is_friend_of_friend``."""
+    friend_ids = friend_ids or set()
+    friends_of_friends = friends_of_friends or set()
+    exclude_ids = exclude_ids or set()
+
+    query_grams = trigrams(query)
+    scored = []
+    for row in candidates:
+        if row["id"] in exclude_ids:
+            continue
+        tier, score = match_tier(row, query, query_grams)
+        if not tier:
+            continue
+        is_fof = row["id"] in friends_of_friends and row["id"] not in friend_ids
+        scored.append((-tier, -int(is_fof), -score, len(row.get("username") or ""), row["id"], row, is_fof))
+
+    scored.sort(key=lambda item: item[:5])
+    return [
+        {**row, "is_friend": row["id"] in friend_ids, "is_friend_of_friend": is_fof}
+        for *_, row, is_fof in scored[:limit]
+    ]
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+# ===============================
+# CANDIDATE BACKENDS
+# ===============================
+
+class TrigramUserSearch:
+    """Candidates from Postgres using pg_trgm.
+
+    ``index_queries`` are the indexes it relies on; for the users table they are
+    created by the users_micro alembic revision 20261018_10.
+    """
+
+    name = "trigram"
+
+    def __init__(self, table: str = "users"):
+        self.table = table
+        full_name = "lower(coalesce(fname, '') || ' ' || coalesce(lname, ''))"
+        self.index_queries = [
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_username_trgm "
+            f"ON {table} USING gin (lower(username) gin_trgm_ops);",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_full_name_trgm "
+            f"ON {table} USING gin ({full_name} gin_trgm_ops);",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_username_prefix "
+            f"ON {table} (lower(username) text_pattern_ops);",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_fname_prefix "
+            f"ON {table} (lower(fname) text_pattern_ops);",
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_{table}_lname_prefix "
+            f"ON {table} (lower(lname) text_pattern_ops);",
+        ]
+        self._fuzzy_sql = text(f"""
+            SELECT id, username, fname, lname, avatar
+            FROM {table}
+            WHERE is_active = true
+              AND (lower(username) LIKE :contains ESCAPE '\\'
+                   OR {full_name} LIKE :contains ESCAPE '\\'
+                   OR lower(username) % :q
+                   OR :q <% {full_name})
+            ORDER BY CASE
+                        WHEN lower(username) = :q OR {full_name} = :q THEN 4
+                        WHEN lower(username) LIKE :prefix ESCAPE '\\' OR {full_name} LIKE :prefix ESCAPE '\\' THEN 3
+                        WHEN lower(username) LIKE :contains ESCAPE '\\' OR {full_name} LIKE :contains ESCAPE '\\' THEN 2
+                        ELSE 1
+                     END DESC,
+                     greatest(similarity(lower(username), :q), word_similarity(:q, {full_name})) DESC
+            LIMIT :candidate_limit
+        """)
+        self._prefix_sql = text(f"""
+            SELECT id, username, fname, lname, avatar
+            FROM {table}
+            WHERE is_active = true
+              AND (lower(username) LIKE :prefix ESCAPE '\\'
+                   OR lower(fname) LIKE :prefix ESCAPE '\\'
+                   OR lower(lname) LIKE :prefix ESCAPE '\\')
+            ORDER BY (lower(username) = :q) DESC, (lower(username) LIKE :prefix ESCAPE '\\') DESC, length(username)
+            LIMIT :candidate_limit
+        """)
+
+    @staticmethod
+    def available(db) -> bool:
+        if db.get_bind().dialect.name != "postgresql":
+            return False
+        try:
+            return db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+        except Exception:
+            return False
+
+    @staticmethod
+    def covers_substrings(query: str) -> bool:
+        """Whether candidates for ``query`` include substring matches (short queries are prefix-only)"""
+        return len(query) >= MIN_FUZZY_LENGTH
+
+    def candidates(self, db, query: str, limit: int = CANDIDATE_LIMIT) -> List[UserRow]:
+        escaped = _like_escape(query)
+        params = {"q": query, "prefix": f"{escaped}%", "contains": f"%{escaped}%", "candidate_limit": limit}
+        sql = self._fuzzy_sql if len(query) >= MIN_FUZZY_LENGTH else self._prefix_sql
+        return [dict(row._mapping) for row in db.execute(sql, params)]
+
+
+class PrefixIndexUserSearch:
+    """In-process fallback: sorted distinct tokens with posting lists, searched with bisect.
+
+    Name tokens (first, last and full name) repeat heavily and are kept apart
+    from usernames, so a fuzzy lookup can score every name sharing the query's
+    first letter and only the usernames sharing its first two.
+    """
+
+    name = "prefix"
+
+    def __init__(
+        self,
+        table: str = "users",
+        refresh_seconds: float = PREFIX_INDEX_REFRESH_SECONDS,
+        fuzzy_scan_limit: int = 2000,
+    ):
+        self.table = table
+        self.refresh_seconds = refresh_seconds
+        # Distinct name tokens scored per fuzzy lookup; usernames are near-unique, so a quarter of that
+        self.fuzzy_scan_limit = fuzzy_scan_limit
+        self._users: Dict[int, UserRow] = {}
+        # (sorted tokens, user ids per token) for usernames and for names
+        self._usernames: Tuple[List[str], List[List[int]]] = ([], [])
+        self._names: Tuple[List[str], List[List[int]]] = ([], [])
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._prefix_sql = text(f"""
+            SELECT id, username, fname, lname, avatar
+            FROM {table}
+            WHERE is_active = true
+              AND (lower(username) LIKE :prefix ESCAPE '\\'
+                   OR lower(fname) LIKE :prefix ESCAPE '\\'
+                   OR lower(lname) LIKE :prefix ESCAPE '\\')
+            LIMIT :candidate_limit
+        """)
+
+    @staticmethod
+    def _build(postings: Dict[str, List[int]]) -> Tuple[List[str], List[List[int]]]:
+        keys = sorted(postings)
+        return keys, [postings[key] for key in keys]
+
+    def load(self, rows: Iterable[UserRow]) -> None:
+        users: Dict[int, UserRow] = {}
+        usernames: Dict[str, List[int]] = {}
+        names: Dict[str, List[int]] = {}
+        for row in rows:
+            user_id = row["id"]
+            users[user_id] = row
+            username = (row.get("username") or "").lower()
+            if username:
+                usernames.setdefault(username, []).append(user_id)
+            for token in {(row.get("fname") or "").lower(), (row.get("lname") or "").lower(), _full_name(row)}:
+                if token:
+                    names.setdefault(token, []).append(user_id)
+        self._users = users
+        self._usernames = self._build(usernames)
+        self._names = self._build(names)
+        self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def covers_substrings(query: str) -> bool:
+        return False
+
+    def refresh(self, connection) -> None:
+        """Reload the index from the users table"""
+        rows = connection.execute(text(
+            f"SELECT id, username, fname, lname, avatar FROM {self.table} WHERE is_active = true"
+        ))
+        self.load(dict(row._mapping) for row in rows)
+
+    def _refresh_in_background(self, bind) -> None:
+        try:
+            with bind.connect() as connection:
+                self.refresh(connection)
+        except Exception as e:
+            print(f"⚠️ User search prefix index reload failed: {e}")
+
+    def _ensure_fresh(self, db) -> bool:
+        """Start a background reload when the index is missing or stale; True once it can answer queries"""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_seconds:
+            return True
+        with self._refresh_lock:
+            if self._refresh_thread is None or not self._refresh_thread.is_alive():
+                self._refresh_thread = threading.Thread(
+                    target=self._refresh_in_background,
+                    args=(db.get_bind(),),
+                    name="user-search-prefix-index",
+                    daemon=True,
+                )
+                self._refresh_thread.start()
+        # A stale index keeps answering while the reload runs
+        return loaded_at is not None
+
+    @staticmethod
+    def _tokens_with_prefix(index: Tuple[List[str], List[List[int]]], prefix: str, limit: int):
+        keys, postings = index
+        position = bisect_left(keys, prefix)
+        end = min(len(keys), position + limit)
+        while position < end and keys[position].startswith(prefix):
+            yield keys[position], postings[position]
+            position += 1
+
+    def _collect(self, ids: List[int], seen: Set[int], user_ids: Iterable[int], limit: int) -> None:
+        for user_id in user_ids:
+            if len(ids) >= limit:
+                return
+            if user_id not in seen:
+                seen.add(user_id)
+                ids.append(user_id)
+
+    def candidates(self, db, query: str, limit: int = CANDIDATE_LIMIT) -> List[UserRow]:
+        if not self._ensure_fresh(db):
+            params = {"prefix": f"{_like_escape(query)}%", "candidate_limit": limit}
+            return [dict(row._mapping) for row in db.execute(self._prefix_sql, params)]
+
+        ids: List[int] = []
+        seen: Set[int] = set()
+        for index in (self._usernames, self._names):
+            for _, user_ids in self._tokens_with_prefix(index, query, len(index[0])):
+                self._collect(ids, seen, user_ids, limit)
+                if len(ids) >= limit:
+                    break
+
+        if len(query) >= MIN_FUZZY_LENGTH and len(ids) < limit:
+            # Typos after the leading characters: score the neighbourhood by similarity
+            query_grams = trigrams(query)
+            scored = [
+                (similarity(token, query, query_grams), user_ids)
+                for index, prefix, scan_limit in (
+                    (self._names, query[:1], self.fuzzy_scan_limit),
+                    (self._usernames, query[:2], self.fuzzy_scan_limit // 4),
+                )
+                for token, user_ids in self._tokens_with_prefix(index, prefix, scan_limit)
+            ]
+            scored.sort(key=lambda item: -item[0])
+            for score, user_ids in scored:
+                if score < FUZZY_THRESHOLD or len(ids) >= limit:
+                    break
+                self._collect(ids, seen, user_ids, limit)
+
+        return [self._users[user_id] for user_id in ids]
+
+
+# ===============================
+# SEARCH SERVICE
+# ===============================
+
+class UserSearch:
+    """Chooses a backend, caches candidate sets and applies ranking."""
+
+    def __init__(
+        self,
+        backend: Optional[Any] = None,
+        *,
+        cache_ttl_seconds: float = SEARCH_CACHE_TTL_SECONDS,
+        max_cached_queries: int = SEARCH_CACHE_MAX_QUERIES,
+        candidate_limit: int = CANDIDATE_LIMIT,
+    ):
+        self.backend = backend
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.max_cached_queries = max_cached_queries
+        self.candidate_limit = candidate_limit
+        # query -> (expires_at, candidates, complete, lowest tier a complete set holds every match of)
+        self._cache: "OrderedDict[str, Tuple[float, List[UserRow], bool, int]]" = OrderedDict()
+        # viewer id -> (expires_at, friend ids, friends-of-friends ids)
+        self._social: "OrderedDict[int, Tuple[float, Set[int], Set[int]]]" = OrderedDict()
+        self.stats = {"hits": 0, "narrowed": 0, "misses": 0}
+
+    def resolve_backend(self, db) -> Any:
+        if self.backend is None:
+            choice = os.getenv("USER_SEARCH_BACKEND", "auto")
+            if choice == "trigram" or (choice == "auto" and TrigramUserSearch.available(db)):
+                self.backend = TrigramUserSearch()
+            else:
+                self.backend = PrefixIndexUserSearch()
+        return self.backend
+
+    def _cached(self, query: str) -> Optional[Tuple[List[UserRow], bool, int]]:
+        entry = self._cache.get(query)
+        if entry is None:
+            return None
+        expires_at, candidates, complete, covered_tier = entry
+        if time.monotonic() > expires_at:
+            del self._cache[query]
+            return None
+        self._cache.move_to_end(query)
+        return candidates, complete, covered_tier
+
+    def _store(self, query: str, candidates: List[UserRow], complete: bool, covered_tier: int) -> None:
+        self._cache[query] = (time.monotonic() + self.cache_ttl_seconds, candidates, complete, covered_tier)
+        self._cache.move_to_end(query)
+        while len(self._cache) > self.max_cached_queries:
+            self._cache.popitem(last=False)
+
+    def social_context(
+        self, viewer_id: int, load: Callable[[int], Tuple[Set[int], Set[int]]]
+    ) -> Tuple[Set[int], Set[int]]:
+        """(friend ids, friends-of-friends) for a viewer, kept for the length of a typing burst."""
+        entry = self._social.get(viewer_id)
+        if entry is not None and time.monotonic() <= entry[0]:
+            self._social.move_to_end(viewer_id)
+            return entry[1], entry[2]
+        friend_ids, friends_of_friends = load(viewer_id)
+        self._social[viewer_id] = (time.monotonic() + self.cache_ttl_seconds, friend_ids, friends_of_friends)
+        self._social.move_to_end(viewer_id)
+        while len(self._social) > self.max_cached_queries:
+            self._social.popitem(last=False)
+        return friend_ids, friends_of_friends
+
+    def candidates(self, db, query: str, limit: int) -> List[UserRow]:
+        cached = self._cached(query)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached[0]
+
+        # A complete candidate set for a shorter prefix holds every match of the longer
+        # query down to the tier it covers: prefix matches, plus substrings when the
+        # backend searched substrings for it. Tiers outrank everything else, so it
+        # answers the longer query when matches in those tiers alone fill the page.
+        for length in range(len(query) - 1, 0, -1):
+            shorter = self._cached(query[:length])
+            if shorter is None or not shorter[1]:
+                continue
+            shorter_candidates, _, covered_tier = shorter
+            query_grams = trigrams(query)
+            narrowed = [row for row in shorter_candidates if match_tier(row, query, query_grams)[0] >= covered_tier]
+            if len(narrowed) >= limit:
+                self.stats["narrowed"] += 1
+                self._store(query, narrowed, False, covered_tier)
+                return narrowed
+            break
+
+        self.stats["misses"] += 1
+        backend = self.resolve_backend(db)
+        candidates = backend.candidates(db, query, self.candidate_limit)
+        covers_substrings = getattr(backend, "covers_substrings", None)
+        covered_tier = TIER_CONTAINS if covers_substrings and covers_substrings(query) else TIER_PREFIX
+        self._store(query, candidates, len(candidates) < self.candidate_limit, covered_tier)
+        return candidates
+
+    def search(
+        self,
+        db,
+        query: str,
+        *,
+        limit: int = 10,
+        viewer_id: Optional[int] = None,
+        friend_ids: Optional[Set[int]] = None,
+        friends_of_friends: Optional[Set[int]] = None,
+    ) -> List[UserRow]:
+        query = normalize_query(query)
+        if not query:
+            return []
+        candidates = self.candidates(db, query, limit)
+        return rank_users(
+            candidates,
+            query,
+            limit=limit,
+            friend_ids=friend_ids,
+            friends_of_friends=friends_of_friends,
+            exclude_ids={viewer_id} if viewer_id is not None else None,
+        )
+
+
+user_search = UserSearch()
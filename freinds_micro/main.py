@@ -1,12 +1,20 @@
+import os
+import sys
+
+# Modules shared between services (common/) sit in the repository root; the
+# Docker image copies them next to this file instead
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
-from Endpoints import friends, squads
+from Endpoints import friends, squads, chat
+from functions.chat_gateway import chat_gateway
+from functions.pagination import conversation_keys
 from db.database import engine, test_connection
 import models.friends_models as friends_models
 import models.squad_models as squad_models
 from sqlalchemy import text
-import os
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -48,12 +56,38 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         print(f"❌ Error creating squad tables: {e}")
     
+    # Message history filters on conversation_key. Replicas from before it existed
+    # write rows without one until users_micro revision 20261018_12 adds the trigger
+    # that fills it in, so keep matching those rows by participants until then.
+    try:
+        with engine.connect() as connection:
+            unkeyed = connection.execute(
+                text("SELECT 1 FROM friend_messages WHERE conversation_key IS NULL LIMIT 1")
+            ).first()
+            keyed_by_trigger = connection.execute(
+                text("SELECT 1 FROM pg_trigger WHERE tgname = 'friend_messages_conversation_key'")
+            ).first()
+        conversation_keys.complete = not unkeyed and keyed_by_trigger is not None
+    except Exception as e:
+        print(f"⚠️ Could not verify message conversation keys: {e}")
+    if conversation_keys.complete:
+        print("✅ Message conversation keys verified")
+    else:
+        print("⚠️ friend_messages may have rows without conversation_key; run `alembic upgrade head` in users_micro. Matching them by participants meanwhile")
+    
+    try:
+        await chat_gateway.start()
+        print(f"✅ Chat gateway started ({type(chat_gateway.backplane).__name__})")
+    except Exception as e:
+        print(f"⚠️ Chat gateway backplane unavailable, realtime push disabled: {e}")
+    
     print("✅ Friends & Squads service startup complete!")
     
     yield  # Application runs here
     
     # Shutdown
     print("🛑 Shutting down Friends & Squads service...")
+    await chat_gateway.stop()
 
 app = FastAPI(
     title="BrainInk Friends & Squads API",
@@ -74,6 +108,7 @@ app.add_middleware(
 # Include routers
 app.include_router(friends.router)
 app.include_router(squads.router)
+app.include_router(chat.router)
 
 # Support both GET and HEAD for root endpoint
 @app.get("/")
@@ -169,5 +204,10 @@ def get_services():
                 "/squads/battles",
                 "/squads/challenge"
             ]
+        },
+        "chat_service": {
+            "endpoints": [
+                "/chat/ws?token={jwt}"
+            ]
         }
     }
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -50,6 +50,8 @@ class FriendMessage(Base):
     sender_id = Column(Integer, ForeignKey(users_table.c.id), nullable=False, index=True)
     receiver_id = Column(Integer, ForeignKey(users_table.c.id), nullable=False, index=True)
     friendship_id = Column(Integer, ForeignKey("friendships.id"), nullable=False, index=True)
+    # "<lower user id>:<higher user id>", the same for both directions of a conversation
+    conversation_key = Column(String(50), nullable=True)
     
     # Message content
     content = Column(Text, nullable=False)
@@ -65,6 +67,11 @@ class FriendMessage(Base):
     # Relationships
     friendship = relationship("Friendship")
     
+    __table_args__ = (
+        # Serves conversation history pages: WHERE conversation_key = ? ORDER BY created_at DESC, id DESC
+        Index("ix_friend_messages_conversation_created", "conversation_key", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<FriendMessage(sender_id={self.sender_id}, receiver_id={self.receiver_id})>"
 
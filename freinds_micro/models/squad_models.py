@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Float, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -87,6 +87,11 @@ class SquadMessage(Base):
     # Relationships
     squad = relationship("Squad", back_populates="messages")
     
+    __table_args__ = (
+        # Serves squad history pages: WHERE squad_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_squad_messages_squad_created", "squad_id", "created_at", "id"),
+    )
+    
     def __repr__(self):
         return f"<SquadMessage(id={self.id}, squad_id={self.squad_id})>"
 
@@ -44,6 +44,13 @@ class UserBasicInfo(BaseModel):
     class Config:
         from_attributes = True
 
+class FriendListEntry(UserBasicInfo):
+    is_online: bool = False
+    friends_since: Optional[datetime] = None
+    last_message: Optional[str] = None
+    last_message_at: Optional[datetime] = None
+    last_message_sender_id: Optional[int] = None
+
 class FriendshipResponse(BaseModel):
     id: int
     requester_id: int
@@ -96,7 +103,7 @@ class ChatConversationResponse(BaseModel):
     friendship_id: int
 
 class FriendsListResponse(BaseModel):
-    friends: List[UserBasicInfo]
+    friends: List[FriendListEntry]
     total_count: int
 
 class PaginatedMessagesResponse(BaseModel):
@@ -104,4 +111,10 @@ class PaginatedMessagesResponse(BaseModel):
     total_count: int
     page: int
     page_size: int
-    has_next: bool
\ No newline at end of file
+    has_next: bool
+
+class MessageHistoryResponse(BaseModel):
+    messages: List[FriendMessageResponse]
+    next_cursor: Optional[str] = None  # Pass as `before` to load older messages
+    has_more: bool
+    approximate_total: Optional[int] = None  # Only when include_total=true
\ No newline at end of file
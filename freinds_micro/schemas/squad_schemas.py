@@ -236,6 +236,26 @@ class LeagueLeaderboardResponse(BaseModel):
     page_size: int
     has_next: bool
 
+class LeagueStandingResponse(BaseModel):
+    rank: int
+    total_participants: int
+    participants: List[LeagueParticipantResponse]
+
+class SquadLeaderboardMember(BaseModel):
+    id: int
+    username: str
+    fname: str
+    lname: str
+    avatar: Optional[str]
+    weekly_xp: int
+    rank: int
+
+class SquadLeaderboardResponse(BaseModel):
+    squad_id: str
+    members: List[SquadLeaderboardMember]
+    total_members: int
+    my_rank: Optional[int] = None
+
 class NationalLeaderboardResponse(BaseModel):
     id: int
     username: str
@@ -262,4 +282,10 @@ class PaginatedMessagesResponse(BaseModel):
     total_count: int
     page: int
     page_size: int
-    has_next: bool
\ No newline at end of file
+    has_next: bool
+
+class MessageHistoryResponse(BaseModel):
+    messages: List[SquadMessageResponse]
+    next_cursor: Optional[str] = None  # Pass as `before` to load older messages
+    has_more: bool
+    approximate_total: Optional[int] = None  # Only when include_total=true
\ No newline at end of file
@@ -0,0 +1,153 @@
+"""
+Benchmark OFFSET vs keyset pagination on a 1M-message conversation.
+
+The "offset" strategy is what the page-based endpoints used to do: an OR of the
+two (sender, receiver) pairs, a COUNT(*) and OFFSET/LIMIT. The "keyset"
+strategy filters on conversation_key and seeks from a (created_at, id) cursor
+via functions.pagination.keyset_page.
+
+Uses a throwaway SQLite file by default; pass --database-url to run against a
+scratch Postgres database (the table is created and dropped).
+
+Usage (from freinds_micro/):
+    python scripts/benchmark_message_pagination.py --messages 1000000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, and_, create_engine, or_
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from functions.pagination import conversation_key, encode_cursor, keyset_page
+
+Base = declarative_base()
+
+
+class BenchMessage(Base):
+    """Mirror of friend_messages with the indexes the service relies on."""
+    __tablename__ = "bench_friend_messages"
+
+    id = Column(Integer, primary_key=True)
+    sender_id = Column(Integer, nullable=False, index=True)
+    receiver_id = Column(Integer, nullable=False, index=True)
+    conversation_key = Column(String(50))
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_bench_conversation_created", "conversation_key", "created_at", "id"),
+    )
+
+
+def seed(session, messages: int, noise: int) -> None:
+    start = datetime(2024, 1, 1)
+    rows = []
+    for i in range(messages + noise):
+        if i < messages:
+            sender, receiver = (1, 2) if i % 2 else (2, 1)
+        else:
+            sender, receiver = 3 + i % 50, 100 + i % 7
+        rows.append({
+            "sender_id": sender,
+            "receiver_id": receiver,
+            "conversation_key": conversation_key(sender, receiver),
+            "content": "hello there",
+            # Bursts of messages share a timestamp, which is why id breaks ties
+            "created_at": start + timedelta(seconds=i // 3),
+        })
+        if len(rows) == 50_000:
+            session.execute(BenchMessage.__table__.insert(), rows)
+            rows = []
+    if rows:
+        session.execute(BenchMessage.__table__.insert(), rows)
+    session.commit()
+
+
+def offset_page(session, page: int, page_size: int):
+    query = session.query(BenchMessage).filter(
+        or_(
+            and_(BenchMessage.sender_id == 1, BenchMessage.receiver_id == 2),
+            and_(BenchMessage.sender_id == 2, BenchMessage.receiver_id == 1),
+        )
+    )
+    total = query.count()
+    rows = query.order_by(BenchMessage.created_at.desc()).offset((page - 1) * page_size).limit(page_size).all()
+    return rows, total
+
+
+def cursor_at_depth(session, depth: int):
+    if depth == 0:
+        return None
+    row = session.query(BenchMessage).filter(
+        BenchMessage.conversation_key == conversation_key(1, 2)
+    ).order_by(BenchMessage.created_at.desc(), BenchMessage.id.desc()).offset(depth - 1).first()
+    return encode_cursor(row.created_at, row.id)
+
+
+def timed(fn, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--noise", type=int, default=200_000, help="messages in other conversations")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    db_path = None
+    if args.database_url:
+        url = args.database_url
+    else:
+        db_path = os.path.join(tempfile.mkdtemp(), "bench.sqlite")
+        url = f"sqlite:///{db_path}"
+
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    print(f"Seeding {args.messages:,} conversation messages + {args.noise:,} others...")
+    seed_start = time.perf_counter()
+    seed(session, args.messages, args.noise)
+    print(f"Seeded in {time.perf_counter() - seed_start:.1f}s\n")
+
+    key_query = session.query(BenchMessage).filter(BenchMessage.conversation_key == conversation_key(1, 2))
+
+    print(f"{'depth (messages)':>18} | {'offset+count (ms)':>18} | {'keyset (ms)':>12}")
+    for depth in (0, 10_000, 100_000, 500_000, args.messages - args.page_size):
+        if depth >= args.messages:
+            continue
+        page = depth // args.page_size + 1
+        before = cursor_at_depth(session, depth)
+
+        offset_ms = timed(lambda: offset_page(session, page, args.page_size), args.runs)
+        keyset_ms = timed(
+            lambda: keyset_page(key_query, BenchMessage.created_at, BenchMessage.id, before=before, limit=args.page_size),
+            args.runs,
+        )
+        print(f"{depth:>18,} | {offset_ms:>18.1f} | {keyset_ms:>12.2f}")
+
+    session.close()
+    Base.metadata.drop_all(engine)
+    if db_path:
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark user search strategies on a 1M-user table.
+
+- "ilike": the old endpoint, ``username ILIKE '%q%' LIMIT 10`` (sequential scan,
+  no ranking).
+- "prefix": the in-process sorted token index (functions.user_search fallback).
+- "trigram": pg_trgm GIN + text_pattern_ops indexes (Postgres only).
+
+Queries replay typing bursts ("j", "jo", "joh", ...) plus misspellings, and
+report p50/p95 latency per keystroke with the query cache disabled so each
+number is a backend round trip.
+
+Uses a throwaway SQLite file by default (ilike + prefix); pass --database-url
+to run all three against a scratch Postgres database (the table is created
+and dropped).
+
+Usage (from freinds_micro/):
+    python scripts/benchmark_user_search.py --users 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Boolean, Column, Integer, String, create_engine, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from functions.user_search import PrefixIndexUserSearch, TrigramUserSearch, UserSearch
+
+Base = declarative_base()
+TABLE = "bench_users"
+
+FIRST_NAMES = ["john", "joanna", "mary", "maria", "michael", "amina", "kwame", "chen", "sofia", "liam",
+               "noah", "olivia", "emma", "ava", "lucas", "mateo", "yusuf", "fatima", "ivan", "priya"]
+LAST_NAMES = ["smith", "johnson", "okafor", "mensah", "garcia", "nguyen", "kim", "patel", "silva", "brown",
+              "wilson", "moore", "taylor", "anderson", "thomas", "jackson", "white", "harris", "martin", "lee"]
+TYPED = ["johnson", "mensah", "okafor", "sofia", "kwame"]
+MISSPELLED = ["jonhson", "mensha", "okafro", "sofai", "kwmae"]
+
+
+class BenchUser(Base):
+    """Mirror of the user columns the search reads."""
+    __tablename__ = TABLE
+
+    id = Column(Integer, primary_key=True)
+    username = Column(String(100), nullable=False)
+    fname = Column(String(100))
+    lname = Column(String(100))
+    avatar = Column(String(255))
+    is_active = Column(Boolean, default=True)
+
+
+def seed(session, users: int) -> None:
+    rng = random.Random(7)
+    batch = []
+    for i in range(1, users + 1):
+        fname, lname = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        batch.append({
+            "id": i,
+            "username": f"{fname}{rng.choice(['', '_', '.'])}{lname}{rng.randint(1, 99999)}",
+            "fname": fname.title(),
+            "lname": lname.title(),
+            "avatar": None,
+            "is_active": True,
+        })
+        if len(batch) == 50000:
+            session.execute(BenchUser.__table__.insert(), batch)
+            batch = []
+    if batch:
+        session.execute(BenchUser.__table__.insert(), batch)
+    session.commit()
+
+
+def keystrokes():
+    for word in TYPED:
+        for length in range(1, len(word) + 1):
+            yield word[:length]
+    yield from MISSPELLED
+
+
+def measure(run, queries):
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        run(query)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    tmp_path = None
+    if args.database_url:
+        url = args.database_url
+    else:
+        handle, tmp_path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        url = f"sqlite:///{tmp_path}"
+
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        print(f"Seeding {args.users:,} users...")
+        started = time.perf_counter()
+        seed(session, args.users)
+        print(f"  seeded in {time.perf_counter() - started:.1f}s")
+
+        queries = list(keystrokes())
+        like = "ILIKE" if engine.dialect.name == "postgresql" else "LIKE"
+        legacy = text(f"SELECT id, username, fname, lname, avatar FROM {TABLE} "
+                      f"WHERE username {like} :username AND is_active = true LIMIT 10")
+        results = {"ilike": measure(lambda q: session.execute(legacy, {"username": f"%{q}%"}).fetchall(), queries)}
+
+        prefix = PrefixIndexUserSearch(table=TABLE)
+        started = time.perf_counter()
+        prefix.refresh(session)
+        print(f"  prefix index built in {time.perf_counter() - started:.1f}s")
+        search = UserSearch(prefix, cache_ttl_seconds=-1)
+        results["prefix"] = measure(lambda q: search.search(session, q), queries)
+
+        if engine.dialect.name == "postgresql":
+            trigram = TrigramUserSearch(table=TABLE)
+            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+                for query in trigram.index_queries:
+                    connection.execute(text(query))
+                connection.execute(text(f"ANALYZE {TABLE}"))
+            search = UserSearch(trigram, cache_ttl_seconds=-1)
+            results["trigram"] = measure(lambda q: search.search(session, q), queries)
+
+        print(f"\n{len(queries)} keystrokes over {args.users:,} users (cache disabled)")
+        for name, (p50, p95) in results.items():
+            print(f"  {name:8s} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms")
+    finally:
+        session.close()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+        if tmp_path:
+            os.remove(tmp_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Tests for the chat gateway using the in-memory backplane."""
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+from freinds_micro.functions.chat_gateway import ChatGateway, InMemoryBackplane
+
+
+class FakeSocket:
+    def __init__(self, fail=False):
+        self.sent = []
+        self.fail = fail
+
+    async def send_json(self, data):
+        if self.fail:
+            raise RuntimeError("connection closed")
+        self.sent.append(data)
+
+
+def _friend_message(sender_id, receiver_id):
+    return SimpleNamespace(
+        id=1,
+        sender_id=sender_id,
+        receiver_id=receiver_id,
+        content="hi",
+        message_type="text",
+        status="sent",
+        created_at=datetime(2024, 1, 1, 12, 0),
+        read_at=None,
+    )
+
+
+def test_message_reaches_user_on_another_replica():
+    async def run():
+        backplane = InMemoryBackplane()
+        replica_a, replica_b = ChatGateway(backplane), ChatGateway(backplane)
+        await replica_a.start()
+        await replica_b.start()
+
+        alice, bob = FakeSocket(), FakeSocket()
+        await replica_a.connect(1, alice)
+        await replica_b.connect(2, bob)
+
+        assert replica_a.is_online(2) and replica_b.is_online(1)
+
+        await replica_a.publish_friend_message(_friend_message(1, 2))
+        return alice, bob
+
+    alice, bob = asyncio.run(run())
+    assert [event["type"] for event in bob.sent] == ["friend_message"]
+    assert bob.sent[0]["message"]["created_at"] == "2024-01-01T12:00:00"
+    # The sender's other devices see their own message too
+    assert alice.sent == bob.sent
+
+
+def test_typing_and_read_receipts_skip_the_sender():
+    async def run():
+        gateway = ChatGateway(InMemoryBackplane())
+        await gateway.start()
+        sockets = {user_id: FakeSocket() for user_id in (1, 2, 3)}
+        for user_id, socket in sockets.items():
+            await gateway.connect(user_id, socket)
+
+        await gateway.publish_typing(1, [1, 2, 3], squad_id="squad-1")
+        await gateway.publish_read_receipt(2, 1, datetime(2024, 1, 1))
+        return sockets
+
+    sockets = asyncio.run(run())
+    assert sockets[1].sent[0]["type"] == "read_receipt"
+    assert [e["type"] for e in sockets[2].sent] == ["typing", "read_receipt"]
+    assert sockets[3].sent == [{"type": "typing", "user_id": 1, "is_typing": True, "squad_id": "squad-1"}]
+
+
+def test_dead_sockets_are_dropped_and_presence_follows():
+    async def run():
+        backplane = InMemoryBackplane()
+        replica_a, replica_b = ChatGateway(backplane), ChatGateway(backplane)
+        await replica_a.start()
+        await replica_b.start()
+
+        healthy, dead = FakeSocket(), FakeSocket(fail=True)
+        await replica_a.connect(5, healthy)
+        await replica_a.connect(5, dead)
+
+        delivered = await replica_a.deliver_local([5], {"type": "ping"})
+        assert delivered == 1
+        assert replica_a.local_connection_count(5) == 1
+
+        await replica_a.disconnect(5, healthy)
+        assert not replica_a.is_online(5)
+        assert not replica_b.is_online(5)
+
+    asyncio.run(run())
@@ -0,0 +1,62 @@
+"""Tests for the friendship adjacency cache and its cross-replica invalidation."""
+
+import asyncio
+import os
+import sys
+
+# Service modules import each other as top-level packages (functions.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.chat_gateway import ChatGateway, InMemoryBackplane
+from functions.friend_graph import FriendAdjacencyCache, INVALIDATION_TOPIC
+
+
+def test_entries_expire_and_are_capped():
+    cache = FriendAdjacencyCache(ttl_seconds=60, max_users=2)
+    cache.set(1, {2: 10})
+    cache.set(2, {1: 10})
+    assert 2 in cache.get(1)
+
+    # user 1 was just read, so user 2 is the least recently used
+    cache.set(3, {})
+    assert cache.get(2) is None and cache.get(1) == {2: 10}
+
+    cache.ttl_seconds = -1
+    assert cache.get(1) is None
+
+
+def test_invalidation_reaches_other_replicas():
+    async def run():
+        backplane = InMemoryBackplane()
+        gateway_a, gateway_b = ChatGateway(backplane), ChatGateway(backplane)
+        await gateway_a.start()
+        await gateway_b.start()
+
+        cache_a, cache_b = FriendAdjacencyCache(), FriendAdjacencyCache()
+        for gateway, cache in ((gateway_a, cache_a), (gateway_b, cache_b)):
+            gateway.add_invalidation_listener(INVALIDATION_TOPIC, cache.drop)
+        cache_a.broadcast = lambda ids: gateway_a.publish_invalidation(INVALIDATION_TOPIC, ids)
+
+        for cache in (cache_a, cache_b):
+            cache.set(1, {})
+            cache.set(2, {})
+            cache.set(3, {4: 7})
+
+        # A friend request between 1 and 2 is accepted on replica A
+        cache_a.invalidate(1, 2)
+        await asyncio.sleep(0)
+        return cache_a, cache_b
+
+    cache_a, cache_b = asyncio.run(run())
+    for cache in (cache_a, cache_b):
+        assert cache.get(1) is None and cache.get(2) is None
+        assert cache.get(3) == {4: 7}
+
+
+def test_invalidate_outside_event_loop_only_drops_locally():
+    cache = FriendAdjacencyCache()
+    calls = []
+    cache.broadcast = calls.append
+    cache.set(5, {})
+    cache.invalidate(5)
+    assert cache.get(5) is None and calls == []
@@ -0,0 +1,115 @@
+"""Tests for in-memory leaderboards and their cross-replica updates."""
+
+import asyncio
+import json
+import os
+import random
+import sys
+
+# Service modules import each other as top-level packages (functions.*)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.chat_gateway import ChatGateway, InMemoryBackplane
+from common.leaderboard import PostgresLeaderboardChannel
+from functions.leaderboard import LeaderboardRegistry, SortedLeaderboard, UPDATE_TOPIC, resolve_entries
+
+
+def test_ranks_match_a_full_sort_after_random_updates():
+    rng = random.Random(3)
+    board, scores = SortedLeaderboard(), {}
+    for _ in range(2000):
+        member = rng.randrange(300)
+        if rng.random() < 0.1:
+            board.remove(member)
+            scores.pop(member, None)
+        else:
+            score = (rng.randrange(50), rng.random())
+            board.set(member, score)
+            scores[member] = score
+
+    expected = sorted(scores, key=lambda member: (tuple(-v for v in scores[member]), member))
+    assert [member for _, member, _ in board.page(0, len(board))] == expected
+    for position, member in enumerate(expected, start=1):
+        assert board.rank(member) == position
+
+
+def test_pages_and_around_me_windows():
+    board = SortedLeaderboard((user_id, 100 - user_id) for user_id in range(1, 11))
+
+    assert [entry[:2] for entry in board.page(8, 5)] == [(9, 9), (10, 10)]
+    assert [member for _, member, _ in board.around(5, radius=2)] == [3, 4, 5, 6, 7]
+    assert [member for _, member, _ in board.around(1, radius=2)] == [1, 2, 3]
+    assert board.around(42) == [] and board.rank(42) is None
+
+
+def test_registry_loads_once_and_expires():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return [(1, 10), (2, 20)]
+
+    registry = LeaderboardRegistry(ttl_seconds=60)
+    registry.get("league:A", loader)
+    registry.update("league:A", 1, 30)
+    registry.update("league:B", 1, 30)  # not loaded: ignored until first read
+
+    assert registry.get("league:A", loader).rank(1) == 1
+    assert registry.peek("league:B") is None
+    assert len(loads) == 1
+
+    registry.ttl_seconds = -1
+    assert registry.get("league:A", loader).rank(1) == 2
+    assert len(loads) == 2
+
+
+def test_updates_reach_other_replicas():
+    async def run():
+        backplane = InMemoryBackplane()
+        gateway_a, gateway_b = ChatGateway(backplane), ChatGateway(backplane)
+        await gateway_a.start()
+        await gateway_b.start()
+
+        registry_a, registry_b = LeaderboardRegistry(), LeaderboardRegistry()
+        for gateway, registry in ((gateway_a, registry_a), (gateway_b, registry_b)):
+            gateway.add_invalidation_listener(UPDATE_TOPIC, registry.apply)
+            registry.get("squad:S", lambda: [(1, (5,)), (2, (9,))])
+        registry_a.broadcast = lambda updates: gateway_a.publish_invalidation(UPDATE_TOPIC, updates)
+
+        registry_a.update("squad:S", 1, (12,))
+        registry_a.remove("squad:S", 2)
+        await asyncio.sleep(0)
+        return registry_a, registry_b
+
+    registry_a, registry_b = asyncio.run(run())
+    for registry in (registry_a, registry_b):
+        board = registry.peek("squad:S")
+        assert board.rank(1) == 1 and 2 not in board and board.score(1) == (12,)
+
+
+def test_null_score_components_rank_as_zero():
+    board = SortedLeaderboard([(1, (None, 0.5, 3)), (2, (10, None, None)), (3, (None, None, None))])
+    assert board.score(1) == (0, 0.5, 3)
+    assert [member for _, member, _ in board.page()] == [2, 1, 3]
+
+
+def test_pages_stay_full_when_users_are_missing():
+    board = SortedLeaderboard((user_id, 100 - user_id) for user_id in range(1, 11))
+    deleted = {2, 3, 5}
+    lookups = []
+
+    def lookup(user_ids):
+        lookups.append(user_ids)
+        return {user_id: f"user {user_id}" for user_id in user_ids if user_id not in deleted}
+
+    resolved = resolve_entries(board, lambda board: board.page(0, 4), lookup)
+    assert [(entry[:2], name) for entry, name in resolved] == [
+        ((1, 1), "user 1"), ((2, 4), "user 4"), ((3, 6), "user 6"), ((4, 7), "user 7"),
+    ]
+    assert len(board) == 7 and len(lookups) == 3
+
+
+def test_oversized_channel_payload_reloads_boards_instead():
+    updates = [["league:A", member, [member, 0.5, 1]] for member in range(1000)] + [["squad:S", 1, [5]]]
+    assert json.loads(PostgresLeaderboardChannel.encode(updates)) == [["league:A"], ["squad:S"]]
+    assert json.loads(PostgresLeaderboardChannel.encode(updates[:2])) == updates[:2]
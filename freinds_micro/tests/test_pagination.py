@@ -0,0 +1,83 @@
+"""Tests for keyset message pagination helpers."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from freinds_micro.functions.pagination import (
+    InvalidCursorError,
+    approximate_count,
+    conversation_filter,
+    conversation_key,
+    conversation_keys,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+)
+
+Base = declarative_base()
+
+
+class Message(Base):
+    __tablename__ = "messages"
+
+    id = Column(Integer, primary_key=True)
+    conversation_key = Column(String(50))
+    sender_id = Column(Integer)
+    receiver_id = Column(Integer)
+    created_at = Column(DateTime)
+
+
+@pytest.fixture()
+def session():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    start = datetime(2024, 1, 1)
+    # Pairs of messages share a timestamp so the id tie-breaker matters
+    db.add_all(Message(id=i, conversation_key="1:2", created_at=start + timedelta(seconds=i // 2)) for i in range(1, 24))
+    db.add(Message(id=100, conversation_key="3:4", created_at=start))
+    db.commit()
+    yield db
+    db.close()
+
+
+def test_conversation_key_is_direction_independent():
+    assert conversation_key(7, 3) == conversation_key(3, 7) == "3:7"
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    created_at = datetime(2024, 5, 1, 8, 30, 15, 123456)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor")
+
+
+def test_keyset_pages_cover_every_row_once_newest_first(session):
+    query = session.query(Message).filter(Message.conversation_key == "1:2")
+
+    seen, before = [], None
+    while True:
+        rows, before = keyset_page(query, Message.created_at, Message.id, before=before, limit=5)
+        seen.extend(row.id for row in rows)
+        if before is None:
+            break
+
+    assert seen == list(range(23, 0, -1))
+    assert approximate_count(session, query) == 23
+
+
+def test_conversation_filter_matches_unkeyed_rows_until_keys_are_complete(session, monkeypatch):
+    session.add(Message(id=200, sender_id=2, receiver_id=1, created_at=datetime(2024, 1, 2)))
+    session.add(Message(id=201, sender_id=2, receiver_id=3, created_at=datetime(2024, 1, 2)))
+    session.commit()
+
+    def conversation_ids():
+        return {row.id for row in session.query(Message).filter(conversation_filter(Message, 1, 2))}
+
+    monkeypatch.setattr(conversation_keys, "complete", False)
+    assert conversation_ids() == set(range(1, 24)) | {200}
+    monkeypatch.setattr(conversation_keys, "complete", True)
+    assert conversation_ids() == set(range(1, 24))
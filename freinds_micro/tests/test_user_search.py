@@ -0,0 +1,128 @@
+"""Tests for ranked user search and its in-process prefix index."""
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from freinds_micro.functions.user_search import (
+    MIN_FUZZY_LENGTH,
+    TIER_CONTAINS,
+    TIER_PREFIX,
+    PrefixIndexUserSearch,
+    UserSearch,
+    match_tier,
+    rank_users,
+    similarity,
+)
+
+USERS = [
+    {"id": 1, "username": "ann", "fname": "Ann", "lname": "Lee", "avatar": None},
+    {"id": 2, "username": "annabel", "fname": "Annabel", "lname": "Moss", "avatar": None},
+    {"id": 3, "username": "jobanner", "fname": "Jo", "lname": "Banner", "avatar": None},
+    {"id": 4, "username": "hannah", "fname": "Hannah", "lname": "Kim", "avatar": None},
+    {"id": 5, "username": "annette", "fname": "Annette", "lname": "Ray", "avatar": None},
+    {"id": 6, "username": "zed", "fname": "Zed", "lname": "Johnson", "avatar": None},
+]
+
+
+class CountingBackend:
+    def __init__(self, backend):
+        self.backend = backend
+        self.queries = []
+
+    def candidates(self, db, query, limit):
+        self.queries.append(query)
+        return self.backend.candidates(db, query, limit)
+
+
+class SubstringBackend:
+    """Trigram-like candidates: prefix-only below three characters, substrings from three"""
+
+    def __init__(self, users):
+        self.users = users
+        self.queries = []
+
+    @staticmethod
+    def covers_substrings(query):
+        return len(query) >= MIN_FUZZY_LENGTH
+
+    def candidates(self, db, query, limit):
+        self.queries.append(query)
+        lowest = TIER_CONTAINS if self.covers_substrings(query) else TIER_PREFIX
+        return [row for row in self.users if match_tier(row, query)[0] >= lowest][:limit]
+
+
+@pytest.fixture()
+def prefix_index():
+    index = PrefixIndexUserSearch(refresh_seconds=3600)
+    index.load(USERS)
+    return index
+
+
+def test_similarity_matches_pg_trgm():
+    # SELECT similarity('word', 'two words') => 0.363636
+    assert similarity("word", "two words") == pytest.approx(4 / 11)
+    assert similarity("", "anything") == 0.0
+
+
+def test_exact_then_prefix_then_substring_with_friends_of_friends_boost():
+    ranked = rank_users(USERS, "ann", limit=10, friends_of_friends={5}, friend_ids={2})
+    assert [row["id"] for row in ranked] == [1, 5, 2, 4, 3]
+    assert ranked[2]["is_friend"] and ranked[1]["is_friend_of_friend"]
+
+    ranked = rank_users(USERS, "ann", exclude_ids={1})
+    assert 1 not in [row["id"] for row in ranked]
+
+
+def test_prefix_index_finds_prefixes_and_typos_but_not_substrings(prefix_index):
+    assert {row["id"] for row in prefix_index.candidates(None, "ann")} == {1, 2, 5}
+    assert [row["id"] for row in prefix_index.candidates(None, "jonhson")] == [6]
+
+
+def test_typing_burst_narrows_a_complete_cached_prefix(prefix_index):
+    backend = CountingBackend(prefix_index)
+    search = UserSearch(backend, candidate_limit=50)
+
+    search.search(None, "an", limit=2)
+    assert [row["id"] for row in search.search(None, "Ann", limit=2)] == [1, 2]
+    search.search(None, "ann", limit=2)
+
+    assert backend.queries == ["an"]
+    assert search.stats == {"hits": 1, "narrowed": 1, "misses": 1}
+
+
+def test_prefix_only_cached_set_does_not_answer_substring_matches():
+    # "bann" matched "an" through the name Andy; for "ann" it is only a substring match
+    users = USERS + [{"id": 7, "username": "bann", "fname": "Andy", "lname": "Fox", "avatar": None}]
+    backend = SubstringBackend(users)
+    search = UserSearch(backend, candidate_limit=50)
+
+    search.search(None, "an", limit=4)
+    ranked = search.search(None, "ann", limit=4, friends_of_friends={4})
+    # Only three prefix matches were cached, so the substring tier is fetched, fof "hannah" first
+    assert backend.queries == ["an", "ann"]
+    assert [row["id"] for row in ranked] == [1, 2, 5, 4]
+
+    # "ann" covered substrings, so it narrows "anne" without another lookup
+    search.search(None, "anne", limit=1)
+    assert backend.queries == ["an", "ann"]
+
+
+def test_prefix_index_loads_in_the_background(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'users.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE users (id INTEGER PRIMARY KEY, username TEXT, fname TEXT, lname TEXT, "
+            "avatar TEXT, is_active BOOLEAN)"
+        ))
+        for row in USERS:
+            connection.execute(text(
+                "INSERT INTO users VALUES (:id, :username, :fname, :lname, :avatar, 1)"
+            ), row)
+
+    index = PrefixIndexUserSearch(refresh_seconds=3600)
+    with Session(engine) as db:
+        # Before the first load finishes, a plain prefix query answers (no typo tolerance)
+        assert {row["id"] for row in index.candidates(db, "ann")} == {1, 2, 5}
+        index._refresh_thread.join(5)
+        assert [row["id"] for row in index.candidates(db, "jonhson")] == [6]
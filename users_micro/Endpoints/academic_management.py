@@ -1,14 +1,18 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Depends, status, Query, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
 from typing import Annotated, List
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func
 import traceback
+import asyncio
+import json
 import os
 import tempfile
 import time
 
 from db.connection import db_dependency
+from db.database import get_session_local
 from models.study_area_models import (
     Role, School, Subject, Student, Teacher, UserRole, Assignment, Grade,
     StudentImage, StudentPDF, GradingSession
@@ -22,7 +26,7 @@ from schemas.assignments_schemas import (
     AssignmentCreate, AssignmentUpdate, AssignmentResponse, AssignmentWithGrades,
     GradeCreate, GradeUpdate, GradeResponse, StudentGradeReport, SubjectGradesSummary,
     BulkGradeCreate, BulkGradeResponse, GradeCheckResponse, GradeDetailResponse,
-    PostGradesRequest, PostGradesResponse
+    PostGradesRequest, PostGradesResponse, ClassGradingJobCreate
 )
 from Endpoints.auth import get_current_user
 from schemas.direct_join_schemas import SchoolSelectionResponse
@@ -33,6 +37,9 @@ from Endpoints.utils import (
 )
 from services.gemma_services.grading_services import gemma_grading_service
 from services.gemma_services.gemma_services import gemma_service
+from services.school_analytics import school_rollups
+from services.grading_jobs import grading_jobs, GradingWorker, ClaimedItem
+from services.upload_ingest import ingest_upload, PDF_UPLOAD, UploadRejected
 
 router = APIRouter(tags=["Academic Management", "Subjects", "Assignments"])
 
@@ -78,6 +85,7 @@ async def create_subject(
             created_by=current_user["user_id"]
         )
         db.add(db_subject)
+        school_rollups.touch(db, db_subject.school_id)
         db.commit()
         db.refresh(db_subject)
         return db_subject
@@ -541,6 +549,7 @@ async def create_assignment(
             max_points=assignment.max_points
         )
         db.add(db_assignment)
+        school_rollups.touch(db, subject.school_id)
         db.commit()
         db.refresh(db_assignment)
         
@@ -695,6 +704,7 @@ async def update_assignment(
         if assignment_update.is_active is not None:
             assignment.is_active = assignment_update.is_active
         
+        school_rollups.touch_assignment(db, assignment.id)
         db.commit()
         db.refresh(assignment)
         
@@ -745,6 +755,7 @@ async def delete_assignment(
     
     try:
         assignment.is_active = False
+        school_rollups.touch_assignment(db, assignment.id)
         db.commit()
         return {"message": f"Assignment '{assignment.title}' has been deactivated"}
     except Exception as e:
@@ -912,6 +923,7 @@ async def create_grade(
             if hasattr(grade, 'ai_confidence') and hasattr(existing_grade, 'ai_confidence'):
                 existing_grade.ai_confidence = getattr(grade, 'ai_confidence', None)
             
+            school_rollups.touch_assignment(db, grade.assignment_id)
             db.commit()
             db.refresh(existing_grade)
             
@@ -953,6 +965,7 @@ async def create_grade(
                 db_grade.ai_confidence = getattr(grade, 'ai_confidence', None)
                 
             db.add(db_grade)
+            school_rollups.touch_assignment(db, grade.assignment_id)
             db.commit()
             db.refresh(db_grade)
             
@@ -1137,6 +1150,7 @@ async def create_bulk_grades(
                 db.add(new_grade)
                 created_grades.append(new_grade)
         
+        school_rollups.touch_assignment(db, bulk_grades.assignment_id)
         db.commit()
         
         # Refresh all new grades
@@ -1166,7 +1180,8 @@ async def grade_class_assignments(
     """
     Grade assignments for multiple students in a class using Gemma AI.
     Supports chunked execution so callers can continue grading across multiple
-    requests without hitting Lambda timeout limits.
+    requests without hitting Lambda timeout limits. For whole classes prefer
+    POST /grades/grade-class/jobs, which grades in the background.
     """
     try:
         ensure_user_role(db, current_user["user_id"], UserRole.teacher)
@@ -1458,202 +1473,19 @@ async def grade_class_assignments(
                 })
                 continue
 
-            pdf_info = pdfs[0]
-            pdf_binary_data = pdf_info.get("data")
-            pdf_path = pdf_info.get("path", "")
-            temp_pdf_path = None
-
             try:
-                if pdf_binary_data:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-                        temp_pdf.write(bytes(pdf_binary_data))
-                        temp_pdf.flush()
-                        temp_pdf_path = temp_pdf.name
-                    pdf_path_for_grading = temp_pdf_path
-                elif pdf_path:
-                    pdf_path_for_grading = os.path.join(os.getcwd(), pdf_path) if not os.path.isabs(pdf_path) else pdf_path
-                else:
-                    grading_results.append({
-                        "student_id": student_id,
-                        "student_name": student_name,
-                        "score": None,
-                        "points_earned": None,
-                        "max_points": assignment.max_points,
-                        "percentage": None,
-                        "feedback": "No PDF binary data or file path available",
-                        "detailed_feedback": "No PDF binary data or file path available",
-                        "confidence": 0,
-                        "success": False,
-                        "error": "No PDF binary data or file path available"
-                    })
-                    continue
-
-                grading_result = await gemma_grading_service.grade_pdf_with_rubric_paragraphs(
-                    pdf_path=pdf_path_for_grading,
-                    rubric=assignment.rubric or "Standard academic grading criteria",
-                    assignment_title=assignment.title or "Assignment",
-                    max_points=assignment.max_points,
-                    max_images=6,
-                    run_ocr_precheck=False,
-                )
-
-                if not grading_result.get("success", False):
-                    failure_reason = grading_result.get("error", "Gemma grading failed")
-                    grading_results.append({
-                        "student_id": student_id,
-                        "student_name": student_name,
-                        "score": None,
-                        "points_earned": None,
-                        "max_points": assignment.max_points,
-                        "percentage": None,
-                        "feedback": failure_reason,
-                        "detailed_feedback": failure_reason,
-                        "confidence": 0,
-                        "success": False,
-                        "error": failure_reason
-                    })
-                    continue
-
-                points_earned = grading_result.get("total_points", grading_result.get("points_earned", 0))
-
-                percentage = grading_result.get("percentage", 0)
-                criterion_feedback = grading_result.get("criterion_feedback", []) if isinstance(grading_result.get("criterion_feedback"), list) else []
-                overall_conclusion = str(grading_result.get("overall_conclusion", "")).strip()
-
-                feedback = overall_conclusion or "Grading completed with rubric-level feedback."
-                strengths = []
-                improvement_areas = []
-                recommendations = []
-                confidence = grading_result.get("confidence", 80)
-                insufficient_submission_evidence = bool(grading_result.get("insufficient_submission_evidence", False))
-
-                normalized_grading_criteria = []
-                detailed_feedback_parts = []
-                for item in criterion_feedback:
-                    if not isinstance(item, dict):
-                        continue
-                    category = str(item.get("criterion", "")).strip()
-                    paragraph = str(item.get("paragraph", "")).strip()
-                    evidence_snippet = str(item.get("evidence_snippet", "")).strip()
-                    try:
-                        item_score = int(float(item.get("points_awarded", 0)))
-                    except Exception:
-                        item_score = 0
-                    try:
-                        item_max = int(float(item.get("max_points", 0)))
-                    except Exception:
-                        item_max = 0
-
-                    if category:
-                        normalized_grading_criteria.append({
-                            "category": category,
-                            "score": item_score,
-                            "maxScore": item_max,
-                            "feedback": paragraph,
-                            "evidence_snippet": evidence_snippet,
-                            "score_display": item.get("score_display") or (f"{item_score}/{item_max}" if item_max > 0 else str(item_score)),
-                        })
-
-                        score_display = item.get("score_display") or (f"{item_score}/{item_max}" if item_max > 0 else str(item_score))
-                        paragraph_line = f"{category} ({score_display}): {paragraph}".strip()
-                        if evidence_snippet:
-                            paragraph_line += f" Evidence: \"{evidence_snippet}\""
-                        detailed_feedback_parts.append(paragraph_line)
-
-                        if item_max > 0 and item_score < item_max:
-                            improvement_areas.append(f"{category}: strengthen evidence and accuracy for this criterion")
-                        if item_max > 0 and item_score >= item_max:
-                            strengths.append(f"{category}: full points achieved")
-
-                if overall_conclusion:
-                    detailed_feedback_parts.append(f"Overall conclusion: {overall_conclusion}")
-
-                recommendations = [
-                    "Review low-scoring rubric criteria and correct calculation/logic gaps.",
-                    "Show each step clearly to improve rubric evidence and confidence.",
-                ]
-                detailed_feedback = "\n".join([part for part in detailed_feedback_parts if part]).strip()
-                persisted_feedback = detailed_feedback
-                if persisted_feedback:
-                    persisted_feedback = "[RUBRIC_FEEDBACK_V2]\n" + persisted_feedback
-
-                submission_text = grading_result.get("submission_text", "")
-                if isinstance(submission_text, bytes):
-                    submission_text = submission_text.decode("utf-8", errors="replace")
-                elif submission_text is None:
-                    submission_text = ""
-                else:
-                    submission_text = str(submission_text)
-
-                existing_grade = db.query(Grade).filter(
-                    Grade.assignment_id == assignment.id,
-                    Grade.student_id == student_id
-                ).first()
-
-                if existing_grade:
-                    existing_grade.points_earned = points_earned
-                    existing_grade.feedback = persisted_feedback or feedback
-                    existing_grade.teacher_id = teacher.id
-                    existing_grade.graded_date = datetime.utcnow()
-                    existing_grade.ai_generated = True
-                    existing_grade.ai_confidence = confidence
-                else:
-                    new_grade = Grade(
-                        assignment_id=assignment.id,
-                        student_id=student_id,
-                        teacher_id=teacher.id,
-                        points_earned=points_earned,
-                        feedback=persisted_feedback or feedback,
-                        ai_generated=True,
-                        ai_confidence=confidence,
-                    )
-                    db.add(new_grade)
-
-                grading_results.append({
-                    "student_id": student_id,
-                    "student_name": student_name,
-                    "score": points_earned,
-                    "points_earned": points_earned,
-                    "max_points": assignment.max_points,
-                    "percentage": percentage,
-                    "feedback": feedback,
-                    "detailed_feedback": detailed_feedback,
-                    "overall_conclusion": overall_conclusion,
-                    "criterion_feedback": criterion_feedback,
-                    "grading_criteria": normalized_grading_criteria,
-                    "strengths": strengths,
-                    "improvement_areas": improvement_areas,
-                    "recommendations": recommendations,
-                    "extracted_text": submission_text,
-                    "submission_text": submission_text,
-                    "confidence": confidence,
-                    "insufficient_submission_evidence": insufficient_submission_evidence,
-                    "success": True,
-                })
+                grading_results.append(await _grade_student_submission(
+                    db, assignment, teacher.id, student_id, student_name,
+                    pdf_data=pdfs[0].get("data"), pdf_path=pdfs[0].get("path", ""),
+                ))
             except Exception as grade_error:
-                grading_results.append({
-                    "student_id": student_id,
-                    "student_name": student_name,
-                    "score": None,
-                    "points_earned": None,
-                    "max_points": assignment.max_points,
-                    "percentage": None,
-                    "feedback": str(grade_error),
-                    "detailed_feedback": str(grade_error),
-                    "confidence": 0,
-                    "success": False,
-                    "error": str(grade_error),
-                })
+                grading_results.append(_grading_failure(student_id, student_name, assignment.max_points, str(grade_error)))
             finally:
-                if temp_pdf_path:
-                    try:
-                        os.unlink(temp_pdf_path)
-                    except Exception:
-                        pass
                 elapsed = time.perf_counter() - student_started_at
                 print(f"Processed grading attempt for student {student_id} in {elapsed:.2f}s")
 
         try:
+            school_rollups.touch_assignment(db, assignment.id)
             db.commit()
         except Exception as commit_error:
             db.rollback()
@@ -1734,6 +1566,379 @@ async def grade_class_assignments(
     }
 
 
+def _grading_failure(student_id: int, student_name: str, max_points: int, reason: str) -> dict:
+    """Result entry for a student whose work could not be graded"""
+    return {
+        "student_id": student_id,
+        "student_name": student_name,
+        "score": None,
+        "points_earned": None,
+        "max_points": max_points,
+        "percentage": None,
+        "feedback": reason,
+        "detailed_feedback": reason,
+        "confidence": 0,
+        "success": False,
+        "error": reason
+    }
+
+
+def _write_temp_pdf(pdf_data) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
+        temp_pdf.write(bytes(pdf_data))
+        return temp_pdf.name
+
+
+def _save_ai_grade(db: Session, assignment_id: int, student_id: int, teacher_id: int,
+                   points_earned, feedback: str, confidence) -> None:
+    """Create or overwrite the student's AI grade for the assignment (not committed)"""
+    existing_grade = db.query(Grade).filter(
+        Grade.assignment_id == assignment_id,
+        Grade.student_id == student_id
+    ).first()
+
+    if existing_grade:
+        existing_grade.points_earned = points_earned
+        existing_grade.feedback = feedback
+        existing_grade.teacher_id = teacher_id
+        existing_grade.graded_date = datetime.utcnow()
+        existing_grade.ai_generated = True
+        existing_grade.ai_confidence = confidence
+    else:
+        db.add(Grade(
+            assignment_id=assignment_id,
+            student_id=student_id,
+            teacher_id=teacher_id,
+            points_earned=points_earned,
+            feedback=feedback,
+            ai_generated=True,
+            ai_confidence=confidence,
+        ))
+
+
+async def _grade_student_submission(
+    db: Session,
+    assignment: Assignment,
+    teacher_id: int,
+    student_id: int,
+    student_name: str,
+    pdf_data=None,
+    pdf_path: str = ""
+) -> dict:
+    """
+    Grade one student's PDF with Gemma and upsert their Grade (not committed).
+    Returns the grading result entry; model errors propagate to the caller.
+    """
+    temp_pdf_path = None
+    try:
+        if pdf_data:
+            temp_pdf_path = await asyncio.to_thread(_write_temp_pdf, pdf_data)
+            pdf_path_for_grading = temp_pdf_path
+        elif pdf_path:
+            pdf_path_for_grading = os.path.join(os.getcwd(), pdf_path) if not os.path.isabs(pdf_path) else pdf_path
+        else:
+            return _grading_failure(student_id, student_name, assignment.max_points, "No PDF binary data or file path available")
+
+        grading_result = await gemma_grading_service.grade_pdf_with_rubric_paragraphs(
+            pdf_path=pdf_path_for_grading,
+            rubric=assignment.rubric or "Standard academic grading criteria",
+            assignment_title=assignment.title or "Assignment",
+            max_points=assignment.max_points,
+            max_images=6,
+            run_ocr_precheck=False,
+        )
+
+        if not grading_result.get("success", False):
+            failure_reason = grading_result.get("error", "Gemma grading failed")
+            return _grading_failure(student_id, student_name, assignment.max_points, failure_reason)
+
+        points_earned = grading_result.get("total_points", grading_result.get("points_earned", 0))
+
+        percentage = grading_result.get("percentage", 0)
+        criterion_feedback = grading_result.get("criterion_feedback", []) if isinstance(grading_result.get("criterion_feedback"), list) else []
+        overall_conclusion = str(grading_result.get("overall_conclusion", "")).strip()
+
+        feedback = overall_conclusion or "Grading completed with rubric-level feedback."
+        strengths = []
+        improvement_areas = []
+        recommendations = []
+        confidence = grading_result.get("confidence", 80)
+        insufficient_submission_evidence = bool(grading_result.get("insufficient_submission_evidence", False))
+
+        normalized_grading_criteria = []
+        detailed_feedback_parts = []
+        for item in criterion_feedback:
+            if not isinstance(item, dict):
+                continue
+            category = str(item.get("criterion", "")).strip()
+            paragraph = str(item.get("paragraph", "")).strip()
+            evidence_snippet = str(item.get("evidence_snippet", "")).strip()
+            try:
+                item_score = int(float(item.get("points_awarded", 0)))
+            except Exception:
+                item_score = 0
+            try:
+                item_max = int(float(item.get("max_points", 0)))
+            except Exception:
+                item_max = 0
+
+            if category:
+                normalized_grading_criteria.append({
+                    "category": category,
+                    "score": item_score,
+                    "maxScore": item_max,
+                    "feedback": paragraph,
+                    "evidence_snippet": evidence_snippet,
+                    "score_display": item.get("score_display") or (f"{item_score}/{item_max}" if item_max > 0 else str(item_score)),
+                })
+
+                score_display = item.get("score_display") or (f"{item_score}/{item_max}" if item_max > 0 else str(item_score))
+                paragraph_line = f"{category} ({score_display}): {paragraph}".strip()
+                if evidence_snippet:
+                    paragraph_line += f" Evidence: \"{evidence_snippet}\""
+                detailed_feedback_parts.append(paragraph_line)
+
+                if item_max > 0 and item_score < item_max:
+                    improvement_areas.append(f"{category}: strengthen evidence and accuracy for this criterion")
+                if item_max > 0 and item_score >= item_max:
+                    strengths.append(f"{category}: full points achieved")
+
+        if overall_conclusion:
+            detailed_feedback_parts.append(f"Overall conclusion: {overall_conclusion}")
+
+        recommendations = [
+            "Review low-scoring rubric criteria and correct calculation/logic gaps.",
+            "Show each step clearly to improve rubric evidence and confidence.",
+        ]
+        detailed_feedback = "\n".join([part for part in detailed_feedback_parts if part]).strip()
+        persisted_feedback = detailed_feedback
+        if persisted_feedback:
+            persisted_feedback = "[RUBRIC_FEEDBACK_V2]\n" + persisted_feedback
+
+        submission_text = grading_result.get("submission_text", "")
+        if isinstance(submission_text, bytes):
+            submission_text = submission_text.decode("utf-8", errors="replace")
+        elif submission_text is None:
+            submission_text = ""
+        else:
+            submission_text = str(submission_text)
+
+        await asyncio.to_thread(
+            _save_ai_grade, db, assignment.id, student_id, teacher_id,
+            points_earned, persisted_feedback or feedback, confidence,
+        )
+
+        return {
+            "student_id": student_id,
+            "student_name": student_name,
+            "score": points_earned,
+            "points_earned": points_earned,
+            "max_points": assignment.max_points,
+            "percentage": percentage,
+            "feedback": feedback,
+            "detailed_feedback": detailed_feedback,
+            "overall_conclusion": overall_conclusion,
+            "criterion_feedback": criterion_feedback,
+            "grading_criteria": normalized_grading_criteria,
+            "strengths": strengths,
+            "improvement_areas": improvement_areas,
+            "recommendations": recommendations,
+            "extracted_text": submission_text,
+            "submission_text": submission_text,
+            "confidence": confidence,
+            "insufficient_submission_evidence": insufficient_submission_evidence,
+            "success": True,
+        }
+    finally:
+        if temp_pdf_path:
+            try:
+                os.unlink(temp_pdf_path)
+            except Exception:
+                pass
+
+
+# === CLASS GRADING JOBS ===
+
+JOB_EVENTS_POLL_SECONDS = 2.0
+
+
+def _load_job_item(db: Session, item: ClaimedItem):
+    """The assignment, student name and latest PDF (blob included) a claimed item grades"""
+    assignment = db.query(Assignment).filter(Assignment.id == item.assignment_id).first()
+    student = db.query(Student).options(joinedload(Student.user)).filter(Student.id == item.student_id).first()
+    student_name = f"Student {item.student_id}"
+    if student and student.user:
+        student_name = f"{student.user.fname or ''} {student.user.lname or ''}".strip() or student_name
+
+    pdf = None
+    if assignment and item.student_pdf_id:
+        pdf = db.query(StudentPDF).filter(StudentPDF.id == item.student_pdf_id).first()
+    return assignment, student_name, pdf
+
+
+async def _grade_job_item(db: Session, item: ClaimedItem) -> dict:
+    """Grader for the class grading worker: one student, reading only their latest PDF"""
+    # Database work (the PDF blob especially) runs in a thread, off the event loop serving requests
+    assignment, student_name, pdf = await asyncio.to_thread(_load_job_item, db, item)
+    if not assignment:
+        return _grading_failure(item.student_id, student_name, None, "Assignment no longer exists")
+    if not pdf:
+        return _grading_failure(item.student_id, student_name, assignment.max_points,
+                                "No PDF work found - manual grading may be required")
+
+    result = await _grade_student_submission(
+        db, assignment, item.teacher_id, item.student_id, student_name,
+        pdf_data=pdf.pdf_data, pdf_path=pdf.pdf_path or "",
+    )
+    if result.get("success"):
+        await asyncio.to_thread(school_rollups.touch_assignment, db, assignment.id)
+    return result
+
+
+# Started and stopped with the app (see main.py); any number of processes can run one
+grading_worker = GradingWorker(grading_jobs, session_factory=lambda: get_session_local()(), grader=_grade_job_item)
+
+
+def _get_teacher_job(db: Session, user_id: int, job_id: int) -> dict:
+    """A grading job's status, if it belongs to this teacher"""
+    ensure_user_role(db, user_id, UserRole.teacher)
+    teacher = db.query(Teacher).filter(Teacher.user_id == user_id).first()
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+    job = grading_jobs.status(db, job_id)
+    if not job or job["teacher_id"] != teacher.id:
+        raise HTTPException(status_code=404, detail="Grading job not found")
+    return job
+
+
+@router.post("/grades/grade-class/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_class_grading_job(
+    request: ClassGradingJobCreate,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Queue AI grading for a class. Workers grade the students in the background;
+    poll GET /grades/grade-class/jobs/{job_id} or subscribe to its /events stream.
+    """
+    ensure_user_role(db, current_user["user_id"], UserRole.teacher)
+
+    teacher = db.query(Teacher).filter(Teacher.user_id == current_user["user_id"]).first()
+    if not teacher:
+        raise HTTPException(status_code=404, detail="Teacher profile not found")
+
+    subject = db.query(Subject).filter(Subject.id == request.subject_id).first()
+    assignment = db.query(Assignment).filter(Assignment.id == request.assignment_id).first()
+    if not subject or not assignment:
+        raise HTTPException(status_code=404, detail="Subject or assignment not found")
+    if assignment.subject_id != subject.id:
+        raise HTTPException(status_code=400, detail="Assignment does not belong to the selected subject")
+    if subject not in teacher.subjects:
+        raise HTTPException(status_code=403, detail="You are not assigned to this subject")
+
+    # One job per assignment at a time; asking again returns the job in progress
+    active_job_id = grading_jobs.active_job_id(db, assignment.id)
+    if active_job_id:
+        return {**grading_jobs.status(db, active_job_id, include_items=False), "already_queued": True}
+
+    students_query = db.query(Student.id).filter(
+        Student.subjects.any(Subject.id == subject.id),
+        Student.is_active == True
+    )
+    if request.grade_all_students:
+        student_ids = sorted(row.id for row in students_query)
+    else:
+        if not request.student_ids:
+            raise HTTPException(status_code=400, detail="No students selected for grading")
+        enrolled = {row.id for row in students_query.filter(Student.id.in_(request.student_ids))}
+        student_ids = [student_id for student_id in dict.fromkeys(request.student_ids) if student_id in enrolled]
+    if not student_ids:
+        raise HTTPException(status_code=404, detail="No students found for grading")
+
+    # Latest PDF per student, without reading the PDF blobs
+    latest_pdf = {}
+    for pdf in db.query(StudentPDF.id, StudentPDF.student_id, StudentPDF.generated_date).filter(
+        StudentPDF.assignment_id == assignment.id,
+        StudentPDF.student_id.in_(student_ids)
+    ).order_by(StudentPDF.generated_date, StudentPDF.id):
+        latest_pdf[pdf.student_id] = pdf.id
+
+    # A request racing this one may have queued the assignment since the check above
+    job_id, created = grading_jobs.enqueue(
+        db, assignment.id, subject.id, teacher.id,
+        [(student_id, latest_pdf.get(student_id)) for student_id in student_ids]
+    )
+    return {**grading_jobs.status(db, job_id, include_items=False), "already_queued": not created}
+
+
+@router.get("/grades/grade-class/jobs/{job_id}")
+async def get_class_grading_job(
+    job_id: int,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Progress of a class grading job with every student's result so far
+    """
+    return _get_teacher_job(db, current_user["user_id"], job_id)
+
+
+@router.get("/grades/grade-class/jobs/{job_id}/events")
+async def stream_class_grading_job(
+    job_id: int,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Server-sent events: a `progress` event whenever the job's counts change,
+    then `finished` with the full per-student results (status `deleted` if the
+    job disappears while streaming)
+    """
+    _get_teacher_job(db, current_user["user_id"], job_id)
+
+    def poll():
+        poll_db = get_session_local()()
+        try:
+            job = grading_jobs.status(poll_db, job_id, include_items=False)
+            if job and job["finished"]:
+                job = grading_jobs.status(poll_db, job_id)
+            return job
+        finally:
+            poll_db.close()
+
+    async def events():
+        last_counts = None
+        while True:
+            job = await asyncio.to_thread(poll)
+            if job is None:
+                # Deleted while we were streaming
+                yield f"event: finished\ndata: {json.dumps({'job_id': job_id, 'status': 'deleted', 'finished': True})}\n\n"
+                return
+            if job["finished"]:
+                yield f"event: finished\ndata: {json.dumps(job, default=str)}\n\n"
+                return
+            if job["counts"] != last_counts:
+                last_counts = job["counts"]
+                yield f"event: progress\ndata: {json.dumps(job, default=str)}\n\n"
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-store"})
+
+
+@router.delete("/grades/grade-class/jobs/{job_id}")
+async def cancel_class_grading_job(
+    job_id: int,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Cancel a class grading job; students already being graded still finish
+    """
+    _get_teacher_job(db, current_user["user_id"], job_id)
+    grading_jobs.cancel(db, job_id)
+    return grading_jobs.status(db, job_id, include_items=False)
+
+
 @router.post("/grades/post", response_model=PostGradesResponse)
 async def post_grades(
     request: PostGradesRequest,
@@ -1862,14 +2067,13 @@ async def test_gemma_vision_extract(
 
     temp_pdf_path = None
     try:
-        pdf_bytes = await pdf.read()
-        if not pdf_bytes:
-            raise HTTPException(status_code=400, detail="Uploaded PDF is empty")
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(pdf_bytes)
-            temp_pdf.flush()
-            temp_pdf_path = temp_pdf.name
+        try:
+            with await ingest_upload(pdf, PDF_UPLOAD) as upload:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
+                    temp_pdf_path = temp_pdf.name
+                await upload.save_to(temp_pdf_path)
+        except UploadRejected as rejected:
+            raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
 
         extraction_result = await gemma_grading_service.extract_text_from_pdf_with_vision(
             pdf_path=temp_pdf_path,
@@ -1927,14 +2131,13 @@ async def test_gemma_rubric_feedback(
 
     temp_pdf_path = None
     try:
-        pdf_bytes = await pdf.read()
-        if not pdf_bytes:
-            raise HTTPException(status_code=400, detail="Uploaded PDF is empty")
-
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
-            temp_pdf.write(pdf_bytes)
-            temp_pdf.flush()
-            temp_pdf_path = temp_pdf.name
+        try:
+            with await ingest_upload(pdf, PDF_UPLOAD) as upload:
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as temp_pdf:
+                    temp_pdf_path = temp_pdf.name
+                await upload.save_to(temp_pdf_path)
+        except UploadRejected as rejected:
+            raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
 
         feedback_result = await gemma_grading_service.grade_pdf_with_rubric_paragraphs(
             pdf_path=temp_pdf_path,
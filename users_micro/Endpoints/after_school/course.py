@@ -1,6 +1,6 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query, File, UploadFile, Form
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, HTTPException, Depends, status, Query, File, UploadFile, Form, Request
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy.orm import Session, joinedload, defer
 from sqlalchemy import and_, or_, desc, func
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -26,6 +26,10 @@ from schemas.afterschool_schema import (
 )
 from services.gemini_service import gemini_service
 from services.image_service import image_service
+from services.course_catalog import (
+    image_etag, thumbnail_url, adjust_lesson_count
+)
+from services.course_progress import course_progress
 
 router = APIRouter(prefix="/after-school/courses", tags=["After-School Courses"])
 
@@ -43,163 +47,28 @@ async def get_course_progress(
     current_user: dict = user_dependency
 ):
     """
-    Compute and return the student's progress for a course based on mark-done sessions and submissions.
+    Return the student's progress for a course.
+
+    Progress is maintained incrementally by domain events (mark-done, submission
+    graded, assignment passed, course structure edited - see
+    services/course_progress.py), so this is a single indexed row fetch. The
+    first read for a course builds the row from the source tables.
 
-    - Uses StudySession records with status='completed' to count completed blocks/lessons
-    - Calculates totals from CourseBlock and CourseLesson
-    - Derives completion percentage prioritizing block-based structure; falls back to lessons
-    - Aggregates average AI score across processed AISubmissions for the course
-    - Upserts StudentProgress for idempotency and returns the fresh record
+    - Completion combines blocks (lessons for block-less courses) and passed assignments
+    - Average score covers processed AI submissions for the course
     """
     user_id = current_user["user_id"]
 
     # Validate course
-    course = db.query(Course).filter(Course.id == course_id, Course.is_active == True).first()
-    if not course:
+    if not db.query(Course.id).filter(Course.id == course_id, Course.is_active == True).first():
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found")
 
     try:
-        # Totals from structure
-        total_blocks = db.query(CourseBlock).filter(CourseBlock.course_id == course_id, CourseBlock.is_active == True).count()
-        total_lessons = db.query(CourseLesson).filter(CourseLesson.course_id == course_id, CourseLesson.is_active == True).count()
-
-        # Completed via mark-done sessions
-        completed_sessions_q = db.query(StudySession).filter(
-            StudySession.user_id == user_id,
-            StudySession.course_id == course_id,
-            StudySession.status == "completed"
-        )
-        blocks_completed = completed_sessions_q.filter(StudySession.block_id.isnot(None)).count()
-        lessons_completed = completed_sessions_q.filter(StudySession.lesson_id.isnot(None)).count()
-
-        # Average score from processed submissions
-        processed = db.query(AISubmission.ai_score).filter(
-            AISubmission.user_id == user_id,
-            AISubmission.course_id == course_id,
-            AISubmission.ai_score.isnot(None)
-        ).all()
-        avg_score = None
-        if processed:
-            scores = [row[0] for row in processed if row[0] is not None]
-            if scores:
-                avg_score = sum(scores) / len(scores)
-
-        # Sessions count and total study time (legacy minutes if present)
-        all_sessions = db.query(StudySession).filter(
-            StudySession.user_id == user_id,
-            StudySession.course_id == course_id
-        ).all()
-        sessions_count = len(all_sessions)
-        total_study_time = sum([s.duration_minutes or 0 for s in all_sessions])
-
-        # Assignment completion: passed (>=80%) only
-        total_assignments = db.query(CourseAssignment).filter(
-            CourseAssignment.course_id == course_id,
-            CourseAssignment.is_active == True
-        ).count()
-
-        passed_assignments = db.query(StudentAssignment).filter(
-            StudentAssignment.user_id == user_id,
-            StudentAssignment.course_id == course_id,
-            StudentAssignment.status == "passed"
-        ).count()
-
-        assignments_pct = (passed_assignments / total_assignments * 100.0) if total_assignments > 0 else None
-
-        # Completion percentage combines blocks and assignments when both exist
-        completion_percentage = 0.0
-        parts = []
-        if total_blocks > 0:
-            parts.append((blocks_completed / total_blocks) * 100.0)
-        elif total_lessons > 0:
-            parts.append((lessons_completed / total_lessons) * 100.0)
-        if assignments_pct is not None:
-            parts.append(assignments_pct)
-        if parts:
-            completion_percentage = sum(parts) / len(parts)
-
-        # Clamp and round
-        completion_percentage = round(max(0.0, min(100.0, completion_percentage)), 2)
-
-        # Upsert StudentProgress
-        progress = db.query(StudentProgress).filter(
-            StudentProgress.user_id == user_id,
-            StudentProgress.course_id == course_id
-        ).first()
-
-        now = datetime.utcnow()
-        if not progress:
-            progress = StudentProgress(
-                user_id=user_id,
-                course_id=course_id,
-                lessons_completed=lessons_completed,
-                total_lessons=total_lessons,
-                blocks_completed=blocks_completed,
-                total_blocks=total_blocks,
-                completion_percentage=completion_percentage,
-                average_score=avg_score,
-                total_study_time=total_study_time,
-                sessions_count=sessions_count,
-                started_at=now,
-                last_activity=now,
-                completed_at=now if completion_percentage >= 100.0 else None,
-            )
-            db.add(progress)
-        else:
-            progress.lessons_completed = lessons_completed
-            progress.total_lessons = total_lessons
-            progress.blocks_completed = blocks_completed
-            progress.total_blocks = total_blocks
-            progress.completion_percentage = completion_percentage
-            progress.average_score = avg_score
-            progress.total_study_time = total_study_time
-            progress.sessions_count = sessions_count
-            progress.last_activity = now
-            progress.completed_at = progress.completed_at or (now if completion_percentage >= 100.0 else None)
-
-        db.commit()
-        db.refresh(progress)
-
-        # Trigger completion notification if newly completed (100%)
-        if completion_percentage >= 100.0 and not progress.completed_at:
-            # Course is now fully complete, send congratulations notification
-            try:
-                from Endpoints.after_school.notification_scheduler import NotificationScheduler
-                course = db.query(Course).filter(Course.id == course_id).first()
-                if course:
-                    NotificationScheduler.trigger_completion_notification(
-                        user_id=user_id,
-                        course_id=course_id,
-                        course_title=course.title,
-                        completion_type="course"
-                    )
-                    print(f"🎉 Triggered completion notification for user {user_id}, course {course_id}")
-            except Exception as e:
-                print(f"⚠️ Error triggering completion notification: {str(e)}")
-
-        # Build response
-        return StudentProgressOut(
-            id=progress.id,
-            user_id=progress.user_id,
-            course_id=progress.course_id,
-            lessons_completed=progress.lessons_completed,
-            total_lessons=progress.total_lessons,
-            completion_percentage=progress.completion_percentage,
-            blocks_completed=progress.blocks_completed,
-            total_blocks=progress.total_blocks,
-            average_score=progress.average_score,
-            total_study_time=progress.total_study_time,
-            sessions_count=progress.sessions_count,
-            started_at=progress.started_at,
-            last_activity=progress.last_activity,
-            completed_at=progress.completed_at,
-            created_at=progress.created_at,
-            updated_at=progress.updated_at,
-        )
+        return StudentProgressOut(**course_progress.get(db, user_id, course_id))
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to compute course progress: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to load course progress: {e}")
 
 
 @router.get("/assignments/my-assignments", response_model=List[StudentAssignmentOut])
@@ -270,15 +139,21 @@ async def get_course_blocks_progress(
             "blocks": []
         }
 
-    # Completed sessions for user/course
-    completed_sessions = db.query(StudySession).filter(
-        and_(
-            StudySession.user_id == user_id,
-            StudySession.course_id == course_id,
-            StudySession.status == "completed"
-        )
-    ).all()
-    completed_block_ids = {s.block_id for s in completed_sessions if s.block_id}
+    # Completed blocks for user/course: one grouped scan of ix_as_study_sessions_user_course_status
+    completed_at_by_block = dict(
+        db.query(
+            StudySession.block_id,
+            func.min(func.coalesce(StudySession.marked_done_at, StudySession.ended_at))
+        ).filter(
+            and_(
+                StudySession.user_id == user_id,
+                StudySession.course_id == course_id,
+                StudySession.status == "completed",
+                StudySession.block_id.isnot(None)
+            )
+        ).group_by(StudySession.block_id).all()
+    )
+    completed_block_ids = set(completed_at_by_block)
 
     blocks_progress: list[dict] = []
     for i, block in enumerate(blocks):
@@ -301,9 +176,7 @@ async def get_course_blocks_progress(
             "duration_minutes": block.duration_minutes,
             "is_completed": is_completed,
             "is_available": is_available,
-            "completed_at": next(
-                (s.marked_done_at or s.ended_at for s in completed_sessions if s.block_id == block.id), None
-            )
+            "completed_at": completed_at_by_block.get(block.id)
         })
 
     total_blocks = len(blocks)
@@ -736,7 +609,8 @@ async def create_course_with_image(
             age_max=age_max,
             difficulty_level=difficulty_level,
             created_by=user_id,
-            image=compressed_image_bytes  # Store compressed bytes directly
+            image=compressed_image_bytes,  # Store compressed bytes directly
+            image_etag=image_etag(compressed_image_bytes)
         )
         
         db.add(new_course)
@@ -830,6 +704,7 @@ async def update_course_image(
             
             # Update course image
             course.image = compressed_image_bytes
+            course.image_etag = image_etag(compressed_image_bytes)
             course.updated_at = datetime.utcnow()
             
             db.commit()
@@ -884,6 +759,40 @@ async def update_course_image(
         )
 
 
+@router.get("/{course_id}/thumbnail")
+async def get_course_thumbnail(
+    course_id: int,
+    request: Request,
+    db: db_dependency
+):
+    """
+    Course image as a cacheable JPEG
+    
+    Listings link here through ``image_url``, which carries the image hash, so a
+    changed image gets a new URL and the old one can be cached indefinitely.
+    Public so that it can be used directly as an ``<img>`` source; a matching
+    ``If-None-Match`` is answered with 304 without reading the image.
+    """
+    etag = db.query(Course.image_etag).filter(Course.id == course_id).scalar()
+    if etag and request.headers.get("if-none-match") == f'"{etag}"':
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": f'"{etag}"'})
+    
+    row = db.query(Course.image, Course.image_etag).filter(Course.id == course_id).first()
+    if not row or not row.image:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No image for course {course_id}"
+        )
+    
+    return Response(
+        content=row.image,
+        media_type="image/jpeg",
+        headers={
+            "ETag": f'"{row.image_etag or image_etag(row.image)}"',
+            "Cache-Control": "public, max-age=31536000, immutable"
+        }
+    )
+
 @router.post("/", response_model=CourseOut)
 async def create_course(
     course_data: CourseCreate,
@@ -1066,13 +975,15 @@ async def list_courses(
     - Completion rates and user engagement metrics
     - Performance insights for course recommendations
     
-    Returns paginated course list with comprehensive metadata
+    Returns paginated course list with comprehensive metadata. Course images are
+    not inlined; each course carries an ``image_url`` to its cacheable thumbnail.
     """
     user_id = current_user["user_id"]
     
     try:
-        # Start with base query
-        query = db.query(Course)
+        # Catalog read model: counters live on the course row, and the image and
+        # textbook blobs are never loaded for a listing
+        query = db.query(Course).options(defer(Course.image), defer(Course.textbook_content))
         
         # Apply active filter first for performance
         if active_only:
@@ -1129,23 +1040,23 @@ async def list_courses(
         # Courses with lessons filter
         if has_lessons is not None:
             if has_lessons:
-                query = query.join(CourseLesson).filter(CourseLesson.is_active == True)
+                query = query.filter(Course.lesson_count > 0)
             else:
-                # Use left join to find courses without lessons
-                subquery = db.query(CourseLesson.course_id).filter(CourseLesson.is_active == True).subquery()
-                query = query.filter(~Course.id.in_(subquery))
+                query = query.filter(Course.lesson_count == 0)
         
         # Get total count before applying sorting and pagination
         total_count = query.count()
         
-        # Apply sorting
+        # Apply sorting; popularity is the enrollment counter, sorted in SQL before pagination
         valid_sort_fields = ["title", "subject", "created_at", "difficulty_level", "updated_at"]
-        if sort_by in valid_sort_fields:
+        if popular or sort_by == "popularity":
+            query = query.order_by(desc(Course.enrollment_count), desc(Course.id))
+        elif sort_by in valid_sort_fields:
             sort_column = getattr(Course, sort_by)
             if sort_order.lower() == "desc":
-                query = query.order_by(desc(sort_column))
+                query = query.order_by(desc(sort_column), desc(Course.id))
             else:
-                query = query.order_by(sort_column)
+                query = query.order_by(sort_column, Course.id)
         else:
             # Default sorting by creation date (newest first)
             query = query.order_by(desc(Course.created_at))
@@ -1153,59 +1064,32 @@ async def list_courses(
         # Apply pagination
         courses = query.offset(skip).limit(limit).all()
         
-        # Enhanced response with analytics
-        enhanced_courses = []
-        for course in courses:
-            # Get lesson count
-            lesson_count = db.query(CourseLesson).filter(
-                and_(
-                    CourseLesson.course_id == course.id,
-                    CourseLesson.is_active == True
-                )
-            ).count()
-            
-            # Get enrollment count (students who started sessions)
-            enrollment_count = db.query(StudySession.user_id).filter(
-                StudySession.course_id == course.id
-            ).distinct().count()
-            
-            # Encode image to base64 if present
-            image_base64 = image_service.encode_image_to_base64(course.image) if course.image else None
-            
-            # Add metadata to course
-            course_dict = {
-                "id": course.id,
-                "title": course.title,
-                "subject": course.subject,
-                "description": course.description,
-                "age_min": course.age_min,
-                "age_max": course.age_max,
-                "difficulty_level": course.difficulty_level,
-                "created_by": course.created_by,
-                "is_active": course.is_active,
-                "image": image_base64,
-                "total_weeks": course.total_weeks,
-                "blocks_per_week": course.blocks_per_week,
-                "textbook_source": course.textbook_source,
-                "generated_by_ai": course.generated_by_ai,
-                "created_at": course.created_at,
-                "updated_at": course.updated_at,
-                "_stats": {
-                    "lesson_count": lesson_count,
-                    "enrollment_count": enrollment_count,
-                    "has_content": lesson_count > 0
-                }
-            }
-            enhanced_courses.append(course_dict)
-        
-        # Popular courses sorting (if requested)
-        if popular:
-            enhanced_courses.sort(key=lambda x: x["_stats"]["enrollment_count"], reverse=True)
-        
         print(f"📚 Course list retrieved: {len(courses)} courses (total: {total_count}) for user {user_id}")
         
         return CourseListResponse(
-            courses=[Course(**{k: v for k, v in course.items() if k != "_stats"}) for course in enhanced_courses],
+            courses=[
+                CourseOut(
+                    id=course.id,
+                    title=course.title,
+                    subject=course.subject,
+                    description=course.description,
+                    age_min=course.age_min,
+                    age_max=course.age_max,
+                    difficulty_level=course.difficulty_level,
+                    created_by=course.created_by,
+                    is_active=course.is_active,
+                    image_url=thumbnail_url(course.id, course.image_etag),
+                    total_weeks=course.total_weeks,
+                    blocks_per_week=course.blocks_per_week,
+                    textbook_source=course.textbook_source,
+                    generated_by_ai=course.generated_by_ai,
+                    lesson_count=course.lesson_count or 0,
+                    enrollment_count=course.enrollment_count or 0,
+                    created_at=course.created_at,
+                    updated_at=course.updated_at
+                )
+                for course in courses
+            ],
             total=total_count
         )
         
@@ -1343,26 +1227,8 @@ async def enroll_in_course(
             db.add(student_assignment)
             created_assignments.append(student_assignment)
         
-        # Create initial progress record only if one doesn't already exist
-        existing_progress = db.query(StudentProgress).filter(
-            and_(StudentProgress.user_id == user_id, StudentProgress.course_id == course_id)
-        ).first()
-        if not existing_progress:
-            total_blocks = len(course.blocks)
-            # Fallback to lessons if no blocks present (legacy courses)
-            total_lessons = db.query(CourseLesson).filter(
-                and_(CourseLesson.course_id == course_id, CourseLesson.is_active == True)
-            ).count() if total_blocks == 0 else 0
-            total_content = total_blocks if total_blocks > 0 else total_lessons
-            progress = StudentProgress(
-                user_id=user_id,
-                course_id=course_id,
-                total_lessons=total_content,
-                sessions_count=0,
-                started_at=enrollment_date,
-                last_activity=enrollment_date
-            )
-            db.add(progress)
+        # Create (or refresh) the progress record with totals from the course structure
+        course_progress.rebuild(db, user_id, course_id)
         try:
             db.commit()
         except Exception as commit_err:
@@ -2190,7 +2056,11 @@ async def submit_assignment_and_auto_grade(
         student_assignment.grade = grade_result["percentage"]
         student_assignment.feedback = grade_result.get("detailed_feedback", "")
         student_assignment.submitted_at = datetime.utcnow()
+        previous_status = student_assignment.status
         student_assignment.status = "graded"
+        course_progress.assignment_status_changed(
+            db, student_assignment.user_id, student_assignment.course_id, previous_status, student_assignment.status
+        )
         
         if student_pdf:
             student_assignment.submission_file_path = student_pdf.pdf_path
@@ -2575,6 +2445,8 @@ async def delete_course_with_safety_checks(
             CourseLesson.is_active: False,
             CourseLesson.updated_at: datetime.utcnow()
         })
+        course.lesson_count = 0
+        course_progress.structure_changed(db, course_id)
         
         db.commit()
         
@@ -2633,6 +2505,8 @@ async def create_lesson(
     )
     
     db.add(new_lesson)
+    adjust_lesson_count(db, course_id, 1)
+    course_progress.structure_changed(db, course_id)
     db.commit()
     db.refresh(new_lesson)
     
@@ -2717,11 +2591,15 @@ async def update_lesson(
         )
     
     # Update fields if provided
+    was_active = bool(lesson.is_active)
     update_data = lesson_data.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(lesson, field, value)
     
     lesson.updated_at = datetime.utcnow()
+    adjust_lesson_count(db, course_id, int(bool(lesson.is_active)) - int(was_active))
+    if bool(lesson.is_active) != was_active:
+        course_progress.structure_changed(db, course_id)
     
     db.commit()
     db.refresh(lesson)
@@ -2754,8 +2632,11 @@ async def delete_lesson(
         )
     
     # Soft delete
+    if lesson.is_active:
+        adjust_lesson_count(db, course_id, -1)
     lesson.is_active = False
     lesson.updated_at = datetime.utcnow()
+    course_progress.structure_changed(db, course_id)
     
     db.commit()
     
@@ -19,6 +19,8 @@ from schemas.afterschool_schema import (
     CourseBlockOut, CourseAssignmentOut, StudentAssignmentOut
 )
 from services.gemini_service import gemini_service
+from services.course_catalog import record_study_session
+from services.course_progress import course_progress
 
 logger = logging.getLogger(__name__)
 
@@ -179,59 +181,34 @@ async def mark_block_done(
         )
         db.add(completed_session)
         db.flush()  # Get session ID
+        record_study_session(db, session_data.course_id, user_id, completed_session.id)
 
-        # Update or create student progress
-        progress = db.query(StudentProgress).filter(
-            and_(
-                StudentProgress.user_id == user_id,
-                StudentProgress.course_id == session_data.course_id
-            )
-        ).first()
-
-        if not progress:
-            # Count total content items for this course
-            total_lessons = db.query(CourseLesson).filter(
-                and_(CourseLesson.course_id == session_data.course_id, CourseLesson.is_active == True)
-            ).count()
-            total_blocks = db.query(CourseBlock).filter(
-                and_(CourseBlock.course_id == session_data.course_id, CourseBlock.is_active == True)
-            ).count()
-            
-            progress = StudentProgress(
-                user_id=user_id,
-                course_id=session_data.course_id,
-                total_lessons=total_blocks if total_blocks > 0 else total_lessons,
-                blocks_completed=1 if session_data.block_id else 0,
-                lessons_completed=1 if session_data.lesson_id else 0,
-                completion_percentage=0.0,
-                sessions_count=1,
-                total_study_time=0,
-                started_at=datetime.utcnow(),
-                last_activity=datetime.utcnow()
-            )
-            db.add(progress)
-        else:
-            # Update progress - increment completed count
-            if session_data.block_id:
-                progress.blocks_completed += 1
-            else:
-                progress.lessons_completed += 1
-                
-            progress.sessions_count += 1
-            progress.last_activity = datetime.utcnow()
-            
-        # Recalculate completion percentage
-        if progress.total_lessons > 0:
-            completed_count = progress.blocks_completed if session_data.block_id else progress.lessons_completed
-            progress.completion_percentage = (completed_count / progress.total_lessons) * 100
-            
-        # Check if course is complete
-        if progress.completion_percentage >= 100:
-            progress.completed_at = datetime.utcnow()
+        # Progress is maintained by events (services/course_progress.py)
+        course_completed = course_progress.session_completed(
+            db,
+            user_id,
+            session_data.course_id,
+            block_id=session_data.block_id,
+            lesson_id=session_data.lesson_id
+        )
 
         db.commit()
         db.refresh(completed_session)
 
+        if course_completed:
+            try:
+                from Endpoints.after_school.notification_scheduler import NotificationScheduler
+                course = db.query(Course).filter(Course.id == session_data.course_id).first()
+                if course:
+                    NotificationScheduler.trigger_completion_notification(
+                        user_id=user_id,
+                        course_id=course.id,
+                        course_title=course.title,
+                        completion_type="course"
+                    )
+            except Exception as e:
+                logger.warning(f"Error triggering completion notification: {str(e)}")
+
         target_info = lesson.title if lesson else (f"Block {block.week}.{block.block_number}: {block.title}" if block else "Unknown")
         logger.info("Marked content done", extra={
             "user_id": user_id,
@@ -545,39 +522,14 @@ async def get_course_progress(
 ):
     """Return (or create if absent) the user's progress for a course.
 
-    If progress does not exist yet we seed a minimal record so frontend never
-    has to treat 404 specially.
+    If progress does not exist yet it is built from the student's sessions,
+    submissions and assignments so frontend never has to treat 404 specially.
     """
     user_id = current_user["user_id"]
-    progress = db.query(StudentProgress).filter(
-        and_(StudentProgress.user_id == user_id, StudentProgress.course_id == course_id)
-    ).first()
-    if not progress:
-        # Ensure course exists to avoid orphan progress
-        if not db.query(Course.id).filter(Course.id == course_id).first():
-            raise HTTPException(status_code=404, detail="Course not found")
-        # Compute total lessons/blocks for initial denominator
-        total_lessons = db.query(CourseLesson).filter(
-            and_(CourseLesson.course_id == course_id, CourseLesson.is_active == True)
-        ).count()
-        total_blocks = db.query(CourseBlock).filter(
-            and_(CourseBlock.course_id == course_id, CourseBlock.is_active == True)
-        ).count()
-        total_content = total_blocks if total_blocks > 0 else total_lessons
-        progress = StudentProgress(
-            user_id=user_id,
-            course_id=course_id,
-            total_lessons=total_content,
-            lessons_completed=0,
-            completion_percentage=0.0,
-            sessions_count=0,
-            total_study_time=0,
-            last_activity=datetime.utcnow()
-        )
-        db.add(progress)
-        db.commit()
-        db.refresh(progress)
-    return progress
+    # Ensure course exists to avoid orphan progress
+    if not db.query(Course.id).filter(Course.id == course_id).first():
+        raise HTTPException(status_code=404, detail="Course not found")
+    return StudentProgressOut(**course_progress.get(db, user_id, course_id))
 
 @router.get("/{session_id}", response_model=StudySessionOut)
 async def get_session_details(
@@ -1078,6 +1030,7 @@ async def grade_course_submissions(
                     # Update the AI submission with Gemini results
                     submission = db.query(AISubmission).filter(AISubmission.id == submission_id).first()
                     if submission:
+                        previous_score = submission.ai_score
                         submission.ai_processed = True
                         submission.ai_score = extracted_score
                         submission.ai_feedback = extracted_feedback
@@ -1085,6 +1038,9 @@ async def grade_course_submissions(
                         submission.ai_strengths = None  # Not using normalized fields
                         submission.ai_improvements = None  # Not using normalized fields
                         submission.processed_at = datetime.utcnow()
+                        course_progress.submission_scored(
+                            db, submission.user_id, submission.course_id, previous_score, extracted_score
+                        )
                         
                         # Update the associated study session
                         if submission.session_id:
@@ -1108,8 +1064,13 @@ async def grade_course_submissions(
                                 student_assignment.ai_grade = extracted_score
                                 student_assignment.grade = extracted_score  # AI grade is the final grade
                                 student_assignment.feedback = extracted_feedback
+                                previous_status = student_assignment.status
                                 student_assignment.status = "graded"
                                 student_assignment.updated_at = datetime.utcnow()
+                                course_progress.assignment_status_changed(
+                                    db, student_assignment.user_id, student_assignment.course_id,
+                                    previous_status, student_assignment.status
+                                )
                                 logger.info(
                                     "Student assignment updated with AI grade",
                                     extra={
@@ -1726,6 +1687,7 @@ async def auto_grade_assignment_submission(
         student_assignment.updated_at = current_time
 
         passing_grade = (ai_score or 0) >= 80.0
+        previous_status = student_assignment.status
 
         if passing_grade:
             student_assignment.status = "passed"
@@ -1752,6 +1714,7 @@ async def auto_grade_assignment_submission(
                         f"{remaining_attempts} attempts remaining today."
                     )
 
+        previous_score = ai_submission.ai_score
         ai_submission.ai_processed = True
         ai_submission.ai_score = ai_score
         ai_submission.ai_feedback = ai_feedback
@@ -1760,6 +1723,11 @@ async def auto_grade_assignment_submission(
         ai_submission.ai_corrections = None  # Not using normalized fields
         ai_submission.processed_at = datetime.utcnow()
 
+        course_progress.submission_scored(db, user_id, ai_submission.course_id, previous_score, ai_score)
+        course_progress.assignment_status_changed(
+            db, user_id, student_assignment.course_id, previous_status, student_assignment.status
+        )
+
         db.commit()
 
         logger.info(
@@ -2247,6 +2215,7 @@ async def process_submission_with_gemini_ai(
         ai_score = extracted_score
         ai_feedback = extracted_feedback
 
+        previous_score = submission.ai_score
         submission.ai_processed = True
         submission.ai_score = ai_score
         submission.ai_feedback = ai_feedback
@@ -2254,6 +2223,7 @@ async def process_submission_with_gemini_ai(
         submission.ai_improvements = None  # Not using normalized fields
         submission.ai_corrections = None  # Not using normalized fields
         submission.processed_at = datetime.utcnow()
+        course_progress.submission_scored(db, submission.user_id, submission.course_id, previous_score, ai_score)
 
         if submission.session_id:
             session = db.query(StudySession).filter(StudySession.id == submission.session_id).first()
@@ -2275,8 +2245,13 @@ async def process_submission_with_gemini_ai(
                 student_assignment.ai_grade = ai_score
                 student_assignment.grade = ai_score
                 student_assignment.feedback = ai_feedback
+                previous_status = student_assignment.status
                 student_assignment.status = "graded"
                 student_assignment.updated_at = datetime.utcnow()
+                course_progress.assignment_status_changed(
+                    db, student_assignment.user_id, student_assignment.course_id,
+                    previous_status, student_assignment.status
+                )
 
         db.commit()
 
@@ -203,6 +203,86 @@ class NotificationScheduler:
             db.close()
 
 
+def reconcile_student_progress():
+    """
+    Nightly job: verify event-maintained StudentProgress against the source
+    tables and repair any rows that drifted (see services/course_progress.py)
+    """
+    from services.course_progress import course_progress
+    
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        mismatches = course_progress.reconcile(db, repair=True)
+        if mismatches:
+            print(f"⚠️ [PROGRESS RECONCILE] Repaired {len(mismatches)} drifted progress rows")
+        else:
+            print("✅ [PROGRESS RECONCILE] All progress rows match")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ [PROGRESS RECONCILE] Failed: {str(e)}")
+    finally:
+        db.close()
+
+
+def refresh_school_rollups():
+    """
+    Frequent job: recompute the analytics rollups of schools whose data
+    changed since their last refresh (see services/school_analytics.py)
+    """
+    from services.school_analytics import school_rollups
+    
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        refreshed = school_rollups.refresh_dirty(db)
+        if refreshed:
+            print(f"✅ [SCHOOL ROLLUPS] Refreshed {refreshed} schools")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ [SCHOOL ROLLUPS] Refresh failed: {str(e)}")
+    finally:
+        db.close()
+
+
+def compact_school_rollups():
+    """
+    Nightly job: recompute every school's rollup and thin out old daily rows
+    """
+    from services.school_analytics import school_rollups
+    
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        result = school_rollups.compact(db)
+        print(f"✅ [SCHOOL ROLLUPS] Recomputed {result['schools_refreshed']} schools, "
+              f"compacted {result['days_compacted']} old daily rows")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ [SCHOOL ROLLUPS] Compaction failed: {str(e)}")
+    finally:
+        db.close()
+
+
+def refresh_course_counters():
+    """
+    Nightly job: resync course enrollments and recompute the course lesson and
+    enrollment counters (see services/course_catalog.py)
+    """
+    from services.course_catalog import refresh_course_counters as refresh_counters
+    
+    SessionLocal = get_session_local()
+    db = SessionLocal()
+    try:
+        updated = refresh_counters(db)
+        print(f"✅ [COURSE COUNTERS] Recomputed counters for {updated} courses")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ [COURSE COUNTERS] Refresh failed: {str(e)}")
+    finally:
+        db.close()
+
+
 # ===============================
 # APSCHEDULER INTEGRATION EXAMPLE
 # ===============================
@@ -223,6 +303,7 @@ def setup_notification_scheduler():
         # APScheduler imports - Pylance may flag these but they work at runtime
         from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
         from apscheduler.triggers.cron import CronTrigger  # type: ignore
+        from apscheduler.triggers.interval import IntervalTrigger  # type: ignore
         
         scheduler = BackgroundScheduler()
         
@@ -246,6 +327,47 @@ def setup_notification_scheduler():
             misfire_grace_time=600
         )
         
+        # Progress reconciliation: Every day at 3:00 AM
+        scheduler.add_job(
+            reconcile_student_progress,
+            trigger=CronTrigger(hour=3, minute=0),
+            id="reconcile_student_progress",
+            name="Reconcile student progress counters",
+            replace_existing=True,
+            misfire_grace_time=3600
+        )
+        
+        # School analytics: refresh changed schools every 5 minutes
+        scheduler.add_job(
+            refresh_school_rollups,
+            trigger=IntervalTrigger(minutes=5),
+            id="refresh_school_rollups",
+            name="Refresh changed school analytics rollups",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+        
+        # School analytics: full recompute and compaction every day at 2:30 AM
+        scheduler.add_job(
+            compact_school_rollups,
+            trigger=CronTrigger(hour=2, minute=30),
+            id="compact_school_rollups",
+            name="Recompute and compact school analytics rollups",
+            replace_existing=True,
+            misfire_grace_time=3600
+        )
+        
+        # Course counters: resync enrollments and recount every day at 3:30 AM
+        scheduler.add_job(
+            refresh_course_counters,
+            trigger=CronTrigger(hour=3, minute=30),
+            id="refresh_course_counters",
+            name="Recompute course lesson and enrollment counters",
+            replace_existing=True,
+            misfire_grace_time=3600
+        )
+        
         scheduler.start()
         print("✅ Notification scheduler initialized and running")
         return scheduler
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, status, Query, File, UploadFile, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import APIRouter, HTTPException, Depends, status, Query, File, UploadFile, Form, BackgroundTasks, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_, desc, func
 from typing import List, Optional, Dict, Any
@@ -29,6 +29,7 @@ from schemas.reading_assistant_schemas import (
 from services.reading_assistant_service import reading_assistant_service
 from services.gemini_service import gemini_service
 from services.tts_service import tts_service
+from services.upload_ingest import ingest_upload, AUDIO_UPLOAD, UploadRejected
 
 router = APIRouter(prefix="/after-school/reading-assistant", tags=["Reading Assistant"])
 
@@ -43,6 +44,7 @@ user_dependency = Depends(get_current_user)
 async def create_reading_content(
     content_data: ReadingContentCreate,
     db: db_dependency,
+    background_tasks: BackgroundTasks,
     current_user: dict = user_dependency
 ):
     """Create new reading content manually"""
@@ -69,6 +71,10 @@ async def create_reading_content(
         db.add(new_content)
         db.commit()
         db.refresh(new_content)
+        reading_assistant_service.invalidate_recommendation_index()
+        
+        # Synthesize vocabulary pronunciations before students ask for them
+        background_tasks.add_task(tts_service.prewarm_words, list((new_content.vocabulary_words or {}).keys()))
         
         return new_content
         
@@ -83,6 +89,7 @@ async def create_reading_content(
 async def generate_reading_content(
     request: GenerateContentRequest,
     db: db_dependency,
+    background_tasks: BackgroundTasks,
     current_user: dict = user_dependency
 ):
     """Generate reading content using AI"""
@@ -120,6 +127,9 @@ async def generate_reading_content(
         db.add(new_content)
         db.commit()
         db.refresh(new_content)
+        reading_assistant_service.invalidate_recommendation_index()
+        
+        background_tasks.add_task(tts_service.prewarm_words, list((new_content.vocabulary_words or {}).keys()))
         
         return new_content
         
@@ -370,20 +380,16 @@ async def upload_reading_audio(
                 detail="Reading content not found"
             )
         
-        # Validate audio file
-        if not audio_file.content_type or not audio_file.content_type.startswith('audio/'):
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid audio file type"
-            )
-        
-        # Save audio file temporarily
+        # Validate audio file while streaming it to a temporary file
         temp_dir = tempfile.mkdtemp()
         audio_filename = f"reading_audio_{session_id}_{attempt_number}_{uuid.uuid4().hex}.wav"
         audio_path = os.path.join(temp_dir, audio_filename)
         
-        with open(audio_path, "wb") as f:
-            f.write(await audio_file.read())
+        try:
+            with await ingest_upload(audio_file, AUDIO_UPLOAD) as upload:
+                await upload.save_to(audio_path)
+        except UploadRejected as rejected:
+            raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
         
         # Create attempt record
         attempt = ReadingAttempt(
@@ -438,6 +444,13 @@ async def upload_reading_audio(
         db.add(feedback)
         db.commit()
         
+        # Mark the content as seen and refresh struggle areas for recommendations
+        reading_assistant_service.record_reading_attempt(
+            student_id=current_user["user_id"],
+            content_id=content_id,
+            db=db
+        )
+        
         # Get recommendations for next content
         recommended_content = await reading_assistant_service.get_recommended_content(
             student_id=current_user["user_id"],
@@ -508,6 +521,9 @@ async def upload_reading_audio(
             pronunciation_urls=pronunciation_urls  # Add pronunciation URLs
         )
         
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         raise HTTPException(
@@ -886,16 +902,59 @@ async def get_sentence_pronunciation(
             detail=f"Error generating sentence pronunciation: {str(e)}"
         )
 
+@router.get("/pronunciation/stream")
+async def stream_pronunciation(
+    text: str = Query(..., description="Text to speak"),
+    voice: Optional[str] = Query(None, description="Kokoro voice id"),
+    speed: float = Query(1.0, description="Speech speed (0.5 - 1.5)"),
+    current_user: dict = user_dependency
+):
+    """Stream pronunciation audio sentence by sentence as it is synthesized"""
+    
+    kokoro = tts_service.kokoro_engine
+    if kokoro is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Streaming TTS is not available on this server"
+        )
+    
+    try:
+        media_type, cache_hit, chunks = await kokoro.open_stream(text=text, voice=voice, speed=speed)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"X-TTS-Cache": "hit" if cache_hit else "miss", "Cache-Control": "no-store"}
+    )
+
 @router.get("/pronunciation-audio/{filename}")
-async def serve_pronunciation_audio(filename: str):
+async def serve_pronunciation_audio(filename: str, request: Request):
     """Serve generated pronunciation audio files"""
     
     try:
+        # Content-addressed cache entries are immutable, so the cache key doubles as the ETag
+        cached = tts_service.resolve_audio_file(filename)
+        if cached:
+            cache_headers = {
+                "ETag": cached.etag,
+                "Cache-Control": "public, max-age=31536000, immutable"
+            }
+            if request.headers.get("if-none-match") == cached.etag:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+            return FileResponse(
+                path=str(cached.path),
+                media_type=cached.media_type,
+                filename=filename,
+                headers=cache_headers
+            )
+        
         print(f"🔊 Serving audio file: {filename}")
         
         # Construct file path
-        audio_dir = Path(tempfile.gettempdir()) / "reading_assistant_tts"
-        file_path = audio_dir / filename
+        audio_dir = tts_service.output_dir
+        file_path = audio_dir / Path(filename).name
         
         print(f"📁 Looking for file at: {file_path}")
         print(f"📁 File exists: {file_path.exists()}")
@@ -928,6 +987,8 @@ async def serve_pronunciation_audio(filename: str):
         # Determine media type based on file extension
         if filename.endswith('.mp3'):
             media_type = "audio/mpeg"
+        elif filename.endswith('.ogg'):
+            media_type = "audio/ogg"
         elif filename.endswith('.wav'):
             media_type = "audio/wav"
         elif filename.endswith('.m4a'):
@@ -974,29 +1035,39 @@ async def get_feedback_words_pronunciation(
                 detail="Words list is required"
             )
         
-        pronunciation_results = []
+        requested = [
+            {
+                "word": word_data.get("word", ""),
+                "target_word": word_data.get("target_word", word_data.get("word", "")),
+                "phonetic_tip": word_data.get("phonetic_tip", "")
+            }
+            for word_data in words_to_correct
+            if word_data.get("word", "")
+        ]
         
-        for word_data in words_to_correct:
-            word = word_data.get("word", "")
-            target_word = word_data.get("target_word", word)
-            phonetic_tip = word_data.get("phonetic_tip", "")
-            
-            if word:
-                # Generate pronunciation for the target (correct) word
-                result = await tts_service.generate_word_pronunciation(
-                    word=target_word,
-                    phonetic_hint=phonetic_tip,
-                    context=f"The correct pronunciation of {word}"
-                )
-                
-                pronunciation_results.append({
-                    "original_word": word,
-                    "target_word": target_word,
-                    "audio_url": result["audio_url"],
-                    "duration_seconds": result["duration_seconds"],
-                    "phonetic_tip": phonetic_tip,
-                    "success": result["success"]
-                })
+        # Generate pronunciation for the target (correct) words in one batch
+        results = await tts_service.generate_word_pronunciations_batch([
+            {
+                "word": item["target_word"],
+                "phonetic_hint": item["phonetic_tip"],
+                "context": f"The correct pronunciation of {item['word']}"
+            }
+            for item in requested
+        ])
+        
+        pronunciation_results = [
+            {
+                "original_word": item["word"],
+                "target_word": item["target_word"],
+                "audio_url": result["audio_url"],
+                "duration_seconds": result["duration_seconds"],
+                "phonetic_tip": item["phonetic_tip"],
+                "voice": result.get("voice"),
+                "provider": result.get("provider"),
+                "success": result["success"]
+            }
+            for item, result in zip(requested, results)
+        ]
         
         return {
             "success": True,
@@ -1071,6 +1142,7 @@ async def health_check():
 @router.post("/admin/populate-reading-content")
 async def populate_reading_content_endpoint(
     db: db_dependency,
+    background_tasks: BackgroundTasks,
     clear_existing: bool = Query(False, description="Delete all existing content before populating")
 ) -> Dict[str, Any]:
     """
@@ -1089,11 +1161,13 @@ async def populate_reading_content_endpoint(
         if clear_existing:
             deleted_count = db.query(ReadingContent).delete()
             db.commit()
+            reading_assistant_service.invalidate_recommendation_index()
             print(f"🗑️  Deleted {deleted_count} existing content items")
         
         content_count = 0
         added_titles = []
         skipped_titles = []
+        vocabulary_to_prewarm = []
         
         for reading_level, difficulty_dict in ENHANCED_CONTENT.items():
             for difficulty_level, content_list in difficulty_dict.items():
@@ -1152,8 +1226,13 @@ async def populate_reading_content_endpoint(
                     db.add(new_content)
                     content_count += 1
                     added_titles.append(content_data["title"])
+                    vocabulary_to_prewarm.extend((content_data["vocabulary_words"] or {}).keys())
         
         db.commit()
+        reading_assistant_service.invalidate_recommendation_index()
+        
+        if vocabulary_to_prewarm:
+            background_tasks.add_task(tts_service.prewarm_words, vocabulary_to_prewarm)
         
         # Get summary by level
         summary = {}
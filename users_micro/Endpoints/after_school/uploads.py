@@ -24,6 +24,8 @@ from schemas.afterschool_schema import (
     AISubmissionCreate, AISubmissionOut, AIGradingResponse, MessageResponse
 )
 from services.gemini_service import gemini_service
+from services.course_progress import course_progress
+from services.upload_ingest import ingest_upload, IMAGE_UPLOAD, UploadLimits, UploadRejected
 import base64
 router = APIRouter(prefix="/after-school/uploads", tags=["After-School File Uploads"])
 legacy_router = APIRouter(prefix="/after-school", tags=["After-School File Uploads"])
@@ -36,6 +38,7 @@ user_dependency = Depends(get_current_user)
 # Configuration
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".pdf", ".txt", ".doc", ".docx"}
+UPLOAD_LIMITS = UploadLimits(kind="file", max_bytes=MAX_FILE_SIZE, extensions=frozenset(ALLOWED_EXTENSIONS))
 UPLOAD_DIR = Path("/tmp/uploads/after_school")
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -67,11 +70,10 @@ def generate_unique_filename(original_filename: str, user_id: int, session_id: i
     return unique_name
 
 async def save_uploaded_file(file: UploadFile, file_path: Path) -> bool:
-    """Save uploaded file to specified path"""
+    """Stream uploaded file to specified path"""
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
-            await f.write(content)
+        with await ingest_upload(file, UPLOAD_LIMITS) as upload:
+            await upload.save_to(file_path)
         return True
     except Exception as e:
         print(f"Error saving file: {e}")
@@ -384,9 +386,11 @@ async def bulk_upload_images_to_pdf_session(
             try:
                 if hasattr(f.file, 'seek') and f.file.seekable():
                     f.file.seek(0)
-                img_bytes = await f.read()
-                image_files_data.append(img_bytes)
+                with await ingest_upload(f, IMAGE_UPLOAD) as upload:
+                    image_files_data.append(upload.read())
                 image_filenames.append(f.filename)
+            except UploadRejected as rejected:
+                raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
             except Exception as read_err:
                 raise HTTPException(status_code=500, detail=f"Failed to read image file {f.filename}: {read_err}")
         
@@ -591,6 +595,7 @@ async def bulk_upload_images_to_pdf_session(
             # Update database with extracted values (for legacy compatibility and search)
             # Add retry logic for database connection failures
             max_db_retries = 3
+            previous_score = submission.ai_score
             for retry_attempt in range(max_db_retries):
                 try:
                     submission.ai_processed = True
@@ -600,6 +605,9 @@ async def bulk_upload_images_to_pdf_session(
                     submission.ai_improvements = extracted_improvements
                     submission.ai_corrections = extracted_corrections
                     submission.processed_at = datetime.utcnow()
+                    course_progress.submission_scored(
+                        db, submission.user_id, submission.course_id, previous_score, extracted_score
+                    )
                     db.commit()
                     print(f"✅ Database updated successfully (attempt {retry_attempt + 1})")
                     break
@@ -652,7 +660,11 @@ async def bulk_upload_images_to_pdf_session(
                 # Set grade from extracted score
                 student_assignment.ai_grade = float(extracted_score)
                 student_assignment.grade = float(extracted_score)
+                previous_status = student_assignment.status
                 student_assignment.status = "graded"
+                course_progress.assignment_status_changed(
+                    db, user_id, student_assignment.course_id, previous_status, student_assignment.status
+                )
 
                 # Feedback if available
                 if extracted_feedback:
@@ -1084,10 +1096,12 @@ async def reprocess_submission_by_id(
                 extracted_feedback = feedback_val.strip('"').strip(',').strip()
 
         # Update submission with extracted values
+        previous_score = submission.ai_score
         submission.ai_score = extracted_score
         submission.ai_feedback = extracted_feedback
         submission.processed_at = datetime.utcnow()
         submission.ai_processed = True
+        course_progress.submission_scored(db, submission.user_id, submission.course_id, previous_score, extracted_score)
         db.commit()
         
     except Exception as ai_err:
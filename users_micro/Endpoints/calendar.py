@@ -1,7 +1,7 @@
 from datetime import datetime, timedelta
 from fastapi import APIRouter, HTTPException, Depends, status
 from typing import Annotated, List, Optional
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy import func, and_, or_
 import json
 import traceback
@@ -9,7 +9,7 @@ import traceback
 from db.connection import db_dependency
 from models.study_area_models import (
     Role, School, Subject, Student, Teacher, UserRole, Assignment, Grade,
-    CalendarEvent, CalendarEventAttendee, CalendarReminder, CalendarView,
+    CalendarEvent, CalendarEventAttendee, CalendarEventException, CalendarReminder, CalendarView,
     CalendarEventType, CalendarEventPriority, CalendarEventStatus, Syllabus,
     subject_students
 )
@@ -22,7 +22,7 @@ from schemas.calendar_schemas import (
     CalendarViewResponse, CalendarDashboard, CalendarFilterRequest,
     CalendarEventListResponse, SyllabusCalendarIntegration,
     AssignmentCalendarIntegration, BulkEventCreate, BulkEventResponse,
-    CalendarEventAttendeeInfo
+    CalendarEventAttendeeInfo, CalendarOccurrenceOverride, CalendarEventStatusEnum
 )
 from Endpoints.auth import get_current_user
 # Import shared utility functions
@@ -30,6 +30,8 @@ from Endpoints.utils import (
     _get_user_roles, check_user_role, ensure_user_role, check_user_has_any_role, 
     ensure_user_has_any_role
 )
+from services.calendar_index import calendar_index, InvalidCursorError
+from services.recurrence import RecurrenceRule, Occurrence, expand_events, expand_series, is_occurrence, occurrence_cache
 
 router = APIRouter(tags=["Calendar Management", "Events", "Reminders"])
 
@@ -135,6 +137,9 @@ async def create_calendar_event(
             if not syllabus:
                 raise HTTPException(status_code=404, detail="Syllabus not found or not accessible")
     
+    if event.is_recurring:
+        _validate_recurrence(event.recurrence_pattern, event.recurrence_interval, event.recurrence_end_date)
+    
     try:
         # Create the calendar event
         db_event = CalendarEvent(
@@ -188,6 +193,8 @@ async def create_calendar_event(
                         )
                         db.add(attendee)
         
+        db.flush()
+        calendar_index.events_changed(db, [db_event.id])
         db.commit()
         db.refresh(db_event)
         
@@ -213,14 +220,7 @@ async def get_calendar_event(
         [UserRole.principal, UserRole.teacher, UserRole.student]
     )
     
-    event = db.query(CalendarEvent).options(
-        joinedload(CalendarEvent.attendees),
-        joinedload(CalendarEvent.subject),
-        joinedload(CalendarEvent.assignment),
-        joinedload(CalendarEvent.syllabus),
-        joinedload(CalendarEvent.classroom),
-        joinedload(CalendarEvent.creator)
-    ).filter(CalendarEvent.id == event_id).first()
+    event = db.query(CalendarEvent).options(*EVENT_LOAD_OPTIONS).filter(CalendarEvent.id == event_id).first()
     
     if not event:
         raise HTTPException(status_code=404, detail="Calendar event not found")
@@ -268,9 +268,16 @@ async def update_calendar_event(
             if not school:
                 raise HTTPException(status_code=403, detail="Access denied")
     
+    update_data = event_update.dict(exclude_unset=True)
+    if update_data.get("is_recurring", event.is_recurring):
+        _validate_recurrence(
+            update_data.get("recurrence_pattern", event.recurrence_pattern),
+            update_data.get("recurrence_interval", event.recurrence_interval),
+            update_data.get("recurrence_end_date", event.recurrence_end_date),
+        )
+    
     try:
         # Update fields
-        update_data = event_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             if hasattr(event, field):
                 if field in ["event_type", "priority", "status"]:
@@ -284,7 +291,10 @@ async def update_calendar_event(
                 setattr(event, field, value)
         
         event.updated_date = datetime.utcnow()
+        db.flush()
+        calendar_index.events_changed(db, [event.id])
         db.commit()
+        occurrence_cache.invalidate(event.id)
         db.refresh(event)
         
         return await _get_calendar_event_response(db, event)
@@ -331,7 +341,10 @@ async def delete_calendar_event(
         # Soft delete
         event.is_active = False
         event.updated_date = datetime.utcnow()
+        db.flush()
+        calendar_index.events_changed(db, [event.id])
         db.commit()
+        occurrence_cache.invalidate(event.id)
         
         return {"message": "Calendar event deleted successfully"}
         
@@ -339,12 +352,153 @@ async def delete_calendar_event(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Event deletion error: {str(e)}")
 
+@router.get("/events/{event_id}/occurrences")
+async def get_event_occurrences(
+    event_id: int,
+    start_date: datetime,
+    end_date: datetime,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Expand a recurring event into its occurrences between start_date and end_date
+    """
+    ensure_user_has_any_role(
+        db, 
+        current_user["user_id"], 
+        [UserRole.principal, UserRole.teacher, UserRole.student]
+    )
+    
+    event = db.query(CalendarEvent).options(*EVENT_LOAD_OPTIONS).filter(
+        CalendarEvent.id == event_id,
+        CalendarEvent.is_active == True
+    ).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Calendar event not found")
+    
+    if not await _check_event_access(db, event, current_user["user_id"]):
+        raise HTTPException(status_code=403, detail="Access denied to this event")
+    
+    if not event.is_recurring:
+        raise HTTPException(status_code=400, detail="Event is not recurring")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    
+    occurrences = await _expand_event_responses(db, [event], start_date, end_date)
+    
+    return {
+        "event_id": event.id,
+        "occurrences": occurrences,
+        "total_occurrences": len(occurrences),
+        "date_range": {
+            "start_date": start_date,
+            "end_date": end_date
+        }
+    }
+
+@router.put("/events/{event_id}/occurrences")
+async def override_event_occurrence(
+    event_id: int,
+    override: CalendarOccurrenceOverride,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Cancel or change one occurrence of a recurring event (creator or principals only)
+    """
+    ensure_user_has_any_role(
+        db, 
+        current_user["user_id"], 
+        [UserRole.principal, UserRole.teacher, UserRole.student]
+    )
+    
+    event = await _get_editable_recurring_event(db, event_id, current_user["user_id"])
+    rule = _validate_recurrence(event.recurrence_pattern, event.recurrence_interval, event.recurrence_end_date)
+    if not is_occurrence(rule, event.start_date, override.occurrence_start):
+        raise HTTPException(status_code=400, detail="occurrence_start is not an occurrence of this event")
+    
+    try:
+        exception = db.query(CalendarEventException).filter(
+            CalendarEventException.event_id == event.id,
+            CalendarEventException.occurrence_start == override.occurrence_start
+        ).first()
+        if not exception:
+            exception = CalendarEventException(event_id=event.id, occurrence_start=override.occurrence_start)
+            db.add(exception)
+        
+        exception.is_cancelled = override.is_cancelled
+        exception.title = override.title
+        exception.description = override.description
+        exception.status = override.status.value if override.status else None
+        exception.start_date = override.start_date
+        exception.end_date = override.end_date
+        
+        # Bumping the series version makes every worker's cached windows stale
+        event.updated_date = datetime.utcnow()
+        db.commit()
+        occurrence_cache.invalidate(event.id)
+        db.refresh(event)
+        
+        # The changed occurrence as listings will now show it (none when cancelled)
+        moved_start = exception.start_date or exception.occurrence_start
+        duration = event.end_date - event.start_date if event.end_date else None
+        occurrences = expand_series(event.id, rule, event.start_date, duration, moved_start, moved_start, [exception])
+        occurrence = None
+        if occurrences:
+            occurrence = _occurrence_response(await _get_calendar_event_response(db, event), occurrences[0])
+        
+        return {
+            "message": "Occurrence cancelled successfully" if exception.is_cancelled else "Occurrence updated successfully",
+            "occurrence": occurrence
+        }
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Occurrence update error: {str(e)}")
+
+@router.delete("/events/{event_id}/occurrences")
+async def restore_event_occurrence(
+    event_id: int,
+    occurrence_start: datetime,
+    db: db_dependency,
+    current_user: user_dependency
+):
+    """
+    Drop the cancellation or changes of one occurrence, restoring it from the series
+    """
+    ensure_user_has_any_role(
+        db, 
+        current_user["user_id"], 
+        [UserRole.principal, UserRole.teacher, UserRole.student]
+    )
+    
+    event = await _get_editable_recurring_event(db, event_id, current_user["user_id"])
+    exception = db.query(CalendarEventException).filter(
+        CalendarEventException.event_id == event.id,
+        CalendarEventException.occurrence_start == occurrence_start
+    ).first()
+    if not exception:
+        raise HTTPException(status_code=404, detail="No changes recorded for this occurrence")
+    
+    try:
+        db.delete(exception)
+        event.updated_date = datetime.utcnow()
+        db.commit()
+        occurrence_cache.invalidate(event.id)
+        
+        return {"message": "Occurrence restored successfully"}
+        
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Occurrence restore error: {str(e)}")
+
 @router.get("/events", response_model=CalendarEventListResponse)
 async def get_calendar_events(
     db: db_dependency,
     current_user: user_dependency,
     page: int = 1,
     page_size: int = 50,
+    cursor: Optional[str] = None,       # next_cursor from the previous page
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     event_types: Optional[str] = None,  # Comma-separated list
@@ -355,6 +509,9 @@ async def get_calendar_events(
 ):
     """
     Get calendar events with filtering and pagination
+    
+    Pages are ordered by (start_date, id). Follow next_cursor for the next
+    page; page still works for older clients but scans every earlier event.
     """
     ensure_user_has_any_role(
         db, 
@@ -362,52 +519,39 @@ async def get_calendar_events(
         [UserRole.principal, UserRole.teacher, UserRole.student]
     )
     
-    # Get user's accessible schools
-    accessible_school_ids = await _get_user_accessible_schools(db, current_user["user_id"])
-    
-    # Build query
-    query = db.query(CalendarEvent).filter(
-        CalendarEvent.school_id.in_(accessible_school_ids),
-        CalendarEvent.is_active == True
-    )
-    
-    # Apply filters
-    if start_date:
-        query = query.filter(CalendarEvent.start_date >= start_date)
-    if end_date:
-        query = query.filter(CalendarEvent.start_date <= end_date)
-    
-    if not include_completed:
-        query = query.filter(CalendarEvent.status != CalendarEventStatus.completed)
+    # Build or refresh the user's visible events index
+    calendar_index.ensure(db, current_user["user_id"])
     
+    # Parse filters
+    filters = {}
     if event_types:
-        type_list = [CalendarEventType(t.strip()) for t in event_types.split(",")]
-        query = query.filter(CalendarEvent.event_type.in_(type_list))
-    
+        filters["event_type"] = [CalendarEventType(t.strip()) for t in event_types.split(",")]
     if priorities:
-        priority_list = [CalendarEventPriority(p.strip()) for p in priorities.split(",")]
-        query = query.filter(CalendarEvent.priority.in_(priority_list))
-    
+        filters["priority"] = [CalendarEventPriority(p.strip()) for p in priorities.split(",")]
     if statuses:
-        status_list = [CalendarEventStatus(s.strip()) for s in statuses.split(",")]
-        query = query.filter(CalendarEvent.status.in_(status_list))
-    
+        filters["status"] = [CalendarEventStatus(s.strip()) for s in statuses.split(",")]
     if subject_ids:
-        subject_id_list = [int(s.strip()) for s in subject_ids.split(",")]
-        query = query.filter(CalendarEvent.subject_id.in_(subject_id_list))
+        filters["subject_id"] = [int(s.strip()) for s in subject_ids.split(",")]
     
-    # Get total count
-    total_events = query.count()
+    try:
+        event_ids, next_cursor, total_events = calendar_index.page(
+            db,
+            current_user["user_id"],
+            start_date=start_date,
+            end_date=end_date,
+            cursor=cursor,
+            limit=page_size,
+            offset=(page - 1) * page_size,
+            filters=filters,
+            include_completed=include_completed
+        )
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    # Apply pagination
-    offset = (page - 1) * page_size
-    events = query.order_by(CalendarEvent.start_date.asc()).offset(offset).limit(page_size).all()
-    
-    # Convert to response format
-    event_responses = []
-    for event in events:
-        event_response = await _get_calendar_event_response(db, event)
-        event_responses.append(event_response)
+    # Hydrate the whole page in one eager-loaded pass
+    event_responses = [
+        await _get_calendar_event_response(db, event) for event in _load_events(db, event_ids)
+    ]
     
     total_pages = (total_events + page_size - 1) // page_size
     
@@ -416,7 +560,8 @@ async def get_calendar_events(
         events=event_responses,
         page=page,
         page_size=page_size,
-        total_pages=total_pages
+        total_pages=total_pages,
+        next_cursor=next_cursor
     )
 
 # === CALENDAR DASHBOARD ENDPOINTS ===
@@ -446,7 +591,7 @@ async def get_calendar_dashboard(
     month_end = (month_start + timedelta(days=32)).replace(day=1)
     
     # Get today's events
-    today_events_query = db.query(CalendarEvent).filter(
+    today_events_query = db.query(CalendarEvent).options(*EVENT_LOAD_OPTIONS).filter(
         CalendarEvent.school_id.in_(accessible_school_ids),
         CalendarEvent.is_active == True,
         CalendarEvent.start_date >= today_start,
@@ -456,7 +601,7 @@ async def get_calendar_dashboard(
     today_events = [_convert_to_event_summary(event) for event in today_events_query.all()]
     
     # Get upcoming events (next 7 days, excluding today)
-    upcoming_events_query = db.query(CalendarEvent).filter(
+    upcoming_events_query = db.query(CalendarEvent).options(*EVENT_LOAD_OPTIONS).filter(
         CalendarEvent.school_id.in_(accessible_school_ids),
         CalendarEvent.is_active == True,
         CalendarEvent.start_date >= today_end,
@@ -466,7 +611,7 @@ async def get_calendar_dashboard(
     upcoming_events = [_convert_to_event_summary(event) for event in upcoming_events_query.all()]
     
     # Get overdue assignments
-    overdue_query = db.query(CalendarEvent).filter(
+    overdue_query = db.query(CalendarEvent).options(*EVENT_LOAD_OPTIONS).filter(
         CalendarEvent.school_id.in_(accessible_school_ids),
         CalendarEvent.is_active == True,
         CalendarEvent.event_type == CalendarEventType.assignment_due,
@@ -604,6 +749,7 @@ async def integrate_assignment_with_calendar(
                         db.flush()
                         created_events.append(reminder_event)
         
+        calendar_index.events_changed(db, [event.id for event in created_events])
         db.commit()
         
         return {
@@ -719,6 +865,7 @@ async def integrate_syllabus_with_calendar(
             db.flush()
             created_events.append(exam_event)
         
+        calendar_index.events_changed(db, [event.id for event in created_events])
         db.commit()
         
         return {
@@ -756,6 +903,7 @@ async def auto_integrate_assignments(
         ).all()
         
         created_events = 0
+        new_events = []
         
         for assignment in assignments:
             # Check if event already exists
@@ -805,8 +953,11 @@ async def auto_integrate_assignments(
                     )
                 
                 db.add(event)
+                new_events.append(event)
                 created_events += 1
         
+        db.flush()
+        calendar_index.events_changed(db, [event.id for event in new_events])
         db.commit()
         
         return {
@@ -837,44 +988,26 @@ async def get_my_calendar_events(
         [UserRole.principal, UserRole.teacher, UserRole.student]
     )
     
-    # Get user's accessible schools
-    accessible_school_ids = await _get_user_accessible_schools(db, current_user["user_id"])
-    
     if not start_date:
         start_date = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
     if not end_date:
         end_date = start_date + timedelta(days=30)  # Default to next 30 days
     
-    # Build query for events in user's schools
-    query = db.query(CalendarEvent).filter(
-        CalendarEvent.school_id.in_(accessible_school_ids),
-        CalendarEvent.is_active == True,
-        CalendarEvent.start_date >= start_date,
-        CalendarEvent.start_date <= end_date
+    # School events plus events the user attends, from the visible events index
+    calendar_index.ensure(db, current_user["user_id"])
+    event_ids = calendar_index.ids_between(db, current_user["user_id"], start_date, end_date)
+    series_ids = calendar_index.recurring_ids_overlapping(db, current_user["user_id"], start_date, end_date)
+    events = _load_events(db, list(dict.fromkeys(event_ids + series_ids)))
+    
+    # Convert to response format; recurring events become their occurrences in the range
+    event_responses = [
+        await _get_calendar_event_response(db, event) for event in events if not event.is_recurring
+    ]
+    event_responses += await _expand_event_responses(
+        db, [event for event in events if event.is_recurring], start_date, end_date
     )
-    
-    # For students, also include events they're attendees of
-    user_roles = _get_user_roles(db, current_user["user_id"])
-    if UserRole.student in user_roles:
-        attendee_events_query = db.query(CalendarEvent).join(CalendarEventAttendee).filter(
-            CalendarEventAttendee.user_id == current_user["user_id"],
-            CalendarEventAttendee.is_active == True,
-            CalendarEvent.is_active == True,
-            CalendarEvent.start_date >= start_date,
-            CalendarEvent.start_date <= end_date
-        )
-        
-        # Combine queries
-        events = query.union(attendee_events_query).order_by(CalendarEvent.start_date.asc()).all()
-    else:
-        events = query.order_by(CalendarEvent.start_date.asc()).all()
-    
-    # Convert to response format
-    event_responses = []
-    for event in events:
-        event_response = await _get_calendar_event_response(db, event)
-        event_responses.append(event_response)
+    event_responses.sort(key=lambda response: (response.start_date, response.id))
     
     return {
         "user_id": current_user["user_id"],
@@ -891,8 +1024,8 @@ async def get_my_calendar_events(
 async def _get_calendar_event_response(db: Session, event: CalendarEvent) -> CalendarEventResponse:
     """Convert CalendarEvent model to CalendarEventResponse"""
     
-    # Get creator info
-    creator = db.query(User).filter(User.id == event.created_by).first()
+    # Get creator info (relationships are eager-loaded by _load_events)
+    creator = event.creator
     creator_name = "Unknown"
     if creator:
         fname = getattr(creator, 'fname', '') or ''
@@ -912,7 +1045,7 @@ async def _get_calendar_event_response(db: Session, event: CalendarEvent) -> Cal
     if hasattr(event, 'attendees') and event.attendees:
         for attendee in event.attendees:
             if attendee.is_active:
-                user = db.query(User).filter(User.id == attendee.user_id).first()
+                user = attendee.user
                 if user:
                     fname = getattr(user, 'fname', '') or ''
                     lname = getattr(user, 'lname', '') or ''
@@ -968,6 +1101,76 @@ async def _get_calendar_event_response(db: Session, event: CalendarEvent) -> Cal
         attendees=attendees
     )
 
+def _validate_recurrence(pattern: Optional[str], interval: Optional[int], end_date: Optional[datetime]) -> RecurrenceRule:
+    """Parse an event's recurrence fields, as a 400 when they are not a usable rule"""
+    try:
+        return RecurrenceRule.for_event(pattern, interval, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid recurrence: {str(e)}")
+
+async def _get_editable_recurring_event(db: Session, event_id: int, user_id: int) -> CalendarEvent:
+    """An active recurring event the user may change (its creator or the school's principal)"""
+    event = db.query(CalendarEvent).filter(
+        CalendarEvent.id == event_id,
+        CalendarEvent.is_active == True
+    ).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Calendar event not found")
+    
+    if event.created_by != user_id:
+        school = db.query(School).filter(
+            School.id == event.school_id,
+            School.principal_id == user_id
+        ).first()
+        if UserRole.principal not in _get_user_roles(db, user_id) or not school:
+            raise HTTPException(status_code=403, detail="Only event creator or principal can change occurrences")
+    
+    if not event.is_recurring:
+        raise HTTPException(status_code=400, detail="Event is not recurring")
+    return event
+
+def _occurrence_response(series: CalendarEventResponse, occurrence: Occurrence) -> CalendarEventResponse:
+    """The series response moved to one occurrence, with that occurrence's overrides"""
+    overrides = dict(occurrence.overrides)
+    if "status" in overrides:
+        overrides["status"] = CalendarEventStatusEnum(overrides["status"])
+    return series.model_copy(update={
+        "start_date": occurrence.start,
+        "end_date": occurrence.end,
+        "occurrence_start": occurrence.original_start,
+        **overrides,
+    })
+
+async def _expand_event_responses(db: Session, events: List[CalendarEvent], start_date: datetime,
+                                  end_date: datetime) -> List[CalendarEventResponse]:
+    """Responses for every occurrence of these recurring events in [start_date, end_date]"""
+    expanded = expand_events(db, events, start_date, end_date)
+    responses = []
+    for event in events:
+        occurrences = expanded.get(event.id)
+        if occurrences:
+            series = await _get_calendar_event_response(db, event)
+            responses.extend(_occurrence_response(series, occurrence) for occurrence in occurrences)
+    return responses
+
+# Everything _get_calendar_event_response and _convert_to_event_summary touch
+EVENT_LOAD_OPTIONS = (
+    selectinload(CalendarEvent.creator),
+    selectinload(CalendarEvent.subject),
+    selectinload(CalendarEvent.assignment),
+    selectinload(CalendarEvent.syllabus),
+    selectinload(CalendarEvent.classroom),
+    selectinload(CalendarEvent.attendees).selectinload(CalendarEventAttendee.user),
+)
+
+def _load_events(db: Session, event_ids: List[int]) -> List[CalendarEvent]:
+    """Load events with their related rows in a fixed number of queries, keeping the given order"""
+    if not event_ids:
+        return []
+    events = db.query(CalendarEvent).options(*EVENT_LOAD_OPTIONS).filter(CalendarEvent.id.in_(event_ids)).all()
+    by_id = {event.id: event for event in events}
+    return [by_id[event_id] for event_id in event_ids if event_id in by_id]
+
 def _convert_to_event_summary(event: CalendarEvent) -> CalendarEventSummary:
     """Convert CalendarEvent to CalendarEventSummary"""
     return CalendarEventSummary(
@@ -1028,24 +1231,4 @@ async def _check_event_access(db: Session, event: CalendarEvent, user_id: int) -
 
 async def _get_user_accessible_schools(db: Session, user_id: int) -> List[int]:
     """Get list of school IDs that the user has access to"""
-    school_ids = []
-    user_roles = _get_user_roles(db, user_id)
-    
-    # Principal - schools they manage
-    if UserRole.principal in user_roles:
-        schools = db.query(School).filter(School.principal_id == user_id).all()
-        school_ids.extend([school.id for school in schools])
-    
-    # Teacher - schools they belong to
-    if UserRole.teacher in user_roles:
-        teacher = db.query(Teacher).filter(Teacher.user_id == user_id).first()
-        if teacher:
-            school_ids.append(teacher.school_id)
-    
-    # Student - schools they belong to
-    if UserRole.student in user_roles:
-        student = db.query(Student).filter(Student.user_id == user_id).first()
-        if student:
-            school_ids.append(student.school_id)
-    
-    return list(set(school_ids))  # Remove duplicates
\ No newline at end of file
+    return calendar_index.accessible_school_ids(db, user_id)
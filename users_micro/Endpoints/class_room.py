@@ -24,6 +24,7 @@ from schemas.classrooms_schemas import ClassroomCreate, ClassroomOut, ClassroomU
 from schemas.students_schemas import StudentCreate, StudentOut
 from schemas.teachers_schemas import TeacherCreate, TeacherOut
 from Endpoints.auth import get_current_user
+from services.school_analytics import school_rollups
 from schemas.direct_join_schemas import (
     DirectSchoolJoinRequest, SchoolSelectionResponse, JoinRequestResponse
 )
@@ -91,6 +92,7 @@ async def create_classroom(
             teacher_id=classroom.teacher_id
         )
         db.add(db_classroom)
+        school_rollups.touch(db, db_classroom.school_id)
         db.commit()
         db.refresh(db_classroom)
         return db_classroom
@@ -205,6 +207,7 @@ async def update_classroom(
         if classroom_update.teacher_id is not None:
             classroom.teacher_id = classroom_update.teacher_id
         
+        school_rollups.touch(db, classroom.school_id)
         db.commit()
         db.refresh(classroom)
         return classroom
@@ -238,6 +241,7 @@ async def delete_classroom(
     try:
         # Soft delete - just mark as inactive
         classroom.is_active = False
+        school_rollups.touch(db, classroom.school_id)
         db.commit()
         return {"message": f"Classroom '{classroom.name}' has been deactivated successfully"}
     except Exception as e:
@@ -338,6 +342,7 @@ async def add_students_to_classroom(
             db.add(student)  # <-- Ensure SQLAlchemy tracks the change!
             added_students.append(student_id)
         
+        school_rollups.touch(db, classroom.school_id)
         db.commit()
         # Optionally, db.refresh(classroom) if you want to return updated classroom info
         
@@ -411,6 +416,7 @@ async def remove_students_from_classroom(
             student.classroom_id = None
             removed_students.append(student_id)
         
+        school_rollups.touch(db, classroom.school_id)
         db.commit()
         
         return {
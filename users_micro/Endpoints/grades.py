@@ -35,6 +35,7 @@ from schemas.assignments_schemas import (
     BulkGradeCreate, BulkGradeResponse
 )
 from Endpoints.auth import get_current_user
+from services.school_analytics import school_rollups
 # Import shared utility functions
 from Endpoints.utils import _get_user_roles, check_user_role, ensure_user_role, check_user_has_any_role, ensure_user_has_any_role
 
@@ -83,6 +84,7 @@ async def create_assignment(
         )
         
         db.add(new_assignment)
+        school_rollups.touch(db, subject.school_id)
         db.commit()
         db.refresh(new_assignment)
         
@@ -322,6 +324,7 @@ async def update_assignment(
         if assignment_update.is_active is not None:
             assignment.is_active = assignment_update.is_active
         
+        school_rollups.touch_assignment(db, assignment.id)
         db.commit()
         db.refresh(assignment)
         
@@ -383,6 +386,7 @@ async def delete_assignment(
         for grade in grades:
             grade.is_active = False
         
+        school_rollups.touch_assignment(db, assignment_id)
         db.commit()
         return {"message": f"Assignment '{assignment.title}' deleted successfully"}
     except Exception as e:
@@ -451,6 +455,7 @@ async def create_grade(
         )
         
         db.add(new_grade)
+        school_rollups.touch_assignment(db, grade.assignment_id)
         db.commit()
         db.refresh(new_grade)
         
@@ -580,6 +585,8 @@ async def create_bulk_grades(
             })
     
     try:
+        if successful_grades:
+            school_rollups.touch_assignment(db, bulk_grade.assignment_id)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -919,6 +926,7 @@ async def update_grade(
         # Update graded_date to reflect the modification
         grade.graded_date = datetime.utcnow()
         
+        school_rollups.touch_assignment(db, grade.assignment_id)
         db.commit()
         db.refresh(grade)
         
@@ -1126,6 +1134,7 @@ async def get_teacher_overall_completion_rate(
     
     try:
         grade.is_active = False
+        school_rollups.touch_assignment(db, grade.assignment_id)
         db.commit()
         return {"message": "Grade deleted successfully"}
     except Exception as e:
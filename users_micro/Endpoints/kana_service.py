@@ -1,3 +1,4 @@
+import aiofiles
 import httpx
 import os
 import json
@@ -16,6 +17,12 @@ from pydantic import BaseModel
 from db.connection import db_dependency
 from Endpoints.auth import get_current_user
 from Endpoints.utils import get_kana_base_url
+from services.kana_http_client import (
+    KanaHttpClient,
+    MultipartFile,
+    is_binary_response,
+    stream_response_to_file,
+)
 
 # Create router for KANA service endpoints
 router = APIRouter(tags=["KANA AI Service"])
@@ -58,15 +65,41 @@ def _sanitize_base_url(url: str) -> str:
     path = parsed.path.rstrip("/") if parsed.path and parsed.path != "/" else ""
     return f"{scheme}://{host}{port}{path}"
 
+# Shared, lifespan-owned connection pool for every KANA call (see main.py startup/shutdown)
+kana_http_client = KanaHttpClient(get_kana_base_url)
+
+# Upper bound on concurrent grading calls issued by batch_grade_assignments
+KANA_BATCH_MAX_CONCURRENCY = int(os.getenv("KANA_BATCH_MAX_CONCURRENCY", "5"))
+
+
+def _existing_files(paths: List[str], field_name: str) -> List[MultipartFile]:
+    files = []
+    for path in paths:
+        if not Path(path).exists():
+            print(f"Warning: File not found: {path}")
+            continue
+        files.append(MultipartFile(path=path, field_name=field_name))
+    return files
+
+
+async def _write_base64_payload(encoded: str, output_path: str) -> int:
+    """Legacy path: the backend answered with base64 PDF bytes inside JSON."""
+    pdf_data = base64.b64decode(encoded or "")
+    os.makedirs(Path(output_path).parent, exist_ok=True)
+    async with aiofiles.open(output_path, "wb") as pdf_file:
+        await pdf_file.write(pdf_data)
+    return len(pdf_data)
+
+
 class KanaService:
     """
     Service class to communicate with KANA AI backend for PDF generation and grading
     """
-    
+
     def __init__(self):
-        self.base_url = get_kana_base_url()
+        self.base_url = kana_http_client.base_url
         self.timeout = 300  # 5 minutes timeout for AI operations
-        
+
     @staticmethod
     async def generate_assignment_pdf(
         image_paths: List[str],
@@ -76,100 +109,88 @@ class KanaService:
     ) -> Dict[str, Any]:
         """
         Generate PDF from multiple assignment images
-        
+
+        Images are streamed to KANA as multipart parts and the generated PDF is
+        streamed straight to ``output_path``. JSON responses carrying base64 PDF
+        data are still accepted for older KANA deployments.
+
         Args:
             image_paths: List of image file paths
             student_name: Name of the student
             assignment_title: Title of the assignment
             output_path: Where to save the generated PDF
-            
+
         Returns:
             Dictionary with success status and result info
         """
         try:
             kana_service = KanaService()
-            
-            # Prepare images for upload
-            image_data = []
-            for img_path in image_paths:
-                if not Path(img_path).exists():
-                    print(f"Warning: Image not found: {img_path}")
-                    continue
-                    
-                # Convert image to base64
-                with open(img_path, "rb") as img_file:
-                    img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-                    img_name = Path(img_path).name
-                    
-                image_data.append({
-                    "filename": img_name,
-                    "data": img_base64,
-                    "path": img_path
-                })
-            
-            if not image_data:
+
+            image_files = _existing_files(image_paths, "images")
+            if not image_files:
                 return {
                     "success": False,
                     "error": "No valid images found for PDF generation"
                 }
-            
-            # Prepare request payload
-            payload = {
+
+            fields = {
                 "operation": "generate_assignment_pdf",
-                "data": {
-                    "student_name": student_name,
-                    "assignment_title": assignment_title,
-                    "images": image_data,
-                    "output_filename": Path(output_path).name,
-                    "metadata": {
-                        "created_at": datetime.now().isoformat(),
-                        "image_count": len(image_data),
-                        "assignment_info": {
-                            "title": assignment_title,
-                            "student": student_name
-                        }
+                "student_name": student_name,
+                "assignment_title": assignment_title,
+                "output_filename": Path(output_path).name,
+                "metadata": {
+                    "created_at": datetime.now().isoformat(),
+                    "image_count": len(image_files),
+                    "assignment_info": {
+                        "title": assignment_title,
+                        "student": student_name
                     }
                 }
             }
-            
-            # Make request to KANA service
-            async with httpx.AsyncClient(timeout=kana_service.timeout) as client:
-                response = await client.post(
-                    f"{kana_service.base_url}/generate-pdf",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    if result.get("success", False):
-                        # Download the generated PDF
-                        pdf_data = base64.b64decode(result.get("pdf_data", ""))
-                        
-                        # Save PDF to specified path
-                        os.makedirs(Path(output_path).parent, exist_ok=True)
-                        with open(output_path, "wb") as pdf_file:
-                            pdf_file.write(pdf_data)
-                        
-                        return {
-                            "success": True,
-                            "pdf_path": output_path,
-                            "pdf_size": len(pdf_data),
-                            "image_count": len(image_data),
-                            "metadata": result.get("metadata", {})
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": result.get("error", "PDF generation failed")
-                        }
-                else:
+
+            async with kana_http_client.stream_multipart(
+                "/generate-pdf",
+                fields=fields,
+                files=image_files,
+                accept="application/pdf, application/json",
+                timeout=kana_service.timeout,
+            ) as response:
+                if response.status_code != 200:
+                    await response.aread()
                     return {
                         "success": False,
                         "error": f"KANA service error: {response.status_code} - {response.text}"
                     }
-                    
+
+                if is_binary_response(response):
+                    pdf_size = await stream_response_to_file(response, output_path)
+                    metadata_header = response.headers.get("x-kana-metadata")
+                    return {
+                        "success": True,
+                        "pdf_path": output_path,
+                        "pdf_size": pdf_size,
+                        "image_count": len(image_files),
+                        "metadata": json.loads(metadata_header) if metadata_header else {}
+                    }
+
+                await response.aread()
+                result = response.json()
+
+            if result.get("success", False):
+                pdf_size = await _write_base64_payload(result.get("pdf_data", ""), output_path)
+                return {
+                    "success": True,
+                    "pdf_path": output_path,
+                    "pdf_size": pdf_size,
+                    "image_count": len(image_files),
+                    "metadata": result.get("metadata", {})
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": result.get("error", "PDF generation failed")
+                }
+
         except httpx.TimeoutException:
             return {
                 "success": False,
@@ -180,7 +201,7 @@ class KanaService:
                 "success": False,
                 "error": f"PDF generation error: {str(e)}"
             }
-    
+
     @staticmethod
     async def grade_assignment_pdf(
         pdf_path: str,
@@ -193,7 +214,7 @@ class KanaService:
     ) -> Dict[str, Any]:
         """
         Grade an assignment PDF using AI
-        
+
         Args:
             pdf_path: Path to the PDF file
             assignment_title: Title of the assignment
@@ -202,89 +223,80 @@ class KanaService:
             max_points: Maximum possible points
             feedback_type: Type of feedback (brief, detailed, comprehensive)
             student_name: Name of the student (optional)
-            
+
         Returns:
             Dictionary with grading results
         """
         try:
             kana_service = KanaService()
-            
+
             if not Path(pdf_path).exists():
                 return {
                     "success": False,
                     "error": "PDF file not found"
                 }
-            
-            # Convert PDF to base64
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_base64 = base64.b64encode(pdf_file.read()).decode('utf-8')
-            
-            # Prepare request payload
-            payload = {
+
+            fields = {
                 "operation": "grade_assignment",
-                "data": {
-                    "pdf_data": pdf_base64,
-                    "pdf_filename": Path(pdf_path).name,
-                    "assignment": {
-                        "title": assignment_title,
-                        "description": assignment_description,
-                        "rubric": rubric,
-                        "max_points": max_points
-                    },
-                    "grading_options": {
-                        "feedback_type": feedback_type,
-                        "include_suggestions": True,
-                        "highlight_errors": True,
-                        "provide_examples": feedback_type in ["detailed", "comprehensive"]
-                    },
-                    "student_info": {
-                        "name": student_name or "Anonymous",
-                        "submission_date": datetime.now().isoformat()
-                    }
+                "pdf_filename": Path(pdf_path).name,
+                "assignment": {
+                    "title": assignment_title,
+                    "description": assignment_description,
+                    "rubric": rubric,
+                    "max_points": max_points
+                },
+                "grading_options": {
+                    "feedback_type": feedback_type,
+                    "include_suggestions": True,
+                    "highlight_errors": True,
+                    "provide_examples": feedback_type in ["detailed", "comprehensive"]
+                },
+                "student_info": {
+                    "name": student_name or "Anonymous",
+                    "submission_date": datetime.now().isoformat()
                 }
             }
-            
-            # Make request to KANA service
-            async with httpx.AsyncClient(timeout=kana_service.timeout) as client:
-                response = await client.post(
-                    f"{kana_service.base_url}/grade-assignment",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    if result.get("success", False):
-                        grading_data = result.get("grading", {})
-                        
-                        return {
-                            "success": True,
-                            "points_earned": grading_data.get("points_earned", 0),
-                            "max_points": max_points,
-                            "percentage": grading_data.get("percentage", 0),
-                            "feedback": grading_data.get("feedback", ""),
-                            "detailed_feedback": grading_data.get("detailed_feedback", {}),
-                            "rubric_scores": grading_data.get("rubric_scores", {}),
-                            "strengths": grading_data.get("strengths", []),
-                            "areas_for_improvement": grading_data.get("areas_for_improvement", []),
-                            "suggestions": grading_data.get("suggestions", []),
-                            "confidence": grading_data.get("confidence", 85),
-                            "processing_time": grading_data.get("processing_time", 0),
-                            "ai_model_used": grading_data.get("ai_model", "gemini-pro"),
-                            "graded_at": datetime.now().isoformat()
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": result.get("error", "Grading failed")
-                        }
+
+            response = await kana_http_client.post_multipart(
+                "/grade-assignment",
+                fields=fields,
+                files=[MultipartFile(path=pdf_path, field_name="pdf", content_type="application/pdf")],
+                timeout=kana_service.timeout,
+            )
+
+            if response.status_code == 200:
+                result = response.json()
+
+                if result.get("success", False):
+                    grading_data = result.get("grading", {})
+
+                    return {
+                        "success": True,
+                        "points_earned": grading_data.get("points_earned", 0),
+                        "max_points": max_points,
+                        "percentage": grading_data.get("percentage", 0),
+                        "feedback": grading_data.get("feedback", ""),
+                        "detailed_feedback": grading_data.get("detailed_feedback", {}),
+                        "rubric_scores": grading_data.get("rubric_scores", {}),
+                        "strengths": grading_data.get("strengths", []),
+                        "areas_for_improvement": grading_data.get("areas_for_improvement", []),
+                        "suggestions": grading_data.get("suggestions", []),
+                        "confidence": grading_data.get("confidence", 85),
+                        "processing_time": grading_data.get("processing_time", 0),
+                        "ai_model_used": grading_data.get("ai_model", "gemini-pro"),
+                        "graded_at": datetime.now().isoformat()
+                    }
                 else:
                     return {
                         "success": False,
-                        "error": f"KANA service error: {response.status_code} - {response.text}"
+                        "error": result.get("error", "Grading failed")
                     }
-                    
+            else:
+                return {
+                    "success": False,
+                    "error": f"KANA service error: {response.status_code} - {response.text}"
+                }
+
         except httpx.TimeoutException:
             return {
                 "success": False,
@@ -295,63 +307,74 @@ class KanaService:
                 "success": False,
                 "error": f"Grading error: {str(e)}"
             }
-    
+
     @staticmethod
     async def batch_grade_assignments(
         assignment_data: List[Dict[str, Any]],
-        grading_criteria: Dict[str, Any]
+        grading_criteria: Dict[str, Any],
+        max_concurrency: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         Grade multiple assignments in batch
-        
+
+        Each assignment is graded through ``grade_assignment_pdf`` over the
+        shared connection pool, with at most ``max_concurrency`` requests in
+        flight. Per-assignment keys (``pdf_path``, ``title``, ``description``,
+        ``rubric``, ``max_points``, ``feedback_type``, ``student_name``) fall
+        back to the matching keys in ``grading_criteria``.
+
         Args:
             assignment_data: List of assignment data dictionaries
             grading_criteria: Common grading criteria for all assignments
-            
+            max_concurrency: Override for KANA_BATCH_MAX_CONCURRENCY
+
         Returns:
-            Batch grading results
+            Batch grading results, in the same order as ``assignment_data``
         """
         try:
-            kana_service = KanaService()
-            
-            # Prepare batch request
-            payload = {
-                "operation": "batch_grade",
-                "data": {
-                    "assignments": assignment_data,
-                    "criteria": grading_criteria,
-                    "batch_options": {
-                        "parallel_processing": True,
-                        "max_concurrent": 5,
-                        "timeout_per_assignment": 60
-                    }
-                }
+            limit = max(1, max_concurrency or KANA_BATCH_MAX_CONCURRENCY)
+            semaphore = asyncio.Semaphore(limit)
+
+            async def grade_one(index: int, item: Dict[str, Any]) -> Dict[str, Any]:
+                def pick(key: str, default: Any = None) -> Any:
+                    return item.get(key, grading_criteria.get(key, default))
+
+                pdf_path = item.get("pdf_path")
+                if not pdf_path:
+                    return {"index": index, "success": False, "error": "Missing pdf_path"}
+
+                async with semaphore:
+                    result = await KanaService.grade_assignment_pdf(
+                        pdf_path=pdf_path,
+                        assignment_title=pick("title", pick("assignment_title", "")),
+                        assignment_description=pick("description", pick("assignment_description", "")),
+                        rubric=pick("rubric", ""),
+                        max_points=int(pick("max_points", 100)),
+                        feedback_type=pick("feedback_type", "detailed"),
+                        student_name=pick("student_name")
+                    )
+                return {"index": index, **result}
+
+            results = await asyncio.gather(
+                *(grade_one(i, item) for i, item in enumerate(assignment_data))
+            )
+            graded = sum(1 for r in results if r.get("success"))
+
+            return {
+                "success": graded == len(results),
+                "total": len(results),
+                "graded": graded,
+                "failed": len(results) - graded,
+                "max_concurrency": limit,
+                "results": results
             }
-            
-            # Extended timeout for batch operations
-            extended_timeout = kana_service.timeout * 2
-            
-            async with httpx.AsyncClient(timeout=extended_timeout) as client:
-                response = await client.post(
-                    f"{kana_service.base_url}/batch-grade",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Batch grading failed: {response.status_code} - {response.text}"
-                    }
-                    
+
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Batch grading error: {str(e)}"
             }
-    
+
     @staticmethod
     async def extract_text_from_images(
         image_paths: List[str],
@@ -359,62 +382,48 @@ class KanaService:
     ) -> Dict[str, Any]:
         """
         Extract text from images using OCR
-        
+
         Args:
             image_paths: List of image file paths
             language: Language for OCR (default: en)
-            
+
         Returns:
             Extracted text results
         """
         try:
             kana_service = KanaService()
-            
-            # Prepare images
-            image_data = []
-            for img_path in image_paths:
-                if Path(img_path).exists():
-                    with open(img_path, "rb") as img_file:
-                        img_base64 = base64.b64encode(img_file.read()).decode('utf-8')
-                        image_data.append({
-                            "filename": Path(img_path).name,
-                            "data": img_base64
-                        })
-            
-            payload = {
+
+            fields = {
                 "operation": "extract_text",
-                "data": {
-                    "images": image_data,
-                    "ocr_options": {
-                        "language": language,
-                        "enhance_quality": True,
-                        "detect_tables": True,
-                        "detect_handwriting": True
-                    }
+                "ocr_options": {
+                    "language": language,
+                    "enhance_quality": True,
+                    "detect_tables": True,
+                    "detect_handwriting": True
                 }
             }
-            
-            async with httpx.AsyncClient(timeout=kana_service.timeout) as client:
-                response = await client.post(
-                    f"{kana_service.base_url}/extract-text",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Text extraction failed: {response.status_code}"
-                    }
-                    
+
+            response = await kana_http_client.post_multipart(
+                "/extract-text",
+                fields=fields,
+                files=_existing_files(image_paths, "images"),
+                timeout=kana_service.timeout,
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {
+                    "success": False,
+                    "error": f"Text extraction failed: {response.status_code}"
+                }
+
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Text extraction error: {str(e)}"
             }
-    
+
     @staticmethod
     async def analyze_assignment_quality(
         pdf_path: str,
@@ -422,62 +431,56 @@ class KanaService:
     ) -> Dict[str, Any]:
         """
         Analyze assignment quality and provide detailed feedback
-        
+
         Args:
             pdf_path: Path to assignment PDF
             assignment_criteria: Quality criteria for analysis
-            
+
         Returns:
             Quality analysis results
         """
         try:
             kana_service = KanaService()
-            
+
             if not Path(pdf_path).exists():
                 return {
                     "success": False,
                     "error": "PDF file not found"
                 }
-            
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_base64 = base64.b64encode(pdf_file.read()).decode('utf-8')
-            
-            payload = {
+
+            fields = {
                 "operation": "analyze_quality",
-                "data": {
-                    "pdf_data": pdf_base64,
-                    "criteria": assignment_criteria,
-                    "analysis_options": {
-                        "check_completeness": True,
-                        "evaluate_organization": True,
-                        "assess_clarity": True,
-                        "detect_plagiarism": False,  # Optional feature
-                        "provide_suggestions": True
-                    }
+                "criteria": assignment_criteria,
+                "analysis_options": {
+                    "check_completeness": True,
+                    "evaluate_organization": True,
+                    "assess_clarity": True,
+                    "detect_plagiarism": False,  # Optional feature
+                    "provide_suggestions": True
                 }
             }
-            
-            async with httpx.AsyncClient(timeout=kana_service.timeout) as client:
-                response = await client.post(
-                    f"{kana_service.base_url}/analyze-quality",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Quality analysis failed: {response.status_code}"
-                    }
-                    
+
+            response = await kana_http_client.post_multipart(
+                "/analyze-quality",
+                fields=fields,
+                files=[MultipartFile(path=pdf_path, field_name="pdf", content_type="application/pdf")],
+                timeout=kana_service.timeout,
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {
+                    "success": False,
+                    "error": f"Quality analysis failed: {response.status_code}"
+                }
+
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Quality analysis error: {str(e)}"
             }
-    
+
     @staticmethod
     async def generate_grade_report(
         grading_results: List[Dict[str, Any]],
@@ -486,18 +489,18 @@ class KanaService:
     ) -> Dict[str, Any]:
         """
         Generate comprehensive grade reports
-        
+
         Args:
             grading_results: List of individual grading results
             assignment_info: Assignment information
             report_type: Type of report (summary, detailed, analytical)
-            
+
         Returns:
             Generated report data
         """
         try:
             kana_service = KanaService()
-            
+
             payload = {
                 "operation": "generate_report",
                 "data": {
@@ -512,56 +515,53 @@ class KanaService:
                     }
                 }
             }
-            
-            async with httpx.AsyncClient(timeout=kana_service.timeout) as client:
-                response = await client.post(
-                    f"{kana_service.base_url}/generate-report",
-                    json=payload,
-                    headers={"Content-Type": "application/json"}
-                )
-                
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {
-                        "success": False,
-                        "error": f"Report generation failed: {response.status_code}"
-                    }
-                    
+
+            response = await kana_http_client.post_json(
+                "/generate-report",
+                payload,
+                timeout=kana_service.timeout,
+            )
+
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {
+                    "success": False,
+                    "error": f"Report generation failed: {response.status_code}"
+                }
+
         except Exception as e:
             return {
                 "success": False,
                 "error": f"Report generation error: {str(e)}"
             }
-    
+
     @staticmethod
     async def health_check() -> Dict[str, Any]:
         """
         Check if KANA service is healthy and responsive
-        
+
         Returns:
             Health status
         """
         try:
-            kana_service = KanaService()
-            
-            async with httpx.AsyncClient(timeout=30) as client:
-                response = await client.get(f"{kana_service.base_url}/health")
-                
-                if response.status_code == 200:
-                    return {
-                        "success": True,
-                        "status": "healthy",
-                        "response_time": response.elapsed.total_seconds(),
-                        "service_info": response.json()
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "status": "unhealthy",
-                        "error": f"Health check failed: {response.status_code}"
-                    }
-                    
+            response = await kana_http_client.get("/health", timeout=30)
+
+            if response.status_code == 200:
+                return {
+                    "success": True,
+                    "status": "healthy",
+                    "response_time": response.elapsed.total_seconds(),
+                    "http_version": response.http_version,
+                    "service_info": response.json()
+                }
+            else:
+                return {
+                    "success": False,
+                    "status": "unhealthy",
+                    "error": f"Health check failed: {response.status_code}"
+                }
+
         except httpx.ConnectError:
             return {
                 "success": False,
@@ -766,6 +766,8 @@ async def test_kana_service():
         )
         print(f"AI Grading: {grade_result}")
 
+    await kana_http_client.aclose()
+
 if __name__ == "__main__":
     # Run tests
     asyncio.run(test_kana_service())
\ No newline at end of file
@@ -19,6 +19,7 @@ from schemas.school_invitations_schemas import (
     BulkInvitationResponse, JoinSchoolByEmailRequest, JoinSchoolResponse
 )
 from Endpoints.auth import get_current_user
+from services.school_analytics import school_rollups
 from Endpoints.utils import ensure_user_role, assign_role_to_user_by_email
 
 router = APIRouter(tags=["School Invitations"])
@@ -350,6 +351,7 @@ async def join_school_as_student(
     invitation.used_date = datetime.utcnow()
     
     db.add(new_student)
+    school_rollups.touch(db, new_student.school_id)
     db.commit()
     db.refresh(new_student)
     
@@ -420,6 +422,7 @@ async def join_school_as_teacher(
     invitation.used_date = datetime.utcnow()
     
     db.add(new_teacher)
+    school_rollups.touch(db, new_teacher.school_id)
     db.commit()
     db.refresh(new_teacher)
     
@@ -4,13 +4,11 @@ from typing import Annotated, List
 import random
 import string
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 
 from db.connection import db_dependency
 from models.study_area_models import (
     Role, School, Classroom, Student, Teacher,
-    SchoolRequest, SchoolRequestStatus, UserRole,
-    Subject, Assignment, Grade
+    SchoolRequest, SchoolRequestStatus, UserRole
 )
 from models.users_models import User
 from schemas.roles_schemas import RoleCreate, RoleOut
@@ -23,6 +21,7 @@ from schemas.classrooms_schemas import ClassroomCreate, ClassroomOut
 from schemas.students_schemas import StudentCreate, StudentOut
 from schemas.teachers_schemas import TeacherCreate, TeacherOut
 from Endpoints.auth import get_current_user
+from services.school_analytics import school_rollups, submission_rate
 from schemas.direct_join_schemas import (
     DirectSchoolJoinRequest, SchoolSelectionResponse, JoinRequestResponse
 )
@@ -195,106 +194,25 @@ async def get_all_schools(db: db_dependency, current_user: user_dependency):
 
 # === ANALYTICS ENDPOINTS ===
 
-@router.get("/analytics/school-overview")
-async def get_school_analytics(db: db_dependency, current_user: user_dependency):
-    """
-    Get comprehensive analytics for current principal's school
-    """
+def _principal_school(db, current_user) -> School:
     ensure_user_role(db, current_user["user_id"], UserRole.principal)
     
     school = db.query(School).filter(School.principal_id == current_user["user_id"]).first()
     if not school:
         raise HTTPException(status_code=404, detail="No school found for this principal")
+    return school
+
+@router.get("/analytics/school-overview")
+async def get_school_analytics(db: db_dependency, current_user: user_dependency, refresh: bool = False):
+    """
+    Get comprehensive analytics for current principal's school
     
-    # Basic counts
-    total_students = db.query(Student).filter(Student.school_id == school.id).count()
-    total_teachers = db.query(Teacher).filter(Teacher.school_id == school.id).count()
-    total_classrooms = db.query(Classroom).filter(
-        Classroom.school_id == school.id,
-        Classroom.is_active == True
-    ).count()
-    
-    # # Active access codes by type
-    # active_student_codes = db.query(AccessCode).filter(
-    #     AccessCode.school_id == school.id,
-    #     AccessCode.code_type == AccessCodeType.student,
-    #     AccessCode.is_active == True
-    # ).count()
-    
-    # active_teacher_codes = db.query(AccessCode).filter(
-    #     AccessCode.school_id == school.id,
-    #     AccessCode.code_type == AccessCodeType.teacher,
-    #     AccessCode.is_active == True
-    # ).count()
-    
-    # # Used access codes
-    # used_codes = db.query(AccessCode).filter(
-    #     AccessCode.school_id == school.id,
-    #     AccessCode.is_active == False,
-    #     AccessCode.used_at.isnot(None)
-    # ).count()
-    
-    # Recent registrations (last 30 days)
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    
-    recent_students = db.query(Student).filter(
-        Student.school_id == school.id,
-        Student.enrollment_date >= thirty_days_ago
-    ).count()
-    
-    recent_teachers = db.query(Teacher).filter(
-        Teacher.school_id == school.id,
-        Teacher.hire_date >= thirty_days_ago
-    ).count()
-    
-    # ENHANCED ANALYTICS - Overall school average from grades
-    try:
-        overall_average = db.query(func.avg(
-            (Grade.points_earned * 100.0 / Assignment.max_points)
-        )).select_from(Grade).join(
-            Assignment, Grade.assignment_id == Assignment.id
-        ).join(
-            Subject, Assignment.subject_id == Subject.id
-        ).filter(
-            Subject.school_id == school.id,
-            Grade.is_active == True,
-            Assignment.is_active == True
-        ).scalar() or 0.0
-    except Exception as e:
-        print(f"Error calculating overall average: {e}")
-        overall_average = 0.0
-    
-    # Assignment completion rate - simplified approach
-    try:
-        total_assignments = db.query(Assignment).join(Subject).filter(
-            Subject.school_id == school.id,
-            Assignment.is_active == True
-        ).count()
-        
-        graded_assignments = db.query(func.count(Grade.id)).select_from(Grade).join(
-            Assignment, Grade.assignment_id == Assignment.id
-        ).join(
-            Subject, Assignment.subject_id == Subject.id
-        ).filter(
-            Subject.school_id == school.id,
-            Assignment.is_active == True,
-            Grade.is_active == True
-        ).scalar() or 0
-        
-        # Simplified calculation - total students * total assignments
-        total_students = db.query(Student).filter(
-            Student.school_id == school.id,
-            Student.is_active == True
-        ).count()
-        
-        expected_submissions = total_assignments * total_students
-        completion_rate = (graded_assignments / expected_submissions * 100) if expected_submissions > 0 else 0.0
-        
-    except Exception as e:
-        print(f"Error calculating completion rate: {e}")
-        completion_rate = 0.0
-        graded_assignments = 0
-        total_assignments = 0
+    Served from the school's daily rollup (services/school_analytics.py); ``freshness``
+    says when it was computed and how many changes are still pending. Pass
+    ``refresh=true`` to recompute it first.
+    """
+    school = _principal_school(db, current_user)
+    rollup = school_rollups.overview(db, school.id, refresh=refresh)
 
     return {
         "school_info": {
@@ -303,231 +221,103 @@ async def get_school_analytics(db: db_dependency, current_user: user_dependency)
             "created_at": school.created_date
         },
         "user_counts": {
-            "total_students": total_students,
-            "total_teachers": total_teachers,
-            "recent_students": recent_students,
-            "recent_teachers": recent_teachers
+            "total_students": rollup["active_students"],
+            "total_teachers": rollup["teachers"],
+            "recent_students": rollup["recent_students"],
+            "recent_teachers": rollup["recent_teachers"]
         },
         "infrastructure": {
-            "total_classrooms": total_classrooms
+            "total_classrooms": rollup["classrooms"]
         },
         "analytics": {
-            "overall_average": round(overall_average, 1),
-            "completion_rate": round(completion_rate, 1),
-            "total_assignments": total_assignments,
-            "graded_assignments": graded_assignments
-        }
-        # "access_codes": {
-        #     "active_student_codes": active_student_codes,
-        #     "active_teacher_codes": active_teacher_codes,
-        #     "used_codes": used_codes,
-        #     "total_active": active_student_codes + active_teacher_codes
-        # }
+            "overall_average": rollup["overall_average"],
+            "completion_rate": rollup["completion_rate"],
+            "total_assignments": rollup["assignments"],
+            "graded_assignments": rollup["grades"]
+        },
+        "freshness": rollup["freshness"]
     }
 
 @router.get("/analytics/subject-performance")
-async def get_subject_performance(db: db_dependency, current_user: user_dependency):
+async def get_subject_performance(db: db_dependency, current_user: user_dependency, refresh: bool = False):
     """
-    Get subject performance analytics - average grades by subject
+    Get subject performance analytics - average grades by subject, with the trend
+    of the last 30 days against the 30 days before
     """
-    ensure_user_role(db, current_user["user_id"], UserRole.principal)
+    school = _principal_school(db, current_user)
+    rollup = school_rollups.overview(db, school.id, refresh=refresh)
     
-    school = db.query(School).filter(School.principal_id == current_user["user_id"]).first()
-    if not school:
-        raise HTTPException(status_code=404, detail="No school found for this principal")
+    result = []
+    for subject in school_rollups.groups(db, school.id, "subject"):
+        if not subject["grades"]:
+            continue
+        trend = subject["recent_average"] - subject["previous_average"] if subject["previous_grades"] else 0
+        result.append({
+            "subject": subject["name"],
+            "average": subject["average"],
+            "trend": f"+{trend:.1f}%" if trend > 0 else f"{trend:.1f}%",
+            "total_grades": subject["grades"]
+        })
     
-    try:
-        # Get average performance by subject
-        subject_performance = db.query(
-            Subject.id,
-            Subject.name,
-            func.avg((Grade.points_earned * 100.0 / Assignment.max_points)).label('average'),
-            func.count(Grade.id).label('total_grades')
-        ).select_from(Subject).join(
-            Assignment, Subject.id == Assignment.subject_id
-        ).join(
-            Grade, Assignment.id == Grade.assignment_id
-        ).filter(
-            Subject.school_id == school.id,
-            Subject.is_active == True,
-            Assignment.is_active == True,
-            Grade.is_active == True
-        ).group_by(Subject.id, Subject.name).all()
-        
-        # Calculate trends (comparing last 30 days vs previous 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        sixty_days_ago = datetime.utcnow() - timedelta(days=60)
-        
-        result = []
-        for subject in subject_performance:
-            try:
-                # Get recent performance
-                recent_avg = db.query(
-                    func.avg((Grade.points_earned * 100.0 / Assignment.max_points))
-                ).select_from(Grade).join(
-                    Assignment, Grade.assignment_id == Assignment.id
-                ).filter(
-                    Assignment.subject_id == subject.id,
-                    Grade.graded_date >= thirty_days_ago,
-                    Grade.is_active == True,
-                    Assignment.is_active == True
-                ).scalar() or 0
-                
-                # Get previous period performance
-                previous_avg = db.query(
-                    func.avg((Grade.points_earned * 100.0 / Assignment.max_points))
-                ).select_from(Grade).join(
-                    Assignment, Grade.assignment_id == Assignment.id
-                ).filter(
-                    Assignment.subject_id == subject.id,
-                    Grade.graded_date >= sixty_days_ago,
-                    Grade.graded_date < thirty_days_ago,
-                    Grade.is_active == True,
-                    Assignment.is_active == True
-                ).scalar() or 0
-                
-                # Calculate trend
-                trend = recent_avg - previous_avg if previous_avg > 0 else 0
-                trend_formatted = f"+{trend:.1f}%" if trend > 0 else f"{trend:.1f}%"
-                
-                result.append({
-                    "subject": subject.name,
-                    "average": round(subject.average, 1),
-                    "trend": trend_formatted,
-                    "total_grades": subject.total_grades
-                })
-            except Exception as e:
-                print(f"Error processing subject {subject.name}: {e}")
-                result.append({
-                    "subject": subject.name,
-                    "average": round(subject.average, 1) if subject.average else 0.0,
-                    "trend": "+0.0%",
-                    "total_grades": subject.total_grades
-                })
-        
-        return {"subject_performance": result}
-    except Exception as e:
-        print(f"Error in subject performance analytics: {e}")
-        return {"subject_performance": []}
+    return {"subject_performance": result, "freshness": rollup["freshness"]}
+
+@router.get("/analytics/classroom-performance")
+async def get_classroom_performance(db: db_dependency, current_user: user_dependency, refresh: bool = False):
+    """
+    Get classroom performance analytics - average grade and submission rate per classroom
+    """
+    school = _principal_school(db, current_user)
+    rollup = school_rollups.overview(db, school.id, refresh=refresh)
+    
+    return {
+        "classroom_performance": [
+            {
+                "classroom_id": classroom["id"],
+                "classroom": classroom["name"],
+                "students": classroom["students"],
+                "average": classroom["average"],
+                "total_grades": classroom["grades"],
+                "submission_rate": submission_rate(classroom["grades"], rollup["assignments"], classroom["students"])
+            }
+            for classroom in school_rollups.groups(db, school.id, "classroom")
+        ],
+        "freshness": rollup["freshness"]
+    }
 
 @router.get("/analytics/grade-distribution") 
-async def get_grade_distribution(db: db_dependency, current_user: user_dependency):
+async def get_grade_distribution(db: db_dependency, current_user: user_dependency, refresh: bool = False):
     """
     Get grade distribution across the school (A, B, C, D, F percentages)
     """
-    ensure_user_role(db, current_user["user_id"], UserRole.principal)
+    school = _principal_school(db, current_user)
+    rollup = school_rollups.overview(db, school.id, refresh=refresh)
     
-    school = db.query(School).filter(School.principal_id == current_user["user_id"]).first()
-    if not school:
-        raise HTTPException(status_code=404, detail="No school found for this principal")
-    
-    try:
-        # Get all grades for school
-        grades = db.query(
-            (Grade.points_earned * 100.0 / Assignment.max_points).label('percentage')
-        ).select_from(Grade).join(
-            Assignment, Grade.assignment_id == Assignment.id
-        ).join(
-            Subject, Assignment.subject_id == Subject.id
-        ).filter(
-            Subject.school_id == school.id,
-            Grade.is_active == True,
-            Assignment.is_active == True
-        ).all()
-        
-        if not grades:
-            return {"grade_distribution": {
-                "Grade A": 0,
-                "Grade B": 0,
-                "Grade C": 0,
-                "Grade D": 0,
-                "Grade F": 0
-            }}
-        
-        # Calculate grade distribution
-        total_grades = len(grades)
-        grade_counts = {"A": 0, "B": 0, "C": 0, "D": 0, "F": 0}
-        
-        for grade in grades:
-            percentage = grade.percentage
-            if percentage >= 90:
-                grade_counts["A"] += 1
-            elif percentage >= 80:
-                grade_counts["B"] += 1
-            elif percentage >= 70:
-                grade_counts["C"] += 1
-            elif percentage >= 60:
-                grade_counts["D"] += 1
-            else:
-                grade_counts["F"] += 1
-        
-        # Convert to percentages
-        grade_distribution = {}
-        for grade, count in grade_counts.items():
-            grade_distribution[f"Grade {grade}"] = round((count / total_grades) * 100) if total_grades > 0 else 0
-        
-        return {"grade_distribution": grade_distribution}
-    except Exception as e:
-        print(f"Error in grade distribution analytics: {e}")
-        return {"grade_distribution": {
-            "Grade A": 0,
-            "Grade B": 0,
-            "Grade C": 0,
-            "Grade D": 0,
-            "Grade F": 0
-        }}
+    total_grades = rollup["grades"]
+    grade_distribution = {
+        f"Grade {letter}": round(rollup[f"grade_{letter.lower()}"] / total_grades * 100) if total_grades > 0 else 0
+        for letter in ("A", "B", "C", "D", "F")
+    }
+    return {"grade_distribution": grade_distribution, "freshness": rollup["freshness"]}
 
 @router.get("/analytics/completion-rate")
-async def get_completion_rate(db: db_dependency, current_user: user_dependency):
+async def get_completion_rate(db: db_dependency, current_user: user_dependency, refresh: bool = False):
     """
-    Get assignment completion rate - percentage of assignments that have been graded
+    Get assignment completion rate - percentage of assignments that have been graded,
+    with the change since the rollup of 30 days ago
     """
-    ensure_user_role(db, current_user["user_id"], UserRole.principal)
+    school = _principal_school(db, current_user)
+    rollup = school_rollups.overview(db, school.id, refresh=refresh)
     
-    school = db.query(School).filter(School.principal_id == current_user["user_id"]).first()
-    if not school:
-        raise HTTPException(status_code=404, detail="No school found for this principal")
+    month_ago = school_rollups.completion_rate_on(db, school.id, datetime.utcnow().date() - timedelta(days=30))
+    improvement = rollup["completion_rate"] - month_ago if month_ago is not None else 0.0
     
-    try:
-        # Get total assignments and graded assignments
-        total_assignments = db.query(Assignment).join(Subject).filter(
-            Subject.school_id == school.id,
-            Assignment.is_active == True
-        ).count()
-        
-        graded_assignments = db.query(func.count(Grade.id)).select_from(Grade).join(
-            Assignment, Grade.assignment_id == Assignment.id
-        ).join(
-            Subject, Assignment.subject_id == Subject.id
-        ).filter(
-            Subject.school_id == school.id,
-            Assignment.is_active == True,
-            Grade.is_active == True
-        ).scalar() or 0
-        
-        # Simplified calculation - total students * total assignments
-        total_students = db.query(Student).filter(
-            Student.school_id == school.id,
-            Student.is_active == True
-        ).count()
-        
-        expected_submissions = total_assignments * total_students
-        completion_rate = (graded_assignments / expected_submissions * 100) if expected_submissions > 0 else 0.0
-        
-        return {
-            "completion_rate": round(completion_rate, 1),
-            "graded_submissions": graded_assignments,
-            "expected_submissions": expected_submissions,
-            "improvement": "+5.1%"  # This could be calculated by comparing with previous period
-        }
-    except Exception as e:
-        print(f"Error in completion rate analytics: {e}")
-        return {
-            "completion_rate": 0.0,
-            "graded_submissions": 0,
-            "expected_submissions": 0,
-            "improvement": "+0.0%"
-        }
+    return {
+        "completion_rate": rollup["completion_rate"],
+        "graded_submissions": rollup["grades"],
+        "expected_submissions": rollup["assignments"] * rollup["active_students"],
+        "improvement": f"+{improvement:.1f}%" if improvement >= 0 else f"{improvement:.1f}%",
+        "freshness": rollup["freshness"]
+    }
 
 @router.get("/analytics/daily-active")
 async def get_daily_active_students(db: db_dependency, current_user: user_dependency):
@@ -1096,6 +886,7 @@ async def approve_principal_request(
         request.reviewed_date = datetime.utcnow()
         request.admin_notes = f"Approved by principal {current_user['user_id']}"
         
+        school_rollups.touch(db, school.id)
         db.commit()
         
         return {
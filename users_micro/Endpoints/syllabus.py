@@ -15,10 +15,10 @@ from schemas.syllabus_schemas import (
 from Endpoints.auth import get_current_user
 from Endpoints.utils import _get_user_roles
 from services.gemma_services.syllabus_services import gemma_syllabus_service
+from services.upload_ingest import ingest_upload, PDF_UPLOAD, UploadRejected
 from typing import List, Optional, Annotated
 import json
 import os
-import aiofiles
 import httpx
 from datetime import datetime
 import uuid
@@ -461,10 +461,12 @@ async def upload_textbook(
     file_path = os.path.join(UPLOAD_DIR, filename)
 
     try:
-        async with aiofiles.open(file_path, 'wb') as f:
-            content = await textbook.read()
-            await f.write(content)
+        with await ingest_upload(textbook, PDF_UPLOAD) as upload:
+            await upload.save_to(file_path)
+    except UploadRejected as rejected:
+        raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
 
+    try:
         syllabus.textbook_filename = textbook.filename
         syllabus.textbook_path = file_path
         syllabus.ai_processing_status = "processing"
@@ -8,14 +8,9 @@ from pathlib import Path
 import os
 import shutil
 import uuid
-import asyncio
 import tempfile
-import aiofiles
 import hashlib
-from PIL import Image, ImageOps
-import io
 import httpx
-import img2pdf
 
 from db.connection import db_dependency
 from models.study_area_models import (
@@ -33,6 +28,9 @@ from Endpoints.auth import get_current_user
 from Endpoints.utils import _get_user_roles, check_user_role, ensure_user_role, check_user_has_any_role, ensure_user_has_any_role
 from Endpoints.kana_service import KanaService
 from services.gemma_services.grading_services import gemma_grading_service
+from services.school_analytics import school_rollups
+from services.pdf_builder import pdf_builder, PdfBuildBudgetExceeded
+from services.upload_ingest import ingest_upload, IMAGE_UPLOAD, UploadRejected
 
 router = APIRouter(tags=["Assignment Image Upload, PDF Management & Bulk Upload"])
 
@@ -41,13 +39,6 @@ user_dependency = Annotated[dict, Depends(get_current_user)]
 # Configuration
 MAX_FILE_SIZE = 20 * 1024 * 1024  # 20MB
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
-TARGET_PDF_SIZE_BYTES = 500 * 1024  # 500KB target for fast DB storage and download
-MIN_ACCEPTABLE_JPEG_QUALITY = 24
-# Ultra preset tuned for speed and very small DB payloads.
-ULTRA_PRIMARY_MAX_DIMENSION = 1000
-ULTRA_PRIMARY_JPEG_QUALITY = 34
-ULTRA_FALLBACK_MAX_DIMENSION = 800
-ULTRA_FALLBACK_JPEG_QUALITY = 28
 
 # Legacy file path for backward compatibility (deprecated - using database storage now)
 STUDENT_PDFS_DIR = Path("/tmp/uploads/student_pdfs")
@@ -225,52 +216,25 @@ def validate_bulk_image_file(file: UploadFile) -> bool:
     return file_extension in ALLOWED_EXTENSIONS
 
 
-def _compress_image_for_pdf(image_data: bytes, max_dimension: int, quality: int) -> bytes:
-    """Convert incoming image bytes to optimized JPEG bytes for fast PDF generation."""
-    if not image_data:
-        raise ValueError("Empty image data")
-
-    with Image.open(io.BytesIO(image_data)) as image:
-        image = ImageOps.exif_transpose(image)
-
-        # Flatten transparency to white because JPEG does not support alpha.
-        if image.mode in ("RGBA", "LA", "P"):
-            rgba = image.convert("RGBA")
-            background = Image.new("RGB", rgba.size, (255, 255, 255))
-            background.paste(rgba, mask=rgba.split()[-1])
-            image = background
-        elif image.mode != "RGB":
-            image = image.convert("RGB")
-
-        if max(image.size) > max_dimension:
-            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-
-        buffer = io.BytesIO()
-        image.save(
-            buffer,
-            format="JPEG",
-            quality=max(MIN_ACCEPTABLE_JPEG_QUALITY, quality),
-            optimize=True,
-            progressive=True,
-            subsampling="4:2:0"
-        )
-        return buffer.getvalue()
-
-
 async def create_pdf_from_images(images: List[UploadFile], filename: str) -> tuple[bytes, str, bool]:
     """
     Create an optimized PDF file from image uploads.
     Returns tuple of (pdf_bytes, content_hash, target_size_achieved).
+    Compression runs in the PDF build process pool; raises PdfBuildBudgetExceeded
+    when the images cost more CPU time than one upload may use, and UploadRejected
+    for an image over the size limit or that is not an image.
     """
     original_images_data: List[bytes] = []
 
     for image_file in images:
         try:
-            image_data = await image_file.read()
-            if not image_data:
-                print(f"Skipping empty image payload for {image_file.filename}")
-                continue
-            original_images_data.append(image_data)
+            with await ingest_upload(image_file, IMAGE_UPLOAD, allow_empty=True) as upload:
+                if not upload.size:
+                    print(f"Skipping empty image payload for {image_file.filename}")
+                    continue
+                original_images_data.append(upload.read())
+        except UploadRejected:
+            raise
         except Exception as e:
             print(f"Error processing image {image_file.filename}: {str(e)}")
             continue
@@ -278,56 +242,18 @@ async def create_pdf_from_images(images: List[UploadFile], filename: str) -> tup
     if not original_images_data:
         raise ValueError("No processable images were provided")
 
-    async def _build_pdf_variant(max_dimension: int, quality: int) -> bytes:
-        # Run compression in threads so multiple images can be processed concurrently.
-        optimized_images = await asyncio.gather(*[
-            asyncio.to_thread(
-                _compress_image_for_pdf,
-                image_data,
-                max_dimension,
-                quality
-            )
-            for image_data in original_images_data
-        ])
-        return await asyncio.to_thread(img2pdf.convert, optimized_images)
-
-    primary_pdf_bytes = await _build_pdf_variant(
-        max_dimension=ULTRA_PRIMARY_MAX_DIMENSION,
-        quality=ULTRA_PRIMARY_JPEG_QUALITY
-    )
-    primary_size = len(primary_pdf_bytes)
-
-    if primary_size <= TARGET_PDF_SIZE_BYTES:
-        best_pdf_bytes = primary_pdf_bytes
-        best_pdf_size = primary_size
-        target_size_achieved = True
-    else:
-        # Only one extra ultra-pass to keep latency low while forcing smaller output.
-        fallback_pdf_bytes = await _build_pdf_variant(
-            max_dimension=ULTRA_FALLBACK_MAX_DIMENSION,
-            quality=ULTRA_FALLBACK_JPEG_QUALITY
-        )
-        fallback_size = len(fallback_pdf_bytes)
-
-        if fallback_size <= primary_size:
-            best_pdf_bytes = fallback_pdf_bytes
-            best_pdf_size = fallback_size
-        else:
-            best_pdf_bytes = primary_pdf_bytes
-            best_pdf_size = primary_size
-
-        target_size_achieved = best_pdf_size <= TARGET_PDF_SIZE_BYTES
-
-    if not best_pdf_bytes:
+    build = await pdf_builder.build(original_images_data)
+    if not build.pdf_bytes:
         raise ValueError("PDF generation failed")
 
-    content_hash = hashlib.md5(best_pdf_bytes).hexdigest()
+    content_hash = hashlib.md5(build.pdf_bytes).hexdigest()
 
     print(
-        f"PDF created in memory: {best_pdf_size} bytes, "
-        f"target_500kb={target_size_achieved}, hash: {content_hash}"
+        f"PDF created in memory: {len(build.pdf_bytes)} bytes, "
+        f"target_500kb={build.target_size_achieved}, hash: {content_hash}, "
+        f"pages_compressed={build.pages_compressed}, cpu={build.cpu_seconds:.2f}s"
     )
-    return best_pdf_bytes, content_hash, target_size_achieved
+    return build.pdf_bytes, content_hash, build.target_size_achieved
 
 # === ASSIGNMENT IMAGE UPLOAD ENDPOINTS ===
 
@@ -387,10 +313,12 @@ async def upload_assignment_image(
         unique_filename = generate_unique_filename(file.filename, student_id, assignment_id)
         file_path = ASSIGNMENT_IMAGES_DIR / unique_filename
         
-        # Save file
-        async with aiofiles.open(file_path, "wb") as buffer:
-            content = await file.read()
-            await buffer.write(content)
+        # Stream the upload to disk without holding it in memory
+        try:
+            with await ingest_upload(file, IMAGE_UPLOAD) as upload:
+                await upload.save_to(file_path)
+        except UploadRejected as rejected:
+            raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
         
         # Get file info
         file_size = file_path.stat().st_size
@@ -877,6 +805,7 @@ async def auto_grade_assignment(
                 )
                     
                 db.add(grade)
+                school_rollups.touch_assignment(db, grade.assignment_id)
                 db.commit()
                 db.refresh(grade)
                 
@@ -1220,6 +1149,10 @@ async def bulk_upload_images_to_pdf_assignment(
         # Create PDF from images (returns bytes and hash)
         try:
             pdf_bytes, content_hash, target_achieved = await create_pdf_from_images(valid_files, pdf_filename)
+        except PdfBuildBudgetExceeded as budget_err:
+            raise HTTPException(status_code=413, detail=str(budget_err))
+        except UploadRejected as rejected:
+            raise HTTPException(status_code=rejected.status_code, detail=str(rejected))
         except Exception as gen_err:
             raise HTTPException(status_code=500, detail=f"Failed to generate PDF from images: {gen_err}")
         pdf_size = len(pdf_bytes)
@@ -1514,6 +1447,7 @@ async def bulk_upload_health_check():
             "PDF generation in memory",
             "Database binary storage",
             "Content deduplication via hashing",
+            "Process-pool page compression with a per-upload CPU budget",
             "No file system dependencies"
         ]
     }
\ No newline at end of file
@@ -2,7 +2,7 @@
 Add objectives, flashcards, and progress tracking to as_student_notes
 
 Revision ID: 20251126_01
-Revises: 20250930_01_allow_block_only_submissions
+Revises: 20250930_01
 Create Date: 2025-11-26
 """
 from alembic import op
@@ -11,7 +11,8 @@ from sqlalchemy.dialects import postgresql
 
 # revision identifiers, used by Alembic.
 revision = '20251126_01'
-down_revision = '20250930_01_allow_block_only_submissions'
+# Named the file rather than revision '20250930_01', which alembic cannot resolve
+down_revision = '20250930_01'
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,53 @@
+"""Course catalog counters and thumbnail etag
+
+Adds denormalized lesson_count / enrollment_count and image_etag to
+as_courses, backfills them, and indexes the catalog and first-session lookups.
+
+Revision ID: 20261018_01
+Revises: 20251126_01
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_01'
+down_revision = '20251126_01'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("ALTER TABLE as_courses ADD COLUMN IF NOT EXISTS lesson_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE as_courses ADD COLUMN IF NOT EXISTS enrollment_count INTEGER NOT NULL DEFAULT 0")
+    op.execute("ALTER TABLE as_courses ADD COLUMN IF NOT EXISTS image_etag VARCHAR(64)")
+
+    # Backfill from the source tables (same definitions as services/course_catalog.py)
+    op.execute(
+        """
+        UPDATE as_courses SET
+            lesson_count = (
+                SELECT COUNT(*) FROM as_course_lessons
+                WHERE as_course_lessons.course_id = as_courses.id AND as_course_lessons.is_active = true
+            ),
+            enrollment_count = (
+                SELECT COUNT(DISTINCT user_id) FROM as_study_sessions
+                WHERE as_study_sessions.course_id = as_courses.id
+            ),
+            image_etag = CASE WHEN image IS NULL THEN NULL ELSE encode(sha1(image), 'hex') END
+        """
+    )
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_as_courses_active_enrollment "
+        "ON as_courses (is_active, enrollment_count, id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_as_study_sessions_course_user "
+        "ON as_study_sessions (course_id, user_id)"
+    )
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_as_study_sessions_course_user")
+    op.execute("DROP INDEX IF EXISTS ix_as_courses_active_enrollment")
+    op.execute("ALTER TABLE as_courses DROP COLUMN IF EXISTS image_etag")
+    op.execute("ALTER TABLE as_courses DROP COLUMN IF EXISTS enrollment_count")
+    op.execute("ALTER TABLE as_courses DROP COLUMN IF EXISTS lesson_count")
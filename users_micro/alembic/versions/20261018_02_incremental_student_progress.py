@@ -0,0 +1,70 @@
+"""Incremental student progress counters
+
+Adds the counters behind event-maintained as_student_progress (passed and
+total assignments, scored submissions and their score total), backfills every
+counter from the source tables, and indexes completed sessions per student.
+Derived fields (completion_percentage, average_score) are rewritten by
+``python scripts/reconcile_student_progress.py --repair``.
+
+Revision ID: 20261018_02
+Revises: 20261018_01
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_02'
+down_revision = '20261018_01'
+branch_labels = None
+depends_on = None
+
+NEW_COLUMNS = [
+    ("assignments_passed", "INTEGER NOT NULL DEFAULT 0"),
+    ("total_assignments", "INTEGER NOT NULL DEFAULT 0"),
+    ("scored_submissions", "INTEGER NOT NULL DEFAULT 0"),
+    ("score_total", "DOUBLE PRECISION NOT NULL DEFAULT 0"),
+]
+
+def upgrade():
+    for name, definition in NEW_COLUMNS:
+        op.execute(f"ALTER TABLE as_student_progress ADD COLUMN IF NOT EXISTS {name} {definition}")
+
+    op.execute(
+        """
+        UPDATE as_student_progress p SET
+            total_blocks = (SELECT COUNT(*) FROM as_course_blocks b
+                            WHERE b.course_id = p.course_id AND b.is_active = true),
+            total_lessons = (SELECT COUNT(*) FROM as_course_lessons l
+                             WHERE l.course_id = p.course_id AND l.is_active = true),
+            total_assignments = (SELECT COUNT(*) FROM as_course_assignments a
+                                 WHERE a.course_id = p.course_id AND a.is_active = true),
+            blocks_completed = (SELECT COUNT(*) FROM as_study_sessions s
+                                WHERE s.user_id = p.user_id AND s.course_id = p.course_id
+                                  AND s.status = 'completed' AND s.block_id IS NOT NULL),
+            lessons_completed = (SELECT COUNT(*) FROM as_study_sessions s
+                                 WHERE s.user_id = p.user_id AND s.course_id = p.course_id
+                                   AND s.status = 'completed' AND s.lesson_id IS NOT NULL),
+            sessions_count = (SELECT COUNT(*) FROM as_study_sessions s
+                              WHERE s.user_id = p.user_id AND s.course_id = p.course_id),
+            total_study_time = (SELECT COALESCE(SUM(s.duration_minutes), 0) FROM as_study_sessions s
+                                WHERE s.user_id = p.user_id AND s.course_id = p.course_id),
+            assignments_passed = (SELECT COUNT(*) FROM as_student_assignments sa
+                                  WHERE sa.user_id = p.user_id AND sa.course_id = p.course_id
+                                    AND sa.status = 'passed'),
+            scored_submissions = (SELECT COUNT(*) FROM as_ai_submissions x
+                                  WHERE x.user_id = p.user_id AND x.course_id = p.course_id
+                                    AND x.ai_score IS NOT NULL),
+            score_total = (SELECT COALESCE(SUM(x.ai_score), 0) FROM as_ai_submissions x
+                           WHERE x.user_id = p.user_id AND x.course_id = p.course_id)
+        """
+    )
+
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_as_study_sessions_user_course_status "
+        "ON as_study_sessions (user_id, course_id, status)"
+    )
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_as_study_sessions_user_course_status")
+    for name, _ in reversed(NEW_COLUMNS):
+        op.execute(f"ALTER TABLE as_student_progress DROP COLUMN IF EXISTS {name}")
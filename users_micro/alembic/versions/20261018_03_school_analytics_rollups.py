@@ -0,0 +1,78 @@
+"""School analytics rollups
+
+Creates the per-school daily rollup, per-subject/classroom group and refresh
+state tables behind the principal analytics endpoints. Rollups are built on
+first read and by the nightly compaction job (services/school_analytics.py).
+
+Revision ID: 20261018_03
+Revises: 20261018_02
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_03'
+down_revision = '20261018_02'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS school_daily_rollups (
+            school_id INTEGER NOT NULL REFERENCES schools (id),
+            day DATE NOT NULL,
+            students INTEGER NOT NULL DEFAULT 0,
+            active_students INTEGER NOT NULL DEFAULT 0,
+            recent_students INTEGER NOT NULL DEFAULT 0,
+            teachers INTEGER NOT NULL DEFAULT 0,
+            recent_teachers INTEGER NOT NULL DEFAULT 0,
+            classrooms INTEGER NOT NULL DEFAULT 0,
+            subjects INTEGER NOT NULL DEFAULT 0,
+            assignments INTEGER NOT NULL DEFAULT 0,
+            grades INTEGER NOT NULL DEFAULT 0,
+            percent_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            grade_a INTEGER NOT NULL DEFAULT 0,
+            grade_b INTEGER NOT NULL DEFAULT 0,
+            grade_c INTEGER NOT NULL DEFAULT 0,
+            grade_d INTEGER NOT NULL DEFAULT 0,
+            grade_f INTEGER NOT NULL DEFAULT 0,
+            computed_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (school_id, day)
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS school_rollup_groups (
+            school_id INTEGER NOT NULL REFERENCES schools (id),
+            day DATE NOT NULL,
+            group_type VARCHAR(16) NOT NULL,
+            group_id INTEGER NOT NULL,
+            name VARCHAR,
+            students INTEGER NOT NULL DEFAULT 0,
+            grades INTEGER NOT NULL DEFAULT 0,
+            percent_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            recent_grades INTEGER NOT NULL DEFAULT 0,
+            recent_percent_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            previous_grades INTEGER NOT NULL DEFAULT 0,
+            previous_percent_total DOUBLE PRECISION NOT NULL DEFAULT 0,
+            PRIMARY KEY (school_id, day, group_type, group_id)
+        )
+        """
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS school_rollup_state (
+            school_id INTEGER PRIMARY KEY REFERENCES schools (id),
+            computed_at TIMESTAMP,
+            dirty_since TIMESTAMP,
+            pending_events INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS school_rollup_state")
+    op.execute("DROP TABLE IF EXISTS school_rollup_groups")
+    op.execute("DROP TABLE IF EXISTS school_daily_rollups")
@@ -0,0 +1,30 @@
+"""Student dashboard indexes
+
+The set-based student dashboard joins a student's subjects to their active
+assignments and the student's grades; index both sides of those joins.
+
+Revision ID: 20261018_04
+Revises: 20261018_03
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_04'
+down_revision = '20261018_03'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_assignments_subject_active "
+        "ON assignments (subject_id, is_active)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_grades_student_assignment "
+        "ON grades (student_id, assignment_id)"
+    )
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_grades_student_assignment")
+    op.execute("DROP INDEX IF EXISTS ix_assignments_subject_active")
@@ -0,0 +1,70 @@
+"""Calendar visibility index
+
+Creates the per-user visible calendar events index and its scope/state
+tables (services/calendar_index.py), and indexes calendar events by school
+and start date for rebuilds. Rows are built per user on first read, so the
+upgrade does not backfill.
+
+Revision ID: 20261018_05
+Revises: 20261018_04
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_05'
+down_revision = '20261018_04'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS calendar_visible_events (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            event_id INTEGER NOT NULL REFERENCES calendar_events (id),
+            school_id INTEGER NOT NULL REFERENCES schools (id),
+            start_date TIMESTAMP NOT NULL,
+            PRIMARY KEY (user_id, event_id)
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_calendar_visible_events_user_start "
+        "ON calendar_visible_events (user_id, start_date, event_id)"
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_calendar_visible_events_event "
+        "ON calendar_visible_events (event_id)"
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS calendar_visibility_scopes (
+            user_id INTEGER NOT NULL REFERENCES users (id),
+            school_id INTEGER NOT NULL REFERENCES schools (id),
+            PRIMARY KEY (user_id, school_id)
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_calendar_visibility_scopes_school_id "
+        "ON calendar_visibility_scopes (school_id)"
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS calendar_visibility_state (
+            user_id INTEGER PRIMARY KEY REFERENCES users (id),
+            built_at TIMESTAMP NOT NULL
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_calendar_events_school_active_start "
+        "ON calendar_events (school_id, is_active, start_date)"
+    )
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_calendar_events_school_active_start")
+    op.execute("DROP TABLE IF EXISTS calendar_visibility_state")
+    op.execute("DROP TABLE IF EXISTS calendar_visibility_scopes")
+    op.execute("DROP TABLE IF EXISTS calendar_visible_events")
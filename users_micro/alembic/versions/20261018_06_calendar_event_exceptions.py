@@ -0,0 +1,39 @@
+"""Calendar event exceptions
+
+Creates calendar_event_exceptions, which cancels or overrides single
+occurrences of a recurring calendar event (services/recurrence.py expands
+the series and applies them).
+
+Revision ID: 20261018_06
+Revises: 20261018_05
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_06'
+down_revision = '20261018_05'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS calendar_event_exceptions (
+            id SERIAL PRIMARY KEY,
+            event_id INTEGER NOT NULL REFERENCES calendar_events (id),
+            occurrence_start TIMESTAMP NOT NULL,
+            is_cancelled BOOLEAN DEFAULT false,
+            title VARCHAR,
+            description TEXT,
+            status VARCHAR,
+            start_date TIMESTAMP,
+            end_date TIMESTAMP,
+            created_date TIMESTAMP,
+            CONSTRAINT uq_event_occurrence_exception UNIQUE (event_id, occurrence_start)
+        )
+        """
+    )
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS calendar_event_exceptions")
@@ -0,0 +1,66 @@
+"""Grading jobs
+
+Creates grading_jobs and grading_job_items, the durable queue behind
+class-wide grading (services/grading_jobs.py). Items are claimed by status
+and next attempt time, so that pair is indexed.
+
+Revision ID: 20261018_07
+Revises: 20261018_06
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_07'
+down_revision = '20261018_06'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS grading_jobs (
+            id SERIAL PRIMARY KEY,
+            assignment_id INTEGER NOT NULL REFERENCES assignments (id),
+            subject_id INTEGER NOT NULL REFERENCES subjects (id),
+            teacher_id INTEGER NOT NULL REFERENCES teachers (id),
+            status VARCHAR NOT NULL DEFAULT 'queued',
+            total_students INTEGER DEFAULT 0,
+            created_date TIMESTAMP,
+            started_date TIMESTAMP,
+            finished_date TIMESTAMP
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_grading_jobs_assignment_id "
+        "ON grading_jobs (assignment_id)"
+    )
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS grading_job_items (
+            id SERIAL PRIMARY KEY,
+            job_id INTEGER NOT NULL REFERENCES grading_jobs (id),
+            student_id INTEGER NOT NULL REFERENCES students (id),
+            student_pdf_id INTEGER REFERENCES student_pdfs (id),
+            position INTEGER NOT NULL DEFAULT 0,
+            status VARCHAR NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_owner VARCHAR,
+            lease_expires_at TIMESTAMP,
+            next_attempt_at TIMESTAMP,
+            result TEXT,
+            error TEXT,
+            updated_date TIMESTAMP,
+            CONSTRAINT uq_grading_job_student UNIQUE (job_id, student_id)
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_grading_job_items_claim "
+        "ON grading_job_items (status, next_attempt_at)"
+    )
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS grading_job_items")
+    op.execute("DROP TABLE IF EXISTS grading_jobs")
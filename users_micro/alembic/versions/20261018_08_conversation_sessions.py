@@ -0,0 +1,42 @@
+"""Conversation sessions
+
+Creates conversation_sessions, the shared store for KANA step-learning and
+agent chat sessions when SESSION_STORE=sql (services/session_store.py).
+Rows are looked up by (namespace, session_id) and pruned by expiry, so
+expires_at is indexed.
+
+Revision ID: 20261018_08
+Revises: 20261018_07
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_08'
+down_revision = '20261018_07'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS conversation_sessions (
+            namespace VARCHAR NOT NULL,
+            session_id VARCHAR NOT NULL,
+            user_id INTEGER,
+            data TEXT NOT NULL,
+            version INTEGER NOT NULL DEFAULT 1,
+            expires_at TIMESTAMP NOT NULL,
+            created_date TIMESTAMP,
+            updated_date TIMESTAMP,
+            PRIMARY KEY (namespace, session_id)
+        )
+        """
+    )
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_conversation_sessions_expires_at "
+        "ON conversation_sessions (expires_at)"
+    )
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS conversation_sessions")
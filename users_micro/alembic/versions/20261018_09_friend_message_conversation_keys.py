@@ -0,0 +1,67 @@
+"""Friend message conversation keys
+
+Adds friend_messages.conversation_key ("low:high" user ids), backfills it in
+batches and creates the (conversation_key, created_at, id) and
+(squad_id, created_at, id) indexes behind keyset-paginated message history
+in freinds_micro. That service creates its tables itself on a fresh
+database (already with the column and indexes), so a table that does not
+exist yet is skipped.
+
+freinds_micro refuses to start while any friend message is missing its key.
+
+Revision ID: 20261018_09
+Revises: 20261018_08
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261018_09'
+down_revision = '20261018_08'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+BACKFILL_SQL = sa.text(
+    """
+    UPDATE friend_messages
+    SET conversation_key = LEAST(sender_id, receiver_id) || ':' || GREATEST(sender_id, receiver_id)
+    WHERE id IN (
+        SELECT id FROM friend_messages WHERE conversation_key IS NULL LIMIT :batch_size
+    )
+    """
+)
+
+def _has_table(name):
+    return sa.inspect(op.get_bind()).has_table(name)
+
+def upgrade():
+    has_friend_messages = _has_table("friend_messages")
+    has_squad_messages = _has_table("squad_messages")
+    if has_friend_messages:
+        op.execute("ALTER TABLE friend_messages ADD COLUMN IF NOT EXISTS conversation_key VARCHAR(50)")
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction; outside one
+    # each backfill batch also commits on its own
+    with op.get_context().autocommit_block():
+        if has_friend_messages:
+            # Built before the backfill so each "IS NULL" batch is an index lookup, not a table scan
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_friend_messages_conversation_created "
+                "ON friend_messages (conversation_key, created_at, id)"
+            )
+            bind = op.get_bind()
+            while bind.execute(BACKFILL_SQL, {"batch_size": BACKFILL_BATCH_SIZE}).rowcount:
+                pass
+        if has_squad_messages:
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_squad_messages_squad_created "
+                "ON squad_messages (squad_id, created_at, id)"
+            )
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_squad_messages_squad_created")
+    op.execute("DROP INDEX IF EXISTS ix_friend_messages_conversation_created")
+    op.execute("ALTER TABLE IF EXISTS friend_messages DROP COLUMN IF EXISTS conversation_key")
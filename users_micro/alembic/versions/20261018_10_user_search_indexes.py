@@ -0,0 +1,46 @@
+"""User search indexes
+
+Enables pg_trgm and creates the indexes behind ranked user search in
+freinds_micro (functions/user_search.py): trigram GIN indexes on the
+username and full name for substring/fuzzy matches, and text_pattern_ops
+indexes for one- and two-character prefixes. When the extension cannot be
+enabled the indexes are skipped, and the service uses its in-process prefix
+index instead.
+
+Revision ID: 20261018_10
+Revises: 20261018_09
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261018_10'
+down_revision = '20261018_09'
+branch_labels = None
+depends_on = None
+
+FULL_NAME = "lower(coalesce(fname, '') || ' ' || coalesce(lname, ''))"
+
+INDEXES = {
+    "ix_users_username_trgm": "USING gin (lower(username) gin_trgm_ops)",
+    "ix_users_full_name_trgm": f"USING gin ({FULL_NAME} gin_trgm_ops)",
+    "ix_users_username_prefix": "(lower(username) text_pattern_ops)",
+    "ix_users_fname_prefix": "(lower(fname) text_pattern_ops)",
+    "ix_users_lname_prefix": "(lower(lname) text_pattern_ops)",
+}
+
+def upgrade():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with op.get_context().autocommit_block():
+        try:
+            op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except sa.exc.DBAPIError as e:
+            print(f"⚠️ pg_trgm unavailable, skipping user search indexes: {e}")
+            return
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON users {definition}")
+
+def downgrade():
+    for name in INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
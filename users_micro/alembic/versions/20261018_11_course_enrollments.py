@@ -0,0 +1,51 @@
+"""Course enrollments
+
+Adds as_course_enrollments, one row per (course, student), and backfills it
+from as_study_sessions. services.course_catalog.record_study_session inserts
+into it with ON CONFLICT DO NOTHING and only bumps as_courses.enrollment_count
+when a row was actually inserted, so concurrent first sessions count once.
+
+Revision ID: 20261018_11
+Revises: 20261018_10
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_11'
+down_revision = '20261018_10'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute(
+        """
+        CREATE TABLE IF NOT EXISTS as_course_enrollments (
+            course_id INTEGER NOT NULL REFERENCES as_courses (id),
+            user_id INTEGER NOT NULL,
+            first_session_id INTEGER,
+            created_date TIMESTAMP,
+            PRIMARY KEY (course_id, user_id)
+        )
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO as_course_enrollments (course_id, user_id, first_session_id, created_date)
+        SELECT course_id, user_id, MIN(id), MIN(created_at) FROM as_study_sessions
+        WHERE course_id IS NOT NULL AND user_id IS NOT NULL
+        GROUP BY course_id, user_id
+        ON CONFLICT (course_id, user_id) DO NOTHING
+        """
+    )
+    op.execute(
+        """
+        UPDATE as_courses SET enrollment_count = (
+            SELECT COUNT(*) FROM as_course_enrollments
+            WHERE as_course_enrollments.course_id = as_courses.id
+        )
+        """
+    )
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS as_course_enrollments")
@@ -0,0 +1,67 @@
+"""Friend message conversation key trigger
+
+friend_messages.conversation_key is filled by freinds_micro when it sends a
+message, so replicas still running older code during a rolling deploy write
+rows without one. This adds a BEFORE INSERT/UPDATE trigger that builds the
+key from sender_id and receiver_id whenever it is missing, then backfills
+any rows written since 20261018_09. freinds_micro reads conversations by
+participant as well until the trigger exists.
+
+Revision ID: 20261018_12
+Revises: 20261018_11
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '20261018_12'
+down_revision = '20261018_11'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 10000
+
+BACKFILL_SQL = sa.text(
+    """
+    UPDATE friend_messages
+    SET conversation_key = LEAST(sender_id, receiver_id) || ':' || GREATEST(sender_id, receiver_id)
+    WHERE id IN (
+        SELECT id FROM friend_messages WHERE conversation_key IS NULL LIMIT :batch_size
+    )
+    """
+)
+
+def upgrade():
+    if not sa.inspect(op.get_bind()).has_table("friend_messages"):
+        return
+    op.execute(
+        """
+        CREATE OR REPLACE FUNCTION friend_messages_conversation_key() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.conversation_key IS NULL THEN
+                NEW.conversation_key := LEAST(NEW.sender_id, NEW.receiver_id) || ':' || GREATEST(NEW.sender_id, NEW.receiver_id);
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute("DROP TRIGGER IF EXISTS friend_messages_conversation_key ON friend_messages")
+    op.execute(
+        """
+        CREATE TRIGGER friend_messages_conversation_key
+        BEFORE INSERT OR UPDATE OF sender_id, receiver_id, conversation_key ON friend_messages
+        FOR EACH ROW EXECUTE FUNCTION friend_messages_conversation_key()
+        """
+    )
+
+    # New rows are keyed from here on; key what older replicas wrote in between, a batch per commit
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while bind.execute(BACKFILL_SQL, {"batch_size": BACKFILL_BATCH_SIZE}).rowcount:
+            pass
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS friend_messages_conversation_key ON friend_messages")
+    op.execute("DROP FUNCTION IF EXISTS friend_messages_conversation_key()")
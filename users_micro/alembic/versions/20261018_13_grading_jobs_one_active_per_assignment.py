@@ -0,0 +1,49 @@
+"""One active grading job per assignment
+
+The grade-class endpoint checked for an active job and enqueued a new one in
+separate statements, so two clicks at once could queue the same class twice.
+A partial unique index now allows one unfinished job per assignment, which
+GradingJobQueue.enqueue inserts against with ON CONFLICT DO NOTHING.
+Duplicates already queued are cancelled first, keeping the newest, which is
+the one active_job_id reports.
+
+Revision ID: 20261018_13
+Revises: 20261018_12
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+revision = '20261018_13'
+down_revision = '20261018_12'
+branch_labels = None
+depends_on = None
+
+DUPLICATE_JOBS = """
+    SELECT j.id FROM grading_jobs j
+    WHERE j.status NOT IN ('completed', 'cancelled')
+      AND EXISTS (SELECT 1 FROM grading_jobs newer
+                  WHERE newer.assignment_id = j.assignment_id AND newer.id > j.id
+                    AND newer.status NOT IN ('completed', 'cancelled'))
+"""
+
+def upgrade():
+    op.execute(
+        f"""
+        UPDATE grading_job_items SET status = 'cancelled', updated_date = NOW()
+        WHERE status = 'pending' AND job_id IN ({DUPLICATE_JOBS})
+        """
+    )
+    op.execute(
+        f"""
+        UPDATE grading_jobs SET status = 'cancelled', finished_date = NOW()
+        WHERE id IN ({DUPLICATE_JOBS})
+        """
+    )
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_grading_jobs_active_assignment "
+        "ON grading_jobs (assignment_id) WHERE status NOT IN ('completed', 'cancelled')"
+    )
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS uq_grading_jobs_active_assignment")
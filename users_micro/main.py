@@ -31,6 +31,9 @@ from Endpoints.after_school import (
 )
 from Endpoints import payments
 from Endpoints.after_school.notification_scheduler import setup_notification_scheduler
+from Endpoints.kana_service import kana_http_client
+from services.gemma_services.pdf_images import pdf_image_extractor
+from services.pdf_builder import pdf_builder
 from db.database import get_engine, test_connection
 import logging
 
@@ -107,6 +110,38 @@ async def startup_event():
     else:
         print("⚠️ Notification scheduler failed to start")
 
+@app.on_event("startup")
+async def start_kana_client():
+    # Pooled KANA connections live for the whole process, not per request
+    await kana_http_client.start()
+
+
+@app.on_event("shutdown")
+async def stop_kana_client():
+    await kana_http_client.aclose()
+
+
+@app.on_event("startup")
+async def start_grading_worker():
+    # Background worker for queued class grading jobs; set GRADING_WORKER_ENABLED=false on API-only replicas
+    if os.getenv("GRADING_WORKER_ENABLED", "true").lower() != "false":
+        academic_management.grading_worker.start()
+
+
+@app.on_event("shutdown")
+async def stop_grading_worker():
+    await academic_management.grading_worker.stop()
+
+
+@app.on_event("shutdown")
+async def stop_pdf_image_workers():
+    pdf_image_extractor.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_pdf_build_workers():
+    pdf_builder.shutdown()
+
 """Remove eager table creation; handled in startup_event with lazy engine."""
 
 # Defer table creation to startup to avoid engine None issues
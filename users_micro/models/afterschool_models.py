@@ -12,6 +12,7 @@ from sqlalchemy import (
     CheckConstraint,
     JSON,
     LargeBinary,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from db.database import Base
@@ -31,6 +32,7 @@ class Course(Base):
     
     # Course image - stored as compressed bytes
     image = Column(LargeBinary, nullable=True)  # Compressed image data
+    image_etag = Column(String(64), nullable=True)  # Hash of image, versions the thumbnail URL
     
     # Enhanced course structure fields
     total_weeks = Column(Integer, nullable=False, default=8)
@@ -39,6 +41,10 @@ class Course(Base):
     textbook_content = Column(Text, nullable=True)  # Original textbook content
     generated_by_ai = Column(Boolean, default=False)  # Whether course was AI-generated
     
+    # Catalog counters, maintained on write (services/course_catalog.py)
+    lesson_count = Column(Integer, nullable=False, default=0)  # Active lessons
+    enrollment_count = Column(Integer, nullable=False, default=0)  # Distinct students with a study session
+    
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -52,6 +58,8 @@ class Course(Base):
     # Ensure unique course title per subject
     __table_args__ = (
         UniqueConstraint('title', 'subject', name='uq_as_course_title_subject'),
+        # Popular-first catalog listing
+        Index('ix_as_courses_active_enrollment', 'is_active', 'enrollment_count', 'id'),
     )
 
 class CourseBlock(Base):
@@ -169,6 +177,26 @@ class StudySession(Base):
     block = relationship("CourseBlock", back_populates="study_sessions")
     ai_submissions = relationship("AISubmission", back_populates="session")
 
+    __table_args__ = (
+        # Enrollment resync in services.course_catalog.refresh_course_counters
+        Index('ix_as_study_sessions_course_user', 'course_id', 'user_id'),
+        # Completed blocks per student (blocks-progress)
+        Index('ix_as_study_sessions_user_course_status', 'user_id', 'course_id', 'status'),
+    )
+
+class CourseEnrollment(Base):
+    """One row per student per course, written with their first study session.
+
+    The primary key is what makes Course.enrollment_count exact: only the
+    insert that creates the row increments the counter.
+    """
+    __tablename__ = "as_course_enrollments"
+
+    course_id = Column(Integer, ForeignKey("as_courses.id"), primary_key=True)
+    user_id = Column(Integer, primary_key=True)  # student user_id
+    first_session_id = Column(Integer, nullable=True)
+    created_date = Column(DateTime, default=datetime.utcnow)
+
 class StudentAssignment(Base):
     __tablename__ = "as_student_assignments"
     
@@ -267,8 +295,13 @@ class StudentProgress(Base):
     blocks_completed = Column(Integer, nullable=False, default=0)
     total_blocks = Column(Integer, nullable=False, default=0)
     
+    assignments_passed = Column(Integer, nullable=False, default=0)
+    total_assignments = Column(Integer, nullable=False, default=0)
+    
     # Performance metrics
-    average_score = Column(Float, nullable=True)
+    average_score = Column(Float, nullable=True)  # score_total / scored_submissions
+    scored_submissions = Column(Integer, nullable=False, default=0)
+    score_total = Column(Float, nullable=False, default=0.0)
     total_study_time = Column(Integer, nullable=False, default=0)  # in minutes
     sessions_count = Column(Integer, nullable=False, default=0)
     
@@ -280,7 +313,8 @@ class StudentProgress(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Ensure one progress record per user per course
+    # Ensure one progress record per user per course (also the read path's index).
+    # Counters are maintained by services/course_progress.py events.
     __table_args__ = (
         UniqueConstraint('user_id', 'course_id', name='uq_as_student_progress'),
     )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime, Boolean, Text, Table, UniqueConstraint, LargeBinary
+from sqlalchemy import Column, Integer, String, ForeignKey, Enum, DateTime, Boolean, Text, Table, UniqueConstraint, LargeBinary, Date, Float, Index, text
 from sqlalchemy.orm import relationship
 from db.connection import Base
 import enum
@@ -225,6 +225,10 @@ class Assignment(Base):
     student_images = relationship("StudentImage", back_populates="assignment", cascade="all, delete-orphan")
     student_pdfs = relationship("StudentPDF", back_populates="assignment", cascade="all, delete-orphan")
     grading_sessions = relationship("GradingSession", back_populates="assignment", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index('ix_assignments_subject_active', 'subject_id', 'is_active'),
+    )
 
 # --- Grade Model ---
 class Grade(Base):
@@ -255,6 +259,7 @@ class Grade(Base):
     # Ensure one grade per student per assignment
     __table_args__ = (
         UniqueConstraint('assignment_id', 'student_id', name='uq_assignment_student'),
+        Index('ix_grades_student_assignment', 'student_id', 'assignment_id'),
     )
 
 # --- School Invitation Model ---
@@ -424,6 +429,52 @@ class GradingSession(Base):
     teacher = relationship("Teacher", back_populates="grading_sessions")
     subject = relationship("Subject", back_populates="grading_sessions")
 
+# --- Durable class grading jobs (queue and workers in services/grading_jobs.py) ---
+class GradingJob(Base):
+    __tablename__ = "grading_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False, index=True)
+    subject_id = Column(Integer, ForeignKey("subjects.id"), nullable=False)
+    teacher_id = Column(Integer, ForeignKey("teachers.id"), nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed, cancelled
+    total_students = Column(Integer, default=0)
+    created_date = Column(DateTime, default=datetime.utcnow)
+    started_date = Column(DateTime, nullable=True)
+    finished_date = Column(DateTime, nullable=True)
+    
+    items = relationship("GradingJobItem", back_populates="job", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # At most one unfinished job per assignment; enqueue relies on it
+        Index('uq_grading_jobs_active_assignment', 'assignment_id', unique=True,
+              postgresql_where=text("status NOT IN ('completed', 'cancelled')")),
+    )
+
+class GradingJobItem(Base):
+    __tablename__ = "grading_job_items"
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("grading_jobs.id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("students.id"), nullable=False)
+    student_pdf_id = Column(Integer, ForeignKey("student_pdfs.id"), nullable=True)  # Latest PDF when enqueued
+    position = Column(Integer, nullable=False, default=0)  # Grading order within the job
+    
+    # pending, running, succeeded, failed, cancelled
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    lease_owner = Column(String, nullable=True)  # Worker grading the student right now
+    lease_expires_at = Column(DateTime, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True)
+    result = Column(Text, nullable=True)  # JSON grading result
+    error = Column(Text, nullable=True)
+    updated_date = Column(DateTime, default=datetime.utcnow)
+    
+    job = relationship("GradingJob", back_populates="items")
+    
+    __table_args__ = (
+        UniqueConstraint('job_id', 'student_id', name='uq_grading_job_student'),
+        Index('ix_grading_job_items_claim', 'status', 'next_attempt_at'),
+    )
+
 
 class LessonPlan(Base):
     __tablename__ = "lesson_plans"
@@ -531,6 +582,11 @@ class CalendarEvent(Base):
     creator = relationship("User")
     attendees = relationship("CalendarEventAttendee", back_populates="event", cascade="all, delete-orphan")
     reminders = relationship("CalendarReminder", back_populates="event", cascade="all, delete-orphan")
+    exceptions = relationship("CalendarEventException", back_populates="event", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        Index('ix_calendar_events_school_active_start', 'school_id', 'is_active', 'start_date'),
+    )
 
 # --- Calendar Event Attendee Model ---
 class CalendarEventAttendee(Base):
@@ -586,6 +642,55 @@ class CalendarReminder(Base):
     event = relationship("CalendarEvent", back_populates="reminders")
     user = relationship("User")
 
+# --- Calendar Event Exception Model (one changed occurrence of a recurring event) ---
+class CalendarEventException(Base):
+    __tablename__ = "calendar_event_exceptions"
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("calendar_events.id"), nullable=False)
+    occurrence_start = Column(DateTime, nullable=False)  # Start the rule gives the occurrence
+    
+    # Either cancelled, or any of these override the series for this occurrence
+    is_cancelled = Column(Boolean, default=False)
+    title = Column(String, nullable=True)
+    description = Column(Text, nullable=True)
+    status = Column(String, nullable=True)
+    start_date = Column(DateTime, nullable=True)
+    end_date = Column(DateTime, nullable=True)
+    
+    # Management
+    created_date = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    event = relationship("CalendarEvent", back_populates="exceptions")
+    
+    # One exception per occurrence
+    __table_args__ = (
+        UniqueConstraint('event_id', 'occurrence_start', name='uq_event_occurrence_exception'),
+    )
+
+# --- Calendar Visibility Index (maintained by services/calendar_index.py) ---
+class CalendarVisibleEvent(Base):
+    __tablename__ = "calendar_visible_events"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    event_id = Column(Integer, ForeignKey("calendar_events.id"), primary_key=True)
+    school_id = Column(Integer, ForeignKey("schools.id"), nullable=False)
+    start_date = Column(DateTime, nullable=False)  # Copy of the event's start_date for range scans
+    
+    __table_args__ = (
+        Index('ix_calendar_visible_events_user_start', 'user_id', 'start_date', 'event_id'),
+        Index('ix_calendar_visible_events_event', 'event_id'),
+    )
+
+class CalendarVisibilityScope(Base):
+    __tablename__ = "calendar_visibility_scopes"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    school_id = Column(Integer, ForeignKey("schools.id"), primary_key=True, index=True)
+
+class CalendarVisibilityState(Base):
+    __tablename__ = "calendar_visibility_state"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    built_at = Column(DateTime, nullable=False)
+
 # --- Calendar View Model (for custom calendar views) ---
 class CalendarView(Base):
     __tablename__ = "calendar_views"
@@ -782,3 +887,52 @@ class ReportSchedule(Base):
     subject = relationship("Subject")
     classroom = relationship("Classroom")
     creator = relationship("User")
+
+# --- School Analytics Rollups (maintained by services/school_analytics.py) ---
+class SchoolDailyRollup(Base):
+    __tablename__ = "school_daily_rollups"
+    school_id = Column(Integer, ForeignKey("schools.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    
+    # People and structure
+    students = Column(Integer, nullable=False, default=0)
+    active_students = Column(Integer, nullable=False, default=0)
+    recent_students = Column(Integer, nullable=False, default=0)  # Enrolled in the last 30 days
+    teachers = Column(Integer, nullable=False, default=0)
+    recent_teachers = Column(Integer, nullable=False, default=0)
+    classrooms = Column(Integer, nullable=False, default=0)
+    subjects = Column(Integer, nullable=False, default=0)
+    assignments = Column(Integer, nullable=False, default=0)
+    
+    # Active grades: count, sum of percentages and letter buckets
+    grades = Column(Integer, nullable=False, default=0)
+    percent_total = Column(Float, nullable=False, default=0)
+    grade_a = Column(Integer, nullable=False, default=0)
+    grade_b = Column(Integer, nullable=False, default=0)
+    grade_c = Column(Integer, nullable=False, default=0)
+    grade_d = Column(Integer, nullable=False, default=0)
+    grade_f = Column(Integer, nullable=False, default=0)
+    
+    computed_at = Column(DateTime, nullable=False)
+
+class SchoolRollupGroup(Base):
+    __tablename__ = "school_rollup_groups"
+    school_id = Column(Integer, ForeignKey("schools.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    group_type = Column(String(16), primary_key=True)  # subject, classroom
+    group_id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=True)
+    students = Column(Integer, nullable=False, default=0)
+    grades = Column(Integer, nullable=False, default=0)
+    percent_total = Column(Float, nullable=False, default=0)
+    recent_grades = Column(Integer, nullable=False, default=0)  # Graded in the last 30 days
+    recent_percent_total = Column(Float, nullable=False, default=0)
+    previous_grades = Column(Integer, nullable=False, default=0)  # Graded 30-60 days ago
+    previous_percent_total = Column(Float, nullable=False, default=0)
+
+class SchoolRollupState(Base):
+    __tablename__ = "school_rollup_state"
+    school_id = Column(Integer, ForeignKey("schools.id"), primary_key=True)
+    computed_at = Column(DateTime, nullable=True)
+    dirty_since = Column(DateTime, nullable=True)  # First change not yet in the rollup
+    pending_events = Column(Integer, nullable=False, default=0)
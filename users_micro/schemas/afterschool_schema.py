@@ -104,6 +104,7 @@ class CourseOut(BaseModel):
     
     # Course image - base64 encoded compressed image
     image: Optional[str] = Field(default=None, description="Base64 encoded compressed image")
+    image_url: Optional[str] = Field(default=None, description="Cacheable thumbnail URL (course listings)")
     
     # Enhanced fields with default values for backward compatibility
     total_weeks: int = Field(default=8, description="Total duration in weeks")
@@ -112,6 +113,10 @@ class CourseOut(BaseModel):
     textbook_content: Optional[str] = Field(default=None, description="Original textbook content")
     generated_by_ai: bool = Field(default=False, description="Whether course was AI-generated")
     
+    # Catalog counters
+    lesson_count: int = Field(default=0, description="Active lessons")
+    enrollment_count: int = Field(default=0, description="Students who have started the course")
+    
     created_at: datetime
     updated_at: datetime
 
@@ -442,6 +447,8 @@ class StudentProgressOut(BaseModel):
     # Include blocks progress for AI-generated courses
     blocks_completed: int
     total_blocks: int
+    assignments_passed: int = 0
+    total_assignments: int = 0
     average_score: Optional[float]
     total_study_time: int
     sessions_count: int
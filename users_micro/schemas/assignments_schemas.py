@@ -169,6 +169,15 @@ class PostGradesResponse(BaseModel):
     assignment_id: int
     timestamp: datetime = Field(default_factory=datetime.utcnow)
 
+# --- Class Grading Job Schemas ---
+
+class ClassGradingJobCreate(BaseModel):
+    """Schema for queueing AI grading of a whole class (or chosen students)"""
+    subject_id: int
+    assignment_id: int
+    student_ids: Optional[List[int]] = None  # Grading order; ignored when grade_all_students is set
+    grade_all_students: bool = False
+
 # Update forward references
 AssignmentWithGrades.model_rebuild()
 
@@ -74,7 +74,7 @@ class CalendarEventBase(BaseModel):
     
     # Recurrence
     is_recurring: bool = False
-    recurrence_pattern: Optional[str] = None  # daily, weekly, monthly, yearly
+    recurrence_pattern: Optional[str] = None  # daily, weekly, monthly, yearly, or an RRULE (FREQ=WEEKLY;BYDAY=MO,WE)
     recurrence_interval: int = 1
     recurrence_end_date: Optional[datetime] = None
     
@@ -152,6 +152,9 @@ class CalendarEventResponse(CalendarEventBase):
     attendee_count: int = 0
     attendees: List[CalendarEventAttendeeInfo] = []
     
+    # Set on expanded occurrences of a recurring event (identifies the occurrence)
+    occurrence_start: Optional[datetime] = None
+    
     class Config:
         from_attributes = True
 
@@ -168,6 +171,15 @@ class CalendarEventSummary(BaseModel):
     classroom_name: Optional[str] = None
     attendee_count: int = 0
 
+class CalendarOccurrenceOverride(BaseModel):
+    occurrence_start: datetime  # Start the recurrence rule gives the occurrence
+    is_cancelled: bool = False
+    title: Optional[str] = Field(None, min_length=1, max_length=200)
+    description: Optional[str] = None
+    status: Optional[CalendarEventStatusEnum] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+
 # === ATTENDEE SCHEMAS ===
 
 class CalendarEventAttendeeCreate(BaseModel):
@@ -345,6 +357,7 @@ class CalendarEventListResponse(BaseModel):
     page: int = 1
     page_size: int = 50
     total_pages: int = 1
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
 
 # === INTEGRATION SCHEMAS ===
 
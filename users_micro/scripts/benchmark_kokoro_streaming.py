@@ -0,0 +1,89 @@
+"""
+Benchmark time-to-first-audio for Kokoro TTS: full synthesis vs sentence streaming.
+
+Each run uses a unique suffix so the shared TTS cache never short-circuits the
+measurement. Requires the optional ``kokoro`` and ``soundfile`` packages.
+
+Usage (from users_micro/):
+    python scripts/benchmark_kokoro_streaming.py --runs 5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.kokoro_tts_service import kokoro_tts_service
+
+PASSAGE = (
+    "The little red hen found a grain of wheat. She asked her friends to help her plant it. "
+    "The dog said no. The cat said no. The duck said no. "
+    "So the little red hen planted the wheat all by herself. "
+    "When the bread was ready, everyone wanted to eat it."
+)
+
+FEEDBACK_WORDS = ["wheat", "planted", "friends", "herself", "bread", "ready", "everyone", "little"]
+
+
+async def time_full_synthesis(text: str) -> float:
+    start = time.perf_counter()
+    await kokoro_tts_service.synthesize(text=text)
+    return time.perf_counter() - start
+
+
+async def time_streaming(text: str) -> tuple:
+    start = time.perf_counter()
+    _, _, chunks = await kokoro_tts_service.open_stream(text=text)
+    first_audio = None
+    async for chunk in chunks:
+        # The first chunk is the WAV header; the second carries the first sentence
+        if first_audio is None and len(chunk) > 44:
+            first_audio = time.perf_counter() - start
+    return first_audio, time.perf_counter() - start
+
+
+async def time_word_batch(words: list, batched: bool) -> float:
+    suffix = uuid.uuid4().hex[:6]
+    texts = [f"{word}. {word}. {suffix}" for word in words]
+    start = time.perf_counter()
+    if batched:
+        await kokoro_tts_service.synthesize_batch(texts=texts, speed=0.7)
+    else:
+        for text in texts:
+            await kokoro_tts_service.synthesize(text=text, speed=0.7)
+    return time.perf_counter() - start
+
+
+async def main(runs: int) -> None:
+    # Load the pipeline once so model start-up is not counted
+    await kokoro_tts_service.synthesize(text=f"warm up {uuid.uuid4().hex[:6]}")
+
+    full, stream_first, stream_total = [], [], []
+    for _ in range(runs):
+        full.append(await time_full_synthesis(f"{PASSAGE} {uuid.uuid4().hex[:6]}"))
+        first, total = await time_streaming(f"{PASSAGE} {uuid.uuid4().hex[:6]}")
+        stream_first.append(first)
+        stream_total.append(total)
+
+    sequential = [await time_word_batch(FEEDBACK_WORDS, batched=False) for _ in range(runs)]
+    batched = [await time_word_batch(FEEDBACK_WORDS, batched=True) for _ in range(runs)]
+
+    print("\n📊 Kokoro time-to-first-audio (seconds, median of %d runs)" % runs)
+    print(f"   Full synthesis (first byte = last byte): {statistics.median(full):.3f}")
+    print(f"   Streaming, first audio chunk:            {statistics.median(stream_first):.3f}")
+    print(f"   Streaming, complete:                     {statistics.median(stream_total):.3f}")
+    print(f"\n📊 {len(FEEDBACK_WORDS)} feedback words")
+    print(f"   One pipeline call per word: {statistics.median(sequential):.3f}")
+    print(f"   Single batched call:        {statistics.median(batched):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.runs))
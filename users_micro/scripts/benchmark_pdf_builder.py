@@ -0,0 +1,123 @@
+"""
+Benchmark event-loop latency while bulk uploads build PDFs.
+
+The "legacy" path is what create_pdf_from_images in Endpoints/upload.py used
+to do: compress every photo with PIL in asyncio.to_thread (sharing the GIL
+with the event loop) and run img2pdf, recompressing re-uploads from scratch.
+The pool path is services.pdf_builder. A probe task sleeps 5ms in a loop on
+the same event loop and records how late it wakes up while the uploads run.
+
+Usage (from users_micro/):
+    python scripts/benchmark_pdf_builder.py --uploads 8 --photos 4 --workers 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import statistics
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import img2pdf
+from PIL import Image, ImageDraw
+
+from services.pdf_builder import (
+    PageCache, PdfBuilder, TARGET_PDF_SIZE_BYTES, ULTRA_FALLBACK_JPEG_QUALITY, ULTRA_FALLBACK_MAX_DIMENSION,
+    ULTRA_PRIMARY_JPEG_QUALITY, ULTRA_PRIMARY_MAX_DIMENSION, compress_image_for_pdf,
+)
+
+PROBE_INTERVAL = 0.005
+
+
+def phone_photo(seed: int, size) -> bytes:
+    rng = random.Random(seed)
+    photo = Image.effect_noise((size[0] // 4, size[1] // 4), 30).resize(size).convert("RGB")
+    draw = ImageDraw.Draw(photo)
+    for line in range(60, size[1] - 60, 70):
+        draw.line((80, line, size[0] - 80, line + rng.randrange(-8, 8)), fill=(20, 20, 60), width=4)
+    out = BytesIO()
+    photo.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+async def legacy_build(images):
+    """The old create_pdf_from_images body"""
+    async def variant(max_dimension, quality):
+        pages = await asyncio.gather(*[
+            asyncio.to_thread(compress_image_for_pdf, image, max_dimension, quality) for image in images
+        ])
+        return await asyncio.to_thread(img2pdf.convert, pages)
+
+    pdf_bytes = await variant(ULTRA_PRIMARY_MAX_DIMENSION, ULTRA_PRIMARY_JPEG_QUALITY)
+    if len(pdf_bytes) > TARGET_PDF_SIZE_BYTES:
+        fallback = await variant(ULTRA_FALLBACK_MAX_DIMENSION, ULTRA_FALLBACK_JPEG_QUALITY)
+        pdf_bytes = min(pdf_bytes, fallback, key=len)
+    return pdf_bytes, hashlib.md5(pdf_bytes).hexdigest()
+
+
+async def pool_build(builder, images):
+    build = await builder.build(images)
+    return build.pdf_bytes, hashlib.md5(build.pdf_bytes).hexdigest()
+
+
+async def measure(label, build, uploads):
+    lags = []
+    running = True
+
+    async def probe():
+        while running:
+            start = time.perf_counter()
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(time.perf_counter() - start - PROBE_INTERVAL)
+
+    probe_task = asyncio.create_task(probe())
+    await asyncio.sleep(PROBE_INTERVAL * 4)
+    start = time.perf_counter()
+    results = await asyncio.gather(*(build(images) for images in uploads))
+    elapsed = time.perf_counter() - start
+    running = False
+    await probe_task
+
+    lags.sort()
+    p99 = lags[min(len(lags) - 1, int(len(lags) * 0.99))]
+    print(f"   {label:<24} wall {elapsed * 1000:8.1f} ms | loop lag p50 {statistics.median(lags) * 1000:6.1f} ms, "
+          f"p99 {p99 * 1000:7.1f} ms, max {lags[-1] * 1000:7.1f} ms")
+    return results
+
+
+def main(uploads: int, photos: int, workers: int, width: int, height: int) -> None:
+    start = time.perf_counter()
+    batches = [[phone_photo(upload * 100 + photo, (width, height)) for photo in range(photos)]
+               for upload in range(uploads)]
+    print(f"Built {uploads} uploads x {photos} photos ({width}x{height} JPEG) in {time.perf_counter() - start:.1f}s")
+
+    builder = PdfBuilder(workers=workers, cache=PageCache())
+
+    async def run():
+        await pool_build(builder, [phone_photo(-1, (64, 64))])  # start the worker processes outside the timings
+        builder.cache.clear()
+        print(f"\n📤 {uploads} concurrent uploads, {workers} worker processes")
+        await measure("Legacy to_thread", legacy_build, batches)
+        await measure("Process pool", lambda images: pool_build(builder, images), batches)
+        await measure("Process pool, re-upload", lambda images: pool_build(builder, images), batches)
+
+    try:
+        asyncio.run(run())
+    finally:
+        builder.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=8, help="Concurrent bulk uploads")
+    parser.add_argument("--photos", type=int, default=4, help="Photos per upload")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--width", type=int, default=3000)
+    parser.add_argument("--height", type=int, default=4000)
+    args = parser.parse_args()
+    main(args.uploads, args.photos, args.workers, args.width, args.height)
@@ -0,0 +1,126 @@
+"""
+Benchmark page image extraction for Gemma grading on a scanned submission.
+
+The "legacy" path is what GemmaGradingService._extract_pdf_images used to
+do: list every page's images through pypdf (decoding each one), normalize
+them one by one in the request thread and only then stop at the cap. The
+pipeline is services.gemma_services.pdf_images: it stops decoding at the
+cap, decodes in a process pool, skips duplicate pages and caches per
+checksum. Pages are synthetic scans (grey paper, text, sensor noise)
+embedded losslessly, as phone scanner apps do, or as JPEG with --jpeg.
+
+Usage (from users_micro/):
+    python scripts/benchmark_pdf_images.py --pages 50 --limit 6 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from io import BytesIO
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import img2pdf
+from PIL import Image, ImageDraw, ImageFilter
+from pypdf import PdfReader
+
+from services.gemma_services.pdf_images import PdfImageCache, PdfImageExtractor, normalize_image_bytes
+
+MAX_IMAGES_PER_SUBMISSION = 12
+MAX_IMAGE_DIMENSION = 1800
+JPEG_QUALITY = 85
+
+
+def scanned_page(number: int, size, jpeg: bool) -> bytes:
+    rng = random.Random(number)
+    page = Image.effect_noise(size, 18).point(lambda value: 200 + value // 8)
+    draw = ImageDraw.Draw(page)
+    for line in range(40, size[1] - 80, 46):
+        words = " ".join(rng.choice(("x =", "3y", "+ 12", "therefore", "f(x)", "answer:", "dx")) for _ in range(14))
+        draw.text((90, line), f"{number}.{line} {words}", fill=30)
+    page = page.filter(ImageFilter.GaussianBlur(0.6))
+    out = BytesIO()
+    page.save(out, format="JPEG" if jpeg else "PNG", quality=90, compress_level=1)
+    return out.getvalue()
+
+
+def legacy_extract(pdf_path: str, limit: int):
+    """The old sequential extraction (every image on a page decoded before truncating)"""
+    reader = PdfReader(pdf_path)
+    images = []
+    for page_number, page in enumerate(reader.pages, start=1):
+        if len(images) >= MAX_IMAGES_PER_SUBMISSION:
+            break
+        page_images = list(page.images or [])
+        page_images.sort(key=lambda img: len(getattr(img, "data", b"")), reverse=True)
+        for image_index, image_file in enumerate(page_images, start=1):
+            if len(images) >= MAX_IMAGES_PER_SUBMISSION:
+                break
+            name = str(getattr(image_file, "name", ""))
+            normalized = normalize_image_bytes(image_file.data, Path(name).suffix.lstrip("."),
+                                               MAX_IMAGE_DIMENSION, JPEG_QUALITY)
+            if normalized:
+                images.append({"bytes": normalized[0], "format": normalized[1], "page_number": page_number})
+    return images[:limit]
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples), result
+
+
+def main(pages: int, limit: int, workers: int, repeat: int, jpeg: bool, width: int, height: int) -> None:
+    workdir = tempfile.mkdtemp()
+    pdf_path = os.path.join(workdir, "scan.pdf")
+    start = time.perf_counter()
+    page_images = [scanned_page(number, (width, height), jpeg) for number in range(1, pages + 1)]
+    page_images[pages // 2] = page_images[0]  # a page scanned twice
+    Path(pdf_path).write_bytes(img2pdf.convert(page_images))
+    print(f"Built {pages}-page {'JPEG' if jpeg else 'lossless'} scan "
+          f"({os.path.getsize(pdf_path) / 1e6:.1f} MB) in {time.perf_counter() - start:.1f}s")
+
+    pooled = PdfImageExtractor(workers=workers, cache=PdfImageCache(max_bytes=0))
+    cached = PdfImageExtractor(workers=workers)
+
+    def run(extractor):
+        return asyncio.run(extractor.extract(pdf_path, limit, MAX_IMAGE_DIMENSION, JPEG_QUALITY))
+
+    try:
+        run(pooled)  # start the worker processes outside the timings
+        legacy_time, legacy_images = timed(lambda: legacy_extract(pdf_path, limit), repeat)
+        pooled_time, pooled_images = timed(lambda: run(pooled), repeat)
+        run(cached)
+        cached_time, _ = timed(lambda: run(cached), repeat)
+    finally:
+        pooled.shutdown()
+        cached.shutdown()
+
+    print(f"\n📄 {limit} images from {pages} pages, {workers} worker processes (median of {repeat})")
+    print(f"   Legacy sequential decode-everything: {legacy_time * 1000:9.1f} ms")
+    print(f"   Capped pipeline:                     {pooled_time * 1000:9.1f} ms")
+    print(f"   Cached (same submission again):      {cached_time * 1000:9.1f} ms")
+    print(f"   Pages sent: legacy {[image['page_number'] for image in legacy_images]}, "
+          f"pipeline {[image['page_number'] for image in pooled_images]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--limit", type=int, default=6, help="Images per submission (grade-class uses 6)")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--jpeg", action="store_true", help="Embed pages as JPEG instead of lossless")
+    parser.add_argument("--width", type=int, default=1700)
+    parser.add_argument("--height", type=int, default=2200)
+    args = parser.parse_args()
+    main(args.pages, args.limit, args.workers, args.repeat, args.jpeg, args.width, args.height)
@@ -0,0 +1,76 @@
+"""
+Benchmark the reading alignment engine on long passages.
+
+Compares the banded aligner with a full O(n*m) alignment and reports how many
+words the old position-by-position comparison would have mis-scored after a
+single skipped and a single inserted word.
+
+Usage (from users_micro/):
+    python scripts/benchmark_reading_alignment.py --words 2000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.reading_alignment import align_words, normalize_word, score_reading
+
+VOCABULARY = (
+    "the cat sat on a mat and saw big red dog run fast to park where kids play "
+    "with ball under tall green tree near blue lake after lunch every sunny day"
+).split()
+
+
+def build_attempt(words, rng):
+    spoken = list(words)
+    del spoken[len(spoken) // 4]                      # one skipped word
+    spoken.insert(len(spoken) // 2, "um")             # one filler word
+    for _ in range(max(1, len(words) // 50)):         # ~2% misreads
+        i = rng.randrange(len(spoken))
+        spoken[i] = spoken[i][::-1]
+    return spoken
+
+
+def positional_correct(expected, spoken):
+    return sum(
+        1 for i, word in enumerate(expected)
+        if i < len(spoken) and normalize_word(word) == normalize_word(spoken[i])
+    )
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main(word_count: int, repeat: int) -> None:
+    rng = random.Random(42)
+    expected = [rng.choice(VOCABULARY) for _ in range(word_count)]
+    spoken = build_attempt(expected, rng)
+    expected_norm = [normalize_word(w) for w in expected]
+    spoken_norm = [normalize_word(w) for w in spoken]
+
+    banded_time, _ = timed(lambda: align_words(expected_norm, spoken_norm), repeat)
+    full_time, _ = timed(lambda: align_words(expected_norm, spoken_norm, band=word_count), 1)
+    score_time, scored = timed(lambda: score_reading(" ".join(expected), " ".join(spoken)), repeat)
+
+    print(f"\n📊 Alignment benchmark: {word_count} expected words, {len(spoken)} spoken")
+    print(f"   Banded alignment:        {banded_time * 1000:8.1f} ms")
+    print(f"   Full O(n*m) alignment:   {full_time * 1000:8.1f} ms")
+    print(f"   score_reading (end2end): {score_time * 1000:8.1f} ms")
+    print(f"\n🎯 Correct words: aligned {scored['correct_count']} vs positional {positional_correct(expected, spoken)}")
+    print(f"   Local confidence: {scored['confidence']:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.words, args.repeat)
@@ -0,0 +1,191 @@
+"""
+Benchmark the student dashboard for a student with thousands of assignments.
+
+The "legacy" path is what /analytics/student-dashboard used to do: load the
+subjects, assignments and grades, then pair them with next()/any() scans
+(O(assignments x grades)). The "set-based" path is services.student_dashboard,
+which does the pairing and ranking in two SQL statements. Pass --profile to
+print the top cProfile entries for each path.
+
+Uses a throwaway SQLite file by default; pass --database-url to run against a
+scratch Postgres database (the bench_ tables are created and dropped).
+
+Usage (from users_micro/):
+    python scripts/benchmark_student_dashboard.py --assignments 2000
+"""
+
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+import services.student_dashboard as dashboard_module
+from services.student_dashboard import StudentDashboard
+
+STUDENT_ID = 1
+TABLES = ("subjects", "subject_students", "assignments", "grades")
+SCHEMA = [
+    "CREATE TABLE bench_subjects (id INTEGER PRIMARY KEY, name VARCHAR(100), school_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE bench_subject_students (subject_id INTEGER, student_id INTEGER, PRIMARY KEY (subject_id, student_id))",
+    """CREATE TABLE bench_assignments (id INTEGER PRIMARY KEY, title VARCHAR(100), description TEXT, subtopic VARCHAR(100),
+                                       subject_id INTEGER, teacher_id INTEGER, max_points INTEGER, due_date TIMESTAMP,
+                                       created_date TIMESTAMP, is_active BOOLEAN)""",
+    """CREATE TABLE bench_grades (id INTEGER PRIMARY KEY, assignment_id INTEGER, student_id INTEGER, teacher_id INTEGER,
+                                  points_earned INTEGER, feedback TEXT, graded_date TIMESTAMP, is_active BOOLEAN)""",
+    "CREATE INDEX ix_bench_assignments_subject_active ON bench_assignments (subject_id, is_active)",
+    "CREATE INDEX ix_bench_grades_student_assignment ON bench_grades (student_id, assignment_id)",
+    "CREATE UNIQUE INDEX uq_bench_grades_assignment_student ON bench_grades (assignment_id, student_id)",
+]
+
+
+def bench_sql(clause):
+    """Point a service statement at the bench_ tables"""
+    sql = str(clause)
+    for table in TABLES:
+        sql = sql.replace(f" {table} ", f" bench_{table} ")
+    return text(sql)
+
+
+def seed(session, assignments: int, subjects: int, other_students: int, now: datetime) -> None:
+    rng = random.Random(42)
+    session.execute(text("INSERT INTO bench_subjects VALUES (:id, :name, 1, true)"),
+                    [{"id": i, "name": f"Subject {i}"} for i in range(1, subjects + 1)])
+    session.execute(text("INSERT INTO bench_subject_students VALUES (:subject, :student)"),
+                    [{"subject": i, "student": s} for i in range(1, subjects + 1) for s in range(1, other_students + 2)])
+    session.execute(text("""
+        INSERT INTO bench_assignments VALUES (:id, :title, 'description', NULL, :subject, 1, 100, :due, :created, true)
+    """), [{
+        "id": i, "title": f"Assignment {i}", "subject": 1 + i % subjects,
+        "due": now + timedelta(days=rng.randint(-90, 30)), "created": now - timedelta(days=120),
+    } for i in range(1, assignments + 1)])
+    grades, grade_id = [], 0
+    for student in range(1, other_students + 2):
+        for assignment in range(1, assignments + 1):
+            if rng.random() < 0.7:
+                grade_id += 1
+                grades.append({
+                    "id": grade_id, "assignment": assignment, "student": student, "points": rng.randint(30, 100),
+                    "graded": now - timedelta(days=rng.randint(0, 90), minutes=grade_id),
+                })
+    session.execute(text("INSERT INTO bench_grades VALUES (:id, :assignment, :student, 1, :points, 'ok', :graded, true)"), grades)
+    session.commit()
+
+
+def legacy_dashboard(session, now: datetime):
+    """The old endpoint body: three loads, then Python pairing with linear scans"""
+    subjects = session.execute(text("""
+        SELECT s.* FROM bench_subjects s JOIN bench_subject_students ss ON ss.subject_id = s.id
+        WHERE ss.student_id = :student AND s.is_active = true
+    """), {"student": STUDENT_ID}).all()
+    subject_ids = [s.id for s in subjects]
+    assignments = session.execute(text(
+        f"SELECT * FROM bench_assignments WHERE is_active = true AND subject_id IN ({','.join(map(str, subject_ids))})"
+    )).all()
+    grades = session.execute(text(
+        "SELECT * FROM bench_grades WHERE student_id = :student AND is_active = true"
+    ), {"student": STUDENT_ID}).all()
+
+    max_points = 0
+    for grade in grades:
+        assignment = next((a for a in assignments if a.id == grade.assignment_id), None)
+        if assignment:
+            max_points += assignment.max_points
+    recent = sorted(grades, key=lambda g: g.graded_date, reverse=True)[:5]
+    for grade in recent:
+        assignment = next((a for a in assignments if a.id == grade.assignment_id), None)
+        next((s for s in subjects if s.id == assignment.subject_id), None)
+    upcoming = []
+    for assignment in assignments:
+        if assignment.due_date and str(assignment.due_date) > str(now):
+            if not any(g.assignment_id == assignment.id for g in grades):
+                upcoming.append(assignment)
+    for subject in subjects:
+        subject_assignments = [a for a in assignments if a.subject_id == subject.id]
+        subject_grades = [g for g in grades if any(a.id == g.assignment_id for a in subject_assignments)]
+        sum(a.max_points for a in subject_assignments if any(g.assignment_id == a.id for g in subject_grades))
+    return len(assignments), len(grades)
+
+
+def timed(fn, repeat: int):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def profile(label: str, fn) -> None:
+    profiler = cProfile.Profile()
+    profiler.enable()
+    fn()
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(8)
+    print(f"\n🔬 {label}\n" + "\n".join(out.getvalue().splitlines()[:22]))
+
+
+def main(database_url: str, assignments: int, subjects: int, other_students: int, repeat: int, show_profile: bool) -> None:
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        for table in TABLES:
+            connection.execute(text(f"DROP TABLE IF EXISTS bench_{table}"))
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    session = sessionmaker(bind=engine)()
+    now = datetime(2026, 10, 18, 12, 0)
+
+    try:
+        start = time.perf_counter()
+        seed(session, assignments, subjects, other_students, now)
+        print(f"Seeded {assignments} assignments for {other_students + 1} students in {time.perf_counter() - start:.1f}s")
+
+        for name in ("SUMMARY_SQL", "HIGHLIGHTS_SQL", "SUBJECT_SQL"):
+            setattr(dashboard_module, name, bench_sql(getattr(dashboard_module, name)))
+        service = StudentDashboard(clock=lambda: now)
+
+        legacy = lambda: legacy_dashboard(session, now)
+        overview = lambda: service.overview(session, STUDENT_ID)
+        subject = lambda: service.subject_performance(session, STUDENT_ID, 1)
+
+        print(f"\n📊 Student dashboard, {assignments} assignments over {subjects} subjects (median of {repeat})")
+        print(f"   Legacy load + Python pairing:   {timed(legacy, repeat) * 1000:9.1f} ms")
+        print(f"   Set-based overview (2 queries): {timed(overview, repeat) * 1000:9.1f} ms")
+        print(f"   Subject performance (1 query):  {timed(subject, repeat) * 1000:9.1f} ms")
+
+        if show_profile:
+            profile("legacy", legacy)
+            profile("set-based overview", overview)
+    finally:
+        session.close()
+        with engine.begin() as connection:
+            for table in TABLES:
+                connection.execute(text(f"DROP TABLE IF EXISTS bench_{table}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--assignments", type=int, default=2000)
+    parser.add_argument("--subjects", type=int, default=8)
+    parser.add_argument("--other-students", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--profile", action="store_true")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if database_url is None:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dashboard_bench.db')}"
+    main(database_url, args.assignments, args.subjects, args.other_students, args.repeat, args.profile)
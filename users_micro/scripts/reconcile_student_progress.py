@@ -0,0 +1,47 @@
+"""
+Verify event-maintained after-school progress against the source tables.
+
+Recomputes every as_student_progress counter (blocks/lessons completed,
+passed assignments, scored submissions, sessions, totals) from the session,
+submission, assignment and course-structure tables and lists the rows that
+drifted. ``--repair`` rewrites them. Also run nightly by the notification
+scheduler.
+
+Usage (from users_micro/):
+    python scripts/reconcile_student_progress.py [--course-id 12] [--repair]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db.database import get_session_local
+from services.course_progress import course_progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--course-id", type=int, default=None)
+    parser.add_argument("--repair", action="store_true", help="Rewrite drifted rows")
+    args = parser.parse_args()
+
+    db = get_session_local()()
+    try:
+        mismatches = course_progress.reconcile(db, course_id=args.course_id, repair=args.repair)
+    finally:
+        db.close()
+
+    for mismatch in mismatches:
+        fields = ", ".join(
+            f"{name}: {values['stored']} -> {values['expected']}" for name, values in mismatch["fields"].items()
+        )
+        print(f"user {mismatch['user_id']} course {mismatch['course_id']}: {fields}")
+    action = "repaired" if args.repair else "found"
+    print(f"{'✅' if not mismatches else '⚠️'} {len(mismatches)} drifted progress rows {action}")
+    return 1 if mismatches and not args.repair else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
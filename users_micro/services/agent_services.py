@@ -1,6 +1,6 @@
 """
 Kana Agent Service
-Conversational helper powered by Gemini with lightweight in-memory session state.
+Conversational helper powered by Gemini with lightweight session state.
 
 Responsibilities
 - Maintain short-lived chat sessions (TTL) so Kana can keep context across turns
@@ -18,6 +18,7 @@ from typing import Any, Dict, List, Optional, Tuple
 import google.generativeai as genai
 
 from services.gemini_service import gemini_service
+from services.session_store import SessionStore, append_capped, session_store
 from tools.inline_attachment import build_inline_part
 
 logger = logging.getLogger(__name__)
@@ -25,19 +26,19 @@ logger = logging.getLogger(__name__)
 # Session constraints
 MAX_HISTORY_MESSAGES = 20  # keep last N turns to bound prompt size
 SESSION_TTL = timedelta(hours=6)  # expire idle sessions automatically
+SESSION_NAMESPACE = "kana_agent"
 
 
 class KanaAgentService:
 	"""Lightweight conversational layer for Kana.
 
-	We keep minimal state in memory (session_id -> history, metadata) to provide
-	contextual answers without persisting to the database. Sessions are keyed by
-	UUID and pruned after SESSION_TTL.
+	We keep minimal state (session_id -> history, metadata) in the shared
+	session store to provide contextual answers without touching the main
+	database models. Sessions are keyed by UUID and expire after SESSION_TTL.
 	"""
 
-	def __init__(self) -> None:
-		self._sessions: Dict[str, Dict[str, Any]] = {}
-		self._lock = asyncio.Lock()
+	def __init__(self, store: Optional[SessionStore] = None) -> None:
+		self._store = store or session_store
 
 	async def chat(
 		self,
@@ -57,46 +58,31 @@ class KanaAgentService:
 		if not text:
 			raise ValueError("Message cannot be empty")
 
-		async with self._lock:
-			self._prune_expired()
-			sess_id, session = self._ensure_session(session_id=session_id, user_id=user_id)
+		sess_id = session_id or str(uuid.uuid4())
+		now = datetime.utcnow()
+		user_turn = {
+			"role": "user",
+			"content": text,
+			"route": route,
+			"screen_context": screen_context,
+			"timestamp": now.isoformat() + "Z",
+		}
 
+		def record_user_turn(session: Dict[str, Any]) -> None:
+			self._check_owner(session, user_id)
 			history: List[Dict[str, Any]] = session.setdefault("history", [])
 			if client_history and not history:
 				# Trust client-provided history only when the server session is new/empty
-				normalized: List[Dict[str, Any]] = []
-				for turn in client_history:
-					role = (turn.get("role") if isinstance(turn, dict) else None) or "user"
-					content = (turn.get("content") if isinstance(turn, dict) else None) or ""
-					if not str(content).strip():
-						continue
-					normalized.append({
-						"role": role,
-						"content": str(content).strip(),
-						"route": turn.get("route") if isinstance(turn, dict) else None,
-						"screen_context": turn.get("screen_context") if isinstance(turn, dict) else None,
-						"timestamp": (turn.get("timestamp") if isinstance(turn, dict) else None) or datetime.utcnow().isoformat() + "Z",
-					})
-				if normalized:
-					session["history"] = normalized[-MAX_HISTORY_MESSAGES:]
-					history = session["history"]
-			now = datetime.utcnow()
-
-			# Record the user turn
-			history.append({
-				"role": "user",
-				"content": text,
-				"route": route,
-				"screen_context": screen_context,
-				"timestamp": now.isoformat() + "Z",
-			})
+				history.extend(self._normalize_client_history(client_history)[-MAX_HISTORY_MESSAGES:])
+			# Record the user turn, keeping the most recent N turns
+			append_capped(history, [user_turn], MAX_HISTORY_MESSAGES)
 			session["updated_at"] = now
 			session["metadata"] = metadata or session.get("metadata") or {}
 
-			# Trim history to the most recent N turns
-			if len(history) > MAX_HISTORY_MESSAGES:
-				session["history"] = history[-MAX_HISTORY_MESSAGES:]
-				history = session["history"]
+		session = await self._store.update(
+			SESSION_NAMESPACE, sess_id, record_user_turn, ttl=SESSION_TTL, default=lambda: self._new_session(user_id)
+		)
+		history = session["history"]
 
 		attachments: List[Any] = []
 		if screen_capture:
@@ -131,15 +117,17 @@ class KanaAgentService:
 			"timestamp": datetime.utcnow().isoformat() + "Z",
 		}
 
-		async with self._lock:
-			# Session could be pruned between calls, so ensure it still exists
-			sess_id, session = self._ensure_session(session_id=sess_id, user_id=user_id)
-			history = session.setdefault("history", [])
-			history.append(assistant_turn)
-			if len(history) > MAX_HISTORY_MESSAGES:
-				session["history"] = history[-MAX_HISTORY_MESSAGES:]
+		def record_reply(session: Dict[str, Any]) -> None:
+			self._check_owner(session, user_id)
+			# Another worker may have recorded turns meanwhile; the reply goes after them
+			append_capped(session.setdefault("history", []), [assistant_turn], MAX_HISTORY_MESSAGES)
 			session["updated_at"] = datetime.utcnow()
 
+		# The session could have expired while Gemini was answering; it is started again then
+		session = await self._store.update(
+			SESSION_NAMESPACE, sess_id, record_reply, ttl=SESSION_TTL, default=lambda: self._new_session(user_id)
+		)
+
 		return {
 			"session_id": sess_id,
 			"reply": reply_text,
@@ -149,34 +137,35 @@ class KanaAgentService:
 			"screen_context": screen_context,
 		}
 
-	def _ensure_session(self, *, session_id: Optional[str], user_id: int) -> Tuple[str, Dict[str, Any]]:
-		"""Return an existing session or create a new one for the user."""
-		if session_id and session_id in self._sessions:
-			session = self._sessions[session_id]
-			# If the user changes, treat it as invalid to avoid cross-user leaks
-			if session.get("user_id") != user_id:
-				raise PermissionError("Session belongs to a different user")
-			return session_id, session
-
-		sess_id = session_id or str(uuid.uuid4())
-		session = {
+	def _new_session(self, user_id: int) -> Dict[str, Any]:
+		return {
 			"user_id": user_id,
 			"created_at": datetime.utcnow(),
 			"updated_at": datetime.utcnow(),
 			"history": [],
 			"metadata": {},
 		}
-		self._sessions[sess_id] = session
-		return sess_id, session
 
-	def _prune_expired(self) -> None:
-		"""Remove sessions that have been idle beyond SESSION_TTL."""
-		now = datetime.utcnow()
-		expired = [sid for sid, data in self._sessions.items() if now - data.get("updated_at", now) > SESSION_TTL]
-		for sid in expired:
-			self._sessions.pop(sid, None)
-		if expired:
-			logger.info("🧹 Pruned Kana sessions", extra={"expired": expired})
+	def _check_owner(self, session: Dict[str, Any], user_id: int) -> None:
+		# If the user changes, treat it as invalid to avoid cross-user leaks
+		if session.get("user_id") != user_id:
+			raise PermissionError("Session belongs to a different user")
+
+	def _normalize_client_history(self, client_history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+		normalized: List[Dict[str, Any]] = []
+		for turn in client_history:
+			role = (turn.get("role") if isinstance(turn, dict) else None) or "user"
+			content = (turn.get("content") if isinstance(turn, dict) else None) or ""
+			if not str(content).strip():
+				continue
+			normalized.append({
+				"role": role,
+				"content": str(content).strip(),
+				"route": turn.get("route") if isinstance(turn, dict) else None,
+				"screen_context": turn.get("screen_context") if isinstance(turn, dict) else None,
+				"timestamp": (turn.get("timestamp") if isinstance(turn, dict) else None) or datetime.utcnow().isoformat() + "Z",
+			})
+		return normalized
 
 	def _build_prompt(
 		self,
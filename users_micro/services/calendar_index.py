@@ -0,0 +1,240 @@
+"""Per-user index of visible calendar events, paged by (start_date, id).
+
+A user sees the active events of every school they run, teach at or study
+at (given the matching role), plus events they are an active attendee of
+(the same rule as ``_check_event_access``). ``calendar_visible_events``
+materializes that as one row per (user, event) carrying the event's
+``start_date``, so a month view is a single range scan on
+``(user_id, start_date, event_id)`` however many schools and attendee lists
+are involved.
+
+A user's rows are built on first read and rebuilt whenever the schools they
+can see change (``ensure`` compares the live membership with the schools in
+``calendar_visibility_scopes``; that check is one query). Event writes call
+``events_changed`` in their own transaction to re-derive the rows of those
+events for every user who has an index.
+
+Pages are keyset pages ordered by ``(start_date, event_id)``. The cursor is
+the position of the last row returned, so the next page is another range
+scan instead of an OFFSET that reads and discards every earlier event.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import IntegrityError
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+Cursor = Tuple[datetime, int]
+
+
+class InvalidCursorError(ValueError):
+    """The ``cursor`` was not produced by ``encode_cursor``."""
+
+
+def encode_cursor(start_date: datetime, event_id: int) -> str:
+    raw = json.dumps([start_date.isoformat(), event_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """Inverse of ``encode_cursor``; raises ``InvalidCursorError`` for anything malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_date, event_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(start_date), int(event_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+SCHOOLS_SQL = text("""
+    WITH granted AS (
+        SELECT r.name FROM user_roles ur JOIN roles r ON r.id = ur.role_id WHERE ur.user_id = :user_id
+    )
+    SELECT id AS school_id FROM schools
+    WHERE principal_id = :user_id AND EXISTS (SELECT 1 FROM granted WHERE name = 'principal')
+    UNION
+    SELECT school_id FROM teachers
+    WHERE user_id = :user_id AND EXISTS (SELECT 1 FROM granted WHERE name = 'teacher')
+    UNION
+    SELECT school_id FROM students
+    WHERE user_id = :user_id AND EXISTS (SELECT 1 FROM granted WHERE name = 'student')
+""")
+
+STORED_SCOPE_SQL = text("""
+    SELECT st.user_id, sc.school_id
+    FROM calendar_visibility_state st
+    LEFT JOIN calendar_visibility_scopes sc ON sc.user_id = st.user_id
+    WHERE st.user_id = :user_id
+""")
+
+REBUILD_SQL = text("""
+    INSERT INTO calendar_visible_events (user_id, event_id, school_id, start_date)
+    SELECT :user_id, e.id, e.school_id, e.start_date
+    FROM calendar_events e
+    JOIN calendar_visibility_scopes sc ON sc.school_id = e.school_id AND sc.user_id = :user_id
+    WHERE e.is_active = true
+    UNION
+    SELECT :user_id, e.id, e.school_id, e.start_date
+    FROM calendar_events e
+    JOIN calendar_event_attendees a ON a.event_id = e.id
+    WHERE a.user_id = :user_id AND a.is_active = true AND e.is_active = true
+""")
+
+EVENTS_SQL = text("""
+    INSERT INTO calendar_visible_events (user_id, event_id, school_id, start_date)
+    SELECT sc.user_id, e.id, e.school_id, e.start_date
+    FROM calendar_events e
+    JOIN calendar_visibility_scopes sc ON sc.school_id = e.school_id
+    WHERE e.id IN :event_ids AND e.is_active = true
+    UNION
+    SELECT a.user_id, e.id, e.school_id, e.start_date
+    FROM calendar_events e
+    JOIN calendar_event_attendees a ON a.event_id = e.id AND a.is_active = true
+    JOIN calendar_visibility_state st ON st.user_id = a.user_id
+    WHERE e.id IN :event_ids AND e.is_active = true
+""").bindparams(bindparam("event_ids", expanding=True))
+
+DELETE_EVENTS_SQL = text(
+    "DELETE FROM calendar_visible_events WHERE event_id IN :event_ids"
+).bindparams(bindparam("event_ids", expanding=True))
+
+
+class CalendarVisibilityIndex:
+    """Builds, maintains and pages the per-user visible events index"""
+
+    def accessible_school_ids(self, db, user_id: int) -> List[int]:
+        """Schools whose calendar the user can see, in one query"""
+        return sorted(row.school_id for row in db.execute(SCHOOLS_SQL, {"user_id": user_id}) if row.school_id is not None)
+
+    def ensure(self, db, user_id: int) -> List[int]:
+        """Build or rebuild the user's rows if their schools changed; returns the school ids"""
+        school_ids = self.accessible_school_ids(db, user_id)
+        stored = db.execute(STORED_SCOPE_SQL, {"user_id": user_id}).all()
+        if stored and sorted(row.school_id for row in stored if row.school_id is not None) == school_ids:
+            return school_ids
+        try:
+            self.rebuild(db, user_id, school_ids)
+        except IntegrityError:
+            # A concurrent request built the same index first
+            db.rollback()
+        return school_ids
+
+    def rebuild(self, db, user_id: int, school_ids: Sequence[int]) -> None:
+        params = {"user_id": user_id}
+        db.execute(text("DELETE FROM calendar_visible_events WHERE user_id = :user_id"), params)
+        db.execute(text("DELETE FROM calendar_visibility_scopes WHERE user_id = :user_id"), params)
+        db.execute(text("DELETE FROM calendar_visibility_state WHERE user_id = :user_id"), params)
+        if school_ids:
+            db.execute(text("INSERT INTO calendar_visibility_scopes (user_id, school_id) VALUES (:user_id, :school_id)"),
+                       [{"user_id": user_id, "school_id": school_id} for school_id in school_ids])
+        db.execute(REBUILD_SQL, params)
+        db.execute(text("INSERT INTO calendar_visibility_state (user_id, built_at) VALUES (:user_id, :now)"),
+                   {"user_id": user_id, "now": datetime.utcnow()})
+        db.commit()
+
+    def events_changed(self, db, event_ids: Iterable[Optional[int]]) -> None:
+        """Re-derive the rows of these events; part of the caller's transaction"""
+        event_ids = sorted({event_id for event_id in event_ids if event_id is not None})
+        if not event_ids:
+            return
+        db.execute(DELETE_EVENTS_SQL, {"event_ids": event_ids})
+        db.execute(EVENTS_SQL, {"event_ids": event_ids})
+
+    def ids_between(self, db, user_id: int, start_date: datetime, end_date: datetime) -> List[int]:
+        """Every visible event id starting in [start_date, end_date], in (start_date, id) order"""
+        return [row.event_id for row in db.execute(text("""
+            SELECT event_id FROM calendar_visible_events
+            WHERE user_id = :user_id AND start_date >= :start_date AND start_date <= :end_date
+            ORDER BY start_date, event_id
+        """), {"user_id": user_id, "start_date": start_date, "end_date": end_date})]
+
+    def recurring_ids_overlapping(self, db, user_id: int, start_date: datetime, end_date: datetime) -> List[int]:
+        """Visible recurring series that can have occurrences in [start_date, end_date]"""
+        return [row.event_id for row in db.execute(text("""
+            SELECT v.event_id FROM calendar_visible_events v
+            JOIN calendar_events e ON e.id = v.event_id
+            WHERE v.user_id = :user_id AND v.start_date <= :end_date AND e.is_recurring = true
+              AND (e.recurrence_end_date IS NULL OR e.recurrence_end_date >= :start_date)
+            ORDER BY v.start_date, v.event_id
+        """), {"user_id": user_id, "start_date": start_date, "end_date": end_date})]
+
+    def page(
+        self,
+        db,
+        user_id: int,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+        filters: Optional[Dict[str, Sequence[Any]]] = None,
+        include_completed: bool = True,
+    ) -> Tuple[List[int], Optional[str], int]:
+        """Return ``(event_ids, next_cursor, total)`` in (start_date, id) order.
+
+        ``filters`` maps ``event_type``/``priority``/``status``/``subject_id``
+        to the allowed values. ``next_cursor`` is None on the last page; one
+        extra row is fetched to know whether another page exists. ``offset``
+        is only for the legacy ``page`` parameter.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        clauses = ["v.user_id = :user_id"]
+        params: Dict[str, Any] = {"user_id": user_id}
+        expanding: List[str] = []
+        event_clauses = 0
+        if start_date is not None:
+            clauses.append("v.start_date >= :start_date")
+            params["start_date"] = start_date
+        if end_date is not None:
+            clauses.append("v.start_date <= :end_date")
+            params["end_date"] = end_date
+        if not include_completed:
+            clauses.append("e.status != 'completed'")
+            event_clauses += 1
+        for column, values in (filters or {}).items():
+            if column not in ("event_type", "priority", "status", "subject_id"):
+                raise ValueError(f"Unknown calendar filter: {column}")
+            if values:
+                clauses.append(f"e.{column} IN :{column}")
+                params[column] = [getattr(value, "name", value) for value in values]
+                expanding.append(column)
+                event_clauses += 1
+
+        where = " AND ".join(clauses)
+        # Only the filters need the events table; the plain range scan stays on the index
+        join = " JOIN calendar_events e ON e.id = v.event_id" if event_clauses else ""
+        count_sql = text(f"SELECT COUNT(*) FROM calendar_visible_events v{join} WHERE {where}")
+        count_params = dict(params)
+
+        if cursor:
+            cursor_start, cursor_id = decode_cursor(cursor)
+            where += (" AND (v.start_date > :cursor_start"
+                      " OR (v.start_date = :cursor_start AND v.event_id > :cursor_id))")
+            params.update(cursor_start=cursor_start, cursor_id=cursor_id)
+            offset = 0
+        page_sql = text(
+            f"SELECT v.event_id, v.start_date FROM calendar_visible_events v{join} WHERE {where}"
+            " ORDER BY v.start_date, v.event_id LIMIT :limit OFFSET :offset"
+        )
+        if expanding:
+            count_sql = count_sql.bindparams(*[bindparam(column, expanding=True) for column in expanding])
+            page_sql = page_sql.bindparams(*[bindparam(column, expanding=True) for column in expanding])
+
+        total = db.execute(count_sql, count_params).scalar() or 0
+        rows = db.execute(page_sql, {**params, "limit": limit + 1, "offset": max(0, int(offset))}).all()
+        if len(rows) <= limit:
+            return [row.event_id for row in rows], None, total
+
+        rows = rows[:limit]
+        last = rows[-1]
+        last_start = last.start_date if isinstance(last.start_date, datetime) else datetime.fromisoformat(str(last.start_date))
+        return [row.event_id for row in rows], encode_cursor(last_start, last.event_id), total
+
+
+calendar_index = CalendarVisibilityIndex()
@@ -0,0 +1,117 @@
+"""Read model behind the after-school course catalog.
+
+``as_courses`` carries denormalized ``lesson_count`` (active lessons) and
+``enrollment_count`` (distinct students with a study session) columns, kept
+current by the endpoints that write lessons and sessions, so listing and
+"popular" sorting are a single indexed query. Counter updates are relative
+(``SET n = n + :delta``) and so never lose a concurrent write. A student is
+counted when their ``as_course_enrollments`` row is inserted, so two first
+sessions racing in different transactions count them once.
+``refresh_course_counters`` recomputes everything exactly; the scheduler runs
+it nightly as the repair path.
+
+Course images are not part of the list payload. Each course exposes a
+thumbnail URL versioned by ``image_etag`` (a hash of the stored bytes), which
+clients and proxies can cache indefinitely.
+"""
+
+import hashlib
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, text
+
+THUMBNAIL_PATH = "/after-school/courses/{course_id}/thumbnail"
+
+
+def image_etag(image: Optional[bytes]) -> Optional[str]:
+    return hashlib.sha1(image).hexdigest() if image else None
+
+
+def thumbnail_url(course_id: int, etag: Optional[str]) -> Optional[str]:
+    """Versioned thumbnail URL, or None for a course without an image"""
+    if not etag:
+        return None
+    return THUMBNAIL_PATH.format(course_id=course_id) + f"?v={etag[:12]}"
+
+
+def adjust_lesson_count(db, course_id: int, delta: int) -> None:
+    """Apply a change in a course's active lessons; part of the caller's transaction"""
+    if delta:
+        db.execute(text(
+            "UPDATE as_courses SET lesson_count = COALESCE(lesson_count, 0) + :delta WHERE id = :course_id"
+        ), {"delta": delta, "course_id": course_id})
+
+
+def record_study_session(db, course_id: int, user_id: int, session_id: int) -> bool:
+    """Count the student as enrolled if ``session_id`` (already flushed) is their first session in the course
+
+    The (course_id, user_id) key of as_course_enrollments makes the check and
+    the increment one atomic step: a concurrent first session waits on the
+    key and then inserts nothing.
+    """
+    enrolled = db.execute(text("""
+        INSERT INTO as_course_enrollments (course_id, user_id, first_session_id, created_date)
+        VALUES (:course_id, :user_id, :session_id, CURRENT_TIMESTAMP)
+        ON CONFLICT (course_id, user_id) DO NOTHING
+        RETURNING course_id
+    """), {"course_id": course_id, "user_id": user_id, "session_id": session_id}).first()
+    if enrolled is None:
+        return False
+    db.execute(text(
+        "UPDATE as_courses SET enrollment_count = COALESCE(enrollment_count, 0) + 1 WHERE id = :course_id"
+    ), {"course_id": course_id})
+    return True
+
+
+SYNC_ENROLLMENTS_SQL = [
+    """
+    INSERT INTO as_course_enrollments (course_id, user_id, first_session_id, created_date)
+    SELECT course_id, user_id, MIN(id), CURRENT_TIMESTAMP FROM as_study_sessions
+    WHERE course_id IS NOT NULL AND user_id IS NOT NULL {sessions_filter}
+    GROUP BY course_id, user_id
+    ON CONFLICT (course_id, user_id) DO NOTHING
+    """,
+    """
+    DELETE FROM as_course_enrollments
+    WHERE NOT EXISTS (
+        SELECT 1 FROM as_study_sessions
+        WHERE as_study_sessions.course_id = as_course_enrollments.course_id
+          AND as_study_sessions.user_id = as_course_enrollments.user_id
+    ) {enrollments_filter}
+    """,
+]
+
+
+def refresh_course_counters(db, course_ids: Optional[Iterable[int]] = None) -> int:
+    """Resync enrollments and recompute the counters from the source tables; returns courses updated"""
+    statement = """
+        UPDATE as_courses SET
+            lesson_count = (
+                SELECT COUNT(*) FROM as_course_lessons
+                WHERE as_course_lessons.course_id = as_courses.id AND as_course_lessons.is_active = true
+            ),
+            enrollment_count = (
+                SELECT COUNT(*) FROM as_course_enrollments
+                WHERE as_course_enrollments.course_id = as_courses.id
+            )
+    """
+    if course_ids is None:
+        params = {}
+        filters = {"sessions_filter": "", "enrollments_filter": ""}
+    else:
+        params = {"course_ids": list(course_ids)}
+        filters = {
+            "sessions_filter": "AND course_id IN :course_ids",
+            "enrollments_filter": "AND as_course_enrollments.course_id IN :course_ids",
+        }
+        statement += " WHERE id IN :course_ids"
+
+    def prepared(sql):
+        query = text(sql)
+        return query.bindparams(bindparam("course_ids", expanding=True)) if params else query
+
+    for sync in SYNC_ENROLLMENTS_SQL:
+        db.execute(prepared(sync.format(**filters)), params)
+    result = db.execute(prepared(statement), params)
+    db.commit()
+    return result.rowcount
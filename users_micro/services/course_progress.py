@@ -0,0 +1,316 @@
+"""Incrementally maintained ``StudentProgress`` (``as_student_progress``).
+
+Progress rows are updated by domain events at write time instead of being
+recomputed on every read:
+
+- ``session_completed``         a block/lesson was marked done
+- ``submission_scored``         an AI submission got (or changed) its score
+- ``assignment_status_changed`` a student assignment moved into/out of "passed"
+- ``structure_changed``         a course's active blocks/lessons/assignments changed
+
+Each event is one relative ``UPDATE ... RETURNING`` on the progress row
+(which also serializes concurrent events for the same student and course)
+followed by one update of the derived fields, all inside the caller's
+transaction. Reads are a single fetch on ``uq_as_student_progress``.
+
+``rebuild`` computes a row from the source tables (used the first time a
+student touches a course); ``reconcile`` recomputes every row in a few grouped
+queries, reports counters that drifted and can repair them.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+
+PASSED = "passed"
+
+COUNTERS = (
+    "lessons_completed", "total_lessons", "blocks_completed", "total_blocks",
+    "assignments_passed", "total_assignments", "scored_submissions", "score_total",
+    "sessions_count", "total_study_time",
+)
+
+
+def completion_percentage(
+    blocks_completed: int,
+    total_blocks: int,
+    lessons_completed: int,
+    total_lessons: int,
+    assignments_passed: int,
+    total_assignments: int,
+) -> float:
+    """Blocks (or lessons for block-less courses) and passed assignments, averaged when both exist"""
+    parts = []
+    if total_blocks > 0:
+        parts.append(blocks_completed / total_blocks * 100.0)
+    elif total_lessons > 0:
+        parts.append(lessons_completed / total_lessons * 100.0)
+    if total_assignments > 0:
+        parts.append(assignments_passed / total_assignments * 100.0)
+    completion = sum(parts) / len(parts) if parts else 0.0
+    return round(max(0.0, min(100.0, completion)), 2)
+
+
+def derived_fields(counters: Dict[str, Any]) -> Dict[str, Any]:
+    scored = counters["scored_submissions"] or 0
+    return {
+        "completion_percentage": completion_percentage(
+            counters["blocks_completed"] or 0, counters["total_blocks"] or 0,
+            counters["lessons_completed"] or 0, counters["total_lessons"] or 0,
+            counters["assignments_passed"] or 0, counters["total_assignments"] or 0,
+        ),
+        "average_score": (counters["score_total"] or 0.0) / scored if scored else None,
+    }
+
+
+def _same(stored: Any, expected: Any) -> bool:
+    if stored is None or expected is None:
+        return stored is None and expected is None
+    return abs(stored - expected) < 1e-6
+
+
+class CourseProgressTracker:
+    # ---- reads ------------------------------------------------------------
+
+    def get(self, db, user_id: int, course_id: int) -> Dict[str, Any]:
+        """The progress row, built from the source tables if the student has none yet"""
+        row = self._fetch(db, user_id, course_id)
+        if row is None:
+            self.rebuild(db, user_id, course_id)
+            db.commit()
+            row = self._fetch(db, user_id, course_id)
+        return row
+
+    def _fetch(self, db, user_id: int, course_id: int) -> Optional[Dict[str, Any]]:
+        row = db.execute(text(
+            "SELECT * FROM as_student_progress WHERE user_id = :user_id AND course_id = :course_id"
+        ), {"user_id": user_id, "course_id": course_id}).first()
+        return dict(row._mapping) if row else None
+
+    # ---- events -----------------------------------------------------------
+
+    def session_completed(
+        self,
+        db,
+        user_id: int,
+        course_id: int,
+        block_id: Optional[int] = None,
+        lesson_id: Optional[int] = None,
+        duration_minutes: Optional[int] = None,
+    ) -> bool:
+        """A new completed study session; returns True when it completed the course"""
+        return self._apply(db, user_id, course_id, {
+            "blocks_completed": 1 if block_id else 0,
+            "lessons_completed": 1 if lesson_id else 0,
+            "sessions_count": 1,
+            "total_study_time": duration_minutes or 0,
+        })
+
+    def submission_scored(
+        self,
+        db,
+        user_id: int,
+        course_id: Optional[int],
+        previous_score: Optional[float],
+        score: Optional[float],
+    ) -> bool:
+        if course_id is None or previous_score == score:
+            return False
+        return self._apply(db, user_id, course_id, {
+            "scored_submissions": (score is not None) - (previous_score is not None),
+            "score_total": (score or 0.0) - (previous_score or 0.0),
+        })
+
+    def assignment_status_changed(
+        self,
+        db,
+        user_id: int,
+        course_id: int,
+        previous_status: Optional[str],
+        status: Optional[str],
+    ) -> bool:
+        delta = (status == PASSED) - (previous_status == PASSED)
+        if not delta:
+            return False
+        return self._apply(db, user_id, course_id, {"assignments_passed": delta})
+
+    def structure_changed(self, db, course_id: int) -> int:
+        """Re-read a course's totals into all of its progress rows; returns rows updated"""
+        db.flush()
+        totals = db.execute(text("""
+            SELECT
+                (SELECT COUNT(*) FROM as_course_blocks WHERE course_id = :course_id AND is_active = true) AS total_blocks,
+                (SELECT COUNT(*) FROM as_course_lessons WHERE course_id = :course_id AND is_active = true) AS total_lessons,
+                (SELECT COUNT(*) FROM as_course_assignments WHERE course_id = :course_id AND is_active = true) AS total_assignments
+        """), {"course_id": course_id}).first()
+        rows = db.execute(text("""
+            UPDATE as_student_progress
+            SET total_blocks = :total_blocks, total_lessons = :total_lessons, total_assignments = :total_assignments
+            WHERE course_id = :course_id
+            RETURNING *
+        """), {"course_id": course_id, **totals._mapping}).fetchall()
+        self._write_derived(db, [dict(row._mapping) for row in rows])
+        return len(rows)
+
+    # ---- rebuild / reconcile ---------------------------------------------
+
+    def rebuild(self, db, user_id: int, course_id: int) -> Dict[str, Any]:
+        """Recompute one student's row from the source tables (creating it if needed)"""
+        db.flush()
+        now = datetime.utcnow()
+        db.execute(text("""
+            INSERT INTO as_student_progress (
+                user_id, course_id, lessons_completed, total_lessons, completion_percentage,
+                blocks_completed, total_blocks, assignments_passed, total_assignments,
+                scored_submissions, score_total, total_study_time, sessions_count,
+                started_at, last_activity, created_at, updated_at
+            )
+            VALUES (:user_id, :course_id, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, :now, :now, :now, :now)
+            ON CONFLICT (user_id, course_id) DO NOTHING
+        """), {"user_id": user_id, "course_id": course_id, "now": now})
+        counters = self.expected(db, course_id=course_id, user_id=user_id)[(user_id, course_id)]
+        row = {"user_id": user_id, "course_id": course_id, **counters}
+        self._write_counters(db, [row])
+        self._write_derived(db, [row])
+        return row
+
+    def expected(self, db, course_id: Optional[int] = None, user_id: Optional[int] = None):
+        """``(user_id, course_id) -> counters`` from the source tables, for existing progress rows"""
+        filters, params = [], {}
+        if course_id is not None:
+            filters.append("p.course_id = :course_id")
+            params["course_id"] = course_id
+        if user_id is not None:
+            filters.append("p.user_id = :user_id")
+            params["user_id"] = user_id
+        where = f"WHERE {' AND '.join(filters)}" if filters else ""
+
+        rows = db.execute(text(f"""
+            SELECT p.user_id, p.course_id,
+                COALESCE(structure.total_blocks, 0) AS total_blocks,
+                COALESCE(structure.total_lessons, 0) AS total_lessons,
+                COALESCE(structure.total_assignments, 0) AS total_assignments,
+                COALESCE(sessions.blocks_completed, 0) AS blocks_completed,
+                COALESCE(sessions.lessons_completed, 0) AS lessons_completed,
+                COALESCE(sessions.sessions_count, 0) AS sessions_count,
+                COALESCE(sessions.total_study_time, 0) AS total_study_time,
+                COALESCE(scores.scored_submissions, 0) AS scored_submissions,
+                COALESCE(scores.score_total, 0) AS score_total,
+                COALESCE(passed.assignments_passed, 0) AS assignments_passed
+            FROM as_student_progress p
+            LEFT JOIN (
+                SELECT c.id AS course_id,
+                    (SELECT COUNT(*) FROM as_course_blocks b WHERE b.course_id = c.id AND b.is_active = true) AS total_blocks,
+                    (SELECT COUNT(*) FROM as_course_lessons l WHERE l.course_id = c.id AND l.is_active = true) AS total_lessons,
+                    (SELECT COUNT(*) FROM as_course_assignments a WHERE a.course_id = c.id AND a.is_active = true) AS total_assignments
+                FROM as_courses c
+            ) structure ON structure.course_id = p.course_id
+            LEFT JOIN (
+                SELECT user_id, course_id,
+                    SUM(CASE WHEN status = 'completed' AND block_id IS NOT NULL THEN 1 ELSE 0 END) AS blocks_completed,
+                    SUM(CASE WHEN status = 'completed' AND lesson_id IS NOT NULL THEN 1 ELSE 0 END) AS lessons_completed,
+                    COUNT(*) AS sessions_count,
+                    SUM(COALESCE(duration_minutes, 0)) AS total_study_time
+                FROM as_study_sessions GROUP BY user_id, course_id
+            ) sessions ON sessions.user_id = p.user_id AND sessions.course_id = p.course_id
+            LEFT JOIN (
+                SELECT user_id, course_id, COUNT(*) AS scored_submissions, SUM(ai_score) AS score_total
+                FROM as_ai_submissions WHERE ai_score IS NOT NULL GROUP BY user_id, course_id
+            ) scores ON scores.user_id = p.user_id AND scores.course_id = p.course_id
+            LEFT JOIN (
+                SELECT user_id, course_id, COUNT(*) AS assignments_passed
+                FROM as_student_assignments WHERE status = 'passed' GROUP BY user_id, course_id
+            ) passed ON passed.user_id = p.user_id AND passed.course_id = p.course_id
+            {where}
+        """), params).fetchall()
+        return {
+            (row.user_id, row.course_id): {column: getattr(row, column) for column in COUNTERS}
+            for row in rows
+        }
+
+    def reconcile(self, db, course_id: Optional[int] = None, repair: bool = False) -> List[Dict[str, Any]]:
+        """Rows whose counters (or derived fields) differ from the source tables
+
+        With ``repair`` the drifted rows are rewritten and committed.
+        """
+        expected = self.expected(db, course_id=course_id)
+        where = "WHERE course_id = :course_id" if course_id is not None else ""
+        stored = db.execute(text(f"""
+            SELECT user_id, course_id, {', '.join(COUNTERS)}, completion_percentage, average_score
+            FROM as_student_progress {where}
+        """), {"course_id": course_id}).fetchall()
+
+        mismatches, repaired = [], []
+        for row in stored:
+            wanted = expected.get((row.user_id, row.course_id))
+            if wanted is None:
+                continue
+            wanted = {**wanted, **derived_fields(wanted)}
+            drifted = {
+                column: {"stored": getattr(row, column), "expected": value}
+                for column, value in wanted.items()
+                if not _same(getattr(row, column), value)
+            }
+            if drifted:
+                mismatches.append({"user_id": row.user_id, "course_id": row.course_id, "fields": drifted})
+                repaired.append({"user_id": row.user_id, "course_id": row.course_id, **wanted})
+
+        if repair and repaired:
+            self._write_counters(db, repaired)
+            self._write_derived(db, repaired)
+            db.commit()
+        return mismatches
+
+    # ---- internals --------------------------------------------------------
+
+    def _apply(self, db, user_id: int, course_id: int, deltas: Dict[str, Any]) -> bool:
+        deltas = {column: delta for column, delta in deltas.items() if delta}
+        if not deltas:
+            return False
+        db.flush()
+        now = datetime.utcnow()
+        assignments = [f"{column} = COALESCE({column}, 0) + :d_{column}" for column in deltas]
+        params = {f"d_{column}": delta for column, delta in deltas.items()}
+        row = db.execute(text(f"""
+            UPDATE as_student_progress SET {', '.join(assignments)}, last_activity = :now
+            WHERE user_id = :user_id AND course_id = :course_id
+            RETURNING *
+        """), {**params, "user_id": user_id, "course_id": course_id, "now": now}).first()
+        if row is None:
+            # First event for this student: the source tables already include it
+            previous_completed_at = None
+            row = self.rebuild(db, user_id, course_id)
+        else:
+            row = dict(row._mapping)
+            previous_completed_at = row["completed_at"]
+            self._write_derived(db, [row])
+        return previous_completed_at is None and derived_fields(row)["completion_percentage"] >= 100.0
+
+    def _write_counters(self, db, rows: List[Dict[str, Any]]) -> None:
+        assignments = ", ".join(f"{column} = :{column}" for column in COUNTERS)
+        db.execute(text(
+            f"UPDATE as_student_progress SET {assignments} WHERE user_id = :user_id AND course_id = :course_id"
+        ), [{column: row[column] for column in ("user_id", "course_id", *COUNTERS)} for row in rows])
+
+    def _write_derived(self, db, rows: List[Dict[str, Any]]) -> None:
+        if not rows:
+            return
+        now = datetime.utcnow()
+        db.execute(text("""
+            UPDATE as_student_progress
+            SET completion_percentage = :completion_percentage,
+                average_score = :average_score,
+                completed_at = CASE
+                    WHEN completed_at IS NULL AND :completion_percentage >= 100.0 THEN :now
+                    ELSE completed_at
+                END,
+                updated_at = :now
+            WHERE user_id = :user_id AND course_id = :course_id
+        """), [
+            {"user_id": row["user_id"], "course_id": row["course_id"], "now": now, **derived_fields(row)}
+            for row in rows
+        ])
+
+
+course_progress = CourseProgressTracker()
@@ -1,12 +1,9 @@
 from pathlib import Path
-from io import BytesIO
 from typing import Any, Dict, List, Optional, Tuple
 import re
 
-from PIL import Image
-from pypdf import PdfReader
-
 from services.gemma_services.gemma_services import gemma_service
+from services.gemma_services.pdf_images import pdf_image_extractor
 
 
 class GemmaGradingService:
@@ -177,71 +174,17 @@ STYLE:
 		return True
 
 	@staticmethod
-	def _normalize_image_bytes(raw_bytes: bytes, source_ext: str) -> Optional[Tuple[bytes, str]]:
-		if not raw_bytes:
-			return None
-
-		ext = (source_ext or "").lower().strip().lstrip(".")
-		if ext == "jpg":
-			ext = "jpeg"
-
-		# Keep PNG/JPEG as-is when reasonably sized.
-		if ext in {"jpeg", "png"} and len(raw_bytes) <= 4 * 1024 * 1024:
-			return raw_bytes, ext
-
-		try:
-			with Image.open(BytesIO(raw_bytes)) as img:
-				img = img.convert("RGB")
-				img.thumbnail((
-					GemmaGradingService.MAX_IMAGE_DIMENSION,
-					GemmaGradingService.MAX_IMAGE_DIMENSION,
-				))
-
-				out = BytesIO()
-				img.save(out, format="JPEG", quality=GemmaGradingService.JPEG_QUALITY, optimize=True)
-				return out.getvalue(), "jpeg"
-		except Exception:
-			return None
-
-	@staticmethod
-	def _extract_pdf_images(pdf_path: str) -> List[Dict[str, Any]]:
-		reader = PdfReader(pdf_path)
-		images: List[Dict[str, Any]] = []
-
-		for page_number, page in enumerate(reader.pages, start=1):
-			if len(images) >= GemmaGradingService.MAX_IMAGES_PER_SUBMISSION:
-				break
-
-			page_images = list(page.images or [])
-			if not page_images:
-				continue
-
-			# Prefer larger embedded images first per page.
-			page_images.sort(key=lambda img: len(getattr(img, "data", b"")), reverse=True)
-
-			for image_index, image_file in enumerate(page_images, start=1):
-				if len(images) >= GemmaGradingService.MAX_IMAGES_PER_SUBMISSION:
-					break
-
-				raw_bytes = getattr(image_file, "data", b"")
-				name = str(getattr(image_file, "name", ""))
-				ext = Path(name).suffix.lower().lstrip(".") if name else ""
-
-				normalized = GemmaGradingService._normalize_image_bytes(raw_bytes, ext)
-				if not normalized:
-					continue
-
-				image_bytes, image_format = normalized
-				images.append(
-					{
-						"bytes": image_bytes,
-						"format": image_format,
-						"page_number": page_number,
-						"image_index": image_index,
-					}
-				)
-
-		return images
+	async def _extract_pdf_images(pdf_path: str, max_images: Optional[int] = None) -> List[Dict[str, Any]]:
+		"""Up to max_images (and MAX_IMAGES_PER_SUBMISSION) page images; see pdf_images for the pipeline."""
+		limit = GemmaGradingService.MAX_IMAGES_PER_SUBMISSION
+		if max_images is not None:
+			limit = min(limit, max_images)
+		return await pdf_image_extractor.extract(
+			pdf_path,
+			limit=limit,
+			max_dimension=GemmaGradingService.MAX_IMAGE_DIMENSION,
+			jpeg_quality=GemmaGradingService.JPEG_QUALITY,
+		)
 
 	@staticmethod
 	def _build_prompts(
@@ -378,7 +321,7 @@ REQUIRED JSON SCHEMA:
 					"insufficient_submission_evidence": True,
 				}
 
-			submission_images = GemmaGradingService._extract_pdf_images(pdf_path)
+			submission_images = await GemmaGradingService._extract_pdf_images(pdf_path)
 			if not submission_images:
 				return {"success": False, "error": "Could not extract readable page images from PDF"}
 
@@ -435,11 +378,11 @@ REQUIRED JSON SCHEMA:
 			if not Path(pdf_path).exists():
 				return {"success": False, "error": "PDF file not found"}
 
-			all_images = GemmaGradingService._extract_pdf_images(pdf_path)
+			max_images = max(1, min(20, int(max_images)))
+			all_images = await GemmaGradingService._extract_pdf_images(pdf_path, max_images)
 			if not all_images:
 				return {"success": False, "error": "Could not extract readable page images from PDF"}
 
-			max_images = max(1, min(20, int(max_images)))
 			selected_images = all_images[:max_images]
 
 			system_prompt = (
@@ -530,7 +473,7 @@ Return ONLY this JSON schema:
 				return {"success": False, "error": "Rubric is required"}
 
 			max_images = max(1, min(20, int(max_images)))
-			all_images = GemmaGradingService._extract_pdf_images(pdf_path)
+			all_images = await GemmaGradingService._extract_pdf_images(pdf_path, max_images)
 			if not all_images:
 				return {"success": False, "error": "Could not extract readable page images from PDF"}
 
@@ -0,0 +1,283 @@
+"""Page image extraction for vision grading.
+
+Submissions are mostly scans: one large embedded image per page. Gemma only
+ever sees the first few, so extraction walks the pages lazily and stops as
+soon as it has ``limit`` images. Image ids and raw stream sizes come from
+the page resources without decoding anything; the per-page "largest image
+first" order uses the encoded size. Identical embedded streams (a page
+scanned twice, a letterhead on every page) are skipped by hashing the raw
+stream before it is decoded, and identical outputs by hashing the result.
+
+Decode, resize and JPEG encode run in a process pool (``PDF_IMAGE_WORKERS``
+processes, spawned so the API's threads are not forked; 0 decodes in a
+thread instead). Each worker opens the PDF itself and keeps the last few
+readers, so only page ids cross the process boundary. Work is submitted in
+waves of exactly the number of images still missing, so pages past the cap
+are never decoded.
+
+Results are cached in memory per submission checksum. A cached extraction
+with a larger limit also answers a smaller one, since the first ``n``
+images do not depend on the limit.
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from io import BytesIO
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from PIL import Image
+from pypdf import PdfReader
+
+PDF_IMAGE_WORKERS = int(os.getenv("PDF_IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+CACHE_MAX_BYTES = int(os.getenv("PDF_IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+PASSTHROUGH_MAX_BYTES = 4 * 1024 * 1024
+READERS_PER_WORKER = 4
+
+ImageId = Union[str, List[str]]
+
+
+def normalize_image_bytes(raw_bytes: bytes, source_ext: str, max_dimension: int, jpeg_quality: int) -> Optional[Tuple[bytes, str]]:
+	"""Reasonably sized PNG/JPEG as-is; anything else resized and re-encoded as JPEG"""
+	if not raw_bytes:
+		return None
+
+	ext = (source_ext or "").lower().strip().lstrip(".")
+	if ext == "jpg":
+		ext = "jpeg"
+
+	# Keep PNG/JPEG as-is when reasonably sized.
+	if ext in {"jpeg", "png"} and len(raw_bytes) <= PASSTHROUGH_MAX_BYTES:
+		return raw_bytes, ext
+
+	try:
+		with Image.open(BytesIO(raw_bytes)) as img:
+			img = img.convert("RGB")
+			img.thumbnail((max_dimension, max_dimension))
+
+			out = BytesIO()
+			img.save(out, format="JPEG", quality=jpeg_quality, optimize=True)
+			return out.getvalue(), "jpeg"
+	except Exception:
+		return None
+
+
+def file_checksum(path: str) -> str:
+	digest = hashlib.sha256()
+	with open(path, "rb") as handle:
+		for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+			digest.update(chunk)
+	return digest.hexdigest()
+
+
+# --- Worker side (runs in the pool processes) ---
+
+_readers: "OrderedDict[Tuple[str, str], PdfReader]" = OrderedDict()
+
+
+def _reader(path: str, checksum: str) -> PdfReader:
+	key = (path, checksum)
+	reader = _readers.get(key)
+	if reader is None:
+		reader = PdfReader(path)
+		_readers[key] = reader
+		while len(_readers) > READERS_PER_WORKER:
+			_readers.popitem(last=False)
+	else:
+		_readers.move_to_end(key)
+	return reader
+
+
+def _decode_image(path: str, checksum: str, page_index: int, image_id: ImageId,
+				  max_dimension: int, jpeg_quality: int) -> Optional[Tuple[bytes, str]]:
+	"""Decode one embedded image and normalize it; None when it cannot be used"""
+	try:
+		image_file = _reader(path, checksum).pages[page_index].images[image_id]
+		raw_bytes = getattr(image_file, "data", b"")
+		name = str(getattr(image_file, "name", ""))
+	except Exception:
+		return None
+	ext = Path(name).suffix.lower().lstrip(".") if name else ""
+	return normalize_image_bytes(raw_bytes, ext, max_dimension, jpeg_quality)
+
+
+# --- Parent side ---
+
+@dataclass(frozen=True)
+class _Candidate:
+	page_number: int
+	image_index: int
+	image_id: ImageId
+
+
+def _raw_stream(page, image_id: ImageId):
+	"""The image XObject behind an id, or None for inline images"""
+	path = [image_id] if isinstance(image_id, str) else list(image_id)
+	if path[0].startswith("~"):
+		return None
+	obj = page
+	try:
+		for name in path:
+			obj = obj["/Resources"]["/XObject"][name].get_object()
+		return obj
+	except Exception:
+		return None
+
+
+def _candidates(reader: PdfReader) -> Iterator[_Candidate]:
+	"""Embedded images page by page, largest encoded stream first, raw duplicates skipped"""
+	seen = set()
+	for page_number, page in enumerate(reader.pages, start=1):
+		try:
+			image_ids = list(page.images.keys())
+		except Exception:
+			continue
+		sized = []
+		for image_id in image_ids:
+			stream = _raw_stream(page, image_id)
+			raw = getattr(stream, "_data", b"") if stream is not None else b""
+			if raw:
+				digest = hashlib.sha1(raw).digest()
+				if digest in seen:
+					continue
+				seen.add(digest)
+			sized.append((len(raw), image_id))
+		# Prefer larger embedded images first per page (stable for equal sizes).
+		sized.sort(key=lambda item: item[0], reverse=True)
+		for image_index, (_, image_id) in enumerate(sized, start=1):
+			yield _Candidate(page_number, image_index, image_id)
+
+
+@dataclass
+class _CacheEntry:
+	images: List[Dict[str, Any]]
+	limit: int
+	exhausted: bool  # The PDF had fewer usable images than the limit
+	size: int
+
+
+class PdfImageCache:
+	"""Byte-bounded LRU of extracted images per submission checksum"""
+
+	def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+		self.max_bytes = max_bytes
+		self._entries: "OrderedDict[Tuple[str, int, int], _CacheEntry]" = OrderedDict()
+		self._size = 0
+		self._lock = threading.Lock()
+
+	def get(self, key: Tuple[str, int, int], limit: int) -> Optional[List[Dict[str, Any]]]:
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is None or (entry.limit < limit and not entry.exhausted):
+				return None
+			self._entries.move_to_end(key)
+			return [dict(image) for image in entry.images[:limit]]
+
+	def put(self, key: Tuple[str, int, int], limit: int, images: List[Dict[str, Any]]) -> None:
+		size = sum(len(image["bytes"]) for image in images)
+		if size > self.max_bytes:
+			return
+		with self._lock:
+			current = self._entries.get(key)
+			if current is not None and (current.exhausted or current.limit >= limit):
+				return
+			if current is not None:
+				self._size -= current.size
+			self._entries[key] = _CacheEntry(list(images), limit, len(images) < limit, size)
+			self._entries.move_to_end(key)
+			self._size += size
+			while self._size > self.max_bytes:
+				_, evicted = self._entries.popitem(last=False)
+				self._size -= evicted.size
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self._size = 0
+
+
+class PdfImageExtractor:
+	"""Extracts up to ``limit`` normalized page images from a PDF on disk"""
+
+	def __init__(self, workers: int = PDF_IMAGE_WORKERS, cache: Optional[PdfImageCache] = None):
+		self.workers = max(0, workers)
+		self.cache = cache if cache is not None else PdfImageCache()
+		self._pool: Optional[Executor] = None
+		self._pool_lock = threading.Lock()
+
+	def _executor(self) -> Optional[Executor]:
+		if self.workers == 0:
+			return None
+		with self._pool_lock:
+			if self._pool is None:
+				self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+			return self._pool
+
+	def shutdown(self) -> None:
+		with self._pool_lock:
+			if self._pool is not None:
+				self._pool.shutdown(wait=False, cancel_futures=True)
+				self._pool = None
+
+	async def extract(self, pdf_path: str, limit: int, max_dimension: int, jpeg_quality: int) -> List[Dict[str, Any]]:
+		"""``[{"bytes", "format", "page_number", "image_index"}]`` in page order, at most ``limit``"""
+		if limit < 1:
+			return []
+		checksum = await asyncio.to_thread(file_checksum, pdf_path)
+		key = (checksum, max_dimension, jpeg_quality)
+		cached = self.cache.get(key, limit)
+		if cached is not None:
+			return cached
+
+		reader = await asyncio.to_thread(PdfReader, pdf_path)
+		candidates = _candidates(reader)
+		loop = asyncio.get_running_loop()
+		executor = self._executor()
+		images: List[Dict[str, Any]] = []
+		seen_outputs = set()
+
+		while len(images) < limit:
+			# Decode exactly as many as are still missing; failures are made up in the next wave
+			wave = await asyncio.to_thread(_take, candidates, limit - len(images))
+			if not wave:
+				break
+			decoded = await asyncio.gather(*(
+				loop.run_in_executor(executor, _decode_image, pdf_path, checksum, candidate.page_number - 1,
+									 candidate.image_id, max_dimension, jpeg_quality)
+				for candidate in wave
+			))
+			for candidate, normalized in zip(wave, decoded):
+				if not normalized:
+					continue
+				image_bytes, image_format = normalized
+				digest = hashlib.sha1(image_bytes).digest()
+				if digest in seen_outputs:
+					continue
+				seen_outputs.add(digest)
+				images.append({
+					"bytes": image_bytes,
+					"format": image_format,
+					"page_number": candidate.page_number,
+					"image_index": candidate.image_index,
+				})
+
+		self.cache.put(key, limit, images)
+		return [dict(image) for image in images]
+
+
+def _take(candidates: Iterator[_Candidate], count: int) -> List[_Candidate]:
+	wave = []
+	for candidate in candidates:
+		wave.append(candidate)
+		if len(wave) >= count:
+			break
+	return wave
+
+
+pdf_image_extractor = PdfImageExtractor()
@@ -0,0 +1,443 @@
+"""Durable class-wide grading jobs.
+
+``/grades/grade-class`` used to make the client drive grading a few students
+per request, re-querying each student's PDF blob every time. A grading job
+is instead enqueued once: ``grading_jobs`` holds one row per class job and
+``grading_job_items`` one row per student, carrying the id of the student's
+latest PDF (the blob itself is only read by the worker grading that student).
+
+Workers claim items with a lease (``lease_owner``/``lease_expires_at``). A
+claim is a guarded UPDATE, so any number of workers in any number of
+processes can poll the same tables without grading a student twice, and an
+item whose worker died is claimed again once its lease expires; a worker
+renews the lease while its grader runs, however long the model takes. Each item's
+outcome is written in the same transaction as the grade the grader wrote,
+so progress survives restarts at per-student granularity. An assignment has
+at most one unfinished job (a partial unique index), so repeated requests
+share the job already queued. A grader that
+raises is retried with exponential backoff up to ``max_attempts``; a grader
+that returns ``success: False`` (no submission, model refused) is final.
+
+``GradingWorker`` runs in the API process: it grades up to ``concurrency``
+students at once and starts at most ``rate_per_minute`` gradings a minute,
+which is what keeps the model provider from throttling a whole class. Its
+queue calls run in worker threads, so they never block the event loop that
+serves requests; graders should do the same with their own database work.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import bindparam, text
+
+logger = logging.getLogger(__name__)
+
+LEASE_SECONDS = int(os.getenv("GRADING_JOB_LEASE_SECONDS", "600"))
+MAX_ATTEMPTS = int(os.getenv("GRADING_JOB_MAX_ATTEMPTS", "3"))
+RETRY_BASE_SECONDS = int(os.getenv("GRADING_JOB_RETRY_BASE_SECONDS", "30"))
+WORKER_CONCURRENCY = int(os.getenv("GRADING_WORKER_CONCURRENCY", "4"))
+WORKER_RATE_PER_MINUTE = int(os.getenv("GRADING_WORKER_RATE_PER_MINUTE", "30"))
+WORKER_POLL_SECONDS = float(os.getenv("GRADING_WORKER_POLL_SECONDS", "2"))
+
+# Item states; a job is finished once none of its items is pending or running
+PENDING, RUNNING, SUCCEEDED, FAILED, CANCELLED = "pending", "running", "succeeded", "failed", "cancelled"
+FINISHED_JOB_STATES = ("completed", "cancelled")
+
+CLAIMABLE = """
+    ((status = 'pending' AND next_attempt_at <= :now)
+     OR (status = 'running' AND lease_expires_at < :now AND attempts < :max_attempts))
+"""
+
+CANDIDATES_SQL = text(f"""
+    SELECT id FROM grading_job_items
+    WHERE {CLAIMABLE}
+    ORDER BY job_id, position
+    LIMIT :limit
+""")
+
+CLAIM_SQL = text(f"""
+    UPDATE grading_job_items
+    SET status = 'running', lease_owner = :worker_id, lease_expires_at = :lease_expires_at,
+        attempts = attempts + 1, updated_date = :now
+    WHERE id = :id AND {CLAIMABLE}
+""")
+
+CLAIMED_SQL = text("""
+    SELECT i.id, i.job_id, i.student_id, i.student_pdf_id, i.attempts, j.assignment_id, j.subject_id, j.teacher_id
+    FROM grading_job_items i
+    JOIN grading_jobs j ON j.id = i.job_id
+    WHERE i.id IN :item_ids AND i.lease_owner = :worker_id
+    ORDER BY i.job_id, i.position
+""").bindparams(bindparam("item_ids", expanding=True))
+
+# Items whose worker kept dying while grading them (a poison submission)
+ABANDONED_SQL = text("""
+    UPDATE grading_job_items
+    SET status = 'failed', error = 'Grading did not finish after repeated attempts', lease_owner = NULL,
+        updated_date = :now
+    WHERE status = 'running' AND lease_expires_at < :now AND attempts >= :max_attempts
+    RETURNING job_id
+""")
+
+RENEW_SQL = text("""
+    UPDATE grading_job_items SET lease_expires_at = :lease_expires_at, updated_date = :now
+    WHERE id = :id AND status = 'running' AND lease_owner = :worker_id
+""")
+
+FINISH_SQL = text("""
+    UPDATE grading_job_items
+    SET status = :status, result = :result, error = :error, lease_owner = NULL, lease_expires_at = NULL,
+        next_attempt_at = :next_attempt_at, updated_date = :now
+    WHERE id = :id AND status = 'running' AND lease_owner = :worker_id
+""")
+
+COMPLETE_JOB_SQL = text("""
+    UPDATE grading_jobs SET status = 'completed', finished_date = :now
+    WHERE id = :job_id AND status NOT IN ('completed', 'cancelled')
+      AND NOT EXISTS (SELECT 1 FROM grading_job_items
+                      WHERE job_id = :job_id AND status IN ('pending', 'running'))
+""")
+
+COUNTS_SQL = text("""
+    SELECT status, COUNT(*) AS items FROM grading_job_items WHERE job_id = :job_id GROUP BY status
+""")
+
+
+@dataclass(frozen=True)
+class ClaimedItem:
+    id: int
+    job_id: int
+    student_id: int
+    student_pdf_id: Optional[int]
+    attempts: int
+    assignment_id: int
+    subject_id: int
+    teacher_id: int
+
+
+def _as_datetime(value: Any) -> Any:
+    # SQLite hands text SQL timestamps back as strings
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+class GradingJobQueue:
+    """Enqueue, claim and settle grading job items"""
+
+    def __init__(
+        self,
+        clock: Callable[[], datetime] = datetime.utcnow,
+        lease_seconds: int = LEASE_SECONDS,
+        max_attempts: int = MAX_ATTEMPTS,
+        retry_base_seconds: int = RETRY_BASE_SECONDS,
+    ):
+        self.clock = clock
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+
+    def active_job_id(self, db, assignment_id: int) -> Optional[int]:
+        """The unfinished job already grading this assignment, if any"""
+        return db.execute(text("""
+            SELECT id FROM grading_jobs
+            WHERE assignment_id = :assignment_id AND status NOT IN ('completed', 'cancelled')
+            ORDER BY id DESC LIMIT 1
+        """), {"assignment_id": assignment_id}).scalar()
+
+    def enqueue(self, db, assignment_id: int, subject_id: int, teacher_id: int,
+                students: Sequence[Tuple[int, Optional[int]]]) -> Tuple[int, bool]:
+        """Create a job for ``(student_id, student_pdf_id)`` pairs, in grading order; commits
+
+        Returns ``(job_id, created)``: if the assignment already has an unfinished
+        job, that job's id and ``False``, with nothing enqueued.
+        """
+        now = self.clock()
+        while True:
+            job_id = db.execute(text("""
+                INSERT INTO grading_jobs (assignment_id, subject_id, teacher_id, status, total_students, created_date)
+                VALUES (:assignment_id, :subject_id, :teacher_id, 'queued', :total, :now)
+                ON CONFLICT (assignment_id) WHERE status NOT IN ('completed', 'cancelled') DO NOTHING
+                RETURNING id
+            """), {
+                "assignment_id": assignment_id, "subject_id": subject_id, "teacher_id": teacher_id,
+                "total": len(students), "now": now,
+            }).scalar()
+            if job_id is not None:
+                break
+            active_job_id = self.active_job_id(db, assignment_id)
+            if active_job_id is not None:
+                db.commit()
+                return active_job_id, False
+            # The job in the way finished in between; try again
+        if students:
+            db.execute(text("""
+                INSERT INTO grading_job_items (job_id, student_id, student_pdf_id, position, status, attempts,
+                                               next_attempt_at, updated_date)
+                VALUES (:job_id, :student_id, :student_pdf_id, :position, 'pending', 0, :now, :now)
+            """), [{
+                "job_id": job_id, "student_id": student_id, "student_pdf_id": student_pdf_id,
+                "position": position, "now": now,
+            } for position, (student_id, student_pdf_id) in enumerate(students)])
+        self._complete_if_done(db, [job_id], now)
+        db.commit()
+        return job_id, True
+
+    def claim(self, db, worker_id: str, limit: int) -> List[ClaimedItem]:
+        """Lease up to ``limit`` items to ``worker_id``; commits"""
+        now = self.clock()
+        params = {"now": now, "max_attempts": self.max_attempts}
+        abandoned = {row.job_id for row in db.execute(ABANDONED_SQL, params)}
+        self._complete_if_done(db, abandoned, now)
+
+        claimed = []
+        for row in db.execute(CANDIDATES_SQL, {**params, "limit": limit}).all():
+            result = db.execute(CLAIM_SQL, {
+                **params, "id": row.id, "worker_id": worker_id,
+                "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+            })
+            if result.rowcount == 1:
+                claimed.append(row.id)
+        if not claimed:
+            db.commit()
+            return []
+
+        items = [ClaimedItem(**row._mapping) for row in db.execute(CLAIMED_SQL, {"item_ids": claimed, "worker_id": worker_id})]
+        db.execute(text("""
+            UPDATE grading_jobs SET status = 'running', started_date = COALESCE(started_date, :now)
+            WHERE id IN :job_ids AND status = 'queued'
+        """).bindparams(bindparam("job_ids", expanding=True)), {"job_ids": sorted({item.job_id for item in items}), "now": now})
+        db.commit()
+        return items
+
+    def renew(self, db, item: ClaimedItem, worker_id: str) -> bool:
+        """Extend the lease on an item still being graded; False once another worker has taken it over"""
+        now = self.clock()
+        renewed = db.execute(RENEW_SQL, {
+            "id": item.id, "worker_id": worker_id, "now": now,
+            "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+        }).rowcount == 1
+        db.commit()
+        return renewed
+
+    def succeed(self, db, item: ClaimedItem, worker_id: str, result: Dict[str, Any]) -> bool:
+        """Record a final outcome with whatever the grader wrote; commits, or rolls back if the lease was lost"""
+        status = SUCCEEDED if result.get("success") else FAILED
+        return self._finish(db, item, worker_id, status, result=result,
+                            error=None if status == SUCCEEDED else result.get("error"))
+
+    def retry(self, db, item: ClaimedItem, worker_id: str, error: str) -> bool:
+        """Put the item back with backoff, or fail it once it is out of attempts; rolls back the grader's writes"""
+        db.rollback()
+        if item.attempts >= self.max_attempts:
+            return self._finish(db, item, worker_id, FAILED, error=error)
+        delay = timedelta(seconds=self.retry_base_seconds * 2 ** (item.attempts - 1))
+        return self._finish(db, item, worker_id, PENDING, error=error, next_attempt_at=self.clock() + delay)
+
+    def cancel(self, db, job_id: int) -> None:
+        """Stop a job; items already being graded still record their result. Commits"""
+        now = self.clock()
+        db.execute(text("""
+            UPDATE grading_job_items SET status = 'cancelled', updated_date = :now
+            WHERE job_id = :job_id AND status = 'pending'
+        """), {"job_id": job_id, "now": now})
+        db.execute(text("""
+            UPDATE grading_jobs SET status = 'cancelled', finished_date = :now
+            WHERE id = :job_id AND status NOT IN ('completed', 'cancelled')
+        """), {"job_id": job_id, "now": now})
+        db.commit()
+
+    def status(self, db, job_id: int, include_items: bool = True) -> Optional[Dict[str, Any]]:
+        """Job progress: per-state counts and, optionally, every student's outcome"""
+        job = db.execute(text("SELECT * FROM grading_jobs WHERE id = :job_id"), {"job_id": job_id}).mappings().first()
+        if job is None:
+            return None
+        counts = {state: 0 for state in (PENDING, RUNNING, SUCCEEDED, FAILED, CANCELLED)}
+        counts.update({row.status: row.items for row in db.execute(COUNTS_SQL, {"job_id": job_id})})
+        status = {
+            "job_id": job["id"],
+            "assignment_id": job["assignment_id"],
+            "subject_id": job["subject_id"],
+            "teacher_id": job["teacher_id"],
+            "status": job["status"],
+            "total_students": job["total_students"],
+            "counts": counts,
+            "finished": job["status"] in FINISHED_JOB_STATES,
+            "created_date": _as_datetime(job["created_date"]),
+            "started_date": _as_datetime(job["started_date"]),
+            "finished_date": _as_datetime(job["finished_date"]),
+        }
+        if include_items:
+            status["items"] = [{
+                "student_id": row["student_id"],
+                "status": row["status"],
+                "attempts": row["attempts"],
+                "error": row["error"],
+                "result": json.loads(row["result"]) if row["result"] else None,
+                "updated_date": _as_datetime(row["updated_date"]),
+            } for row in db.execute(text("""
+                SELECT student_id, status, attempts, error, result, updated_date
+                FROM grading_job_items WHERE job_id = :job_id ORDER BY position
+            """), {"job_id": job_id}).mappings()]
+        return status
+
+    def _finish(self, db, item: ClaimedItem, worker_id: str, status: str, result: Optional[Dict[str, Any]] = None,
+                error: Optional[str] = None, next_attempt_at: Optional[datetime] = None) -> bool:
+        now = self.clock()
+        updated = db.execute(FINISH_SQL, {
+            "id": item.id, "worker_id": worker_id, "status": status, "now": now,
+            "result": json.dumps(result, default=str) if result is not None else None,
+            "error": error, "next_attempt_at": next_attempt_at,
+        }).rowcount
+        if updated != 1:
+            # Another worker took the item over after our lease ran out; its outcome wins
+            db.rollback()
+            return False
+        self._complete_if_done(db, [item.job_id], now)
+        db.commit()
+        return True
+
+    def _complete_if_done(self, db, job_ids, now: datetime) -> None:
+        for job_id in job_ids:
+            db.execute(COMPLETE_JOB_SQL, {"job_id": job_id, "now": now})
+
+
+class RateLimiter:
+    """Spaces out starts so at most ``rate_per_minute`` happen in any minute"""
+
+    def __init__(self, rate_per_minute: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], Awaitable[Any]] = asyncio.sleep):
+        self.interval = 60.0 / rate_per_minute if rate_per_minute > 0 else 0.0
+        self.clock = clock
+        self.sleep = sleep
+        self._next_start = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            now = self.clock()
+            if self._next_start > now:
+                await self.sleep(self._next_start - now)
+                now = self._next_start
+            self._next_start = now + self.interval
+
+
+Grader = Callable[[Any, ClaimedItem], Awaitable[Dict[str, Any]]]
+
+
+class GradingWorker:
+    """Polls the queue and grades claimed students concurrently"""
+
+    def __init__(
+        self,
+        queue: GradingJobQueue,
+        session_factory: Callable[[], Any],
+        grader: Grader,
+        concurrency: int = WORKER_CONCURRENCY,
+        rate_per_minute: int = WORKER_RATE_PER_MINUTE,
+        poll_seconds: float = WORKER_POLL_SECONDS,
+        worker_id: Optional[str] = None,
+        renew_seconds: Optional[float] = None,
+    ):
+        self.queue = queue
+        self.session_factory = session_factory
+        self.grader = grader
+        self.concurrency = max(1, concurrency)
+        self.rate_limiter = RateLimiter(rate_per_minute)
+        self.poll_seconds = poll_seconds
+        # Renew well before the lease runs out, so a slow renewal still lands in time
+        self.renew_seconds = renew_seconds if renew_seconds is not None else queue.lease_seconds / 3
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+
+    async def run_once(self) -> int:
+        """Claim up to ``concurrency`` items and grade them; returns how many were claimed"""
+        items = await asyncio.to_thread(self._claim)
+        await asyncio.gather(*(self._grade(item) for item in items))
+        return len(items)
+
+    def _claim(self) -> List[ClaimedItem]:
+        db = self.session_factory()
+        try:
+            return self.queue.claim(db, self.worker_id, self.concurrency)
+        finally:
+            db.close()
+
+    def _renew(self, item: ClaimedItem) -> bool:
+        db = self.session_factory()
+        try:
+            return self.queue.renew(db, item, self.worker_id)
+        finally:
+            db.close()
+
+    async def _keep_leased(self, item: ClaimedItem) -> None:
+        """Renew ``item``'s lease until cancelled, on a session of its own (the grader's may hold writes)"""
+        while True:
+            await asyncio.sleep(self.renew_seconds)
+            try:
+                if not await asyncio.to_thread(self._renew, item):
+                    logger.warning("Grading job %s student %s lease was taken over", item.job_id, item.student_id)
+                    return
+            except Exception:
+                logger.exception("Could not renew the lease on grading job %s student %s", item.job_id, item.student_id)
+
+    async def _run_grader(self, db, item: ClaimedItem) -> Dict[str, Any]:
+        lease = asyncio.create_task(self._keep_leased(item))
+        try:
+            return await self.grader(db, item)
+        finally:
+            lease.cancel()
+
+    async def _grade(self, item: ClaimedItem) -> None:
+        await self.rate_limiter.acquire()
+        db = self.session_factory()
+        try:
+            try:
+                result = await self._run_grader(db, item)
+            except Exception as e:
+                logger.warning("Grading job %s student %s attempt %s failed: %s",
+                               item.job_id, item.student_id, item.attempts, e)
+                await asyncio.to_thread(self.queue.retry, db, item, self.worker_id, str(e) or type(e).__name__)
+            else:
+                await asyncio.to_thread(self.queue.succeed, db, item, self.worker_id, result)
+        except Exception:
+            logger.exception("Could not record grading job %s student %s", item.job_id, item.student_id)
+            await asyncio.to_thread(db.rollback)
+        finally:
+            await asyncio.to_thread(db.close)
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception:
+                logger.exception("Grading worker poll failed")
+                claimed = 0
+            if not claimed:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._stopping = asyncio.Event()
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        """Finish the students in hand and stop polling"""
+        if self._task is None:
+            return
+        self._stopping.set()
+        await self._task
+        self._task = None
+
+
+grading_jobs = GradingJobQueue()
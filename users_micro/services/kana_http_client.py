@@ -0,0 +1,283 @@
+"""Pooled HTTP client for the KANA AI backend.
+
+One long-lived ``httpx.AsyncClient`` is shared by every KANA call so TCP/TLS
+connections (and HTTP/2 streams when ``h2`` is installed) are reused instead of
+being rebuilt per request. The app lifespan owns it: ``start()`` on startup and
+``aclose()`` on shutdown. Callers that run outside the app (scripts, tests) get
+a client lazily on first use.
+
+Uploads are sent as streamed ``multipart/form-data`` bodies whose file parts
+are read in chunks with aiofiles, and binary responses (e.g. generated PDFs)
+can be streamed straight to disk without buffering the whole payload.
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import mimetypes
+import os
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import aiofiles
+import httpx
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = float(os.getenv("KANA_HTTP_TIMEOUT", "300"))
+MAX_CONNECTIONS = int(os.getenv("KANA_HTTP_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("KANA_HTTP_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("KANA_HTTP_KEEPALIVE_EXPIRY", "60"))
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# httpx only negotiates HTTP/2 when the optional ``h2`` package is present.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+BINARY_CONTENT_TYPES = ("application/pdf", "application/octet-stream")
+
+
+@dataclass
+class MultipartFile:
+    """A file on disk to be sent as one part of a multipart upload."""
+
+    path: str
+    field_name: str = "files"
+    filename: Optional[str] = None
+    content_type: Optional[str] = None
+
+    @property
+    def resolved_filename(self) -> str:
+        return self.filename or Path(self.path).name
+
+    @property
+    def resolved_content_type(self) -> str:
+        if self.content_type:
+            return self.content_type
+        guessed, _ = mimetypes.guess_type(self.resolved_filename)
+        return guessed or "application/octet-stream"
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def build_multipart_body(
+    fields: Dict[str, Any],
+    files: Sequence[MultipartFile],
+    boundary: Optional[str] = None,
+) -> Tuple[str, int, Callable[[], AsyncIterator[bytes]]]:
+    """Prepare a streamed multipart body.
+
+    Returns ``(content_type, content_length, body_factory)``. The length is
+    computed from file sizes up front so the request is not chunk-encoded, and
+    ``body_factory()`` yields the body lazily, reading each file with aiofiles.
+    Non-string field values are JSON encoded.
+    """
+    boundary = boundary or uuid.uuid4().hex
+    head = f"--{boundary}\r\n".encode()
+    tail = f"--{boundary}--\r\n".encode()
+
+    field_parts: List[bytes] = []
+    for name, value in fields.items():
+        if value is None:
+            continue
+        text = value if isinstance(value, str) else json.dumps(value)
+        field_parts.append(
+            head
+            + f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'.encode()
+            + text.encode("utf-8")
+            + b"\r\n"
+        )
+
+    file_headers: List[Tuple[MultipartFile, bytes, int]] = []
+    for item in files:
+        header = (
+            head
+            + (
+                f'Content-Disposition: form-data; name="{_quote(item.field_name)}"; '
+                f'filename="{_quote(item.resolved_filename)}"\r\n'
+                f"Content-Type: {item.resolved_content_type}\r\n\r\n"
+            ).encode()
+        )
+        file_headers.append((item, header, os.path.getsize(item.path)))
+
+    content_length = (
+        sum(len(part) for part in field_parts)
+        + sum(len(header) + size + 2 for _, header, size in file_headers)
+        + len(tail)
+    )
+
+    async def body() -> AsyncIterator[bytes]:
+        for part in field_parts:
+            yield part
+        for item, header, _ in file_headers:
+            yield header
+            async with aiofiles.open(item.path, "rb") as handle:
+                while True:
+                    chunk = await handle.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    yield chunk
+            yield b"\r\n"
+        yield tail
+
+    return f"multipart/form-data; boundary={boundary}", content_length, body
+
+
+def is_binary_response(response: httpx.Response) -> bool:
+    content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+    return content_type in BINARY_CONTENT_TYPES
+
+
+async def stream_response_to_file(response: httpx.Response, output_path: str) -> int:
+    """Write a streamed response body to ``output_path`` and return the byte count.
+
+    The body is written to a sibling ``.part`` file and renamed on success so a
+    dropped connection never leaves a truncated file at ``output_path``.
+    """
+    target = Path(output_path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".part")
+    written = 0
+    try:
+        async with aiofiles.open(partial, "wb") as handle:
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                await handle.write(chunk)
+                written += len(chunk)
+        os.replace(partial, target)
+    except BaseException:
+        try:
+            partial.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+    return written
+
+
+class KanaHttpClient:
+    """Lifespan-owned, pooled async client for the KANA backend."""
+
+    def __init__(
+        self,
+        base_url: Union[str, Callable[[], str]],
+        *,
+        timeout: float = DEFAULT_TIMEOUT,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self._base_url = base_url
+        self._timeout = timeout
+        self._http2 = http2 and HTTP2_AVAILABLE
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def base_url(self) -> str:
+        value = self._base_url() if callable(self._base_url) else self._base_url
+        return value.rstrip("/")
+
+    @property
+    def is_started(self) -> bool:
+        return self._client is not None and not self._client.is_closed
+
+    def _build_client(self) -> httpx.AsyncClient:
+        kwargs: Dict[str, Any] = {
+            "base_url": self.base_url,
+            "timeout": httpx.Timeout(self._timeout, connect=10.0),
+            "limits": httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            "http2": self._http2,
+        }
+        if self._transport is not None:
+            kwargs["transport"] = self._transport
+        return httpx.AsyncClient(**kwargs)
+
+    async def start(self) -> None:
+        """Open the shared connection pool (idempotent)."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.is_started:
+                self._client = self._build_client()
+                logger.info("KANA HTTP client started (base_url=%s, http2=%s)", self.base_url, self._http2)
+
+    async def aclose(self) -> None:
+        """Close the pool; a later call will transparently reopen it."""
+        client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            await client.aclose()
+            logger.info("KANA HTTP client closed")
+
+    async def get_client(self) -> httpx.AsyncClient:
+        if not self.is_started:
+            await self.start()
+        return self._client  # type: ignore[return-value]
+
+    async def get(self, path: str, *, timeout: Optional[float] = None) -> httpx.Response:
+        client = await self.get_client()
+        return await client.get(path, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+
+    async def post_json(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        *,
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        client = await self.get_client()
+        return await client.post(path, json=payload, timeout=timeout or httpx.USE_CLIENT_DEFAULT)
+
+    @asynccontextmanager
+    async def stream_multipart(
+        self,
+        path: str,
+        *,
+        fields: Dict[str, Any],
+        files: Sequence[MultipartFile],
+        accept: str = "application/json",
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[httpx.Response]:
+        """POST a streamed multipart body and yield the un-read response.
+
+        The caller decides whether to ``aread()`` it (JSON) or hand it to
+        :func:`stream_response_to_file` (binary).
+        """
+        content_type, content_length, body = build_multipart_body(fields, files)
+        client = await self.get_client()
+        request = client.build_request(
+            "POST",
+            path,
+            content=body(),
+            headers={
+                "Content-Type": content_type,
+                "Content-Length": str(content_length),
+                "Accept": accept,
+            },
+            timeout=timeout or httpx.USE_CLIENT_DEFAULT,
+        )
+        response = await client.send(request, stream=True)
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    async def post_multipart(
+        self,
+        path: str,
+        *,
+        fields: Dict[str, Any],
+        files: Sequence[MultipartFile],
+        timeout: Optional[float] = None,
+    ) -> httpx.Response:
+        """POST a streamed multipart body and return the fully read response."""
+        async with self.stream_multipart(path, fields=fields, files=files, timeout=timeout) as response:
+            await response.aread()
+            return response
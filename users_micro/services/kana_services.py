@@ -19,11 +19,14 @@ from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 from services.gemini_service import gemini_service
+from services.session_store import SessionStore, append_capped, session_store
 from tools.inline_attachment import build_inline_part
 
 logger = logging.getLogger(__name__)
 
 SESSION_TTL = timedelta(hours=8)
+SESSION_NAMESPACE = "kana_learning"
+MAX_CLARIFY_MESSAGES = 40  # per step thread, user and assistant turns
 MAX_STEPS = 12
 MIN_STEPS = 2
 DEFAULT_EXPECTED_STEPS = 4
@@ -32,9 +35,8 @@ MAX_IMAGE_BYTES = 8 * 1024 * 1024
 
 
 class KanaLearningService:
-	def __init__(self) -> None:
-		self._sessions: Dict[str, Dict[str, Any]] = {}
-		self._lock = asyncio.Lock()
+	def __init__(self, store: Optional[SessionStore] = None) -> None:
+		self._store = store or session_store
 
 	async def start_session(
 		self,
@@ -94,17 +96,13 @@ class KanaLearningService:
 			"updated_at": now,
 		}
 
-		async with self._lock:
-			self._prune_expired_locked()
-			self._sessions[session_id] = session
+		await self._store.write(SESSION_NAMESPACE, session_id, session, 0, SESSION_TTL)
 
 		return self._build_public_state(session)
 
 	async def get_session(self, *, user_id: int, session_id: str) -> Dict[str, Any]:
-		async with self._lock:
-			self._prune_expired_locked()
-			session = self._require_session_locked(user_id=user_id, session_id=session_id)
-			return self._build_public_state(session)
+		session = await self._require_session(user_id=user_id, session_id=session_id)
+		return self._build_public_state(session)
 
 	async def clarify_current_step(
 		self,
@@ -119,18 +117,13 @@ class KanaLearningService:
 		if not text:
 			raise ValueError("Clarify message cannot be empty")
 
-		async with self._lock:
-			self._prune_expired_locked()
-			session = self._require_session_locked(user_id=user_id, session_id=session_id)
-			if session.get("completed"):
-				raise ValueError("Session is already completed")
-
-			step_index = int(session.get("current_step_index", 0))
-			step = session["steps"][step_index]
+		session = await self._require_session(user_id=user_id, session_id=session_id)
+		if session.get("completed"):
+			raise ValueError("Session is already completed")
 
-			clarify_threads: Dict[str, List[Dict[str, Any]]] = session.setdefault("clarify_threads", {})
-			step_key = str(step_index)
-			thread = clarify_threads.setdefault(step_key, [])
+		step_index = int(session.get("current_step_index", 0))
+		step = session["steps"][step_index]
+		thread = session.get("clarify_threads", {}).get(str(step_index), [])
 
 		reply = await self._generate_clarification(
 			question=session["question"],
@@ -152,17 +145,17 @@ class KanaLearningService:
 			"timestamp": datetime.utcnow().isoformat() + "Z",
 		}
 
-		async with self._lock:
-			session = self._require_session_locked(user_id=user_id, session_id=session_id)
+		def record_turns(session: Dict[str, Any]) -> None:
+			self._check_owner(session, user_id)
 			if session.get("completed"):
 				raise ValueError("Session is already completed")
-			step_index = int(session.get("current_step_index", 0))
-			step_key = str(step_index)
+			step_key = str(int(session.get("current_step_index", 0)))
 			thread = session.setdefault("clarify_threads", {}).setdefault(step_key, [])
-			thread.append(turn_user)
-			thread.append(turn_assistant)
+			append_capped(thread, [turn_user, turn_assistant], MAX_CLARIFY_MESSAGES)
 			session["updated_at"] = datetime.utcnow()
-			state = self._build_public_state(session)
+
+		session = await self._store.update(SESSION_NAMESPACE, session_id, record_turns, ttl=SESSION_TTL)
+		state = self._build_public_state(session)
 
 		return {
 			"session": state,
@@ -171,12 +164,10 @@ class KanaLearningService:
 		}
 
 	async def continue_step(self, *, user_id: int, session_id: str) -> Dict[str, Any]:
-		async with self._lock:
-			self._prune_expired_locked()
-			session = self._require_session_locked(user_id=user_id, session_id=session_id)
-
+		def advance(session: Dict[str, Any]) -> None:
+			self._check_owner(session, user_id)
 			if session.get("completed"):
-				return self._build_public_state(session)
+				return
 
 			current_idx = int(session.get("current_step_index", 0))
 			last_index = len(session["steps"]) - 1
@@ -187,17 +178,20 @@ class KanaLearningService:
 				session["current_step_index"] = current_idx + 1
 
 			session["updated_at"] = datetime.utcnow()
-			return self._build_public_state(session)
+
+		session = await self._store.update(SESSION_NAMESPACE, session_id, advance, ttl=SESSION_TTL)
+		return self._build_public_state(session)
 
 	async def restart_session(self, *, user_id: int, session_id: str) -> Dict[str, Any]:
-		async with self._lock:
-			self._prune_expired_locked()
-			session = self._require_session_locked(user_id=user_id, session_id=session_id)
+		def restart(session: Dict[str, Any]) -> None:
+			self._check_owner(session, user_id)
 			session["current_step_index"] = 0
 			session["completed"] = False
 			session["clarify_threads"] = {}
 			session["updated_at"] = datetime.utcnow()
-			return self._build_public_state(session)
+
+		session = await self._store.update(SESSION_NAMESPACE, session_id, restart, ttl=SESSION_TTL)
+		return self._build_public_state(session)
 
 	async def _generate_steps(
 		self,
@@ -546,25 +540,16 @@ class KanaLearningService:
 			"updated_at": session.get("updated_at").isoformat() + "Z" if session.get("updated_at") else None,
 		}
 
-	def _require_session_locked(self, *, user_id: int, session_id: str) -> Dict[str, Any]:
-		session = self._sessions.get(session_id)
-		if not session:
+	async def _require_session(self, *, user_id: int, session_id: str) -> Dict[str, Any]:
+		stored = await self._store.get(SESSION_NAMESPACE, session_id)
+		if stored is None:
 			raise KeyError("Session not found")
+		self._check_owner(stored.data, user_id)
+		return stored.data
+
+	def _check_owner(self, session: Dict[str, Any], user_id: int) -> None:
 		if session.get("user_id") != user_id:
 			raise PermissionError("Session belongs to another user")
-		return session
-
-	def _prune_expired_locked(self) -> None:
-		now = datetime.utcnow()
-		expired_ids = [
-			sid
-			for sid, data in self._sessions.items()
-			if now - data.get("updated_at", now) > SESSION_TTL
-		]
-		for sid in expired_ids:
-			self._sessions.pop(sid, None)
-		if expired_ids:
-			logger.info("Pruned Kana learning sessions", extra={"count": len(expired_ids)})
 
 	def _build_image_attachments(
 		self,
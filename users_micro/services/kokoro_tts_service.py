@@ -3,6 +3,13 @@
 Provides a cached wrapper around the Kokoro ONNX pipeline so we can reuse loaded
 models across requests without blocking the event loop. The synthesis call is
 run in a worker thread because Torchaudio/ONNX execution is CPU-bound.
+
+Synthesized audio goes through the shared on-disk TTS cache, so a given
+(text, voice, speed) is only ever rendered once.
+
+``open_stream`` emits audio sentence by sentence as the pipeline yields it, and
+``synthesize_batch`` renders many short texts (e.g. feedback words) in a single
+pipeline call instead of one call per word.
 """
 
 import asyncio
@@ -10,18 +17,27 @@ import base64
 import io
 import logging
 import os
-from typing import Any, Dict, Optional
+import struct
+import threading
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import numpy as np
 import soundfile as sf
 from kokoro import KPipeline
 
+from services.tts_cache import tts_audio_cache
+
 logger = logging.getLogger(__name__)
 
 DEFAULT_VOICE = os.getenv("KOKORO_DEFAULT_VOICE", "bf_isabella")
 DEFAULT_SPEED = float(os.getenv("KOKORO_DEFAULT_VOICE_SPEED", "1.0"))
 MAX_CHARS = int(os.getenv("KOKORO_TTS_MAX_CHARS", "1200"))
 SAMPLE_RATE = 24_000
+STREAM_CHUNK_BYTES = 32 * 1024
+
+# Streaming is chunked by sentence; whole-text synthesis keeps splitting on newlines
+SENTENCE_SPLIT_PATTERN = r"(?<=[.!?])\s+|\n+"
+BATCH_SPLIT_PATTERN = r"\n+"
 
 VOICE_REGISTRY = {
     "af_bella",
@@ -49,6 +65,28 @@ LANG_CODE_MAP = {
 }
 
 
+def _pcm16_bytes(audio: Any) -> bytes:
+    samples = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+    return (samples * 32767.0).astype("<i2").tobytes()
+
+
+def _streaming_wav_header(sample_rate: int = SAMPLE_RATE) -> bytes:
+    """WAV header with unknown (max) sizes so players start before the end arrives."""
+    unknown = 0xFFFFFFFF
+    return b"".join([
+        b"RIFF", struct.pack("<I", unknown), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, 1, sample_rate, sample_rate * 2, 2, 16),
+        b"data", struct.pack("<I", unknown),
+    ])
+
+
+def _encode_wav(audio_chunks: List[Any]) -> Tuple[bytes, float]:
+    waveform = np.concatenate(audio_chunks)
+    buffer = io.BytesIO()
+    sf.write(buffer, waveform, SAMPLE_RATE, format="WAV")
+    return buffer.getvalue(), waveform.shape[0] / SAMPLE_RATE
+
+
 class KokoroTTSService:
     """Small helper that lazily loads a Kokoro pipeline per language."""
 
@@ -58,17 +96,8 @@ class KokoroTTSService:
         self._global_lock = asyncio.Lock()
 
     async def synthesize(self, *, text: str, voice: Optional[str] = None, speed: float = DEFAULT_SPEED) -> Dict[str, Any]:
-        normalized_text = (text or "").strip()
-        if not normalized_text:
-            raise ValueError("Text to synthesize cannot be empty")
-        if len(normalized_text) > MAX_CHARS:
-            raise ValueError(f"Text is too long for Kokoro (max {MAX_CHARS} characters)")
-
-        voice_choice = self._normalize_voice(voice)
-        lang_code = self._infer_lang_code(voice_choice)
-        speed = max(0.5, min(speed, 1.5))
-
-        pipeline = await self._get_pipeline(lang_code)
+        normalized_text, voice_choice, speed = self._validate(text, voice, speed)
+        pipeline = await self._get_pipeline(self._infer_lang_code(voice_choice))
 
         def _generate() -> Dict[str, Any]:
             audio_chunks = []
@@ -87,26 +116,194 @@ class KokoroTTSService:
             if not audio_chunks:
                 raise RuntimeError("Kokoro returned no audio")
 
-            waveform = np.concatenate(audio_chunks)
-            buffer = io.BytesIO()
-            sf.write(buffer, waveform, SAMPLE_RATE, format="WAV")
-            duration_seconds = waveform.shape[0] / SAMPLE_RATE
+            audio_bytes, duration_seconds = _encode_wav(audio_chunks)
             return {
-                "audio_bytes": buffer.getvalue(),
+                "audio_bytes": audio_bytes,
                 "duration_seconds": duration_seconds,
             }
 
-        result = await asyncio.to_thread(_generate)
-        audio_b64 = base64.b64encode(result["audio_bytes"]).decode("utf-8")
+        async def _produce():
+            result = await asyncio.to_thread(_generate)
+            metadata = {
+                "duration_seconds": result["duration_seconds"],
+                "voice": voice_choice,
+                "sample_rate": SAMPLE_RATE,
+            }
+            return result["audio_bytes"], "wav", metadata
+
+        cache_key = tts_audio_cache.make_key(normalized_text, voice_choice, speed, "kokoro")
+        cached = await tts_audio_cache.get_or_create(cache_key, _produce)
+        audio_bytes = await asyncio.to_thread(cached.path.read_bytes)
+        audio_b64 = base64.b64encode(audio_bytes).decode("utf-8")
 
         return {
             "audio_base64": audio_b64,
-            "mime_type": "audio/wav",
+            "mime_type": cached.media_type,
             "sample_rate": SAMPLE_RATE,
             "voice": voice_choice,
-            "duration_seconds": result["duration_seconds"],
+            "duration_seconds": cached.metadata.get("duration_seconds", 0.0),
+            "etag": cached.etag,
+            "cached": cached.cache_hit,
         }
 
+    async def open_stream(
+        self,
+        *,
+        text: str,
+        voice: Optional[str] = None,
+        speed: float = DEFAULT_SPEED,
+    ) -> Tuple[str, bool, AsyncIterator[bytes]]:
+        """Start streaming synthesis; returns ``(media_type, cache_hit, chunks)``.
+
+        A cache hit streams the stored file. Otherwise a WAV header is sent
+        immediately and PCM for each sentence follows as soon as the pipeline
+        yields it; the complete clip is written to the cache at the end.
+        """
+        normalized_text, voice_choice, speed = self._validate(text, voice, speed)
+        cache_key = tts_audio_cache.make_key(normalized_text, voice_choice, speed, "kokoro")
+
+        cached = tts_audio_cache.lookup(cache_key)
+        if cached:
+            async def _from_cache() -> AsyncIterator[bytes]:
+                with open(cached.path, "rb") as handle:
+                    while True:
+                        chunk = await asyncio.to_thread(handle.read, STREAM_CHUNK_BYTES)
+                        if not chunk:
+                            break
+                        yield chunk
+
+            return cached.media_type, True, _from_cache()
+
+        pipeline = await self._get_pipeline(self._infer_lang_code(voice_choice))
+
+        async def _live() -> AsyncIterator[bytes]:
+            loop = asyncio.get_running_loop()
+            queue: asyncio.Queue = asyncio.Queue()
+            cancelled = threading.Event()
+            done = object()
+
+            def _produce_chunks() -> None:
+                try:
+                    generator = pipeline(
+                        normalized_text,
+                        voice=voice_choice,
+                        speed=speed,
+                        split_pattern=SENTENCE_SPLIT_PATTERN,
+                    )
+                    for _, _, audio in generator:
+                        if cancelled.is_set():
+                            break
+                        loop.call_soon_threadsafe(queue.put_nowait, audio)
+                except Exception as exc:  # noqa: BLE001
+                    loop.call_soon_threadsafe(queue.put_nowait, RuntimeError(f"Kokoro generation failed: {exc}"))
+                finally:
+                    loop.call_soon_threadsafe(queue.put_nowait, done)
+
+            worker = loop.run_in_executor(None, _produce_chunks)
+            audio_chunks: List[Any] = []
+            try:
+                yield _streaming_wav_header()
+                while True:
+                    item = await queue.get()
+                    if item is done:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    audio_chunks.append(item)
+                    yield _pcm16_bytes(item)
+            finally:
+                cancelled.set()
+                await worker
+
+            if audio_chunks:
+                audio_bytes, duration_seconds = await asyncio.to_thread(_encode_wav, audio_chunks)
+
+                async def _already_rendered():
+                    return audio_bytes, "wav", {
+                        "duration_seconds": duration_seconds,
+                        "voice": voice_choice,
+                        "sample_rate": SAMPLE_RATE,
+                    }
+
+                try:
+                    await tts_audio_cache.get_or_create(cache_key, _already_rendered)
+                except Exception as exc:  # noqa: BLE001 - caching must not break a finished stream
+                    logger.warning("Could not cache streamed Kokoro audio: %s", exc)
+
+        return "audio/wav", False, _live()
+
+    async def synthesize_batch(
+        self,
+        *,
+        texts: List[str],
+        voice: Optional[str] = None,
+        speed: float = DEFAULT_SPEED,
+    ) -> List[Any]:
+        """Render many short texts with one pipeline call; returns cache entries in input order.
+
+        Texts already in the cache are skipped. The misses are joined one per
+        line so the pipeline yields exactly one segment per text; if the segment
+        count does not line up (e.g. a text the pipeline split further), the
+        affected texts fall back to individual synthesis.
+        """
+        voice_choice = self._normalize_voice(voice)
+        speed = max(0.5, min(speed, 1.5))
+        cleaned = [" ".join((text or "").split()) for text in texts]
+        keys = [tts_audio_cache.make_key(text, voice_choice, speed, "kokoro") for text in cleaned]
+
+        entries: List[Any] = [tts_audio_cache.lookup(key) if text else None for key, text in zip(keys, cleaned)]
+        misses = [i for i, entry in enumerate(entries) if entry is None and cleaned[i]]
+        if not misses:
+            return entries
+
+        pipeline = await self._get_pipeline(self._infer_lang_code(voice_choice))
+
+        def _generate_all() -> List[Any]:
+            generator = pipeline(
+                "\n".join(cleaned[i] for i in misses),
+                voice=voice_choice,
+                speed=speed,
+                split_pattern=BATCH_SPLIT_PATTERN,
+            )
+            return [audio for _, _, audio in generator]
+
+        try:
+            segments = await asyncio.to_thread(_generate_all)
+        except Exception as exc:  # noqa: BLE001
+            raise RuntimeError(f"Kokoro batch generation failed: {exc}") from exc
+
+        if len(segments) == len(misses):
+            for index, audio in zip(misses, segments):
+                audio_bytes, duration_seconds = await asyncio.to_thread(_encode_wav, [audio])
+
+                async def _rendered(audio_bytes=audio_bytes, duration_seconds=duration_seconds):
+                    return audio_bytes, "wav", {
+                        "duration_seconds": duration_seconds,
+                        "voice": voice_choice,
+                        "sample_rate": SAMPLE_RATE,
+                    }
+
+                entries[index] = await tts_audio_cache.get_or_create(keys[index], _rendered)
+        else:
+            logger.warning(
+                "Kokoro batch returned %s segments for %s texts; synthesizing individually",
+                len(segments),
+                len(misses),
+            )
+            for index in misses:
+                await self.synthesize(text=cleaned[index], voice=voice_choice, speed=speed)
+                entries[index] = tts_audio_cache.lookup(keys[index])
+
+        return entries
+
+    def _validate(self, text: str, voice: Optional[str], speed: float) -> Tuple[str, str, float]:
+        normalized_text = (text or "").strip()
+        if not normalized_text:
+            raise ValueError("Text to synthesize cannot be empty")
+        if len(normalized_text) > MAX_CHARS:
+            raise ValueError(f"Text is too long for Kokoro (max {MAX_CHARS} characters)")
+        return normalized_text, self._normalize_voice(voice), max(0.5, min(speed, 1.5))
+
     async def _get_pipeline(self, lang_code: str) -> KPipeline:
         async with self._global_lock:
             if lang_code in self._pipelines:
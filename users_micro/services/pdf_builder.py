@@ -0,0 +1,265 @@
+"""Image-to-PDF builds for bulk uploads.
+
+``/bulk-upload-to-pdf`` turns a student's photos into one small PDF: every
+page is flattened, resized and re-encoded as JPEG, then ``img2pdf`` wraps
+the JPEGs without touching them again. A second, smaller pass runs when the
+first PDF is over the 500KB target.
+
+The compression is pure CPU work, so it runs in a bounded process pool
+(``PDF_BUILD_WORKERS`` processes, spawned so the API's threads are not
+forked; 0 compresses in threads instead) and the event loop only awaits it.
+A build keeps at most one page per worker in the pool, so concurrent
+uploads take turns instead of queueing behind the largest one.
+Compressed pages are cached by the SHA-256 of the uploaded bytes and the
+pass settings, so re-uploading the same photos, or the same photo twice in
+one upload, compresses it once.
+
+Each build has a CPU time budget (``PDF_BUILD_CPU_BUDGET_SECONDS``). Workers
+report the CPU time every page cost; a build that goes over its budget is
+cancelled with ``PdfBuildBudgetExceeded``, and the fallback pass is skipped
+when what is left of the budget would not cover it.
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import img2pdf
+from PIL import Image, ImageOps
+
+PDF_BUILD_WORKERS = int(os.getenv("PDF_BUILD_WORKERS", str(min(4, os.cpu_count() or 1))))
+CPU_BUDGET_SECONDS = float(os.getenv("PDF_BUILD_CPU_BUDGET_SECONDS", "20"))
+CACHE_MAX_BYTES = int(os.getenv("PDF_BUILD_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+TARGET_PDF_SIZE_BYTES = 500 * 1024  # 500KB target for fast DB storage and download
+MIN_ACCEPTABLE_JPEG_QUALITY = 24
+# Ultra preset tuned for speed and very small DB payloads.
+ULTRA_PRIMARY_MAX_DIMENSION = 1000
+ULTRA_PRIMARY_JPEG_QUALITY = 34
+ULTRA_FALLBACK_MAX_DIMENSION = 800
+ULTRA_FALLBACK_JPEG_QUALITY = 28
+
+PageKey = Tuple[str, int, int]
+
+
+class PdfBuildBudgetExceeded(Exception):
+    """The images cost more CPU time to compress than one upload may use"""
+
+
+def compress_image_for_pdf(image_data: bytes, max_dimension: int, quality: int) -> bytes:
+    """Convert incoming image bytes to optimized JPEG bytes for fast PDF generation."""
+    if not image_data:
+        raise ValueError("Empty image data")
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        image = ImageOps.exif_transpose(image)
+
+        # Flatten transparency to white because JPEG does not support alpha.
+        if image.mode in ("RGBA", "LA", "P"):
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(
+            buffer,
+            format="JPEG",
+            quality=max(MIN_ACCEPTABLE_JPEG_QUALITY, quality),
+            optimize=True,
+            progressive=True,
+            subsampling="4:2:0"
+        )
+        return buffer.getvalue()
+
+
+# --- Worker side (runs in the pool processes) ---
+
+def _compress_page(image_data: bytes, max_dimension: int, quality: int) -> Tuple[bytes, float]:
+    """One compressed page and the CPU seconds it took"""
+    start = time.thread_time()
+    page = compress_image_for_pdf(image_data, max_dimension, quality)
+    return page, time.thread_time() - start
+
+
+def _assemble(pages: List[bytes]) -> Tuple[bytes, float]:
+    start = time.thread_time()
+    pdf_bytes = img2pdf.convert(pages)
+    return pdf_bytes, time.thread_time() - start
+
+
+# --- Parent side ---
+
+class PageCache:
+    """Byte-bounded LRU of compressed pages keyed by (sha256, max_dimension, quality)"""
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._pages: "OrderedDict[PageKey, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: PageKey) -> Optional[bytes]:
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key: PageKey, page: bytes) -> None:
+        if len(page) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._pages.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._pages[key] = page
+            self._size += len(page)
+            while self._size > self.max_bytes:
+                _, evicted = self._pages.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pages.clear()
+            self._size = 0
+
+
+@dataclass
+class PdfBuild:
+    pdf_bytes: bytes
+    target_size_achieved: bool
+    cpu_seconds: float
+    pages_compressed: int  # Pages that were not already cached
+
+
+class _Budget:
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.spent = 0.0
+
+    def charge(self, cpu_seconds: float) -> None:
+        self.spent += cpu_seconds
+        if self.spent > self.seconds:
+            raise PdfBuildBudgetExceeded(
+                f"Compressing these images needs more than {self.seconds:g}s of CPU time; upload fewer or smaller images"
+            )
+
+    @property
+    def remaining(self) -> float:
+        return self.seconds - self.spent
+
+
+class PdfBuilder:
+    """Builds upload PDFs in a process pool with a content-addressed page cache"""
+
+    def __init__(self, workers: int = PDF_BUILD_WORKERS, cache: Optional[PageCache] = None,
+                 cpu_budget_seconds: float = CPU_BUDGET_SECONDS):
+        self.workers = max(0, workers)
+        self.window = max(1, self.workers)
+        self.cache = cache if cache is not None else PageCache()
+        self.cpu_budget_seconds = cpu_budget_seconds
+        self._pool: Optional[Executor] = None
+        self._pool_lock = threading.Lock()
+
+    def _executor(self) -> Optional[Executor]:
+        if self.workers == 0:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+            return self._pool
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                # Queued pages are dropped; at most one running page per worker is waited for
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    async def build(self, images: Sequence[bytes], target_size: int = TARGET_PDF_SIZE_BYTES,
+                    cpu_budget_seconds: Optional[float] = None) -> PdfBuild:
+        """One page per image, smallest of the primary and (when needed) fallback pass"""
+        if not images:
+            raise ValueError("No processable images were provided")
+        digests = await asyncio.to_thread(lambda: [hashlib.sha256(image).hexdigest() for image in images])
+        budget = _Budget(self.cpu_budget_seconds if cpu_budget_seconds is None else cpu_budget_seconds)
+
+        primary, compressed = await self._build_variant(
+            images, digests, ULTRA_PRIMARY_MAX_DIMENSION, ULTRA_PRIMARY_JPEG_QUALITY, budget)
+        best = primary
+        primary_cost = budget.spent
+        # Only one extra ultra-pass to keep latency low while forcing smaller output.
+        if len(primary) > target_size and budget.remaining >= primary_cost:
+            fallback, fallback_compressed = await self._build_variant(
+                images, digests, ULTRA_FALLBACK_MAX_DIMENSION, ULTRA_FALLBACK_JPEG_QUALITY, budget)
+            compressed += fallback_compressed
+            if len(fallback) <= len(primary):
+                best = fallback
+
+        return PdfBuild(best, len(best) <= target_size, budget.spent, compressed)
+
+    async def _build_variant(self, images: Sequence[bytes], digests: List[str], max_dimension: int,
+                             quality: int, budget: _Budget) -> Tuple[bytes, int]:
+        loop = asyncio.get_running_loop()
+        executor = self._executor()
+        pages: Dict[PageKey, bytes] = {}
+        todo: Dict[PageKey, bytes] = {}
+        for image, digest in zip(images, digests):
+            key = (digest, max_dimension, quality)
+            if key in pages or key in todo:
+                continue  # Same photo twice in one upload
+            cached = self.cache.get(key)
+            if cached is not None:
+                pages[key] = cached
+            else:
+                todo[key] = image
+
+        # An over-budget build stops before the rest of its pages start
+        queued = iter(todo.items())
+        in_flight = set()
+        try:
+            while True:
+                for key, image in queued:
+                    in_flight.add(asyncio.ensure_future(
+                        _keyed(key, loop.run_in_executor(executor, _compress_page, image, max_dimension, quality))))
+                    if len(in_flight) >= self.window:
+                        break
+                if not in_flight:
+                    break
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    key, page, cpu_seconds = task.result()
+                    pages[key] = page
+                    self.cache.put(key, page)
+                    budget.charge(cpu_seconds)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+
+        pdf_bytes, cpu_seconds = await loop.run_in_executor(
+            executor, _assemble, [pages[(digest, max_dimension, quality)] for digest in digests])
+        budget.charge(cpu_seconds)
+        return pdf_bytes, len(todo)
+
+
+async def _keyed(key: PageKey, compression: "asyncio.Future[Tuple[bytes, float]]") -> Tuple[PageKey, bytes, float]:
+    page, cpu_seconds = await compression
+    return key, page, cpu_seconds
+
+
+pdf_builder = PdfBuilder()
@@ -0,0 +1,450 @@
+"""
+Word alignment and scoring engine for reading assessment.
+
+Aligns the words a student was expected to read against the transcription with
+a banded Needleman-Wunsch (weighted Levenshtein) pass, so one skipped or added
+word no longer shifts every word after it. Substitution cost comes from a mix
+of spelling similarity and Metaphone similarity, which lets misread words
+("begist" for "biggest") pair with their targets instead of becoming gaps.
+
+Scoring stays strict: only an exact normalized match earns 1.0. Phonetics only
+decide which words are compared and how much partial credit a near-miss gets.
+
+All lookup tables and regexes are built once at import time; per-word results
+are memoised with ``lru_cache``.
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ===============================
+# TABLES
+# ===============================
+
+_NON_WORD_RE = re.compile(r"[^\w]+")
+_VOWELS = frozenset("AEIOU")
+_LOWER_VOWELS = frozenset("aeiou")
+
+GAP_COST = 1.0
+DEFAULT_BAND = 12
+
+# Substitutions in this similarity range could be a misread or a different
+# word; the aligner cannot tell, so they lower the confidence of local scoring
+AMBIGUOUS_SIMILARITY = (0.35, 0.8)
+
+PRONUNCIATION_GUIDES: Dict[str, str] = {
+    'the': 'THUH (like "thuh")',
+    'sky': 'SKY (sounds like "skai")',
+    'leaf': 'LEEF (long "ee" sound)',
+    'see': 'SEE (sounds like the letter "C")',
+    'tree': 'TREE (rhymes with "free")',
+    'sun': 'SUN (rhymes with "fun")',
+    'run': 'RUN (rhymes with "sun")',
+    'big': 'BIG (short "i" sound)',
+    'slide': 'SLIDE (sounds like "slyde")',
+    'through': 'THROO (with "th" sound, like "threw")',
+    'play': 'PLAY (sounds like "plei")',
+    'say': 'SAY (sounds like "sei")',
+    'day': 'DAY (sounds like "dei")',
+    'eat': 'EET (long "ee" sound)',
+    'read': 'REED (long "ee" sound)',
+    'friend': 'FREND (short "e" sound)',
+    'get': 'GET (short "e" sound)',
+    'kind': 'KYND (long "i" sound)',
+    'being': 'BEE-ing (sounds like "bee" + "ing")',
+    'keen': 'KEEN (long "ee" sound)',
+    'house': 'HOWSE (sounds like "ow" as in "cow")',
+    'bed': 'BED (short "e" sound)',
+    'teddy': 'TED-ee (short "e" then "ee")',
+    'bear': 'BAIR (sounds like "air" with B)',
+    'bears': 'BAIRS (sounds like "air" with B, then Z)',
+    'looked': 'LOOKT (sounds like "lukt")',
+    'found': 'FOWND (sounds like "ow" in "cow")',
+    'closet': 'CLOZ-it (soft "z" sound)',
+    'gets': 'GETS (short "e" sound)',
+    'two': 'TOO (sounds like "too")',
+    'bread': 'BRED (short "e" sound)',
+    'next': 'NEKST (short "e" sound)',
+    'add': 'AD (short "a" sound)',
+    'peanut': 'PEE-nut (long "ee" sound)',
+    'butter': 'BUT-er (short "u" sound)',
+    'then': 'THEN (short "e" sound)',
+    'jelly': 'JEL-ee (short "e" then "ee")',
+    'finally': 'FY-nal-ee (long "i" sound)',
+    'put': 'PUT (sounds like "puht")',
+    'together': 'tuh-GETH-er (soft "uh" sounds)',
+    'now': 'NOW (sounds like "ow" in "cow")',
+    'have': 'HAV (short "a" sound)',
+    'sandwich': 'SAND-wich (short "a" sound)',
+    'ready': 'RED-ee (like the color RED + EE)',
+    'places': 'PLAY-ses (long A sound + ses)',
+    'squirrels': 'SKWIR-els (SKWIR like squirt + els)',
+    'winter': 'WIN-ter (short I + ter)',
+    'gather': 'GATH-er (like math + er)',
+}
+
+# Pattern-based guides for words missing from the table, checked in order
+_PATTERN_GUIDES: Tuple[Tuple[str, str], ...] = (
+    ('ee', '(with long "ee" sound like "tree")'),
+    ('ea', '(with long "e" sound like "eat")'),
+    ('ay', '(with long "a" sound like "play")'),
+    ('ai', '(with long "a" sound like "play")'),
+    ('oo', '(with "oo" sound like "moon")'),
+)
+
+
+# ===============================
+# TOKENS
+# ===============================
+
+@dataclass(frozen=True)
+class Token:
+    text: str  # as written, punctuation included
+    norm: str  # lowercase, punctuation stripped
+
+
+@dataclass(frozen=True)
+class AlignedPair:
+    expected_index: Optional[int]  # None for an inserted (extra) spoken word
+    spoken_index: Optional[int]    # None for a skipped expected word
+    similarity: float
+
+
+def normalize_word(word: str) -> str:
+    return _NON_WORD_RE.sub("", word.lower())
+
+
+def tokenize(text: str) -> List[Token]:
+    tokens = []
+    for raw in (text or "").split():
+        norm = normalize_word(raw)
+        if norm:
+            tokens.append(Token(text=raw, norm=norm))
+    return tokens
+
+
+# ===============================
+# PHONETICS
+# ===============================
+
+@lru_cache(maxsize=16384)
+def metaphone(word: str) -> str:
+    """Original (Philips, 1990) Metaphone code for an English word."""
+    w = "".join(ch for ch in word.upper() if "A" <= ch <= "Z")
+    if not w:
+        return ""
+
+    if w[:2] in ("AE", "GN", "KN", "PN", "WR"):
+        w = w[1:]
+    if w[0] == "X":
+        w = "S" + w[1:]
+    if w[:2] == "WH":
+        w = "W" + w[2:]
+
+    out: List[str] = []
+    n = len(w)
+    i = 0
+    while i < n:
+        c = w[i]
+        prev = w[i - 1] if i > 0 else ""
+        nxt = w[i + 1] if i + 1 < n else ""
+        nxt2 = w[i + 2] if i + 2 < n else ""
+
+        if c == prev and c != "C":
+            i += 1
+            continue
+
+        if c in _VOWELS:
+            if i == 0:
+                out.append(c)
+        elif c == "B":
+            if not (prev == "M" and i == n - 1):
+                out.append("B")
+        elif c == "C":
+            if nxt == "H" or (nxt == "I" and nxt2 == "A"):
+                out.append("K" if prev == "S" else "X")
+                if nxt == "H":
+                    i += 1
+            elif nxt and nxt in "IEY":
+                if prev != "S":
+                    out.append("S")
+            else:
+                out.append("K")
+        elif c == "D":
+            if nxt == "G" and nxt2 and nxt2 in "EIY":
+                out.append("J")
+                i += 1
+            else:
+                out.append("T")
+        elif c == "G":
+            if nxt == "H":
+                if nxt2 and nxt2 in _VOWELS:
+                    out.append("K")
+                i += 1
+            elif nxt == "N" and (i + 2 == n or w[i + 2:] == "ED"):
+                pass
+            elif nxt and nxt in "IEY" and prev != "G":
+                out.append("J")
+            else:
+                out.append("K")
+        elif c == "H":
+            if not (prev in _VOWELS and nxt not in _VOWELS) and prev not in ("C", "S", "P", "T", "G"):
+                out.append("H")
+        elif c == "K":
+            if prev != "C":
+                out.append("K")
+        elif c == "P":
+            if nxt == "H":
+                out.append("F")
+                i += 1
+            else:
+                out.append("P")
+        elif c == "Q":
+            out.append("K")
+        elif c == "S":
+            if nxt == "H":
+                out.append("X")
+                i += 1
+            elif nxt == "I" and nxt2 in ("O", "A"):
+                out.append("X")
+            else:
+                out.append("S")
+        elif c == "T":
+            if nxt == "I" and nxt2 in ("O", "A"):
+                out.append("X")
+            elif nxt == "H":
+                out.append("0")
+                i += 1
+            elif not (nxt == "C" and nxt2 == "H"):
+                out.append("T")
+        elif c == "V":
+            out.append("F")
+        elif c == "W":
+            if nxt in _VOWELS and nxt:
+                out.append("W")
+        elif c == "X":
+            out.append("KS")
+        elif c == "Y":
+            if nxt in _VOWELS and nxt:
+                out.append("Y")
+        elif c == "Z":
+            out.append("S")
+        else:
+            out.append(c)
+        i += 1
+
+    return "".join(out)
+
+
+def _levenshtein(a: str, b: str) -> int:
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        previous = current
+    return previous[-1]
+
+
+@lru_cache(maxsize=65536)
+def word_similarity(expected: str, spoken: str) -> float:
+    """Similarity in [0, 1] of two normalized words; 1.0 only for identical words."""
+    if expected == spoken:
+        return 1.0
+    if not expected or not spoken:
+        return 0.0
+
+    spelling = 1.0 - _levenshtein(expected, spoken) / max(len(expected), len(spoken))
+    code_e, code_s = metaphone(expected), metaphone(spoken)
+    if code_e and code_e == code_s:
+        sound = 1.0
+    elif code_e and code_s:
+        sound = 1.0 - _levenshtein(code_e, code_s) / max(len(code_e), len(code_s))
+    else:
+        sound = spelling
+
+    # Identical-sounding but differently spelled words are near misses, never exact
+    return min(0.95, max(spelling, 0.4 * spelling + 0.6 * sound))
+
+
+# ===============================
+# ALIGNMENT
+# ===============================
+
+def align_words(
+    expected: Sequence[str],
+    spoken: Sequence[str],
+    band: Optional[int] = None,
+) -> List[AlignedPair]:
+    """Globally align two normalized word sequences.
+
+    Runs in O(n * band) time and memory: cells further than ``band`` from the
+    diagonal are never visited. The band always covers the length difference,
+    so an alignment is always found.
+    """
+    n, m = len(expected), len(spoken)
+    band = max(DEFAULT_BAND if band is None else band, abs(n - m)) + 1
+    width = 2 * band + 1
+    inf = float("inf")
+
+    # Row i stores columns j in [i - band, i + band] at offset k = j - i + band
+    previous = [inf] * width
+    traces: List[bytearray] = []
+    for i in range(n + 1):
+        current = [inf] * width
+        trace = bytearray(width)
+        j_start = max(0, i - band)
+        j_end = min(m, i + band)
+        for j in range(j_start, j_end + 1):
+            k = j - i + band
+            if i == 0 and j == 0:
+                current[k] = 0.0
+                continue
+            best, move = inf, 0
+            if i > 0 and j > 0:
+                cost = previous[k] + (1.0 - word_similarity(expected[i - 1], spoken[j - 1]))
+                if cost < best:
+                    best, move = cost, 0
+            if i > 0 and k + 1 < width:
+                cost = previous[k + 1] + GAP_COST  # expected word skipped
+                if cost < best:
+                    best, move = cost, 1
+            if j > 0 and k > 0:
+                cost = current[k - 1] + GAP_COST  # extra spoken word
+                if cost < best:
+                    best, move = cost, 2
+            current[k] = best
+            trace[k] = move
+        traces.append(trace)
+        previous = current
+
+    pairs: List[AlignedPair] = []
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = traces[i][j - i + band]
+        if move == 0:
+            pairs.append(AlignedPair(i - 1, j - 1, word_similarity(expected[i - 1], spoken[j - 1])))
+            i, j = i - 1, j - 1
+        elif move == 1:
+            pairs.append(AlignedPair(i - 1, None, 0.0))
+            i -= 1
+        else:
+            pairs.append(AlignedPair(None, j - 1, 0.0))
+            j -= 1
+    pairs.reverse()
+    return pairs
+
+
+# ===============================
+# FEEDBACK
+# ===============================
+
+@lru_cache(maxsize=4096)
+def pronunciation_guide(word: str) -> str:
+    """Phonetic pronunciation guide for a word."""
+    word_lower = normalize_word(word)
+    if word_lower in PRONUNCIATION_GUIDES:
+        return PRONUNCIATION_GUIDES[word_lower]
+    for pattern, hint in _PATTERN_GUIDES:
+        if pattern in word_lower:
+            return f'{word.upper()} {hint}'
+    if word_lower.endswith('y') and len(word_lower) > 2:
+        return f'{word.upper()} (ends with "ee" sound like "happy")'
+    return word.upper()
+
+
+def describe_word_error(expected: Token, spoken: Token) -> Tuple[List[str], str]:
+    """Sound-level error labels and child-facing feedback for a substitution."""
+    pronunciation = pronunciation_guide(expected.text)
+    feedback = f"❌ You said '{spoken.text}' but the word is '{expected.text}'. Say it like: {pronunciation}"
+    sound_errors: List[str] = []
+
+    if len(spoken.norm) > len(expected.norm):
+        sound_errors.append("added_sounds")
+        feedback += f" (You added extra sounds: '{spoken.text}' is longer than '{expected.text}')"
+    elif len(spoken.norm) < len(expected.norm):
+        sound_errors.append("missing_sounds")
+        feedback += f" (You're missing sounds: '{spoken.text}' is shorter than '{expected.text}')"
+
+    if [c for c in expected.norm if c in _LOWER_VOWELS] != [c for c in spoken.norm if c in _LOWER_VOWELS]:
+        sound_errors.append("vowel_error")
+        feedback += " - Focus on the vowel sounds!"
+    if [c for c in expected.norm if c not in _LOWER_VOWELS] != [c for c in spoken.norm if c not in _LOWER_VOWELS]:
+        sound_errors.append("consonant_error")
+        feedback += " - Check the consonant sounds!"
+
+    return sound_errors, feedback
+
+
+def score_reading(expected_text: str, transcribed_text: str, band: Optional[int] = None) -> Dict[str, object]:
+    """Align a reading attempt and build per-word feedback.
+
+    ``word_feedback`` has exactly one entry per expected word, in order;
+    words the student added are reported separately in ``inserted_words``.
+    ``confidence`` is the share of expected words whose verdict does not hinge
+    on an ambiguous substitution, used to decide whether AI review is needed.
+    """
+    expected = tokenize(expected_text)
+    spoken = tokenize(transcribed_text)
+    pairs = align_words([t.norm for t in expected], [t.norm for t in spoken], band=band)
+
+    word_feedback = []
+    inserted_words = []
+    correct_count = 0
+    ambiguous = 0
+    low, high = AMBIGUOUS_SIMILARITY
+
+    for pair in pairs:
+        if pair.expected_index is None:
+            inserted_words.append(spoken[pair.spoken_index].text)
+            continue
+
+        target = expected[pair.expected_index]
+        if pair.spoken_index is None:
+            word_feedback.append({
+                "word": target.text,
+                "expected": target.text,
+                "said": "",
+                "pronunciation_score": 0.0,
+                "sound_errors": ["word_skipped"],
+                "feedback": f"⚠️ You skipped this word. Say it like: {pronunciation_guide(target.text)}"
+            })
+            continue
+
+        said = spoken[pair.spoken_index]
+        if pair.similarity >= 1.0:
+            correct_count += 1
+            sound_errors, feedback = [], "✅ Perfect!"
+        else:
+            sound_errors, feedback = describe_word_error(target, said)
+            if low <= pair.similarity < high:
+                ambiguous += 1
+
+        word_feedback.append({
+            "word": target.text,
+            "expected": target.text,
+            "said": said.text,
+            "pronunciation_score": pair.similarity,
+            "sound_errors": sound_errors,
+            "feedback": feedback
+        })
+
+    total = len(expected)
+    return {
+        "word_feedback": word_feedback,
+        "inserted_words": inserted_words,
+        "correct_count": correct_count,
+        "total_words": total,
+        "accuracy_score": correct_count / total if total else 0.0,
+        "confidence": 1.0 - ambiguous / total if total else 0.0,
+    }
@@ -22,6 +22,8 @@ except ImportError:
     print("⚠️ Audio processing libraries not available. Install librosa and numpy for advanced audio analysis.")
 
 from services.gemini_service import gemini_service
+from services.reading_alignment import score_reading
+from services.reading_recommendation_index import ContentEntry, RecommendationIndex, StudentState
 from models.reading_assistant_models import (
     ReadingContent, ReadingSession, ReadingAttempt, 
     WordFeedback, ReadingFeedback, ReadingProgress,
@@ -32,6 +34,21 @@ from schemas.reading_assistant_schemas import (
     FluentReadingAnalysis
 )
 
+# Minimum share of unambiguous word verdicts for local scoring to stand without Gemini
+LOCAL_ANALYSIS_CONFIDENCE = float(os.getenv("READING_LOCAL_ANALYSIS_CONFIDENCE", "0.9"))
+
+# Difficulty steps used when mixing harder content into recommendations
+DIFFICULTY_PROGRESSION = [
+    DifficultyLevel.ELEMENTARY,
+    DifficultyLevel.MIDDLE_SCHOOL,
+    DifficultyLevel.HIGH_SCHOOL
+]
+
+# Background Gemini re-rank of recommendation candidates
+AI_RERANK_ENABLED = os.getenv("READING_AI_RERANK", "true").lower() in ("1", "true", "yes")
+AI_RERANK_TTL_SECONDS = float(os.getenv("READING_AI_RERANK_TTL_SECONDS", "1800"))
+AI_RERANK_CANDIDATES = int(os.getenv("READING_AI_RERANK_CANDIDATES", "12"))
+
 class ReadingAssistantService:
     """
     AI-powered reading assistant service that analyzes speech,
@@ -40,6 +57,8 @@ class ReadingAssistantService:
     
     def __init__(self):
         self.gemini_service = gemini_service
+        self.recommendation_index = RecommendationIndex()
+        self._ai_rerank_tasks: Dict[int, asyncio.Task] = {}
         
     # ===============================
     # CONTENT GENERATION & MANAGEMENT
@@ -528,14 +547,17 @@ class ReadingAssistantService:
         """
         
         try:
-            # Try AI analysis first, fallback to local if it fails
-            print(f"🎯 Attempting AI analysis...")
-            try:
-                analysis_result = await self._analyze_with_gemini_ai(target_text, transcribed_text, reading_level)
-                print(f"✅ AI analysis succeeded")
-            except Exception as ai_error:
-                print(f"⚠️ AI analysis failed: {ai_error}. Using local analysis.")
-                analysis_result = self._analyze_pronunciation_locally(target_text, transcribed_text, reading_level)
+            # Local alignment first; only ask Gemini when the local verdict is ambiguous
+            analysis_result = self._analyze_pronunciation_locally(target_text, transcribed_text, reading_level)
+            if analysis_result.get("confidence", 0.0) >= LOCAL_ANALYSIS_CONFIDENCE:
+                print(f"✅ Local analysis is confident ({analysis_result['confidence']:.2f}); skipping AI analysis")
+            else:
+                print(f"🎯 Attempting AI analysis...")
+                try:
+                    analysis_result = await self._analyze_with_gemini_ai(target_text, transcribed_text, reading_level)
+                    print(f"✅ AI analysis succeeded")
+                except Exception as ai_error:
+                    print(f"⚠️ AI analysis failed: {ai_error}. Using local analysis.")
             
             print(f"🤖 DEBUG: Analysis returned accuracy_score: {analysis_result.get('accuracy_score', 'MISSING')}")
             
@@ -689,223 +711,40 @@ BE RUTHLESSLY STRICT. No partial credit for "close enough"."""
         """
         Perform local word-by-word pronunciation analysis with phonetic guides.
         Takes pronunciations literally as transcribed by Gemini.
-        """
-        from difflib import SequenceMatcher
-        
-        def get_pronunciation_guide(word: str) -> str:
-            """Generate phonetic pronunciation guide for a word"""
-            word_lower = word.lower()
-            
-            # Common word pronunciations - expanded list
-            pronunciation_map = {
-                'the': 'THUH (like "thuh")',
-                'sky': 'SKY (sounds like "skai")',
-                'leaf': 'LEEF (long "ee" sound)',
-                'see': 'SEE (sounds like the letter "C")',
-                'tree': 'TREE (rhymes with "free")',
-                'sun': 'SUN (rhymes with "fun")',
-                'run': 'RUN (rhymes with "sun")',
-                'big': 'BIG (short "i" sound)',
-                'slide': 'SLIDE (sounds like "slyde")',
-                'through': 'THROO (with "th" sound, like "threw")',
-                'play': 'PLAY (sounds like "plei")',
-                'say': 'SAY (sounds like "sei")',
-                'day': 'DAY (sounds like "dei")',
-                'eat': 'EET (long "ee" sound)',
-                'read': 'REED (long "ee" sound)',
-                'friend': 'FREND (short "e" sound)',
-                'get': 'GET (short "e" sound)',
-                'kind': 'KYND (long "i" sound)',
-                'being': 'BEE-ing (sounds like "bee" + "ing")',
-                'keen': 'KEEN (long "ee" sound)',
-                'house': 'HOWSE (sounds like "ow" as in "cow")',
-                'bed': 'BED (short "e" sound)',
-                'teddy': 'TED-ee (short "e" then "ee")',
-                'bear': 'BAIR (sounds like "air" with B)',
-                'bears': 'BAIRS (sounds like "air" with B, then Z)',
-                'looked': 'LOOKT (sounds like "lukt")',
-                'found': 'FOWND (sounds like "ow" in "cow")',
-                'closet': 'CLOZ-it (soft "z" sound)',
-                'gets': 'GETS (short "e" sound)',
-                'two': 'TOO (sounds like "too")',
-                'bread': 'BRED (short "e" sound)',
-                'next': 'NEKST (short "e" sound)',
-                'add': 'AD (short "a" sound)',
-                'peanut': 'PEE-nut (long "ee" sound)',
-                'butter': 'BUT-er (short "u" sound)',
-                'then': 'THEN (short "e" sound)',
-                'jelly': 'JEL-ee (short "e" then "ee")',
-                'finally': 'FY-nal-ee (long "i" sound)',
-                'put': 'PUT (sounds like "puht")',
-                'together': 'tuh-GETH-er (soft "uh" sounds)',
-                'now': 'NOW (sounds like "ow" in "cow")',
-                'have': 'HAV (short "a" sound)',
-                'sandwich': 'SAND-wich (short "a" sound)',
-                'ready': 'RED-ee (like the color RED + EE)',
-                'places': 'PLAY-ses (long A sound + ses)',
-                'squirrels': 'SKWIR-els (SKWIR like squirt + els)',
-                'winter': 'WIN-ter (short I + ter)',
-                'gather': 'GATH-er (like math + er)',
-            }
-            
-            if word_lower in pronunciation_map:
-                return pronunciation_map[word_lower]
-            
-            # Pattern-based pronunciation for unknown words
-            if 'ee' in word_lower:
-                return f'{word.upper()} (with long "ee" sound like "tree")'
-            elif 'ea' in word_lower:
-                return f'{word.upper()} (with long "e" sound like "eat")'
-            elif 'ay' in word_lower or 'ai' in word_lower:
-                return f'{word.upper()} (with long "a" sound like "play")'
-            elif 'oo' in word_lower:
-                return f'{word.upper()} (with "oo" sound like "moon")'
-            elif word_lower.endswith('y') and len(word_lower) > 2:
-                return f'{word.upper()} (ends with "ee" sound like "happy")'
-            else:
-                return f'{word.upper()}'
         
-        def analyze_phonics_error(expected_word: str, spoken_word: str) -> tuple:
-            """Analyze the phonetic/phonics difference between expected and spoken words"""
-            exp_clean = expected_word.lower().strip('.,!?;:')
-            sp_clean = spoken_word.lower().strip('.,!?;:')
-            
-            sound_errors = []
-            
-            # Get pronunciation guide for the correct word
-            pronunciation = get_pronunciation_guide(expected_word)
-            
-            # If words are different, provide SPECIFIC phonetic feedback
-            if exp_clean != sp_clean:
-                feedback = f"❌ You said '{spoken_word}' but the word is '{expected_word}'. Say it like: {pronunciation}"
-                
-                # Analyze specific sound differences
-                if len(sp_clean) > len(exp_clean):
-                    sound_errors.append("added_sounds")
-                    feedback += f" (You added extra sounds: '{spoken_word}' is longer than '{expected_word}')"
-                elif len(sp_clean) < len(exp_clean):
-                    sound_errors.append("missing_sounds")
-                    feedback += f" (You're missing sounds: '{spoken_word}' is shorter than '{expected_word}')"
-                
-                # Check vowel differences
-                exp_vowels = [c for c in exp_clean if c in 'aeiou']
-                sp_vowels = [c for c in sp_clean if c in 'aeiou']
-                if exp_vowels != sp_vowels:
-                    sound_errors.append("vowel_error")
-                    feedback += " - Focus on the vowel sounds!"
-                
-                # Check if consonants are different
-                exp_consonants = [c for c in exp_clean if c not in 'aeiou']
-                sp_consonants = [c for c in sp_clean if c not in 'aeiou']
-                if exp_consonants != sp_consonants:
-                    sound_errors.append("consonant_error")
-                    feedback += " - Check the consonant sounds!"
-            else:
-                feedback = f"✅ Perfect!"
-            
-            return sound_errors, feedback
-        
-        # Normalize texts for comparison (remove punctuation, lowercase)
-        def normalize(text: str) -> str:
-            return re.sub(r'[^\w\s]', '', text.lower().strip())
-        
-        expected_normalized = normalize(expected_text)
-        transcribed_normalized = normalize(transcribed_text)
+        Words are aligned (see services/reading_alignment.py) rather than compared
+        by position, so a skipped or extra word only affects that word.
+        """
+        scored = score_reading(expected_text, transcribed_text)
+        word_feedback = scored["word_feedback"]
+        correct_count = scored["correct_count"]
+        total_words = scored["total_words"]
         
-        # Quick check: If texts are identical, perfect reading!
-        if expected_normalized == transcribed_normalized:
+        if total_words and correct_count == total_words and not scored["inserted_words"]:
             print("🎉 Perfect reading detected - texts match exactly!")
-            expected_words = expected_text.strip().split()
+            expected_words = [w["expected"] for w in word_feedback]
             return {
                 "accuracy_score": 1.0,
+                "confidence": 1.0,
                 "overall_feedback": "Perfect! You read every word correctly!",
-                "word_feedback": [
-                    {
-                        "word": word,
-                        "expected": word,
-                        "said": word,
-                        "pronunciation_score": 1.0,
-                        "sound_errors": [],
-                        "feedback": "✅ Perfect!"
-                    }
-                    for word in expected_words
-                ],
+                "word_feedback": word_feedback,
                 "suggestions": ["Keep up the great work!", "Try reading more challenging content"],
                 "correctly_read_words": expected_words,
                 "incorrectly_read_words": [],
                 "needs_practice_words": [],
+                "inserted_words": [],
                 "encouragement": f"Excellent work! You got all {len(expected_words)} words correct!"
             }
         
-        # Split into words (preserve punctuation context)
-        expected_words = expected_text.strip().split()
-        transcribed_words = transcribed_text.strip().split()
-        
-        word_feedback = []
-        correct_count = 0
-        incorrect_words = []
-        needs_practice = []
-        
-        max_len = max(len(expected_words), len(transcribed_words))
-        
-        for i in range(max_len):
-            expected_word = expected_words[i] if i < len(expected_words) else ""
-            spoken_word = transcribed_words[i] if i < len(transcribed_words) else ""
-            
-            # Normalize for comparison (remove punctuation)
-            expected_clean = re.sub(r'[^\w]', '', expected_word.lower())
-            spoken_clean = re.sub(r'[^\w]', '', spoken_word.lower())
-            
-            # Calculate word similarity
-            if expected_clean == spoken_clean:
-                # Perfect match
-                score = 1.0
-                correct_count += 1
-                feedback_text = f"✅ Perfect!"
-                sound_errors = []
-            elif not spoken_clean:
-                # Word was skipped
-                score = 0.0
-                incorrect_words.append(expected_word)
-                needs_practice.append(expected_word)
-                pronunciation = get_pronunciation_guide(expected_word)
-                feedback_text = f"⚠️ You skipped this word. Say it like: {pronunciation}"
-                sound_errors = ["word_skipped"]
-            elif not expected_clean:
-                # Extra word spoken
-                score = 0.0
-                feedback_text = f"⚠️ This word isn't in the text. You added '{spoken_word}'."
-                sound_errors = ["extra_word"]
-            else:
-                # Analyze phonics/pronunciation error
-                sound_errors, feedback_text = analyze_phonics_error(expected_word, spoken_word)
-                
-                # Calculate similarity score
-                word_similarity = SequenceMatcher(None, expected_clean, spoken_clean).ratio()
-                score = word_similarity
-                
-                # Add to practice list
-                if score < 1.0:
-                    needs_practice.append(expected_word)
-                    if score < 0.7:
-                        incorrect_words.append(expected_word)
-            
-            word_feedback.append({
-                "word": expected_word,
-                "expected": expected_word,
-                "said": spoken_word,
-                "pronunciation_score": score,
-                "sound_errors": sound_errors,
-                "feedback": feedback_text
-            })
+        needs_practice = [w["expected"] for w in word_feedback if w["pronunciation_score"] < 1.0]
+        incorrect_words = [w["expected"] for w in word_feedback if w["pronunciation_score"] < 0.7]
         
-        accuracy_score = correct_count / len(expected_words) if expected_words else 0.0
-        
-        print(f"📊 Local analysis: {correct_count}/{len(expected_words)} words correct ({accuracy_score*100:.1f}%)")
+        print(f"📊 Local analysis: {correct_count}/{total_words} words correct ({scored['accuracy_score']*100:.1f}%), confidence {scored['confidence']:.2f}")
         
         return {
-            "accuracy_score": accuracy_score,
-            "overall_feedback": f"Good job! You got {correct_count} out of {len(expected_words)} words correct.",
+            "accuracy_score": scored["accuracy_score"],
+            "confidence": scored["confidence"],
+            "overall_feedback": f"Good job! You got {correct_count} out of {total_words} words correct.",
             "word_feedback": word_feedback,
             "suggestions": [
                 f"Practice saying: {', '.join(needs_practice[:3])}" if needs_practice else "Keep reading aloud every day!"
@@ -913,6 +752,7 @@ BE RUTHLESSLY STRICT. No partial credit for "close enough"."""
             "correctly_read_words": [w["expected"] for w in word_feedback if w["pronunciation_score"] >= 0.99],
             "incorrectly_read_words": incorrect_words,
             "needs_practice_words": needs_practice,
+            "inserted_words": scored["inserted_words"],
             "encouragement": "Great effort! Keep practicing and you'll get even better!"
         }
     
@@ -1104,56 +944,126 @@ BE RUTHLESSLY STRICT. No partial credit for "close enough"."""
     # CONTENT RECOMMENDATION ENGINE
     # ===============================
     
+    def invalidate_recommendation_index(self) -> None:
+        """Call after reading content is created, changed or deleted"""
+        self.recommendation_index.invalidate()
+    
+    def _ensure_recommendation_index(self, db: Session) -> None:
+        """Reload the in-memory content pools if they are stale (one query)"""
+        if not self.recommendation_index.needs_refresh():
+            return
+        
+        rows = db.query(
+            ReadingContent.id,
+            ReadingContent.title,
+            ReadingContent.reading_level,
+            ReadingContent.difficulty_level,
+            ReadingContent.content_type,
+            ReadingContent.word_count,
+            ReadingContent.phonics_focus,
+            ReadingContent.vocabulary_words
+        ).filter(ReadingContent.is_active == True).all()
+        
+        self.recommendation_index.load_content(
+            ContentEntry(
+                id=row.id,
+                title=row.title,
+                reading_level=row.reading_level,
+                difficulty_level=row.difficulty_level,
+                content_type=row.content_type or "",
+                word_count=row.word_count or 0,
+                has_phonics=bool(row.phonics_focus),
+                has_vocabulary=bool(row.vocabulary_words)
+            )
+            for row in rows
+        )
+    
+    def _recent_attempts(self, student_id: int, db: Session, limit: int = 10) -> List[ReadingAttempt]:
+        # Attempts carry no student id of their own; it lives on the session
+        return db.query(ReadingAttempt).join(
+            ReadingSession, ReadingAttempt.session_id == ReadingSession.id
+        ).filter(
+            ReadingSession.student_id == student_id
+        ).order_by(desc(ReadingAttempt.started_at)).limit(limit).all()
+    
+    def _student_recommendation_state(self, student_id: int, db: Session) -> StudentState:
+        """Seen-set and struggle tags for a student, loaded from the database on first use"""
+        state = self.recommendation_index.student(student_id)
+        if state is not None:
+            return state
+        
+        seen_rows = db.query(ReadingAttempt.content_id).join(
+            ReadingSession, ReadingAttempt.session_id == ReadingSession.id
+        ).filter(
+            ReadingSession.student_id == student_id
+        ).distinct().all()
+        
+        return self.recommendation_index.set_student(
+            student_id,
+            seen=(row.content_id for row in seen_rows),
+            struggle_areas=self._identify_struggle_areas(self._recent_attempts(student_id, db))
+        )
+    
+    def record_reading_attempt(self, student_id: int, content_id: int, db: Session) -> None:
+        """Keep the recommendation index current after a scored attempt is committed"""
+        struggle_areas = self._identify_struggle_areas(self._recent_attempts(student_id, db))
+        if not self.recommendation_index.record_attempt(student_id, content_id, struggle_areas):
+            self._student_recommendation_state(student_id, db)
+    
+    def _recommendation_pools(
+        self,
+        progress: Optional[ReadingProgress]
+    ) -> Tuple[Tuple[ReadingLevel, DifficultyLevel], Optional[Tuple], Optional[Tuple]]:
+        """Current pool plus the easier/harder pools mixed in for this student"""
+        if not progress:
+            # Default recommendations for new students
+            return (ReadingLevel.KINDERGARTEN, DifficultyLevel.ELEMENTARY), None, None
+        
+        level = progress.current_reading_level
+        difficulty = progress.current_difficulty
+        current = (level, difficulty)
+        
+        # Add some easier content for confidence building
+        easier = None
+        if difficulty != DifficultyLevel.ELEMENTARY:
+            easier = (level, DifficultyLevel.ELEMENTARY)
+        
+        # Add challenging content if student is performing well
+        harder = None
+        if progress.average_accuracy and progress.average_accuracy > 85 and difficulty in DIFFICULTY_PROGRESSION:
+            position = DIFFICULTY_PROGRESSION.index(difficulty)
+            if position + 1 < len(DIFFICULTY_PROGRESSION):
+                harder = (level, DIFFICULTY_PROGRESSION[position + 1])
+        
+        return current, easier, harder
+    
     async def get_recommended_content(
         self,
         student_id: int,
         db: Session,
         limit: int = 5
     ) -> List[ReadingContent]:
-        """Get personalized content recommendations for student"""
-        
-        progress = db.query(ReadingProgress).filter_by(student_id=student_id).first()
-        
-        if not progress:
-            # Default recommendations for new students
-            return db.query(ReadingContent).filter(
-                ReadingContent.reading_level == ReadingLevel.KINDERGARTEN,
-                ReadingContent.difficulty_level == DifficultyLevel.ELEMENTARY,
-                ReadingContent.is_active == True
-            ).limit(limit).all()
-        
-        # Get content matching current level
-        base_query = db.query(ReadingContent).filter(
-            ReadingContent.reading_level == progress.current_reading_level,
-            ReadingContent.is_active == True
-        )
+        """Get personalized content recommendations for student
         
-        # Prioritize based on student's challenges and strengths
-        recommendations = []
+        Ranking happens in memory against the recommendation index; content the
+        student has already attempted is only offered once nothing new is left.
+        """
         
-        # Add current difficulty level content
-        current_level_content = base_query.filter(
-            ReadingContent.difficulty_level == progress.current_difficulty
-        ).limit(3).all()
-        recommendations.extend(current_level_content)
+        progress = db.query(ReadingProgress).filter_by(student_id=student_id).first()
         
-        # Add some easier content for confidence building
-        if progress.current_difficulty != DifficultyLevel.ELEMENTARY:
-            easier_content = base_query.filter(
-                ReadingContent.difficulty_level == DifficultyLevel.ELEMENTARY
-            ).limit(1).all()
-            recommendations.extend(easier_content)
+        self._ensure_recommendation_index(db)
+        state = self._student_recommendation_state(student_id, db)
+        current, easier, harder = self._recommendation_pools(progress)
         
-        # Add challenging content if student is performing well
-        if (progress.average_accuracy and progress.average_accuracy > 85 and 
-            progress.current_difficulty != DifficultyLevel.ADVANCED):
-            
-            challenging_content = base_query.filter(
-                ReadingContent.difficulty_level == DifficultyLevel.ADVANCED
-            ).limit(1).all()
-            recommendations.extend(challenging_content)
+        content_ids = self.recommendation_index.rank(
+            state, current, easier=easier, harder=harder, limit=limit
+        )
+        if not content_ids:
+            return []
         
-        return recommendations[:limit]
+        rows = db.query(ReadingContent).filter(ReadingContent.id.in_(content_ids)).all()
+        by_id = {row.id: row for row in rows}
+        return [by_id[cid] for cid in content_ids if cid in by_id]
     
     async def get_ai_personalized_recommendations(
         self,
@@ -1161,42 +1071,89 @@ BE RUTHLESSLY STRICT. No partial credit for "close enough"."""
         db: Session,
         limit: int = 5
     ) -> List[Dict[str, Any]]:
-        """Get AI-generated personalized content recommendations"""
+        """Get personalized content recommendations, reordered by AI when available
         
-        try:
-            # Get student progress and reading history
+        The response never waits on Gemini: the in-memory ranking is returned
+        straight away and a re-rank is scheduled in the background. Its ordering
+        is applied to this student's later recommendations until it expires.
+        """
+        
+        content_recs = await self.get_recommended_content(student_id, db, limit)
+        state = self._student_recommendation_state(student_id, db)
+        
+        if AI_RERANK_ENABLED and not state.fresh_ai_order() and student_id not in self._ai_rerank_tasks:
             progress = db.query(ReadingProgress).filter_by(student_id=student_id).first()
-            recent_attempts = db.query(ReadingAttempt).filter_by(student_id=student_id).order_by(desc(ReadingAttempt.created_at)).limit(10).all()
-            
-            # Build student profile for AI
-            student_profile = {
-                "reading_level": progress.current_reading_level.value if progress else "KINDERGARTEN",
-                "current_accuracy": progress.average_accuracy if progress else 0.8,
-                "struggle_areas": self._identify_struggle_areas(recent_attempts),
-                "interests": ["animals", "colors", "family"],  # Could be expanded with user preferences
-                "completed_content_ids": [attempt.content_id for attempt in recent_attempts]
+            current, easier, harder = self._recommendation_pools(progress)
+            candidates = self.recommendation_index.candidates(
+                state, (current, easier, harder), limit=AI_RERANK_CANDIDATES
+            )
+            if len(candidates) > 1:
+                task = asyncio.create_task(self._ai_rerank(student_id, state, candidates, progress))
+                self._ai_rerank_tasks[student_id] = task
+                task.add_done_callback(lambda _: self._ai_rerank_tasks.pop(student_id, None))
+        
+        why = ", ".join(area.replace("_", " ") for area in state.struggle_areas) or "general practice"
+        return [
+            {
+                "content_id": content.id,
+                "title": content.title,
+                "content_type": content.content_type,
+                "topic": "general",
+                "difficulty_justification": f"Appropriate for {content.reading_level.value}",
+                "why_recommended": f"Picked to practise {why}",
+                "expected_benefit": "Will help improve reading skills"
             }
-            
-            # Use AI to generate personalized recommendations
-            ai_recommendations = await self.gemini_service.generate_personalized_recommendations(student_profile)
-            
-            return ai_recommendations[:limit]
-            
+            for content in content_recs
+        ]
+    
+    async def _ai_rerank(
+        self,
+        student_id: int,
+        state: StudentState,
+        candidates: List[ContentEntry],
+        progress: Optional[ReadingProgress]
+    ) -> None:
+        """Ask Gemini to order the candidate shortlist; failures leave the rule-based order"""
+        
+        student_profile = {
+            "reading_level": progress.current_reading_level.value if progress else "KINDERGARTEN",
+            "current_accuracy": progress.average_accuracy if progress else None,
+            "struggle_areas": state.struggle_areas,
+        }
+        shortlist = [
+            {
+                "id": entry.id,
+                "title": entry.title,
+                "content_type": entry.content_type,
+                "difficulty": getattr(entry.difficulty_level, "value", str(entry.difficulty_level)),
+                "word_count": entry.word_count,
+            }
+            for entry in candidates
+        ]
+        prompt = f"""Order these reading passages from most to least useful for this young reader.
+
+STUDENT: {json.dumps(student_profile)}
+PASSAGES: {json.dumps(shortlist)}
+
+Return JSON only: {{"ranked_ids": [<passage ids, best first>]}}"""
+        
+        try:
+            response = await asyncio.to_thread(
+                self.gemini_service.config.model.generate_content,
+                prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.2,
+                    max_output_tokens=256,
+                    response_mime_type="application/json"
+                )
+            )
+            ranked_ids = [int(cid) for cid in json.loads(response.text).get("ranked_ids", [])]
+            allowed = {entry.id for entry in candidates}
+            self.recommendation_index.set_ai_order(
+                student_id, [cid for cid in ranked_ids if cid in allowed], AI_RERANK_TTL_SECONDS
+            )
         except Exception as e:
-            print(f"❌ AI recommendations failed: {e}")
-            # Fallback to rule-based recommendations
-            content_recs = await self.get_recommended_content(student_id, db, limit)
-            return [
-                {
-                    "title": content.title,
-                    "content_type": content.content_type,
-                    "topic": "general",
-                    "difficulty_justification": f"Appropriate for {content.reading_level.value}",
-                    "why_recommended": "Based on your reading level",
-                    "expected_benefit": "Will help improve reading skills"
-                }
-                for content in content_recs
-            ]
+            print(f"⚠️ AI re-rank skipped: {e}")
     
     def _identify_struggle_areas(self, recent_attempts: List[ReadingAttempt]) -> List[str]:
         """Identify areas where student struggles based on recent attempts"""
@@ -1205,14 +1162,21 @@ BE RUTHLESSLY STRICT. No partial credit for "close enough"."""
         if not recent_attempts:
             return ["pronunciation", "fluency"]
         
+        # Attempts store accuracy as a percentage; thresholds below are fractions
+        accuracies = [
+            attempt.accuracy_percentage / 100.0
+            for attempt in recent_attempts
+            if attempt.accuracy_percentage is not None
+        ]
+        
         # Analyze recent performance
-        low_accuracy_count = sum(1 for attempt in recent_attempts if attempt.accuracy_score and attempt.accuracy_score < 0.8)
+        low_accuracy_count = sum(1 for accuracy in accuracies if accuracy < 0.8)
         
         if low_accuracy_count > len(recent_attempts) * 0.5:
             struggle_areas.append("pronunciation")
         
         # Add more analysis based on attempt data
-        avg_accuracy = sum(attempt.accuracy_score or 0.8 for attempt in recent_attempts) / len(recent_attempts)
+        avg_accuracy = (sum(accuracies) + 0.8 * (len(recent_attempts) - len(accuracies))) / len(recent_attempts)
         if avg_accuracy < 0.75:
             struggle_areas.extend(["fluency", "sight_words"])
         
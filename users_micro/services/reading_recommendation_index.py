@@ -0,0 +1,225 @@
+"""In-memory index behind reading-content recommendations.
+
+Active content is held in pools keyed by ``(reading_level, difficulty_level)``
+and reloaded when content changes (or after ``refresh_seconds``, so workers
+that did not see the change catch up). Each student's state -- the content
+ids they have already attempted and their struggle-area tags -- is loaded
+once and then kept current at attempt time, so a recommendation is a single
+in-memory ranking followed by one primary-key fetch.
+
+An optional AI ordering can be attached per student; it is produced off the
+request path and only reorders candidates the rules already consider valid.
+
+The index knows nothing about the ORM: callers feed it ``ContentEntry`` rows
+and pool keys, which keeps it cheap to test and to rebuild.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_REFRESH_SECONDS = float(os.getenv("READING_RECOMMENDATION_REFRESH_SECONDS", "300"))
+DEFAULT_MAX_STUDENTS = int(os.getenv("READING_RECOMMENDATION_MAX_STUDENTS", "5000"))
+
+# Passages at or below this length count as fluency practice
+SHORT_PASSAGE_WORDS = 40
+
+PoolKey = Tuple[Hashable, Hashable]
+
+
+@dataclass(frozen=True)
+class ContentEntry:
+    id: int
+    title: str
+    reading_level: Hashable
+    difficulty_level: Hashable
+    content_type: str = ""
+    word_count: int = 0
+    has_phonics: bool = False
+    has_vocabulary: bool = False
+
+    @property
+    def pool_key(self) -> PoolKey:
+        return (self.reading_level, self.difficulty_level)
+
+
+@dataclass
+class StudentState:
+    seen: Set[int] = field(default_factory=set)
+    struggle_areas: List[str] = field(default_factory=list)
+    ai_order: List[int] = field(default_factory=list)
+    ai_order_expires_at: float = 0.0
+
+    def fresh_ai_order(self) -> List[int]:
+        return self.ai_order if self.ai_order and time.time() < self.ai_order_expires_at else []
+
+
+class RecommendationIndex:
+    """Content pools plus per-student seen-sets and struggle tags."""
+
+    def __init__(
+        self,
+        *,
+        refresh_seconds: float = DEFAULT_REFRESH_SECONDS,
+        max_students: int = DEFAULT_MAX_STUDENTS,
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.max_students = max_students
+        self._pools: Dict[PoolKey, List[ContentEntry]] = {}
+        self._entries: Dict[int, ContentEntry] = {}
+        self._loaded_at: Optional[float] = None
+        self._students: "OrderedDict[int, StudentState]" = OrderedDict()
+
+    # ---- content pools --------------------------------------------------
+
+    def needs_refresh(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at > self.refresh_seconds
+
+    def invalidate(self) -> None:
+        """Mark the pools stale; the next recommendation reloads them."""
+        self._loaded_at = None
+
+    def load_content(self, entries: Iterable[ContentEntry]) -> None:
+        pools: Dict[PoolKey, List[ContentEntry]] = {}
+        by_id: Dict[int, ContentEntry] = {}
+        for entry in entries:
+            pools.setdefault(entry.pool_key, []).append(entry)
+            by_id[entry.id] = entry
+        for pool in pools.values():
+            pool.sort(key=lambda e: e.id)
+        self._pools = pools
+        self._entries = by_id
+        self._loaded_at = time.monotonic()
+
+    def pool(self, key: PoolKey) -> List[ContentEntry]:
+        return self._pools.get(key, [])
+
+    def entry(self, content_id: int) -> Optional[ContentEntry]:
+        return self._entries.get(content_id)
+
+    # ---- students -------------------------------------------------------
+
+    def student(self, student_id: int) -> Optional[StudentState]:
+        state = self._students.get(student_id)
+        if state is not None:
+            self._students.move_to_end(student_id)
+        return state
+
+    def set_student(self, student_id: int, seen: Iterable[int], struggle_areas: List[str]) -> StudentState:
+        state = StudentState(seen=set(seen), struggle_areas=list(struggle_areas))
+        self._students[student_id] = state
+        self._students.move_to_end(student_id)
+        while len(self._students) > self.max_students:
+            self._students.popitem(last=False)
+        return state
+
+    def record_attempt(self, student_id: int, content_id: int, struggle_areas: List[str]) -> bool:
+        """Update a cached student after an attempt; False if the student is not cached."""
+        state = self.student(student_id)
+        if state is None:
+            return False
+        state.seen.add(content_id)
+        state.struggle_areas = list(struggle_areas)
+        # The AI ordering was computed against the old seen-set
+        state.ai_order = []
+        return True
+
+    def set_ai_order(self, student_id: int, content_ids: List[int], ttl_seconds: float) -> None:
+        state = self.student(student_id)
+        if state is None:
+            return
+        state.ai_order = [cid for cid in content_ids if cid in self._entries]
+        state.ai_order_expires_at = time.time() + ttl_seconds
+
+    # ---- ranking --------------------------------------------------------
+
+    @staticmethod
+    def score(entry: ContentEntry, state: StudentState) -> float:
+        """Higher is better: unseen content first, then content that targets a struggle area."""
+        score = 0.0 if entry.id in state.seen else 10.0
+        areas = state.struggle_areas
+        if "pronunciation" in areas and entry.has_phonics:
+            score += 2.0
+        if "sight_words" in areas and entry.has_vocabulary:
+            score += 1.5
+        if "fluency" in areas and 0 < entry.word_count <= SHORT_PASSAGE_WORDS:
+            score += 1.0
+        return score
+
+    def _ordered(self, key: Optional[PoolKey], state: StudentState) -> List[ContentEntry]:
+        if key is None:
+            return []
+        # Ties follow the AI ordering when there is one, then id order (the old query order)
+        position = {cid: index for index, cid in enumerate(state.fresh_ai_order())}
+        return sorted(
+            self.pool(key),
+            key=lambda e: (-self.score(e, state), position.get(e.id, len(position)))
+        )
+
+    def rank(
+        self,
+        state: StudentState,
+        current: PoolKey,
+        *,
+        easier: Optional[PoolKey] = None,
+        harder: Optional[PoolKey] = None,
+        limit: int = 5,
+    ) -> List[int]:
+        """Pick ``limit`` content ids: mostly the current pool, one easier and one harder when given.
+
+        Seen content is only used when the unseen candidates run out.
+        """
+        if limit <= 0:
+            return []
+
+        groups = [self._ordered(current, state)]
+        quotas = []
+        for extra in (easier, harder):
+            if extra is not None and extra != current:
+                groups.append(self._ordered(extra, state))
+                quotas.append(1)
+        quotas.insert(0, max(limit - sum(quotas), 1))
+
+        picked: List[int] = []
+        taken: Set[int] = set()
+        for allow_seen in (False, True):
+            # First honour each group's quota, then let any group fill the remaining slots
+            for respect_quota in (True, False):
+                for group, quota in zip(groups, quotas):
+                    used = sum(1 for entry in group if entry.id in taken)
+                    for entry in group:
+                        if len(picked) >= limit or (respect_quota and used >= quota):
+                            break
+                        if entry.id in taken or (entry.id in state.seen and not allow_seen):
+                            continue
+                        picked.append(entry.id)
+                        taken.add(entry.id)
+                        used += 1
+
+        ai_order = state.fresh_ai_order()
+        if ai_order:
+            position = {cid: index for index, cid in enumerate(ai_order)}
+            picked.sort(key=lambda cid: position.get(cid, len(position)))
+        return picked
+
+    def candidates(self, state: StudentState, keys: Iterable[Optional[PoolKey]], limit: int) -> List[ContentEntry]:
+        """Best unseen entries across ``keys``; the shortlist handed to the AI re-rank."""
+        merged: Dict[int, ContentEntry] = {}
+        for key in keys:
+            for entry in self._ordered(key, state):
+                if entry.id not in state.seen:
+                    merged.setdefault(entry.id, entry)
+        ranked = sorted(merged.values(), key=lambda e: -self.score(e, state))
+        return ranked[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "content_entries": len(self._entries),
+            "pools": len(self._pools),
+            "students_cached": len(self._students),
+            "stale": self.needs_refresh(),
+        }
@@ -0,0 +1,451 @@
+"""Recurring calendar event expansion.
+
+A series is a ``CalendarEvent`` with ``is_recurring`` set. Its rule is either
+one of the legacy keywords the create form sends (``daily``, ``weekly``,
+``monthly``, ``yearly`` with ``recurrence_interval`` and
+``recurrence_end_date``) or an RFC 5545 RRULE such as
+``FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE;COUNT=10``. Supported parts are FREQ
+(DAILY..YEARLY), INTERVAL, COUNT, UNTIL, BYDAY (weekdays without ordinals),
+BYMONTHDAY (negative counts from the month end) and BYMONTH. Expansion
+follows python-dateutil's rrule semantics, which the test suite uses as the
+reference: occurrences keep the time of day of DTSTART, DTSTART itself only
+counts if it matches the rule, and UNTIL is inclusive.
+
+Expansion is lazy and windowed: ``occurrences_between`` jumps straight to
+the period containing the window when the rule has no COUNT, so a daily
+series started years ago costs the same as one started yesterday.
+``expand_series`` then applies per-occurrence exceptions (cancel, or
+override the title/description/status/time of one occurrence, which may move
+it into or out of the window).
+
+``OccurrenceCache`` keeps expanded windows per (series, version, window).
+The version is the series' ``updated_date``, which every edit and exception
+write bumps, so other workers miss after an edit; ``invalidate`` drops the
+series locally straight away.
+"""
+
+import calendar
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import bindparam, text
+
+DAILY, WEEKLY, MONTHLY, YEARLY = "DAILY", "WEEKLY", "MONTHLY", "YEARLY"
+FREQUENCIES = (DAILY, WEEKLY, MONTHLY, YEARLY)
+LEGACY_PATTERNS = {"daily": DAILY, "weekly": WEEKLY, "monthly": MONTHLY, "yearly": YEARLY}
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+UNTIL_FORMAT = "%Y%m%dT%H%M%S"
+
+# Occurrences of one series in one window; guards against rules that match
+# almost every day over a very wide window
+MAX_OCCURRENCES_PER_WINDOW = 5000
+
+OVERRIDE_FIELDS = ("title", "description", "status")
+
+EXCEPTIONS_SQL = text("""
+    SELECT event_id, occurrence_start, is_cancelled, title, description, status, start_date, end_date
+    FROM calendar_event_exceptions
+    WHERE event_id IN :event_ids
+""").bindparams(bindparam("event_ids", expanding=True))
+
+
+@dataclass(frozen=True)
+class RecurrenceRule:
+    freq: str
+    interval: int = 1
+    count: Optional[int] = None
+    until: Optional[datetime] = None
+    byweekday: Tuple[int, ...] = ()
+    bymonthday: Tuple[int, ...] = ()
+    bymonth: Tuple[int, ...] = ()
+
+    def __post_init__(self):
+        if self.freq not in FREQUENCIES:
+            raise ValueError(f"Unsupported recurrence frequency: {self.freq}")
+        if self.interval < 1:
+            raise ValueError("Recurrence interval must be at least 1")
+        if self.count is not None and self.count < 1:
+            raise ValueError("Recurrence count must be at least 1")
+        if self.count is not None and self.until is not None:
+            raise ValueError("A recurrence rule cannot have both COUNT and UNTIL")
+        if any(not 0 <= day <= 6 for day in self.byweekday):
+            raise ValueError("BYDAY must be weekdays")
+        if any(day == 0 or not -31 <= day <= 31 for day in self.bymonthday):
+            raise ValueError("BYMONTHDAY must be between -31 and 31, excluding 0")
+        if any(not 1 <= month <= 12 for month in self.bymonth):
+            raise ValueError("BYMONTH must be between 1 and 12")
+
+    @classmethod
+    def parse(cls, rule: str) -> "RecurrenceRule":
+        """Parse ``FREQ=...;INTERVAL=...`` (an optional ``RRULE:`` prefix is allowed)"""
+        text = rule.strip()
+        if text.upper().startswith("RRULE:"):
+            text = text[6:]
+        parts: Dict[str, str] = {}
+        for part in filter(None, text.split(";")):
+            if "=" not in part:
+                raise ValueError(f"Malformed recurrence rule part: {part}")
+            name, value = part.split("=", 1)
+            parts[name.strip().upper()] = value.strip().upper()
+        unknown = set(parts) - {"FREQ", "INTERVAL", "COUNT", "UNTIL", "BYDAY", "BYMONTHDAY", "BYMONTH", "WKST"}
+        if unknown:
+            raise ValueError(f"Unsupported recurrence rule parts: {', '.join(sorted(unknown))}")
+        if parts.get("WKST", "MO") != "MO":
+            raise ValueError("Only WKST=MO is supported")
+        if "FREQ" not in parts:
+            raise ValueError("Recurrence rule needs FREQ")
+        try:
+            interval = int(parts.get("INTERVAL", 1))
+            count = int(parts["COUNT"]) if "COUNT" in parts else None
+            until = _parse_until(parts["UNTIL"]) if "UNTIL" in parts else None
+            byweekday = {WEEKDAYS.index(day) for day in parts["BYDAY"].split(",")} if "BYDAY" in parts else set()
+            bymonthday = {int(day) for day in parts["BYMONTHDAY"].split(",")} if "BYMONTHDAY" in parts else set()
+            bymonth = {int(month) for month in parts["BYMONTH"].split(",")} if "BYMONTH" in parts else set()
+        except ValueError as e:
+            raise ValueError(f"Malformed recurrence rule: {rule}") from e
+        return cls(parts["FREQ"], interval, count, until,
+                   tuple(sorted(byweekday)), tuple(sorted(bymonthday)), tuple(sorted(bymonth)))
+
+    @classmethod
+    def for_event(cls, pattern: Optional[str], interval: Optional[int] = 1,
+                  end_date: Optional[datetime] = None) -> "RecurrenceRule":
+        """The rule for a CalendarEvent's recurrence fields (legacy keyword or RRULE)"""
+        if not pattern:
+            raise ValueError("Recurring events need a recurrence pattern")
+        if pattern.strip().lower() in LEGACY_PATTERNS:
+            rule = cls(freq=LEGACY_PATTERNS[pattern.strip().lower()], interval=interval or 1)
+        else:
+            rule = cls.parse(pattern)
+        if end_date is not None and rule.count is None and (rule.until is None or end_date < rule.until):
+            rule = cls(rule.freq, rule.interval, None, end_date, rule.byweekday, rule.bymonthday, rule.bymonth)
+        return rule
+
+    def to_string(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append(f"UNTIL={self.until.strftime(UNTIL_FORMAT)}")
+        if self.byweekday:
+            parts.append("BYDAY=" + ",".join(WEEKDAYS[day] for day in self.byweekday))
+        if self.bymonthday:
+            parts.append("BYMONTHDAY=" + ",".join(str(day) for day in self.bymonthday))
+        if self.bymonth:
+            parts.append("BYMONTH=" + ",".join(str(month) for month in self.bymonth))
+        return ";".join(parts)
+
+
+def _parse_until(value: str) -> datetime:
+    value = value.rstrip("Z")
+    if "T" in value:
+        return datetime.strptime(value, UNTIL_FORMAT)
+    return datetime.strptime(value, "%Y%m%d")
+
+
+def _add_months(year: int, month: int, months: int) -> Tuple[int, int]:
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+class _Expander:
+    """Candidate days per period (day/week/month/year), filtered dateutil-style"""
+
+    def __init__(self, rule: RecurrenceRule, dtstart: datetime):
+        self.rule = rule
+        self.dtstart = dtstart
+        byweekday, bymonthday, bymonth = set(rule.byweekday), set(rule.bymonthday), set(rule.bymonth)
+        # Defaults when the rule does not say which days: DTSTART's weekday/day/month
+        if not byweekday and not bymonthday:
+            if rule.freq == WEEKLY:
+                byweekday = {dtstart.weekday()}
+            elif rule.freq == MONTHLY:
+                bymonthday = {dtstart.day}
+            elif rule.freq == YEARLY:
+                bymonthday = {dtstart.day}
+                bymonth = bymonth or {dtstart.month}
+        self.byweekday, self.bymonth = byweekday, bymonth
+        self.positive_days = {day for day in bymonthday if day > 0}
+        self.negative_days = {day for day in bymonthday if day < 0}
+        self.week_zero = dtstart.date() - timedelta(days=dtstart.weekday())
+
+    def period_start(self, k: int) -> date:
+        interval = self.rule.interval
+        if self.rule.freq == DAILY:
+            return self.dtstart.date() + timedelta(days=k * interval)
+        if self.rule.freq == WEEKLY:
+            return self.week_zero + timedelta(weeks=k * interval)
+        if self.rule.freq == MONTHLY:
+            year, month = _add_months(self.dtstart.year, self.dtstart.month, k * interval)
+            return date(year, month, 1)
+        return date(self.dtstart.year + k * interval, 1, 1)
+
+    def first_period_near(self, moment: datetime) -> int:
+        """Index of a period starting no later than ``moment`` (and not before the first)"""
+        interval = self.rule.interval
+        if moment <= self.dtstart:
+            return 0
+        if self.rule.freq == DAILY:
+            k = (moment.date() - self.dtstart.date()).days // interval
+        elif self.rule.freq == WEEKLY:
+            k = (moment.date() - self.week_zero).days // (7 * interval)
+        elif self.rule.freq == MONTHLY:
+            k = ((moment.year - self.dtstart.year) * 12 + moment.month - self.dtstart.month) // interval
+        else:
+            k = (moment.year - self.dtstart.year) // interval
+        return max(0, k - 1)
+
+    def days(self, k: int) -> List[date]:
+        start = self.period_start(k)
+        if self.rule.freq == DAILY:
+            candidates: Iterable[date] = (start,)
+        elif self.rule.freq == WEEKLY:
+            candidates = (start + timedelta(days=offset) for offset in range(7))
+        elif self.rule.freq == MONTHLY:
+            candidates = (start + timedelta(days=offset) for offset in range(calendar.monthrange(start.year, start.month)[1]))
+        else:
+            months = sorted(self.bymonth) if self.bymonth else range(1, 13)
+            candidates = (
+                date(start.year, month, day)
+                for month in months
+                for day in range(1, calendar.monthrange(start.year, month)[1] + 1)
+            )
+        return [day for day in candidates if self._matches(day)]
+
+    def _matches(self, day: date) -> bool:
+        if self.bymonth and day.month not in self.bymonth:
+            return False
+        if self.byweekday and day.weekday() not in self.byweekday:
+            return False
+        if self.positive_days or self.negative_days:
+            days_in_month = calendar.monthrange(day.year, day.month)[1]
+            if day.day not in self.positive_days and day.day - days_in_month - 1 not in self.negative_days:
+                return False
+        return True
+
+
+def iter_occurrences(rule: RecurrenceRule, dtstart: datetime, after: Optional[datetime] = None,
+                     before: Optional[datetime] = None) -> Iterator[datetime]:
+    """Occurrence starts from DTSTART on, lazily; stops at UNTIL, COUNT or ``before``.
+
+    ``after`` lets a rule without COUNT skip the periods before it; with
+    COUNT every occurrence from the start has to be counted.
+    """
+    expander = _Expander(rule, dtstart)
+    k = expander.first_period_near(after) if after is not None and rule.count is None else 0
+    emitted = 0
+    while True:
+        period = expander.period_start(k)
+        if before is not None and period > before.date():
+            return
+        if rule.until is not None and period > rule.until.date():
+            return
+        for day in expander.days(k):
+            moment = datetime.combine(day, dtstart.time())
+            if moment < dtstart:
+                continue
+            if rule.until is not None and moment > rule.until:
+                return
+            if before is not None and moment > before:
+                return
+            emitted += 1
+            yield moment
+            if rule.count is not None and emitted >= rule.count:
+                return
+        k += 1
+
+
+def occurrences_between(rule: RecurrenceRule, dtstart: datetime, start: datetime, end: datetime) -> List[datetime]:
+    """Occurrence starts in ``[start, end]`` (both inclusive, like the calendar endpoints)"""
+    result = []
+    for moment in iter_occurrences(rule, dtstart, after=start, before=end):
+        if moment >= start:
+            result.append(moment)
+            if len(result) >= MAX_OCCURRENCES_PER_WINDOW:
+                break
+    return result
+
+
+def is_occurrence(rule: RecurrenceRule, dtstart: datetime, moment: datetime) -> bool:
+    return bool(occurrences_between(rule, dtstart, moment, moment))
+
+
+@dataclass(frozen=True)
+class Occurrence:
+    series_id: int
+    original_start: datetime  # Identifies the occurrence, even when it was moved
+    start: datetime
+    end: Optional[datetime]
+    overrides: Dict[str, Any] = field(default_factory=dict, hash=False, compare=False)
+
+    @property
+    def is_exception(self) -> bool:
+        return bool(self.overrides) or self.start != self.original_start
+
+
+def expand_series(
+    series_id: int,
+    rule: RecurrenceRule,
+    dtstart: datetime,
+    duration: Optional[timedelta],
+    start: datetime,
+    end: datetime,
+    exceptions: Sequence[Any] = (),
+) -> List[Occurrence]:
+    """Occurrences of one series in ``[start, end]`` with exceptions applied.
+
+    ``exceptions`` are rows (or objects) with ``occurrence_start``,
+    ``is_cancelled`` and optional ``start_date``/``end_date`` and
+    OVERRIDE_FIELDS. A moved occurrence appears where it was moved to.
+    """
+    by_original = {exception.occurrence_start: exception for exception in exceptions}
+    occurrences = []
+    for moment in occurrences_between(rule, dtstart, start, end):
+        if moment not in by_original:
+            occurrences.append(Occurrence(series_id, moment, moment, moment + duration if duration is not None else None))
+
+    for original, exception in by_original.items():
+        if getattr(exception, "is_cancelled", False):
+            continue
+        moved_start = getattr(exception, "start_date", None) or original
+        if not start <= moved_start <= end or not is_occurrence(rule, dtstart, original):
+            continue
+        moved_end = getattr(exception, "end_date", None)
+        if moved_end is None and duration is not None:
+            moved_end = moved_start + duration
+        overrides = {name: getattr(exception, name) for name in OVERRIDE_FIELDS if getattr(exception, name, None) is not None}
+        occurrences.append(Occurrence(series_id, original, moved_start, moved_end, overrides))
+
+    occurrences.sort(key=lambda occurrence: (occurrence.start, occurrence.original_start))
+    return occurrences
+
+
+class OccurrenceCache:
+    """Thread-safe LRU of expanded windows keyed by (series, version, window)"""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Hashable, ...], List[Occurrence]]" = OrderedDict()
+        self._by_series: Dict[int, Set[Tuple[Hashable, ...]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, series_id: int, version: Hashable, start: datetime, end: datetime) -> Optional[List[Occurrence]]:
+        key = (series_id, version, start, end)
+        with self._lock:
+            occurrences = self._entries.get(key)
+            if occurrences is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return occurrences
+
+    def put(self, series_id: int, version: Hashable, start: datetime, end: datetime,
+            occurrences: List[Occurrence]) -> None:
+        key = (series_id, version, start, end)
+        with self._lock:
+            self._entries[key] = occurrences
+            self._entries.move_to_end(key)
+            self._by_series.setdefault(series_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                keys = self._by_series.get(old_key[0])
+                if keys is not None:
+                    keys.discard(old_key)
+                    if not keys:
+                        del self._by_series[old_key[0]]
+
+    def get_or_expand(self, series_id: int, version: Hashable, start: datetime, end: datetime,
+                      expand: Callable[[], List[Occurrence]]) -> List[Occurrence]:
+        occurrences = self.get(series_id, version, start, end)
+        if occurrences is None:
+            occurrences = expand()
+            self.put(series_id, version, start, end, occurrences)
+        return occurrences
+
+    def invalidate(self, series_id: int) -> None:
+        with self._lock:
+            for key in self._by_series.pop(series_id, ()):
+                self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_series.clear()
+
+
+occurrence_cache = OccurrenceCache()
+
+
+@dataclass(frozen=True)
+class _ExceptionRow:
+    occurrence_start: datetime
+    is_cancelled: bool
+    title: Optional[str]
+    description: Optional[str]
+    status: Optional[str]
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+
+
+def _as_datetime(value: Any) -> Any:
+    # SQLite hands text SQL timestamps back as strings
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def rule_for(series: Any) -> RecurrenceRule:
+    """The rule of a CalendarEvent (or any row with its recurrence columns)"""
+    return RecurrenceRule.for_event(series.recurrence_pattern, series.recurrence_interval, series.recurrence_end_date)
+
+
+def expand_events(db, events: Sequence[Any], start: datetime, end: datetime,
+                  cache: OccurrenceCache = occurrence_cache) -> Dict[int, List[Occurrence]]:
+    """Occurrences in ``[start, end]`` per recurring event id.
+
+    Windows come from the cache when the series has not changed; the
+    exceptions of every series that missed are loaded in one query. A series
+    whose stored rule no longer parses shows as its single first occurrence,
+    as it did before rules were expanded.
+    """
+    result: Dict[int, List[Occurrence]] = {}
+    missed = []
+    for event in events:
+        cached = cache.get(event.id, event.updated_date, start, end)
+        if cached is None:
+            missed.append(event)
+        else:
+            result[event.id] = cached
+    if not missed:
+        return result
+
+    exceptions: Dict[int, List[Any]] = {event.id: [] for event in missed}
+    for row in db.execute(EXCEPTIONS_SQL, {"event_ids": list(exceptions)}):
+        exceptions[row.event_id].append(_ExceptionRow(
+            occurrence_start=_as_datetime(row.occurrence_start),
+            is_cancelled=bool(row.is_cancelled),
+            title=row.title,
+            description=row.description,
+            status=row.status,
+            start_date=_as_datetime(row.start_date),
+            end_date=_as_datetime(row.end_date),
+        ))
+
+    for event in missed:
+        duration = event.end_date - event.start_date if event.end_date else None
+        try:
+            rule = rule_for(event)
+        except ValueError:
+            occurrences = [Occurrence(event.id, event.start_date, event.start_date, event.end_date)] \
+                if start <= event.start_date <= end else []
+        else:
+            occurrences = expand_series(event.id, rule, event.start_date, duration, start, end, exceptions[event.id])
+        cache.put(event.id, event.updated_date, start, end, occurrences)
+        result[event.id] = occurrences
+    return result
+
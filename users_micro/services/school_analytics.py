@@ -0,0 +1,326 @@
+"""Precomputed school analytics behind the principal dashboards.
+
+Each school has one row per day in ``school_daily_rollups`` (people,
+classrooms, subjects, assignments, grade count/total/letter buckets) and one
+row per subject and per classroom in ``school_rollup_groups`` (grade averages
+overall and for the last two 30-day windows, students, submissions). A
+refresh rebuilds today's rows for one school from three grouped queries, so
+dashboard reads are a primary-key lookup whatever the size of the school.
+
+Writes that change the numbers (grades, assignments, subjects, classrooms,
+enrolment) call ``touch``/``touch_assignment`` in their own transaction. That
+only bumps ``pending_events`` in ``school_rollup_state``; the scheduler
+refreshes dirty schools every few minutes (``refresh_dirty``) and recomputes
+and compacts every school nightly (``compact``), which also catches any write
+path that does not emit an event. Responses carry ``freshness`` (when the
+rollup was computed and how many changes it has not seen yet).
+
+Refreshes of one school can overlap (every worker runs the scheduler, and
+the dashboard can ask for one); on Postgres they queue on a transaction-level
+advisory lock on the school id, and every row is written with an upsert.
+"""
+
+import os
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, text
+
+RETENTION_DAYS = int(os.getenv("SCHOOL_ROLLUP_RETENTION_DAYS", "90"))
+RECENT_DAYS = 30
+# Namespace for pg_advisory_xact_lock(namespace, school_id) while refreshing a school's rollups
+# (achievements_micro's action_engine uses 4242 for its progress rows)
+ROLLUP_LOCK_NAMESPACE = 4243
+
+GRADE_BUCKETS = (("grade_a", 90), ("grade_b", 80), ("grade_c", 70), ("grade_d", 60), ("grade_f", None))
+DAILY_COLUMNS = (
+    "students", "active_students", "recent_students", "teachers", "recent_teachers",
+    "classrooms", "subjects", "assignments", "grades", "percent_total",
+) + tuple(name for name, _ in GRADE_BUCKETS)
+GROUP_COLUMNS = (
+    "name", "students", "grades", "percent_total",
+    "recent_grades", "recent_percent_total", "previous_grades", "previous_percent_total",
+)
+
+COUNTS_SQL = text("""
+    SELECT
+        (SELECT COUNT(*) FROM students WHERE school_id = :school_id) AS students,
+        (SELECT COUNT(*) FROM students WHERE school_id = :school_id AND is_active = true) AS active_students,
+        (SELECT COUNT(*) FROM students WHERE school_id = :school_id AND enrollment_date >= :recent) AS recent_students,
+        (SELECT COUNT(*) FROM teachers WHERE school_id = :school_id) AS teachers,
+        (SELECT COUNT(*) FROM teachers WHERE school_id = :school_id AND hire_date >= :recent) AS recent_teachers,
+        (SELECT COUNT(*) FROM classrooms WHERE school_id = :school_id AND is_active = true) AS classrooms,
+        (SELECT COUNT(*) FROM subjects WHERE school_id = :school_id AND is_active = true) AS subjects,
+        (SELECT COUNT(*) FROM assignments a JOIN subjects s ON s.id = a.subject_id
+         WHERE s.school_id = :school_id AND a.is_active = true) AS assignments
+""")
+
+# Active grades by (subject, classroom of the student), with the letter buckets and 30-day windows
+GRADES_SQL = text("""
+    SELECT subject_id, subject_name, subject_active, classroom_id,
+           COUNT(*) AS grades,
+           SUM(pct) AS percent_total,
+           SUM(CASE WHEN pct >= 90 THEN 1 ELSE 0 END) AS grade_a,
+           SUM(CASE WHEN pct >= 80 AND pct < 90 THEN 1 ELSE 0 END) AS grade_b,
+           SUM(CASE WHEN pct >= 70 AND pct < 80 THEN 1 ELSE 0 END) AS grade_c,
+           SUM(CASE WHEN pct >= 60 AND pct < 70 THEN 1 ELSE 0 END) AS grade_d,
+           SUM(CASE WHEN pct < 60 THEN 1 ELSE 0 END) AS grade_f,
+           SUM(CASE WHEN graded_date >= :recent THEN 1 ELSE 0 END) AS recent_grades,
+           SUM(CASE WHEN graded_date >= :recent THEN pct ELSE 0 END) AS recent_percent_total,
+           SUM(CASE WHEN graded_date >= :previous AND graded_date < :recent THEN 1 ELSE 0 END) AS previous_grades,
+           SUM(CASE WHEN graded_date >= :previous AND graded_date < :recent THEN pct ELSE 0 END) AS previous_percent_total
+    FROM (
+        SELECT s.id AS subject_id, s.name AS subject_name, s.is_active AS subject_active,
+               st.classroom_id AS classroom_id, g.graded_date AS graded_date,
+               g.points_earned * 100.0 / a.max_points AS pct
+        FROM grades g
+        JOIN assignments a ON a.id = g.assignment_id
+        JOIN subjects s ON s.id = a.subject_id
+        LEFT JOIN students st ON st.id = g.student_id
+        WHERE s.school_id = :school_id AND g.is_active = true AND a.is_active = true
+    ) graded
+    GROUP BY subject_id, subject_name, subject_active, classroom_id
+""")
+
+CLASSROOMS_SQL = text("""
+    SELECT c.id, c.name, COUNT(st.id) AS students
+    FROM classrooms c
+    LEFT JOIN students st ON st.classroom_id = c.id AND st.is_active = true
+    WHERE c.school_id = :school_id AND c.is_active = true
+    GROUP BY c.id, c.name
+""")
+
+
+def average(total: float, count: int) -> float:
+    return round(total / count, 1) if count else 0.0
+
+
+def submission_rate(grades: int, assignments: int, students: int) -> float:
+    """Graded submissions as a percentage of assignments x students"""
+    expected = assignments * students
+    return round(grades / expected * 100, 1) if expected else 0.0
+
+
+class SchoolRollups:
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow, retention_days: int = RETENTION_DAYS):
+        self.clock = clock
+        self.retention_days = retention_days
+
+    # ---- events ---------------------------------------------------------------
+
+    def touch(self, db, school_id: Optional[int]) -> None:
+        """Note a change to a school's numbers; part of the caller's transaction"""
+        if school_id is None:
+            return
+        db.execute(text("""
+            UPDATE school_rollup_state
+            SET pending_events = pending_events + 1, dirty_since = COALESCE(dirty_since, :now)
+            WHERE school_id = :school_id
+        """), {"school_id": school_id, "now": self.clock()})
+
+    def touch_assignment(self, db, assignment_id: Optional[int]) -> None:
+        """``touch`` for the school an assignment (and so its grades) belongs to"""
+        if assignment_id is None:
+            return
+        db.execute(text("""
+            UPDATE school_rollup_state
+            SET pending_events = pending_events + 1, dirty_since = COALESCE(dirty_since, :now)
+            WHERE school_id = (
+                SELECT s.school_id FROM assignments a JOIN subjects s ON s.id = a.subject_id WHERE a.id = :assignment_id
+            )
+        """), {"assignment_id": assignment_id, "now": self.clock()})
+
+    # ---- reads ----------------------------------------------------------------
+
+    def overview(self, db, school_id: int, refresh: bool = False) -> Dict[str, Any]:
+        """The latest daily rollup (built on first use) with derived rates and ``freshness``"""
+        state = self._state(db, school_id)
+        if refresh or state is None:
+            self.refresh(db, school_id)
+            state = self._state(db, school_id)
+
+        row = db.execute(text("""
+            SELECT * FROM school_daily_rollups WHERE school_id = :school_id ORDER BY day DESC LIMIT 1
+        """), {"school_id": school_id}).mappings().first()
+        rollup = {column: row[column] or 0 for column in DAILY_COLUMNS}
+        rollup["day"] = row["day"]
+        rollup["overall_average"] = average(rollup["percent_total"], rollup["grades"])
+        rollup["completion_rate"] = submission_rate(
+            rollup["grades"], rollup["assignments"], rollup["active_students"]
+        )
+        rollup["freshness"] = self._freshness(state)
+        return rollup
+
+    def groups(self, db, school_id: int, group_type: str) -> List[Dict[str, Any]]:
+        """Subject or classroom rows of the latest rollup, with averages"""
+        rows = db.execute(text("""
+            SELECT * FROM school_rollup_groups
+            WHERE school_id = :school_id AND group_type = :group_type
+              AND day = (SELECT MAX(day) FROM school_daily_rollups WHERE school_id = :school_id)
+            ORDER BY name
+        """), {"school_id": school_id, "group_type": group_type}).mappings().all()
+        return [
+            {
+                "id": row["group_id"],
+                **{column: row[column] for column in GROUP_COLUMNS},
+                "average": average(row["percent_total"], row["grades"]),
+                "recent_average": average(row["recent_percent_total"], row["recent_grades"]),
+                "previous_average": average(row["previous_percent_total"], row["previous_grades"]),
+            }
+            for row in rows
+        ]
+
+    def completion_rate_on(self, db, school_id: int, day: date) -> Optional[float]:
+        """Completion rate from the last rollup on or before ``day``, for trends"""
+        row = db.execute(text("""
+            SELECT grades, assignments, active_students FROM school_daily_rollups
+            WHERE school_id = :school_id AND day <= :day ORDER BY day DESC LIMIT 1
+        """), {"school_id": school_id, "day": day}).first()
+        return submission_rate(row.grades or 0, row.assignments or 0, row.active_students or 0) if row else None
+
+    # ---- refresh --------------------------------------------------------------
+
+    def refresh(self, db, school_id: int) -> None:
+        """Rebuild today's rollup rows for one school and commit"""
+        if db.get_bind().dialect.name == "postgresql":
+            # Held until the commit below: a concurrent refresh of this school waits, then recounts
+            db.execute(text("SELECT pg_advisory_xact_lock(:namespace, :school_id)"), {
+                "namespace": ROLLUP_LOCK_NAMESPACE, "school_id": school_id
+            })
+        now = self.clock()
+        day = now.date()
+        recent = now - timedelta(days=RECENT_DAYS)
+        params = {"school_id": school_id, "recent": recent, "previous": recent - timedelta(days=RECENT_DAYS)}
+
+        db.execute(text("""
+            INSERT INTO school_rollup_state (school_id, computed_at, dirty_since, pending_events)
+            VALUES (:school_id, NULL, NULL, 0)
+            ON CONFLICT (school_id) DO NOTHING
+        """), {"school_id": school_id})
+        seen = self._state(db, school_id)["pending_events"]
+
+        daily = dict(db.execute(COUNTS_SQL, params).mappings().first())
+        for column in ("grades", "percent_total") + tuple(name for name, _ in GRADE_BUCKETS):
+            daily[column] = 0
+        subjects: Dict[int, Dict[str, Any]] = {}
+        classrooms = {
+            row.id: self._empty_group(row.name, row.students) for row in db.execute(CLASSROOMS_SQL, params)
+        }
+
+        for row in db.execute(GRADES_SQL, params).mappings():
+            for column in ("grades", "percent_total") + tuple(name for name, _ in GRADE_BUCKETS):
+                daily[column] += row[column] or 0
+            targets = []
+            if row["subject_active"]:
+                targets.append(subjects.setdefault(row["subject_id"], self._empty_group(row["subject_name"], 0)))
+            if row["classroom_id"] in classrooms:
+                targets.append(classrooms[row["classroom_id"]])
+            for group in targets:
+                for column in GROUP_COLUMNS[2:]:
+                    group[column] += row[column] or 0
+
+        key = {"school_id": school_id, "day": day}
+        db.execute(text(f"""
+            INSERT INTO school_daily_rollups (school_id, day, {", ".join(DAILY_COLUMNS)}, computed_at)
+            VALUES (:school_id, :day, {", ".join(":" + column for column in DAILY_COLUMNS)}, :now)
+            ON CONFLICT (school_id, day) DO UPDATE SET
+                {", ".join(f"{column} = excluded.{column}" for column in DAILY_COLUMNS + ("computed_at",))}
+        """), {**key, **daily, "now": now})
+        for group_type, groups in (("subject", subjects), ("classroom", classrooms)):
+            # Groups that are gone (a deactivated subject, say) drop out of today's rollup
+            db.execute(text("""
+                DELETE FROM school_rollup_groups
+                WHERE school_id = :school_id AND day = :day AND group_type = :group_type
+                  AND group_id NOT IN :group_ids
+            """).bindparams(bindparam("group_ids", expanding=True)),
+                {**key, "group_type": group_type, "group_ids": list(groups)})
+        group_rows = [
+            {**key, "group_type": group_type, "group_id": group_id, **values}
+            for group_type, groups in (("subject", subjects), ("classroom", classrooms))
+            for group_id, values in groups.items()
+        ]
+        if group_rows:
+            db.execute(text(f"""
+                INSERT INTO school_rollup_groups (school_id, day, group_type, group_id, {", ".join(GROUP_COLUMNS)})
+                VALUES (:school_id, :day, :group_type, :group_id, {", ".join(":" + column for column in GROUP_COLUMNS)})
+                ON CONFLICT (school_id, day, group_type, group_id) DO UPDATE SET
+                    {", ".join(f"{column} = excluded.{column}" for column in GROUP_COLUMNS)}
+            """), group_rows)
+
+        # Events that arrived while we were counting stay pending
+        db.execute(text("""
+            UPDATE school_rollup_state
+            SET computed_at = :now,
+                pending_events = pending_events - :seen,
+                dirty_since = CASE WHEN pending_events > :seen THEN dirty_since ELSE NULL END
+            WHERE school_id = :school_id
+        """), {"school_id": school_id, "now": now, "seen": seen})
+        db.commit()
+
+    def refresh_dirty(self, db) -> int:
+        """Refresh every school with pending events; returns schools refreshed"""
+        school_ids = [row.school_id for row in db.execute(text(
+            "SELECT school_id FROM school_rollup_state WHERE pending_events > 0 ORDER BY dirty_since"
+        ))]
+        for school_id in school_ids:
+            self.refresh(db, school_id)
+        return len(school_ids)
+
+    def compact(self, db) -> Dict[str, int]:
+        """Nightly: recompute every active school, then thin rows past retention to one per month"""
+        school_ids = [row.id for row in db.execute(text("SELECT id FROM schools WHERE is_active = true"))]
+        for school_id in school_ids:
+            self.refresh(db, school_id)
+
+        cutoff = self.clock().date() - timedelta(days=self.retention_days)
+        old = db.execute(text(
+            "SELECT school_id, day FROM school_daily_rollups WHERE day < :cutoff"
+        ), {"cutoff": cutoff}).all()
+        month_ends: Dict[tuple, date] = {}
+        for school_id, day in old:
+            day = self._as_date(day)
+            month = (school_id, day.year, day.month)
+            month_ends[month] = max(month_ends.get(month, day), day)
+        keep = set((school_id, day) for (school_id, _, _), day in month_ends.items())
+        doomed = [(school_id, self._as_date(day)) for school_id, day in old if (school_id, self._as_date(day)) not in keep]
+
+        for table in ("school_rollup_groups", "school_daily_rollups"):
+            for school_id in {school_id for school_id, _ in doomed}:
+                days = [day for doomed_school, day in doomed if doomed_school == school_id]
+                db.execute(
+                    text(f"DELETE FROM {table} WHERE school_id = :school_id AND day IN :days")
+                    .bindparams(bindparam("days", expanding=True)),
+                    {"school_id": school_id, "days": days}
+                )
+        db.commit()
+        return {"schools_refreshed": len(school_ids), "days_compacted": len(doomed)}
+
+    # ---- internals ------------------------------------------------------------
+
+    def _state(self, db, school_id: int) -> Optional[Dict[str, Any]]:
+        row = db.execute(text(
+            "SELECT computed_at, dirty_since, pending_events FROM school_rollup_state WHERE school_id = :school_id"
+        ), {"school_id": school_id}).mappings().first()
+        return dict(row) if row else None
+
+    def _freshness(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        computed_at = state["computed_at"]
+        if isinstance(computed_at, str):
+            computed_at = datetime.fromisoformat(computed_at)
+        return {
+            "computed_at": computed_at.isoformat() if computed_at else None,
+            "age_seconds": int((self.clock() - computed_at).total_seconds()) if computed_at else None,
+            "pending_changes": state["pending_events"],
+            "stale": state["pending_events"] > 0,
+        }
+
+    @staticmethod
+    def _empty_group(name: str, students: int) -> Dict[str, Any]:
+        return {"name": name, "students": students or 0, **{column: 0 for column in GROUP_COLUMNS[2:]}}
+
+    @staticmethod
+    def _as_date(value) -> date:
+        return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+school_rollups = SchoolRollups()
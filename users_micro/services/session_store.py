@@ -0,0 +1,442 @@
+"""Conversation session storage shared by every API worker.
+
+The KANA step-learning and agent chat services used to keep sessions in a
+per-process dict, so with several uvicorn workers a learner's next message
+often reached a worker that had never seen their session, and a restart
+lost them all. Sessions now live in a ``SessionStore``:
+
+- ``MemorySessionStore``: the old behaviour, for a single worker and tests.
+- ``SqlSessionStore``: the ``conversation_sessions`` table.
+- ``RedisSessionStore``: any server speaking the Redis protocol (RESP),
+  through a small built-in client with a connection pool, so no Redis
+  package is needed.
+
+Sessions are JSON documents (datetimes survive the round trip) with a
+version number and an expiry. Every write sets a new expiry ``ttl`` from
+now, so idle sessions expire as before. Writes are optimistic: ``write``
+only succeeds if the stored version is still ``expected_version`` (0 for
+"does not exist yet"), otherwise it raises ``SessionConflict``. ``update``
+wraps read, mutate and write in a retry loop, so two workers appending to
+the same history both land, and ``append_capped`` keeps histories bounded.
+
+``SESSION_STORE`` picks the backend (memory, sql or redis;
+``SESSION_STORE_REDIS_URL`` and ``SESSION_STORE_REDIS_POOL_SIZE`` for redis).
+"""
+
+import abc
+import asyncio
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import unquote, urlparse
+
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory").lower()
+REDIS_URL = os.getenv("SESSION_STORE_REDIS_URL", os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+REDIS_POOL_SIZE = int(os.getenv("SESSION_STORE_REDIS_POOL_SIZE", "4"))
+UPDATE_RETRIES = 8
+PRUNE_INTERVAL_SECONDS = 300
+
+Session = Dict[str, Any]
+
+
+class SessionConflict(Exception):
+    """Another writer changed the session since it was read"""
+
+
+@dataclass
+class StoredSession:
+    data: Session
+    version: int
+
+
+def append_capped(history: List[Any], items: Sequence[Any], max_items: int) -> List[Any]:
+    """Append ``items`` and keep only the last ``max_items`` entries, in place"""
+    history.extend(items)
+    if len(history) > max_items:
+        del history[:len(history) - max_items]
+    return history
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1 and "$datetime" in obj:
+        return datetime.fromisoformat(obj["$datetime"])
+    return obj
+
+
+def encode_session(data: Session) -> str:
+    return json.dumps(data, default=_encode_value, separators=(",", ":"))
+
+
+def decode_session(payload) -> Session:
+    if isinstance(payload, bytes):
+        payload = payload.decode("utf-8")
+    return json.loads(payload, object_hook=_decode_object)
+
+
+class SessionStore(abc.ABC):
+    """Versioned, expiring session documents grouped by namespace"""
+
+    @abc.abstractmethod
+    async def get(self, namespace: str, session_id: str) -> Optional[StoredSession]:
+        """The live session, or None if it does not exist or has expired"""
+
+    @abc.abstractmethod
+    async def write(self, namespace: str, session_id: str, data: Session, expected_version: int,
+                    ttl: timedelta) -> int:
+        """Store ``data`` if the current version is ``expected_version``; returns the new version"""
+
+    @abc.abstractmethod
+    async def delete(self, namespace: str, session_id: str) -> None:
+        """Remove the session if it exists"""
+
+    async def update(self, namespace: str, session_id: str, mutate: Callable[[Session], None], *,
+                     ttl: timedelta, default: Optional[Callable[[], Session]] = None) -> Session:
+        """Apply ``mutate`` to the stored session and write it back, retrying on conflicts.
+
+        A missing or expired session is started from ``default()``, or raises
+        ``KeyError`` without one. Exceptions from ``mutate`` abort without writing.
+        """
+        for _ in range(UPDATE_RETRIES):
+            current = await self.get(namespace, session_id)
+            if current is None:
+                if default is None:
+                    raise KeyError("Session not found")
+                data, version = default(), 0
+            else:
+                data, version = current.data, current.version
+            mutate(data)
+            try:
+                await self.write(namespace, session_id, data, version, ttl)
+                return data
+            except SessionConflict:
+                continue
+        raise SessionConflict(f"Session {session_id} kept changing; gave up after {UPDATE_RETRIES} attempts")
+
+
+class MemorySessionStore(SessionStore):
+    """Per-process store; sessions are not shared between workers"""
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow):
+        self._clock = clock
+        self._sessions: Dict[Tuple[str, str], Tuple[str, int, datetime]] = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _live(self, key: Tuple[str, str]) -> Optional[Tuple[str, int, datetime]]:
+        entry = self._sessions.get(key)
+        if entry is not None and entry[2] < self._clock():
+            del self._sessions[key]
+            return None
+        return entry
+
+    async def get(self, namespace: str, session_id: str) -> Optional[StoredSession]:
+        with self._lock:
+            entry = self._live((namespace, session_id))
+        if entry is None:
+            return None
+        return StoredSession(decode_session(entry[0]), entry[1])
+
+    async def write(self, namespace: str, session_id: str, data: Session, expected_version: int,
+                    ttl: timedelta) -> int:
+        payload = encode_session(data)
+        key = (namespace, session_id)
+        with self._lock:
+            entry = self._live(key)
+            if (entry[1] if entry else 0) != expected_version:
+                raise SessionConflict(f"Session {session_id} changed")
+            version = expected_version + 1
+            now = self._clock()
+            self._sessions[key] = (payload, version, now + ttl)
+            if time.monotonic() - self._last_prune > PRUNE_INTERVAL_SECONDS:
+                self._last_prune = time.monotonic()
+                for stale in [k for k, (_, _, expires) in self._sessions.items() if expires < now]:
+                    del self._sessions[stale]
+        return version
+
+    async def delete(self, namespace: str, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop((namespace, session_id), None)
+
+
+GET_SQL = text("""
+    SELECT data, version FROM conversation_sessions
+    WHERE namespace = :namespace AND session_id = :session_id AND expires_at >= :now
+""")
+
+UPDATE_SQL = text("""
+    UPDATE conversation_sessions
+    SET data = :data, version = version + 1, user_id = :user_id, expires_at = :expires_at, updated_date = :now
+    WHERE namespace = :namespace AND session_id = :session_id AND version = :expected_version
+      AND expires_at >= :now
+""")
+
+INSERT_SQL = text("""
+    INSERT INTO conversation_sessions (namespace, session_id, user_id, data, version, expires_at, created_date, updated_date)
+    VALUES (:namespace, :session_id, :user_id, :data, 1, :expires_at, :now, :now)
+""")
+
+DELETE_EXPIRED_KEY_SQL = text("""
+    DELETE FROM conversation_sessions
+    WHERE namespace = :namespace AND session_id = :session_id AND expires_at < :now
+""")
+
+DELETE_SQL = text("DELETE FROM conversation_sessions WHERE namespace = :namespace AND session_id = :session_id")
+
+PRUNE_SQL = text("DELETE FROM conversation_sessions WHERE expires_at < :now")
+
+
+class SqlSessionStore(SessionStore):
+    """Sessions in ``conversation_sessions``; a write is one guarded UPDATE (or INSERT)"""
+
+    def __init__(self, engine=None, engine_factory: Optional[Callable[[], Any]] = None,
+                 clock: Callable[[], datetime] = datetime.utcnow):
+        if engine is None and engine_factory is None:
+            raise ValueError("SqlSessionStore needs an engine or an engine factory")
+        self._engine = engine
+        self._engine_factory = engine_factory
+        self._clock = clock
+        self._last_prune = 0.0
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = self._engine_factory()
+        return self._engine
+
+    def _get(self, namespace: str, session_id: str) -> Optional[StoredSession]:
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                GET_SQL, {"namespace": namespace, "session_id": session_id, "now": self._clock()}
+            ).first()
+        if row is None:
+            return None
+        return StoredSession(decode_session(row.data), row.version)
+
+    def _write(self, namespace: str, session_id: str, data: Session, expected_version: int,
+               ttl: timedelta) -> int:
+        now = self._clock()
+        params = {
+            "namespace": namespace,
+            "session_id": session_id,
+            "user_id": data.get("user_id"),
+            "data": encode_session(data),
+            "expires_at": now + ttl,
+            "now": now,
+        }
+        try:
+            with self.engine.begin() as connection:
+                if expected_version == 0:
+                    # An expired row with this id does not count as existing
+                    connection.execute(DELETE_EXPIRED_KEY_SQL, params)
+                    connection.execute(INSERT_SQL, params)
+                else:
+                    updated = connection.execute(UPDATE_SQL, {**params, "expected_version": expected_version})
+                    if updated.rowcount != 1:
+                        raise SessionConflict(f"Session {session_id} changed")
+                if time.monotonic() - self._last_prune > PRUNE_INTERVAL_SECONDS:
+                    self._last_prune = time.monotonic()
+                    connection.execute(PRUNE_SQL, {"now": now})
+        except IntegrityError as exc:
+            raise SessionConflict(f"Session {session_id} already exists") from exc
+        return expected_version + 1
+
+    def _delete(self, namespace: str, session_id: str) -> None:
+        with self.engine.begin() as connection:
+            connection.execute(DELETE_SQL, {"namespace": namespace, "session_id": session_id})
+
+    async def get(self, namespace: str, session_id: str) -> Optional[StoredSession]:
+        return await asyncio.to_thread(self._get, namespace, session_id)
+
+    async def write(self, namespace: str, session_id: str, data: Session, expected_version: int,
+                    ttl: timedelta) -> int:
+        return await asyncio.to_thread(self._write, namespace, session_id, data, expected_version, ttl)
+
+    async def delete(self, namespace: str, session_id: str) -> None:
+        await asyncio.to_thread(self._delete, namespace, session_id)
+
+
+class RespError(Exception):
+    """An error reply from a Redis-protocol server"""
+
+
+def encode_command(*parts) -> bytes:
+    """A RESP array of bulk strings"""
+    out = [b"*%d\r\n" % len(parts)]
+    for part in parts:
+        if not isinstance(part, bytes):
+            part = str(part).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(part), part))
+    return b"".join(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return body.decode("utf-8")
+    if kind == b"-":
+        raise RespError(body.decode("utf-8"))
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise RespError(f"Unexpected reply type {kind!r}")
+
+
+# KEYS[1] session key; ARGV expected version, payload, ttl in ms. Returns the new version or -1.
+WRITE_SCRIPT = """
+local current = tonumber(redis.call('HGET', KEYS[1], 'version') or '0')
+if current ~= tonumber(ARGV[1]) then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'data', ARGV[2], 'version', current + 1)
+redis.call('PEXPIRE', KEYS[1], ARGV[3])
+return current + 1
+"""
+
+
+class RedisSessionStore(SessionStore):
+    """Sessions as Redis hashes (data, version) with native key expiry; writes are a compare-and-set script.
+
+    Commands run on a pool of up to ``pool_size`` connections per event loop,
+    so concurrent requests do not queue behind one another's round trips.
+    """
+
+    def __init__(self, url: str = REDIS_URL, key_prefix: str = "brainink:session:", pool_size: int = REDIS_POOL_SIZE):
+        parsed = urlparse(url)
+        if parsed.scheme != "redis":
+            raise ValueError("RedisSessionStore supports redis:// URLs")
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = unquote(parsed.password) if parsed.password else None
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.key_prefix = key_prefix
+        self.pool_size = max(1, pool_size)
+        self._idle: List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def _key(self, namespace: str, session_id: str) -> str:
+        return f"{self.key_prefix}{namespace}:{session_id}"
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            if self.password:
+                auth = ("AUTH", self.username, self.password) if self.username else ("AUTH", self.password)
+                writer.write(encode_command(*auth))
+                await read_reply(reader)
+            if self.db:
+                writer.write(encode_command("SELECT", self.db))
+                await read_reply(reader)
+        except BaseException:
+            writer.close()
+            raise
+        return reader, writer
+
+    @staticmethod
+    def _discard(connection: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]) -> None:
+        if connection is not None:
+            connection[1].close()
+
+    async def execute(self, *command) -> Any:
+        """Run one command on a pooled connection, reconnecting once if it turns out to be dead
+
+        A send failure, or a pooled connection the server closed while it sat idle
+        (Redis restarted, idle timeout), is retried once on a fresh connection. Every
+        command this store sends is safe to repeat: reads and DEL are idempotent and a
+        repeated write fails its version check, which ``update`` already retries.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Connections and the semaphore belong to the loop that made them
+            self._loop, self._slots, self._idle = loop, asyncio.Semaphore(self.pool_size), []
+        async with self._slots:
+            connection = self._idle.pop() if self._idle else None
+            for attempt in (1, 2):
+                reused = connection is not None
+                try:
+                    if connection is None:
+                        connection = await self._connect()
+                    reader, writer = connection
+                    writer.write(encode_command(*command))
+                    await writer.drain()
+                except OSError:
+                    self._discard(connection)
+                    connection = None
+                    if attempt == 2:
+                        raise
+                    continue
+                try:
+                    reply = await read_reply(reader)
+                except RespError:
+                    # The error reply was read in full, so the connection is still in step
+                    self._idle.append(connection)
+                    raise
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    self._discard(connection)
+                    connection = None
+                    if attempt == 2 or not reused:
+                        raise
+                    continue
+                except BaseException:
+                    # A half-read reply would be misread by the next command, so the
+                    # connection is dropped
+                    self._discard(connection)
+                    raise
+                self._idle.append(connection)
+                return reply
+
+    async def get(self, namespace: str, session_id: str) -> Optional[StoredSession]:
+        payload, version = await self.execute("HMGET", self._key(namespace, session_id), "data", "version")
+        if payload is None:
+            return None
+        return StoredSession(decode_session(payload), int(version))
+
+    async def write(self, namespace: str, session_id: str, data: Session, expected_version: int,
+                    ttl: timedelta) -> int:
+        version = await self.execute(
+            "EVAL", WRITE_SCRIPT, 1, self._key(namespace, session_id),
+            expected_version, encode_session(data), int(ttl.total_seconds() * 1000),
+        )
+        if version < 0:
+            raise SessionConflict(f"Session {session_id} changed")
+        return version
+
+    async def delete(self, namespace: str, session_id: str) -> None:
+        await self.execute("DEL", self._key(namespace, session_id))
+
+
+def session_store_from_env() -> SessionStore:
+    if SESSION_STORE == "sql":
+        from db.database import get_engine
+        return SqlSessionStore(engine_factory=get_engine)
+    if SESSION_STORE == "redis":
+        return RedisSessionStore(REDIS_URL, pool_size=REDIS_POOL_SIZE)
+    return MemorySessionStore()
+
+
+session_store = session_store_from_env()
@@ -0,0 +1,219 @@
+"""Set-based queries behind the student dashboard.
+
+Both student analytics endpoints used to load every assignment and grade for
+the student and pair them up in Python with nested scans. Here the pairing
+is a join: ``work`` is one row per (subject, assignment) with the student's
+active grade for it (NULL when still to do). Nothing stops a student having
+more than one active grade for an assignment, so ``latest_grades`` keeps only
+the most recently graded one and an assignment is never counted twice. The dashboard needs two statements whatever the number
+of assignments: a GROUP BY for the per-subject numbers and a query ranked
+with ROW_NUMBER() that returns only the few recent grades and upcoming
+deadlines it shows. The subject view fetches its rows in one statement
+and walks them once.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import text
+
+RECENT_LIMIT = 5
+UPCOMING_LIMIT = 5
+TREND_DAYS = 30
+
+ENROLLED_SCOPE = """
+    SELECT s.id AS subject_id, s.name AS subject_name
+    FROM subjects s
+    JOIN subject_students ss ON ss.subject_id = s.id
+    WHERE ss.student_id = :student_id AND s.is_active = true
+"""
+
+SUBJECT_SCOPE = """
+    SELECT s.id AS subject_id, s.name AS subject_name
+    FROM subjects s
+    WHERE s.id = :subject_id
+"""
+
+WORK_CTE = """
+WITH scope AS ({scope}),
+latest_grades AS (
+    SELECT * FROM (
+        SELECT g.*, ROW_NUMBER() OVER (PARTITION BY g.assignment_id ORDER BY g.graded_date DESC, g.id DESC) AS grade_rank
+        FROM grades g
+        WHERE g.student_id = :student_id AND g.is_active = true
+    ) ranked
+    WHERE grade_rank = 1
+),
+work AS (
+    SELECT scope.subject_id, scope.subject_name,
+           a.id AS assignment_id, a.title, a.description, a.subtopic, a.teacher_id,
+           a.max_points, a.due_date, a.created_date, a.is_active,
+           g.id AS grade_id, g.teacher_id AS grade_teacher_id, g.points_earned, g.feedback, g.graded_date
+    FROM scope
+    LEFT JOIN assignments a ON a.subject_id = scope.subject_id AND a.is_active = true
+    LEFT JOIN latest_grades g ON g.assignment_id = a.id
+)
+"""
+
+SUMMARY_SQL = text(WORK_CTE.format(scope=ENROLLED_SCOPE) + """
+SELECT subject_id, subject_name,
+       COUNT(assignment_id) AS total_assignments,
+       COUNT(grade_id) AS completed_assignments,
+       COALESCE(SUM(points_earned), 0) AS points,
+       COALESCE(SUM(CASE WHEN grade_id IS NOT NULL THEN max_points END), 0) AS max_points
+FROM work
+GROUP BY subject_id, subject_name
+ORDER BY subject_id
+""")
+
+HIGHLIGHTS_SQL = text(WORK_CTE.format(scope=ENROLLED_SCOPE) + """
+SELECT * FROM (
+    SELECT 'recent' AS kind, work.*,
+           ROW_NUMBER() OVER (ORDER BY graded_date DESC, grade_id DESC) AS position
+    FROM work
+    WHERE grade_id IS NOT NULL
+) recent
+WHERE position <= :recent_limit
+UNION ALL
+SELECT * FROM (
+    SELECT 'upcoming' AS kind, work.*,
+           ROW_NUMBER() OVER (ORDER BY due_date, assignment_id) AS position
+    FROM work
+    WHERE assignment_id IS NOT NULL AND grade_id IS NULL AND due_date > :now
+) upcoming
+WHERE position <= :upcoming_limit
+""")
+
+SUBJECT_SQL = text(WORK_CTE.format(scope=SUBJECT_SCOPE) + """
+SELECT work.*, CASE WHEN graded_date >= :trend_since THEN 1 ELSE 0 END AS in_trend
+FROM work
+WHERE assignment_id IS NOT NULL
+ORDER BY assignment_id
+""")
+
+
+def percentage(points: float, max_points: float) -> float:
+    return (points / max_points) * 100 if max_points else 0
+
+
+def letter(percent: float) -> str:
+    for grade, floor in (("A", 90), ("B", 80), ("C", 70), ("D", 60)):
+        if percent >= floor:
+            return grade
+    return "F"
+
+
+class StudentDashboard:
+    """Dashboard numbers for one student, computed in the database"""
+
+    def __init__(self, clock: Callable[[], datetime] = datetime.now):
+        self.clock = clock
+
+    def overview(self, db, student_id: int) -> Dict[str, Any]:
+        """Academic overview, subject performance, recent grades and upcoming work"""
+        params = {"student_id": student_id}
+        subjects = [dict(row._mapping) for row in db.execute(SUMMARY_SQL, params)]
+        highlights = db.execute(HIGHLIGHTS_SQL, {
+            **params, "now": self.clock(), "recent_limit": RECENT_LIMIT, "upcoming_limit": UPCOMING_LIMIT
+        }).mappings().all()
+
+        total_assignments = sum(row["total_assignments"] for row in subjects)
+        completed_assignments = sum(row["completed_assignments"] for row in subjects)
+        points = sum(row["points"] for row in subjects)
+        max_points = sum(row["max_points"] for row in subjects)
+
+        recent = sorted((row for row in highlights if row["kind"] == "recent"), key=lambda row: row["position"])
+        upcoming = sorted((row for row in highlights if row["kind"] == "upcoming"), key=lambda row: row["position"])
+
+        return {
+            "total_subjects": len(subjects),
+            "total_assignments": total_assignments,
+            "completed_assignments": completed_assignments,
+            "average_grade": percentage(points, max_points),
+            "completion_rate": percentage(completed_assignments, total_assignments),
+            "subject_performance": [{
+                "subject_id": row["subject_id"],
+                "subject_name": row["subject_name"],
+                "average_grade": percentage(row["points"], row["max_points"]),
+                "total_assignments": row["total_assignments"],
+                "completed_assignments": row["completed_assignments"],
+            } for row in subjects],
+            "recent_grades": [{
+                "id": row["grade_id"],
+                "assignment_id": row["assignment_id"],
+                "student_id": student_id,
+                "teacher_id": row["grade_teacher_id"],
+                "points_earned": row["points_earned"],
+                "feedback": row["feedback"],
+                "graded_date": row["graded_date"],
+                "is_active": True,
+                "assignment_title": row["title"],
+                "assignment_max_points": row["max_points"],
+                "percentage": percentage(row["points_earned"], row["max_points"]),
+            } for row in recent],
+            "upcoming_assignments": [{
+                "id": row["assignment_id"],
+                "title": row["title"],
+                "description": row["description"],
+                "subtopic": row["subtopic"],
+                "subject_id": row["subject_id"],
+                "teacher_id": row["teacher_id"],
+                "max_points": row["max_points"],
+                "due_date": row["due_date"],
+                "created_date": row["created_date"],
+                "is_active": row["is_active"],
+                "subject_name": row["subject_name"],
+            } for row in upcoming],
+        }
+
+    def subject_performance(self, db, student_id: int, subject_id: int) -> Dict[str, Any]:
+        """Per-assignment status, grade distribution and 30-day trend for one subject"""
+        rows = db.execute(SUBJECT_SQL, {
+            "student_id": student_id,
+            "subject_id": subject_id,
+            "trend_since": self.clock() - timedelta(days=TREND_DAYS),
+        }).mappings().all()
+
+        distribution = {"A": 0, "B": 0, "C": 0, "D": 0, "F": 0}
+        total_points = max_points = completed = 0
+        assignments: List[Dict[str, Any]] = []
+        trend: List[Dict[str, Any]] = []
+        for row in rows:
+            item = {
+                "assignment_id": row["assignment_id"],
+                "assignment_title": row["title"],
+                "max_points": row["max_points"],
+                "due_date": row["due_date"],
+                "completed": row["grade_id"] is not None,
+            }
+            if row["grade_id"] is not None:
+                percent = percentage(row["points_earned"], row["max_points"])
+                item.update({
+                    "points_earned": row["points_earned"],
+                    "percentage": percent,
+                    "feedback": row["feedback"],
+                    "graded_date": row["graded_date"],
+                })
+                completed += 1
+                total_points += row["points_earned"]
+                max_points += row["max_points"]
+                distribution[letter(percent)] += 1
+                if row["in_trend"]:
+                    trend.append({"date": row["graded_date"], "percentage": percent, "assignment_title": row["title"]})
+            assignments.append(item)
+        trend.sort(key=lambda point: point["date"])
+
+        return {
+            "total_assignments": len(rows),
+            "completed_assignments": completed,
+            "completion_rate": percentage(completed, len(rows)),
+            "overall_percentage": percentage(total_points, max_points),
+            "total_points": total_points,
+            "max_points": max_points,
+            "grade_distribution": distribution,
+            "assignment_performance": assignments,
+            "performance_trends": trend,
+        }
+
+
+student_dashboard = StudentDashboard()
@@ -0,0 +1,315 @@
+"""Content-addressed, on-disk audio cache for TTS output.
+
+Entries are keyed by ``sha256(text, voice, speed, engine)``, so the same word
+spoken by the same voice is synthesized once no matter which student, request
+or uvicorn worker asks for it. Every worker on a host points at the same
+directory (``TTS_CACHE_DIR``); files are written atomically and a lock file per
+key stops two workers from synthesizing the same entry at the same time.
+
+WAV output is transcoded to Ogg/Opus (or MP3 via ffmpeg) before it is stored
+when an encoder is available. The cache is capped at ``TTS_CACHE_MAX_MB`` and
+evicts least recently used entries; a hit bumps the file's mtime, which is the
+recency signal eviction sorts by.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import soundfile as sf
+    SOUNDFILE_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the deployment image
+    SOUNDFILE_AVAILABLE = False
+
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / "reading_assistant_tts" / "cache"
+DEFAULT_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024)
+LOCK_STALE_SECONDS = 120
+LOCK_POLL_SECONDS = 0.05
+EVICT_EVERY_N_WRITES = 50
+
+MEDIA_TYPES = {
+    "ogg": "audio/ogg",
+    "mp3": "audio/mpeg",
+    "wav": "audio/wav",
+    "m4a": "audio/mp4",
+}
+
+# Producers return (audio_bytes, format, metadata) where format is a MEDIA_TYPES key
+AudioProducer = Callable[[], Awaitable[Tuple[bytes, str, Dict[str, Any]]]]
+
+
+@dataclass
+class CachedAudio:
+    key: str
+    path: Path
+    audio_format: str
+    size: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    cache_hit: bool = False
+
+    @property
+    def filename(self) -> str:
+        return self.path.name
+
+    @property
+    def media_type(self) -> str:
+        return MEDIA_TYPES.get(self.audio_format, "application/octet-stream")
+
+    @property
+    def etag(self) -> str:
+        # Content-addressed: the key already identifies the bytes
+        return f'"{self.key}"'
+
+
+def _transcode_wav(audio_bytes: bytes) -> Optional[Tuple[bytes, str]]:
+    """Compress WAV bytes to Opus (soundfile) or MP3 (ffmpeg); None if neither works."""
+    if SOUNDFILE_AVAILABLE:
+        try:
+            data, sample_rate = sf.read(io.BytesIO(audio_bytes))
+            if sample_rate in (8000, 12000, 16000, 24000, 48000):
+                out = io.BytesIO()
+                sf.write(out, data, sample_rate, format="OGG", subtype="OPUS")
+                return out.getvalue(), "ogg"
+        except Exception as exc:  # noqa: BLE001 - older libsndfile builds lack Opus
+            logger.debug("Opus transcode failed: %s", exc)
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        try:
+            proc = subprocess.run(
+                [ffmpeg, "-loglevel", "error", "-i", "pipe:0", "-f", "mp3", "-b:a", "48k", "pipe:1"],
+                input=audio_bytes,
+                capture_output=True,
+                timeout=30,
+                check=True,
+            )
+            if proc.stdout:
+                return proc.stdout, "mp3"
+        except Exception as exc:  # noqa: BLE001
+            logger.debug("ffmpeg transcode failed: %s", exc)
+    return None
+
+
+class TTSAudioCache:
+    """Shared on-disk LRU cache of synthesized audio."""
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        *,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        compress: bool = True,
+    ) -> None:
+        self.root = Path(root or os.getenv("TTS_CACHE_DIR") or DEFAULT_CACHE_DIR)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compress = compress
+        self._key_locks: Dict[str, asyncio.Lock] = {}
+        self._writes_since_evict = 0
+
+    @staticmethod
+    def make_key(text: str, voice: str, speed: float, engine: str) -> str:
+        normalized = " ".join((text or "").split()).lower()
+        payload = json.dumps(
+            [normalized, voice or "", round(float(speed), 2), engine or ""],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    # ---- lookup ---------------------------------------------------------
+
+    def _meta_path(self, key: str) -> Path:
+        return self.root / f"{key}.json"
+
+    def lookup(self, key: str) -> Optional[CachedAudio]:
+        meta_path = self._meta_path(key)
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+        audio_path = self.root / f"{key}.{meta.get('format', 'wav')}"
+        try:
+            size = audio_path.stat().st_size
+            now = time.time()
+            os.utime(audio_path, (now, now))
+        except FileNotFoundError:
+            return None
+        if size == 0:
+            return None
+
+        return CachedAudio(
+            key=key,
+            path=audio_path,
+            audio_format=meta.get("format", "wav"),
+            size=size,
+            metadata=meta.get("metadata", {}),
+            cache_hit=True,
+        )
+
+    def resolve_filename(self, filename: str) -> Optional[CachedAudio]:
+        """Map a served filename (``<key>.<ext>``) back to its entry."""
+        key, _, ext = filename.partition(".")
+        if len(key) != 64 or ext not in MEDIA_TYPES or not all(c in "0123456789abcdef" for c in key):
+            return None
+        return self.lookup(key)
+
+    # ---- populate -------------------------------------------------------
+
+    async def get_or_create(self, key: str, producer: AudioProducer) -> CachedAudio:
+        """Return the cached entry for ``key``, synthesizing it once if missing."""
+        cached = self.lookup(key)
+        if cached:
+            return cached
+
+        lock = self._key_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            try:
+                cached = self.lookup(key)
+                if cached:
+                    return cached
+
+                lock_path = self.root / f"{key}.lock"
+                owns_file_lock = await self._acquire_file_lock(lock_path)
+                try:
+                    # Another worker may have finished while we waited on the lock file
+                    cached = self.lookup(key)
+                    if cached:
+                        return cached
+
+                    audio_bytes, audio_format, metadata = await producer()
+                    return await asyncio.to_thread(self._store, key, audio_bytes, audio_format, metadata)
+                finally:
+                    if owns_file_lock:
+                        self._release_file_lock(lock_path)
+            finally:
+                self._key_locks.pop(key, None)
+
+    async def _acquire_file_lock(self, lock_path: Path) -> bool:
+        """Cross-worker lock via O_EXCL; gives up (returns False) on a stale lock."""
+        deadline = time.monotonic() + LOCK_STALE_SECONDS
+        while True:
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.close(fd)
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - lock_path.stat().st_mtime > LOCK_STALE_SECONDS:
+                        lock_path.unlink()
+                        continue
+                except FileNotFoundError:
+                    continue
+                if time.monotonic() > deadline:
+                    return False
+                await asyncio.sleep(LOCK_POLL_SECONDS)
+
+    @staticmethod
+    def _release_file_lock(lock_path: Path) -> None:
+        try:
+            lock_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _store(self, key: str, audio_bytes: bytes, audio_format: str, metadata: Dict[str, Any]) -> CachedAudio:
+        if not audio_bytes:
+            raise ValueError("Refusing to cache empty audio")
+
+        if self.compress and audio_format == "wav":
+            transcoded = _transcode_wav(audio_bytes)
+            if transcoded:
+                audio_bytes, audio_format = transcoded
+
+        audio_path = self.root / f"{key}.{audio_format}"
+        self._atomic_write(audio_path, audio_bytes)
+        # Metadata is written last: an entry only exists once its sidecar does
+        self._atomic_write(
+            self._meta_path(key),
+            json.dumps({"format": audio_format, "metadata": metadata}).encode("utf-8"),
+        )
+
+        self._writes_since_evict += 1
+        if self._writes_since_evict >= EVICT_EVERY_N_WRITES:
+            self._writes_since_evict = 0
+            self.evict()
+
+        return CachedAudio(
+            key=key,
+            path=audio_path,
+            audio_format=audio_format,
+            size=len(audio_bytes),
+            metadata=metadata,
+        )
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        fd, tmp_name = tempfile.mkstemp(dir=self.root, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_name)
+            except FileNotFoundError:
+                pass
+            raise
+
+    # ---- maintenance ----------------------------------------------------
+
+    def _audio_entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in self.root.iterdir():
+            if path.suffix.lstrip(".") not in MEDIA_TYPES:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Delete least recently used entries until the cache fits; returns count removed."""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        entries = self._audio_entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            for victim in (self._meta_path(path.stem), path):
+                try:
+                    victim.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("TTS cache evicted %s entries (now %s bytes)", removed, total)
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries = self._audio_entries()
+        return {
+            "directory": str(self.root),
+            "entries": len(entries),
+            "total_bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+
+# Shared cache instance used by every TTS engine in this process
+tts_audio_cache = TTSAudioCache()
@@ -13,6 +13,7 @@ from datetime import datetime
 import json
 
 from services.azure_tts_service import azure_tts_service
+from services.tts_cache import CachedAudio, tts_audio_cache
 
 # Try to import Google TTS - will use fallback if not available
 try:
@@ -28,21 +29,57 @@ try:
 except ImportError:
     PYTTSX3_AVAILABLE = False
 
+AUDIO_URL_PREFIX = "/after-school/reading-assistant/pronunciation-audio"
+
+# Prewarm settings: vocabulary words are synthesized the way the pronunciation
+# endpoints request them so the first student tap is already a cache hit
+PREWARM_CONCURRENCY = int(os.getenv("TTS_PREWARM_CONCURRENCY", "4"))
+PREWARM_MAX_WORDS = int(os.getenv("TTS_PREWARM_MAX_WORDS", "50"))
+
+WORD_PRONUNCIATION_SPEED = 0.7  # Slower for individual words
+
+_KOKORO_UNLOADED = object()
+
 AZURE_VOICE_MAP = {
     "child_friendly": "en-US-AvaNeural",
     "teacher": "en-US-GuyNeural",
     "clear": "en-US-JennyNeural",
 }
 
+# Kokoro voices matching the Azure ones above, so switching engine keeps the voice
+KOKORO_VOICE_MAP = {
+    "child_friendly": "af_bella",
+    "teacher": "am_michael",
+    "clear": "af_sarah",
+}
+
+
+def _word_pronunciation_text(
+    word: str,
+    phonetic_hint: Optional[str] = None,
+    context: Optional[str] = None
+) -> str:
+    """Create pronunciation text with phonetic hints"""
+    if phonetic_hint:
+        return f"{word}. {phonetic_hint}. {word}."
+    if context:
+        return f"{word}. As in {context}. {word}."
+    return f"{word}. {word}."
+
+
+class _UncacheableAudio(Exception):
+    """Raised by a cache producer whose result must not be stored."""
+
 
 class TTSService:
     """Text-to-Speech service for pronunciation help"""
     
     def __init__(self):
         self.tts_method = self._detect_available_tts()
-        self.audio_cache = {}  # Cache generated audio files
         self.output_dir = Path(tempfile.gettempdir()) / "reading_assistant_tts"
         self.output_dir.mkdir(exist_ok=True)
+        self.audio_cache = tts_audio_cache  # Shared across workers, see services/tts_cache.py
+        self._kokoro = _KOKORO_UNLOADED  # Imported lazily; loading torch is expensive
         
         print(f"🔊 TTS Service initialized using: {self.tts_method}")
     
@@ -90,17 +127,18 @@ class TTSService:
         self,
         text: str,
         voice_type: str = "child_friendly",
-        speed: float = 0.8,  # Slower for learning
-        cache_key: Optional[str] = None
+        speed: float = 0.8  # Slower for learning
     ) -> Dict[str, Any]:
         """
         Generate pronunciation audio for text
         
+        Results are served from the shared on-disk cache (see services/tts_cache.py),
+        keyed by text, voice, speed and engine, so each phrase is synthesized once.
+        
         Args:
             text: Text to convert to speech
             voice_type: Type of voice (child_friendly, teacher, clear)
             speed: Speech speed (0.5 = slow, 1.0 = normal, 1.5 = fast)
-            cache_key: Optional key for caching
             
         Returns:
             {
@@ -108,42 +146,69 @@ class TTSService:
                 "audio_url": str,
                 "audio_file": str,
                 "duration_seconds": float,
-                "text": str
+                "text": str,
+                "etag": str,
+                "cached": bool
             }
         """
         
         try:
-            # Generate cache key if not provided
-            if not cache_key:
-                cache_key = f"{text}_{voice_type}_{speed}".replace(" ", "_").lower()
-            
-            # Check cache first
-            if cache_key in self.audio_cache:
-                cached_result = self.audio_cache[cache_key]
-                if os.path.exists(cached_result["audio_file"]):
-                    print(f"🎯 Using cached TTS for: '{text}'")
-                    return cached_result
-            
             # Generate new audio based on available method
             method = self.tts_method
             if method == "azure" and not azure_tts_service.is_available:
                 method = self._detect_available_tts()
                 self.tts_method = method
 
-            if method == "azure":
-                result = await self._generate_azure_tts(text, voice_type, speed)
-            elif method == "google_cloud":
-                result = await self._generate_google_cloud_tts(text, voice_type, speed)
-            elif method == "pyttsx3":
-                result = await self._generate_pyttsx3_tts(text, voice_type, speed)
+            cache_key = self.audio_cache.make_key(text, voice_type, speed, method)
+            uncached_result: Dict[str, Any] = {}
+
+            async def produce():
+                if method == "azure":
+                    result = await self._generate_azure_tts(text, voice_type, speed)
+                elif method == "google_cloud":
+                    result = await self._generate_google_cloud_tts(text, voice_type, speed)
+                elif method == "pyttsx3":
+                    result = await self._generate_pyttsx3_tts(text, voice_type, speed)
+                else:
+                    result = await self._generate_fallback_tts(text, voice_type, speed)
+
+                # Silence placeholders must never be cached as the real pronunciation
+                if not result.get("success") or result.get("method") == "silence_fallback":
+                    uncached_result.update(result)
+                    raise _UncacheableAudio()
+
+                generated = Path(result["audio_file"])
+                audio_bytes = generated.read_bytes()
+                generated.unlink(missing_ok=True)
+                metadata = {
+                    "duration_seconds": result["duration_seconds"],
+                    "voice": result.get("voice", voice_type),
+                    "provider": result.get("provider", method),
+                }
+                return audio_bytes, generated.suffix.lstrip(".") or "wav", metadata
+
+            try:
+                cached = await self.audio_cache.get_or_create(cache_key, produce)
+            except _UncacheableAudio:
+                return uncached_result
+
+            if cached.cache_hit:
+                print(f"🎯 Using cached TTS for: '{text}'")
             else:
-                result = await self._generate_fallback_tts(text, voice_type, speed)
-            
-            # Cache the result
-            self.audio_cache[cache_key] = result
-            
-            print(f"🔊 Generated TTS audio for: '{text}' ({result['duration_seconds']:.1f}s)")
-            return result
+                print(f"🔊 Generated TTS audio for: '{text}' ({cached.metadata.get('duration_seconds', 0.0):.1f}s)")
+
+            return {
+                "success": True,
+                "audio_url": f"{AUDIO_URL_PREFIX}/{cached.filename}",
+                "audio_file": str(cached.path),
+                "duration_seconds": cached.metadata.get("duration_seconds", 0.0),
+                "text": text,
+                "voice": cached.metadata.get("voice", voice_type),
+                "provider": cached.metadata.get("provider", method),
+                "media_type": cached.media_type,
+                "etag": cached.etag,
+                "cached": cached.cache_hit
+            }
             
         except Exception as e:
             print(f"❌ TTS generation failed for '{text}': {e}")
@@ -415,21 +480,77 @@ class TTSService:
     ) -> Dict[str, Any]:
         """Generate pronunciation for a single word with phonetic guidance"""
         
-        # Create pronunciation text with phonetic hints
-        if phonetic_hint:
-            pronunciation_text = f"{word}. {phonetic_hint}. {word}."
-        elif context:
-            pronunciation_text = f"{word}. As in {context}. {word}."
-        else:
-            pronunciation_text = f"{word}. {word}."
-        
         return await self.generate_pronunciation_audio(
-            text=pronunciation_text,
+            text=_word_pronunciation_text(word, phonetic_hint, context),
             voice_type="child_friendly",
-            speed=0.7,  # Slower for individual words
-            cache_key=f"word_{word}_{phonetic_hint or 'default'}"
+            speed=WORD_PRONUNCIATION_SPEED
         )
     
+    async def generate_word_pronunciations_batch(
+        self,
+        words: List[Dict[str, Optional[str]]],
+        voice_type: str = "child_friendly"
+    ) -> List[Dict[str, Any]]:
+        """Generate pronunciations for many words at once
+        
+        Each item is {"word", "phonetic_hint", "context"}. With Kokoro installed all
+        uncached words are rendered in a single pipeline call, in the Kokoro voice
+        mapped from voice_type (KOKORO_VOICE_MAP); otherwise words are generated
+        concurrently with the configured engine.
+        """
+        
+        texts = [
+            _word_pronunciation_text(item["word"], item.get("phonetic_hint"), item.get("context"))
+            for item in words
+        ]
+        
+        kokoro = self.kokoro_engine
+        if kokoro is not None and texts:
+            try:
+                voice = KOKORO_VOICE_MAP.get(voice_type, KOKORO_VOICE_MAP["child_friendly"])
+                entries = await kokoro.synthesize_batch(texts=texts, voice=voice, speed=WORD_PRONUNCIATION_SPEED)
+                return [
+                    {
+                        "success": entry is not None,
+                        "audio_url": f"{AUDIO_URL_PREFIX}/{entry.filename}" if entry else None,
+                        "audio_file": str(entry.path) if entry else None,
+                        "duration_seconds": entry.metadata.get("duration_seconds", 0.0) if entry else 0.0,
+                        "text": text,
+                        "voice": voice,
+                        "provider": "kokoro",
+                        "etag": entry.etag if entry else None,
+                        "cached": entry.cache_hit if entry else False,
+                    }
+                    for text, entry in zip(texts, entries)
+                ]
+            except Exception as e:
+                print(f"⚠️ Kokoro batch synthesis failed, generating words individually: {e}")
+        
+        semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        
+        async def generate(text: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.generate_pronunciation_audio(
+                    text=text,
+                    voice_type=voice_type,
+                    speed=WORD_PRONUNCIATION_SPEED
+                )
+        
+        return list(await asyncio.gather(*(generate(text) for text in texts)))
+    
+    @property
+    def kokoro_engine(self):
+        """Kokoro service if the optional ``kokoro`` package is installed, else None"""
+        
+        if self._kokoro is _KOKORO_UNLOADED:
+            try:
+                from services.kokoro_tts_service import kokoro_tts_service
+                self._kokoro = kokoro_tts_service
+            except Exception as e:
+                print(f"ℹ️ Kokoro TTS not available: {e}")
+                self._kokoro = None
+        return self._kokoro
+    
     async def generate_sentence_pronunciation(
         self,
         sentence: str,
@@ -451,12 +572,42 @@ class TTSService:
         return await self.generate_pronunciation_audio(
             text=pronunciation_text,
             voice_type="teacher",
-            speed=0.8,
-            cache_key=f"sentence_{hash(sentence)}_{len(highlight_words or [])}"
+            speed=0.8
         )
     
+    async def prewarm_words(self, words: List[str]) -> Dict[str, int]:
+        """Synthesize vocabulary words ahead of time so student requests hit the cache"""
+        
+        unique_words = []
+        seen = set()
+        for word in words or []:
+            cleaned = (word or "").strip()
+            if cleaned and cleaned.lower() not in seen:
+                seen.add(cleaned.lower())
+                unique_words.append(cleaned)
+        unique_words = unique_words[:PREWARM_MAX_WORDS]
+        
+        semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        
+        async def warm(word: str) -> bool:
+            async with semaphore:
+                # Matches GET /pronunciation/word (speed=normal) and POST /pronunciation/word
+                plain = await self.generate_pronunciation_audio(text=word, voice_type="child_friendly", speed=1.0)
+                guided = await self.generate_word_pronunciation(word=word)
+                # Only cache-backed results count; silence fallbacks are never stored
+                return bool(plain.get("etag") and guided.get("etag"))
+        
+        results = await asyncio.gather(*(warm(word) for word in unique_words))
+        warmed = sum(1 for ok in results if ok)
+        print(f"🔥 Prewarmed TTS cache: {warmed}/{len(unique_words)} words")
+        return {"requested": len(unique_words), "warmed": warmed}
+    
+    def resolve_audio_file(self, filename: str) -> Optional[CachedAudio]:
+        """Look up a served filename in the shared cache"""
+        return self.audio_cache.resolve_filename(filename)
+    
     def cleanup_old_files(self, max_age_hours: int = 24):
-        """Clean up old TTS files to save space"""
+        """Clean up uncached TTS files by age and trim the shared cache by LRU size"""
         
         try:
             current_time = datetime.now()
@@ -469,7 +620,8 @@ class TTSService:
                         file_path.unlink()
                         cleaned_count += 1
             
-            print(f"🧹 Cleaned up {cleaned_count} old TTS files")
+            evicted_count = self.audio_cache.evict()
+            print(f"🧹 Cleaned up {cleaned_count} old TTS files, evicted {evicted_count} cached entries")
             
         except Exception as e:
             print(f"⚠️ TTS cleanup warning: {e}")
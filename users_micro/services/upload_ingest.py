@@ -0,0 +1,172 @@
+"""Streaming ingestion for uploaded files.
+
+Upload endpoints used to ``await file.read()`` the whole upload, then copy
+the bytes again into a tempfile or a ``LargeBinary`` column, so peak memory
+was a multiple of the upload size. ``ingest_upload`` instead reads the
+upload in ``CHUNK_SIZE`` chunks into a ``SpooledTemporaryFile`` (kept in
+memory up to ``SPOOL_MAX_BYTES``, then on disk) and hashes it on the way,
+so memory stays at about one chunk whatever the upload size.
+
+Limits are per upload kind (``IMAGE_UPLOAD``, ``PDF_UPLOAD``,
+``AUDIO_UPLOAD``) and are enforced as early as possible: extension and
+declared size before anything is read, the file signature on the first
+chunk, the size limit while streaming (the rest is never read) and the PDF
+page limit before the file is handed on. A rejected upload raises
+``UploadRejected`` carrying the HTTP status the endpoint should answer with.
+"""
+
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, FrozenSet, Optional, Tuple
+
+from pypdf import PdfReader
+
+CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_BYTES = int(os.getenv("UPLOAD_SPOOL_MAX_BYTES", str(1024 * 1024)))
+MB = 1024 * 1024
+
+
+class UploadRejected(Exception):
+    """An upload that breaks its limits; ``status_code`` is 400 or 413"""
+
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+@dataclass(frozen=True)
+class UploadLimits:
+    kind: str
+    max_bytes: int
+    extensions: FrozenSet[str] = frozenset()
+    content_type_prefix: Optional[str] = None
+    signatures: Tuple[bytes, ...] = ()  # Accepted leading bytes; empty accepts anything
+    max_pages: Optional[int] = None  # PDFs only
+
+
+IMAGE_UPLOAD = UploadLimits(
+    kind="image",
+    max_bytes=int(os.getenv("UPLOAD_IMAGE_MAX_MB", "20")) * MB,
+    extensions=frozenset({".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}),
+    signatures=(b"\xff\xd8\xff", b"\x89PNG", b"GIF8", b"BM", b"RIFF"),
+)
+PDF_UPLOAD = UploadLimits(
+    kind="PDF",
+    max_bytes=int(os.getenv("UPLOAD_PDF_MAX_MB", "100")) * MB,
+    extensions=frozenset({".pdf"}),
+    signatures=(b"%PDF",),
+    max_pages=int(os.getenv("UPLOAD_PDF_MAX_PAGES", "1500")),
+)
+AUDIO_UPLOAD = UploadLimits(
+    kind="audio",
+    max_bytes=int(os.getenv("UPLOAD_AUDIO_MAX_MB", "50")) * MB,
+    content_type_prefix="audio/",
+)
+
+
+@dataclass
+class IngestedUpload:
+    """A fully received upload: spooled contents plus what was learned while streaming it"""
+
+    filename: str
+    content_type: Optional[str]
+    size: int
+    sha256: str
+    file: BinaryIO = field(repr=False)
+    page_count: Optional[int] = None
+
+    def read(self) -> bytes:
+        """The whole contents, for consumers that can only take bytes (e.g. a LargeBinary column)"""
+        self.file.seek(0)
+        return self.file.read()
+
+    async def save_to(self, path) -> None:
+        """Copy the contents to ``path`` chunk by chunk"""
+        def copy():
+            self.file.seek(0)
+            with open(path, "wb") as out:
+                shutil.copyfileobj(self.file, out, CHUNK_SIZE)
+
+        await asyncio.to_thread(copy)
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> "IngestedUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _megabytes(size: int) -> str:
+    return f"{size / MB:g}MB"
+
+
+def check_upload_metadata(upload, limits: UploadLimits) -> None:
+    """Checks that need no bytes: extension, content type and declared size"""
+    filename = upload.filename or ""
+    if limits.extensions and Path(filename).suffix.lower() not in limits.extensions:
+        raise UploadRejected(
+            f"{filename or '<no name>'}: file type not allowed. Allowed types: {', '.join(sorted(limits.extensions))}"
+        )
+    if limits.content_type_prefix and not (upload.content_type or "").startswith(limits.content_type_prefix):
+        raise UploadRejected(f"Invalid {limits.kind} file type")
+    declared = getattr(upload, "size", None)
+    if declared and declared > limits.max_bytes:
+        raise UploadRejected(
+            f"{filename}: {_megabytes(declared)} is over the {_megabytes(limits.max_bytes)} {limits.kind} limit", 413
+        )
+
+
+def _count_pages(handle: BinaryIO) -> int:
+    handle.seek(0)
+    try:
+        return len(PdfReader(handle).pages)
+    except Exception as exc:
+        raise UploadRejected(f"Unreadable PDF: {exc}") from exc
+
+
+async def ingest_upload(upload, limits: UploadLimits, chunk_size: int = CHUNK_SIZE,
+                        allow_empty: bool = False) -> IngestedUpload:
+    """Stream ``upload`` (a FastAPI ``UploadFile``) into spooled storage within ``limits``"""
+    check_upload_metadata(upload, limits)
+    filename = upload.filename or ""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    digest = hashlib.sha256()
+    size = 0
+
+    def absorb(chunk: bytes) -> None:
+        digest.update(chunk)
+        spool.write(chunk)
+
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+            if size == 0 and limits.signatures and not chunk.startswith(limits.signatures):
+                raise UploadRejected(f"{filename}: contents are not a valid {limits.kind} file")
+            size += len(chunk)
+            if size > limits.max_bytes:
+                raise UploadRejected(f"{filename}: over the {_megabytes(limits.max_bytes)} {limits.kind} limit", 413)
+            await asyncio.to_thread(absorb, chunk)
+        if size == 0 and not allow_empty:
+            raise UploadRejected(f"{filename or 'Upload'} is empty")
+
+        page_count = None
+        if limits.max_pages is not None and size:
+            page_count = await asyncio.to_thread(_count_pages, spool)
+            if page_count > limits.max_pages:
+                raise UploadRejected(f"{filename}: {page_count} pages is over the {limits.max_pages} page limit", 413)
+        spool.seek(0)
+    except BaseException:
+        spool.close()
+        raise
+
+    return IngestedUpload(filename, upload.content_type, size, digest.hexdigest(), spool, page_count)
@@ -0,0 +1,26 @@
+"""Shared fixtures for the users_micro tests."""
+
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+USERS_MICRO = Path(__file__).resolve().parents[1]
+
+
+@pytest.fixture()
+def app_import(monkeypatch):
+    """Import app modules as top-level ``services.*`` (how the app imports its siblings).
+
+    ``sys.path`` is restored by monkeypatch, and the app modules imported this
+    way are dropped afterwards, so they do not leak into later tests.
+    """
+    monkeypatch.syspath_prepend(str(USERS_MICRO))
+    before = set(sys.modules)
+    yield importlib.import_module
+    for name in set(sys.modules) - before:
+        module = sys.modules[name]
+        location = getattr(module, "__file__", None) or next(iter(getattr(module, "__path__", [])), "")
+        if str(location).startswith(str(USERS_MICRO)) and not name.startswith("users_micro"):
+            del sys.modules[name]
@@ -0,0 +1,154 @@
+"""Tests for the per-user calendar visibility index and keyset pages."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.calendar_index import (
+    CalendarVisibilityIndex, InvalidCursorError, decode_cursor, encode_cursor
+)
+
+MONTH = datetime(2026, 10, 1)
+
+SCHEMA = [
+    "CREATE TABLE roles (id INTEGER PRIMARY KEY, name TEXT)",
+    "CREATE TABLE user_roles (user_id INTEGER, role_id INTEGER)",
+    "CREATE TABLE schools (id INTEGER PRIMARY KEY, principal_id INTEGER)",
+    "CREATE TABLE teachers (id INTEGER PRIMARY KEY, user_id INTEGER, school_id INTEGER)",
+    "CREATE TABLE students (id INTEGER PRIMARY KEY, user_id INTEGER, school_id INTEGER)",
+    """CREATE TABLE calendar_events (id INTEGER PRIMARY KEY, school_id INTEGER, event_type TEXT, priority TEXT,
+                                     status TEXT, subject_id INTEGER, start_date TIMESTAMP, is_active BOOLEAN)""",
+    "CREATE TABLE calendar_event_attendees (id INTEGER PRIMARY KEY, event_id INTEGER, user_id INTEGER, is_active BOOLEAN)",
+    """CREATE TABLE calendar_visible_events (user_id INTEGER, event_id INTEGER, school_id INTEGER, start_date TIMESTAMP,
+                                             PRIMARY KEY (user_id, event_id))""",
+    "CREATE INDEX ix_visible_user_start ON calendar_visible_events (user_id, start_date, event_id)",
+    "CREATE TABLE calendar_visibility_scopes (user_id INTEGER, school_id INTEGER, PRIMARY KEY (user_id, school_id))",
+    "CREATE TABLE calendar_visibility_state (user_id INTEGER PRIMARY KEY, built_at TIMESTAMP)",
+    "INSERT INTO roles VALUES (1, 'student'), (2, 'teacher'), (3, 'principal')",
+    # user 10: student at school 1; user 20: teacher at school 2; user 30: principal of school 1
+    "INSERT INTO user_roles VALUES (10, 1), (20, 2), (30, 3)",
+    "INSERT INTO schools VALUES (1, 30), (2, 99)",
+    "INSERT INTO teachers VALUES (1, 20, 2)",
+    "INSERT INTO students VALUES (1, 10, 1), (2, 40, 2)",  # user 40 has no student role
+]
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    return sessionmaker(bind=engine)()
+
+
+def _event(db, event_id, school_id, day, hour=9, event_type="exam", status="scheduled", active=True):
+    db.execute(text("INSERT INTO calendar_events VALUES (:id, :school, :type, 'medium', :status, 1, :start, :active)"), {
+        "id": event_id, "school": school_id, "type": event_type, "status": status,
+        "start": MONTH + timedelta(days=day, hours=hour), "active": active,
+    })
+
+
+def _seed(db):
+    for event_id in range(1, 61):
+        # Three events share each start time, so ids must break the ties
+        _event(db, event_id, 1 + event_id % 2, day=(event_id - 1) // 3,
+               event_type="exam" if event_id % 5 else "reminder", status="completed" if event_id % 7 == 0 else "scheduled")
+    _event(db, 61, 1, day=3, active=False)
+    db.execute(text("INSERT INTO calendar_event_attendees VALUES (1, 2, 10, 1), (2, 4, 10, 0)"))
+    db.commit()
+
+
+def _visible(db, index, user_id, **kwargs):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor, total = index.page(db, user_id, cursor=cursor, **kwargs)
+        ids.extend(page)
+        pages += 1
+        if cursor is None:
+            return ids, total, pages
+
+
+def test_schools_follow_roles():
+    db, index = _db(), CalendarVisibilityIndex()
+    assert index.accessible_school_ids(db, 10) == [1]
+    assert index.accessible_school_ids(db, 20) == [2]
+    assert index.accessible_school_ids(db, 30) == [1]
+    assert index.accessible_school_ids(db, 40) == []
+
+
+def test_keyset_pages_walk_every_visible_event_once_in_order():
+    db, index = _db(), CalendarVisibilityIndex()
+    _seed(db)
+    index.ensure(db, 10)
+
+    ids, total, pages = _visible(db, index, 10, limit=7)
+    school_events = [event_id for event_id in range(1, 61) if event_id % 2 == 0]
+    expected = sorted(set(school_events), key=lambda event_id: ((event_id - 1) // 3, event_id))
+    assert ids == expected and total == len(expected) == 30 and pages == 5
+
+    # Attending a school-2 event adds it once the event write is reported
+    db.execute(text("INSERT INTO calendar_event_attendees VALUES (3, 3, 10, 1)"))
+    index.events_changed(db, [3])
+    db.commit()
+    ids, total, _ = _visible(db, index, 10, limit=50)
+    assert 3 in ids and total == 31
+
+    exams, _, _ = _visible(db, index, 10, filters={"event_type": ["exam"]}, include_completed=False)
+    assert all(event_id % 5 and event_id % 7 for event_id in exams)
+
+    in_range, _, _ = _visible(db, index, 10, start_date=MONTH + timedelta(days=2), end_date=MONTH + timedelta(days=4))
+    assert in_range == index.ids_between(db, 10, MONTH + timedelta(days=2), MONTH + timedelta(days=4)) == [8, 10, 12]
+
+
+def test_event_writes_and_membership_changes_reach_the_index():
+    db, index = _db(), CalendarVisibilityIndex()
+    _seed(db)
+    index.ensure(db, 10)
+    index.ensure(db, 20)
+
+    # Moving an event to school 2 moves it between the two users' indexes
+    db.execute(text("UPDATE calendar_events SET school_id = 2, start_date = :start WHERE id = 4"), {"start": MONTH})
+    index.events_changed(db, [4])
+    db.commit()
+    assert 4 not in index.ids_between(db, 10, MONTH, MONTH + timedelta(days=40))
+    assert index.ids_between(db, 20, MONTH, MONTH)[:1] == [4]
+
+    # Soft-deleting removes it everywhere
+    db.execute(text("UPDATE calendar_events SET is_active = 0 WHERE id = 4"))
+    index.events_changed(db, [4])
+    db.commit()
+    assert 4 not in index.ids_between(db, 20, MONTH, MONTH + timedelta(days=40))
+
+    # A student who changes school is rebuilt on their next read
+    db.execute(text("UPDATE students SET school_id = 2 WHERE user_id = 10"))
+    db.commit()
+    assert index.ensure(db, 10) == [2]
+    ids, _, _ = _visible(db, index, 10, limit=100)
+    assert set(ids) == set(index.ids_between(db, 20, MONTH, MONTH + timedelta(days=40))) | {2}  # still attends event 2
+
+
+def test_month_view_is_a_constant_number_of_statements():
+    db, index = _db(), CalendarVisibilityIndex()
+    _seed(db)
+    index.ensure(db, 10)
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    for limit in (5, 50):
+        statements.clear()
+        index.ensure(db, 10)
+        index.page(db, 10, start_date=MONTH, end_date=MONTH + timedelta(days=31), limit=limit,
+                   filters={"status": ["scheduled"]})
+        assert len(statements) == 4  # scope, stored scope, count, page
+
+
+def test_cursors_round_trip_and_reject_garbage():
+    cursor = encode_cursor(MONTH, 42)
+    assert decode_cursor(cursor) == (MONTH, 42)
+    with pytest.raises(InvalidCursorError):
+        decode_cursor("not-a-cursor")
+    db, index = _db(), CalendarVisibilityIndex()
+    with pytest.raises(ValueError):
+        index.page(db, 10, filters={"title": ["x"]})
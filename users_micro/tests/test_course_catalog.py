@@ -0,0 +1,107 @@
+"""Tests for the course catalog counters and thumbnail URLs."""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.course_catalog import (
+    adjust_lesson_count, image_etag, record_study_session, refresh_course_counters, thumbnail_url
+)
+
+SCHEMA = [
+    """CREATE TABLE as_courses (id INTEGER PRIMARY KEY, title TEXT,
+                                lesson_count INTEGER NOT NULL DEFAULT 0, enrollment_count INTEGER NOT NULL DEFAULT 0)""",
+    "CREATE TABLE as_course_lessons (id INTEGER PRIMARY KEY, course_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE as_study_sessions (id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER)",
+    """CREATE TABLE as_course_enrollments (course_id INTEGER NOT NULL, user_id INTEGER NOT NULL,
+                                           first_session_id INTEGER, created_date TIMESTAMP,
+                                           PRIMARY KEY (course_id, user_id))""",
+    "INSERT INTO as_courses (id, title) VALUES (1, 'Fractions'), (2, 'Phonics')",
+]
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    return sessionmaker(bind=engine)()
+
+
+def _counters(db, course_id):
+    return tuple(db.execute(text(
+        "SELECT lesson_count, enrollment_count FROM as_courses WHERE id = :id"
+    ), {"id": course_id}).first())
+
+
+def _start_session(db, session_id, user_id, course_id):
+    db.execute(text("INSERT INTO as_study_sessions VALUES (:id, :user_id, :course_id)"), {
+        "id": session_id, "user_id": user_id, "course_id": course_id
+    })
+    return record_study_session(db, course_id, user_id, session_id)
+
+
+def test_enrollment_counts_each_student_once():
+    db = _db()
+    assert _start_session(db, 1, 10, 1)
+    assert not _start_session(db, 2, 10, 1)
+    assert _start_session(db, 3, 11, 1)
+    assert _start_session(db, 4, 10, 2)
+    db.commit()
+
+    assert _counters(db, 1) == (0, 2)
+    assert _counters(db, 2) == (0, 1)
+
+
+def test_concurrent_first_sessions_enroll_the_student_once():
+    db = _db()
+    # Both first sessions are flushed before either is recorded, as when two
+    # requests for the same student overlap
+    for session_id in (1, 2):
+        db.execute(text("INSERT INTO as_study_sessions VALUES (:id, 10, 1)"), {"id": session_id})
+
+    assert [record_study_session(db, 1, 10, session_id) for session_id in (1, 2)] == [True, False]
+    db.commit()
+    assert _counters(db, 1) == (0, 1)
+
+
+def test_refresh_resyncs_enrollments_for_the_requested_courses():
+    db = _db()
+    for session_id, user_id, course_id in [(1, 10, 1), (2, 11, 1), (3, 10, 2)]:
+        db.execute(text("INSERT INTO as_study_sessions VALUES (:id, :user_id, :course_id)"), {
+            "id": session_id, "user_id": user_id, "course_id": course_id
+        })
+    db.execute(text("INSERT INTO as_course_enrollments (course_id, user_id) VALUES (1, 12), (2, 12)"))
+
+    assert refresh_course_counters(db, [1]) == 1
+    assert _counters(db, 1) == (0, 2)
+    assert _counters(db, 2) == (0, 0)  # not requested, left alone
+    assert db.execute(text(
+        "SELECT course_id, user_id FROM as_course_enrollments ORDER BY course_id, user_id"
+    )).fetchall() == [(1, 10), (1, 11), (2, 12)]
+
+
+def test_maintained_counters_match_a_full_recount():
+    db = _db()
+    for lesson_id, course_id, active in [(1, 1, True), (2, 1, True), (3, 1, False), (4, 2, True)]:
+        db.execute(text("INSERT INTO as_course_lessons VALUES (:id, :course_id, :active)"), {
+            "id": lesson_id, "course_id": course_id, "active": active
+        })
+        adjust_lesson_count(db, course_id, 1)
+    adjust_lesson_count(db, 1, -1)  # lesson 3 deactivated
+    _start_session(db, 1, 10, 1)
+    _start_session(db, 2, 10, 1)
+    db.commit()
+    maintained = [_counters(db, 1), _counters(db, 2)]
+
+    db.execute(text("UPDATE as_courses SET lesson_count = 99, enrollment_count = 99"))
+    assert refresh_course_counters(db) == 2
+    assert [_counters(db, 1), _counters(db, 2)] == maintained == [(2, 1), (1, 0)]
+
+
+def test_thumbnail_url_is_versioned_by_image_content():
+    first, second = image_etag(b"jpeg-one"), image_etag(b"jpeg-two")
+
+    assert thumbnail_url(5, first).startswith("/after-school/courses/5/thumbnail?v=")
+    assert thumbnail_url(5, first) != thumbnail_url(5, second)
+    assert thumbnail_url(5, image_etag(b"jpeg-one")) == thumbnail_url(5, first)
+    assert thumbnail_url(5, image_etag(None)) is None
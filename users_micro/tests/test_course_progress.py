@@ -0,0 +1,120 @@
+"""Tests for event-maintained student course progress."""
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.course_progress import CourseProgressTracker, completion_percentage
+
+SCHEMA = [
+    "CREATE TABLE as_courses (id INTEGER PRIMARY KEY)",
+    "CREATE TABLE as_course_blocks (id INTEGER PRIMARY KEY, course_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE as_course_lessons (id INTEGER PRIMARY KEY, course_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE as_course_assignments (id INTEGER PRIMARY KEY, course_id INTEGER, is_active BOOLEAN)",
+    """CREATE TABLE as_study_sessions (id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER, block_id INTEGER,
+                                       lesson_id INTEGER, status TEXT, duration_minutes INTEGER)""",
+    "CREATE TABLE as_ai_submissions (id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER, ai_score FLOAT)",
+    "CREATE TABLE as_student_assignments (id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER, status TEXT)",
+    """CREATE TABLE as_student_progress (
+           id INTEGER PRIMARY KEY, user_id INTEGER, course_id INTEGER,
+           lessons_completed INTEGER, total_lessons INTEGER, completion_percentage FLOAT,
+           blocks_completed INTEGER, total_blocks INTEGER, assignments_passed INTEGER, total_assignments INTEGER,
+           scored_submissions INTEGER, score_total FLOAT, average_score FLOAT, total_study_time INTEGER,
+           sessions_count INTEGER, started_at TIMESTAMP, last_activity TIMESTAMP, completed_at TIMESTAMP,
+           created_at TIMESTAMP, updated_at TIMESTAMP,
+           CONSTRAINT uq_as_student_progress UNIQUE (user_id, course_id))""",
+    "INSERT INTO as_courses VALUES (1)",
+    "INSERT INTO as_course_blocks VALUES (1, 1, 1), (2, 1, 1), (3, 1, 1), (4, 1, 1)",
+    "INSERT INTO as_course_assignments VALUES (1, 1, 1), (2, 1, 1)",
+]
+
+USER = 7
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    return sessionmaker(bind=engine)()
+
+
+def _insert(db, sql, **params):
+    db.execute(text(sql), params)
+
+
+def mark_done(tracker, db, session_id, block_id):
+    _insert(db, "INSERT INTO as_study_sessions VALUES (:id, :user, 1, :block, NULL, 'completed', 20)",
+            id=session_id, user=USER, block=block_id)
+    return tracker.session_completed(db, USER, 1, block_id=block_id, duration_minutes=20)
+
+
+def test_completion_combines_blocks_and_assignments():
+    assert completion_percentage(2, 4, 0, 0, 1, 2) == 50.0
+    assert completion_percentage(0, 0, 1, 3, 0, 0) == 33.33
+    assert completion_percentage(4, 4, 0, 0, 0, 0) == 100.0
+    assert completion_percentage(0, 0, 0, 0, 0, 0) == 0.0
+
+
+def test_events_keep_the_row_current_and_report_completion():
+    tracker, db = CourseProgressTracker(), _db()
+
+    assert not mark_done(tracker, db, 1, 1)  # first event builds the row
+    progress = tracker.get(db, USER, 1)
+    assert (progress["blocks_completed"], progress["total_blocks"], progress["total_assignments"]) == (1, 4, 2)
+    assert progress["completion_percentage"] == 12.5
+
+    _insert(db, "INSERT INTO as_ai_submissions VALUES (1, :user, 1, 70)", user=USER)
+    tracker.submission_scored(db, USER, 1, None, 70.0)
+    _insert(db, "UPDATE as_ai_submissions SET ai_score = 90 WHERE id = 1")
+    tracker.submission_scored(db, USER, 1, 70.0, 90.0)
+    _insert(db, "INSERT INTO as_ai_submissions VALUES (2, :user, 1, 60)", user=USER)
+    tracker.submission_scored(db, USER, 1, None, 60.0)
+    assert tracker.get(db, USER, 1)["average_score"] == 75.0
+
+    for assignment_id in (1, 2):
+        _insert(db, "INSERT INTO as_student_assignments VALUES (:id, :user, 1, 'passed')", id=assignment_id, user=USER)
+        tracker.assignment_status_changed(db, USER, 1, "assigned", "passed")
+    for session_id, block_id in ((2, 2), (3, 3)):
+        assert not mark_done(tracker, db, session_id, block_id)
+    assert mark_done(tracker, db, 4, 4)  # 4/4 blocks and 2/2 assignments
+    db.commit()
+
+    progress = tracker.get(db, USER, 1)
+    assert progress["completion_percentage"] == 100.0
+    assert progress["completed_at"] is not None
+    assert (progress["sessions_count"], progress["total_study_time"]) == (4, 80)
+    assert tracker.reconcile(db) == []
+
+
+def test_structure_change_updates_totals_for_enrolled_students():
+    tracker, db = CourseProgressTracker(), _db()
+    mark_done(tracker, db, 1, 1)
+    mark_done(tracker, db, 2, 2)
+
+    _insert(db, "UPDATE as_course_blocks SET is_active = 0 WHERE id IN (3, 4)")
+    _insert(db, "DELETE FROM as_course_assignments")
+    assert tracker.structure_changed(db, 1) == 1
+    db.commit()
+
+    progress = tracker.get(db, USER, 1)
+    assert (progress["total_blocks"], progress["total_assignments"]) == (2, 0)
+    assert progress["completion_percentage"] == 100.0
+    assert tracker.reconcile(db) == []
+
+
+def test_reconcile_reports_and_repairs_drift():
+    tracker, db = CourseProgressTracker(), _db()
+    mark_done(tracker, db, 1, 1)
+    # A write path that bypassed the events
+    _insert(db, "INSERT INTO as_study_sessions VALUES (2, :user, 1, 2, NULL, 'completed', 10)", user=USER)
+    db.commit()
+
+    mismatches = tracker.reconcile(db)
+    assert len(mismatches) == 1
+    fields = mismatches[0]["fields"]
+    assert fields["blocks_completed"] == {"stored": 1, "expected": 2}
+    assert fields["completion_percentage"]["expected"] == 25.0
+
+    tracker.reconcile(db, repair=True)
+    assert tracker.reconcile(db) == []
+    assert tracker.get(db, USER, 1)["total_study_time"] == 30
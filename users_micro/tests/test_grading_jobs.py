@@ -0,0 +1,221 @@
+"""Tests for the durable class grading queue and its workers, with a fake grader."""
+
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.grading_jobs import GradingJobQueue, GradingWorker, RateLimiter
+
+SCHEMA = [
+    """CREATE TABLE grading_jobs (id INTEGER PRIMARY KEY, assignment_id INTEGER, subject_id INTEGER, teacher_id INTEGER,
+                                  status TEXT, total_students INTEGER, created_date TIMESTAMP, started_date TIMESTAMP,
+                                  finished_date TIMESTAMP)""",
+    """CREATE UNIQUE INDEX uq_grading_jobs_active_assignment ON grading_jobs (assignment_id)
+       WHERE status NOT IN ('completed', 'cancelled')""",
+    """CREATE TABLE grading_job_items (id INTEGER PRIMARY KEY, job_id INTEGER, student_id INTEGER, student_pdf_id INTEGER,
+                                       position INTEGER, status TEXT, attempts INTEGER, lease_owner TEXT,
+                                       lease_expires_at TIMESTAMP, next_attempt_at TIMESTAMP, result TEXT, error TEXT,
+                                       updated_date TIMESTAMP, UNIQUE (job_id, student_id))""",
+]
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 10, 18, 12, 0)
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, **kwargs):
+        self.now += timedelta(**kwargs)
+
+
+def _setup(tmp_path, **queue_options):
+    engine = create_engine(f"sqlite:///{tmp_path / 'grading.db'}")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    clock = Clock()
+    return sessionmaker(bind=engine), clock, GradingJobQueue(clock=clock, **queue_options)
+
+
+class FakeGrader:
+    """Records who it graded; fails a student a given number of times first"""
+
+    def __init__(self, failures=None, unsuccessful=()):
+        self.calls = []
+        self.failures = dict(failures or {})
+        self.unsuccessful = set(unsuccessful)
+        self.in_flight = self.max_in_flight = 0
+
+    async def __call__(self, db, item):
+        self.calls.append(item.student_id)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0)
+        self.in_flight -= 1
+        if self.failures.get(item.student_id, 0) > 0:
+            self.failures[item.student_id] -= 1
+            raise RuntimeError("model throttled")
+        if item.student_id in self.unsuccessful:
+            return {"student_id": item.student_id, "success": False, "error": "No PDF work found"}
+        return {"student_id": item.student_id, "success": True, "points_earned": 80 + item.student_id}
+
+
+def _worker(sessions, queue, grader, concurrency=4):
+    return GradingWorker(queue, sessions, grader, concurrency=concurrency, rate_per_minute=0, worker_id="b")
+
+
+def test_crashed_worker_items_resume_without_regrading(tmp_path):
+    sessions, clock, queue = _setup(tmp_path, lease_seconds=60)
+    db = sessions()
+    job_id, _ = queue.enqueue(db, assignment_id=1, subject_id=1, teacher_id=1, students=[(s, 100 + s) for s in range(1, 6)])
+
+    # Worker "a" takes two students, records one, then dies holding the other
+    first, second = queue.claim(db, "a", 2)
+    assert queue.succeed(db, first, "a", {"success": True, "points_earned": 90})
+
+    grader = FakeGrader()
+    worker = _worker(sessions, queue, grader)
+    assert asyncio.run(worker.run_once()) == 3
+    assert sorted(grader.calls) == [3, 4, 5]
+    assert queue.status(db, job_id)["counts"]["running"] == 1
+
+    clock.advance(seconds=61)  # the dead worker's lease runs out
+    assert asyncio.run(worker.run_once()) == 1
+    assert grader.calls[-1] == 2 and 1 not in grader.calls
+
+    # The dead worker coming back cannot overwrite the result
+    assert not queue.succeed(db, second, "a", {"success": False, "error": "stale"})
+
+    status = queue.status(db, job_id)
+    assert (status["status"], status["finished"]) == ("completed", True)
+    assert [(item["student_id"], item["status"], item["attempts"]) for item in status["items"]] == [
+        (1, "succeeded", 1), (2, "succeeded", 2), (3, "succeeded", 1), (4, "succeeded", 1), (5, "succeeded", 1),
+    ]
+    assert status["items"][1]["result"] == {"student_id": 2, "success": True, "points_earned": 82}
+
+
+def test_retries_back_off_then_fail_and_unsuccessful_results_are_final(tmp_path):
+    sessions, clock, queue = _setup(tmp_path, max_attempts=3, retry_base_seconds=10)
+    db = sessions()
+    job_id, _ = queue.enqueue(db, 1, 1, 1, [(1, 11), (2, 12), (3, None)])
+    grader = FakeGrader(failures={1: 1, 2: 5}, unsuccessful={3})
+    worker = _worker(sessions, queue, grader)
+
+    asyncio.run(worker.run_once())
+    assert asyncio.run(worker.run_once()) == 0  # both retries wait out their backoff
+    clock.advance(seconds=10)
+    asyncio.run(worker.run_once())
+    clock.advance(seconds=19)
+    assert asyncio.run(worker.run_once()) == 0  # second backoff doubles to 20s
+    clock.advance(seconds=1)
+    asyncio.run(worker.run_once())
+
+    status = queue.status(db, job_id)
+    assert sorted(grader.calls) == [1, 1, 2, 2, 2, 3]
+    assert [(item["status"], item["attempts"]) for item in status["items"]] == [
+        ("succeeded", 2), ("failed", 3), ("failed", 1),
+    ]
+    assert status["items"][1]["error"] == "model throttled"
+    assert status["items"][2]["error"] == "No PDF work found"
+    assert status["status"] == "completed"
+
+
+def test_workers_respect_concurrency_and_rate_limit(tmp_path):
+    sessions, clock, queue = _setup(tmp_path)
+    db = sessions()
+    queue.enqueue(db, 1, 1, 1, [(s, s) for s in range(1, 8)])
+    grader = FakeGrader()
+    worker = _worker(sessions, queue, grader, concurrency=3)
+    assert [asyncio.run(worker.run_once()) for _ in range(4)] == [3, 3, 1, 0]
+    assert grader.max_in_flight == 3 and sorted(grader.calls) == list(range(1, 8))
+
+    now, slept = [0.0], []
+
+    async def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = RateLimiter(rate_per_minute=30, clock=lambda: now[0], sleep=sleep)
+
+    async def burst():
+        await asyncio.gather(*(limiter.acquire() for _ in range(4)))
+
+    asyncio.run(burst())
+    assert slept == [2.0, 2.0, 2.0]
+
+
+def test_queue_calls_run_off_the_event_loop(tmp_path):
+    sessions, clock, queue = _setup(tmp_path)
+    db = sessions()
+    queue.enqueue(db, 1, 1, 1, [(1, 1), (2, 2)])
+    loop_thread, queue_threads = threading.get_ident(), []
+
+    class RecordingQueue:
+        def __getattr__(self, name):
+            method = getattr(queue, name)
+            if not callable(method):
+                return method
+
+            def call(*args, **kwargs):
+                queue_threads.append((name, threading.get_ident() != loop_thread))
+                return method(*args, **kwargs)
+            return call
+
+    grader = FakeGrader(failures={2: 1})
+    assert asyncio.run(_worker(sessions, RecordingQueue(), grader).run_once()) == 2
+    assert sorted(queue_threads) == [("claim", True), ("retry", True), ("succeed", True)]
+
+
+def test_poison_items_fail_after_max_attempts_and_cancel_stops_a_job(tmp_path):
+    sessions, clock, queue = _setup(tmp_path, lease_seconds=60, max_attempts=2)
+    db = sessions()
+    poisoned, _ = queue.enqueue(db, 1, 1, 1, [(1, 1)])
+    for _ in range(2):  # the worker dies every time it grades this student
+        assert len(queue.claim(db, "a", 1)) == 1
+        clock.advance(seconds=61)
+    assert queue.claim(db, "a", 1) == []
+    assert queue.status(db, poisoned)["items"][0]["status"] == "failed"
+    assert queue.status(db, poisoned)["status"] == "completed"
+
+    cancelled, _ = queue.enqueue(db, 2, 1, 1, [(1, 1), (2, 2)])
+    assert queue.active_job_id(db, 2) == cancelled
+    queue.cancel(db, cancelled)
+    assert queue.claim(db, "a", 5) == [] and queue.active_job_id(db, 2) is None
+    assert queue.status(db, cancelled)["counts"]["cancelled"] == 2
+
+
+def test_an_assignment_has_one_active_job_at_a_time(tmp_path):
+    sessions, clock, queue = _setup(tmp_path)
+    db = sessions()
+    first, created = queue.enqueue(db, 1, 1, 1, [(1, 1), (2, 2)])
+    assert created
+    assert queue.enqueue(sessions(), 1, 1, 1, [(1, 1), (2, 2), (3, 3)]) == (first, False)
+    assert db.execute(text("SELECT COUNT(*) FROM grading_job_items")).scalar() == 2
+
+    queue.cancel(db, first)
+    second, created = queue.enqueue(db, 1, 1, 1, [(3, 3)])
+    assert created and second != first
+
+
+def test_workers_renew_the_lease_while_a_student_is_being_graded(tmp_path):
+    sessions, clock, queue = _setup(tmp_path, lease_seconds=60)
+    db = sessions()
+    job_id, _ = queue.enqueue(db, 1, 1, 1, [(1, 1)])
+    stolen = []
+
+    async def slow_grader(db, item):
+        for _ in range(3):  # three minutes of model time, well past the 60s lease
+            clock.advance(seconds=59)
+            await asyncio.sleep(0.05)
+            stolen.extend(await asyncio.to_thread(queue.claim, sessions(), "thief", 1))
+        return {"student_id": item.student_id, "success": True}
+
+    worker = GradingWorker(queue, sessions, slow_grader, rate_per_minute=0, worker_id="b", renew_seconds=0.01)
+    assert asyncio.run(worker.run_once()) == 1
+    assert stolen == []
+    assert queue.status(db, job_id)["items"][0]["status"] == "succeeded"
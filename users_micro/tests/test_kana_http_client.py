@@ -0,0 +1,133 @@
+"""Tests for the pooled KANA HTTP client against a local stand-in server."""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from users_micro.services.kana_http_client import (
+    KanaHttpClient,
+    MultipartFile,
+    is_binary_response,
+    stream_response_to_file,
+)
+
+FAKE_PDF = b"%PDF-1.4\n" + b"0" * 200_000 + b"\n%%EOF"
+
+
+class _StandInKana(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    received = []
+    connections = set()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        _StandInKana.connections.add(self.client_address)
+        if self.path == "/health":
+            self._send(200, json.dumps({"status": "ok"}).encode(), "application/json")
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def do_POST(self):
+        _StandInKana.connections.add(self.client_address)
+        length = int(self.headers["Content-Length"])
+        body = self.rfile.read(length)
+        _StandInKana.received.append((self.path, self.headers["Content-Type"], body))
+        if self.path == "/generate-pdf":
+            self._send(200, FAKE_PDF, "application/pdf")
+        else:
+            payload = {"success": True, "bytes": len(body)}
+            self._send(200, json.dumps(payload).encode(), "application/json")
+
+
+@pytest.fixture()
+def kana_server():
+    _StandInKana.received = []
+    _StandInKana.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInKana)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_multipart_upload_streams_files_and_fields(kana_server, tmp_path):
+    image = tmp_path / "page1.jpg"
+    image.write_bytes(b"\xff\xd8" + b"x" * 150_000)
+
+    async def run():
+        client = KanaHttpClient(kana_server)
+        try:
+            response = await client.post_multipart(
+                "/grade-assignment",
+                fields={"operation": "grade", "assignment": {"max_points": 10}},
+                files=[MultipartFile(path=str(image), field_name="images")],
+            )
+        finally:
+            await client.aclose()
+        return response
+
+    response = asyncio.run(run())
+    assert response.status_code == 200
+
+    path, content_type, body = _StandInKana.received[0]
+    assert path == "/grade-assignment"
+    assert content_type.startswith("multipart/form-data; boundary=")
+    assert response.json()["bytes"] == len(body)
+    assert b'name="operation"\r\n\r\ngrade' in body
+    assert b'{"max_points": 10}' in body
+    assert b'filename="page1.jpg"' in body
+    assert image.read_bytes() in body
+
+
+def test_binary_response_is_streamed_to_disk(kana_server, tmp_path):
+    image = tmp_path / "page1.png"
+    image.write_bytes(b"\x89PNG" + b"y" * 1000)
+    output = tmp_path / "out" / "result.pdf"
+
+    async def run():
+        client = KanaHttpClient(kana_server)
+        try:
+            async with client.stream_multipart(
+                "/generate-pdf",
+                fields={"operation": "generate_assignment_pdf"},
+                files=[MultipartFile(path=str(image), field_name="images")],
+                accept="application/pdf",
+            ) as response:
+                assert is_binary_response(response)
+                return await stream_response_to_file(response, str(output))
+        finally:
+            await client.aclose()
+
+    written = asyncio.run(run())
+    assert written == len(FAKE_PDF)
+    assert output.read_bytes() == FAKE_PDF
+    assert not (tmp_path / "out" / "result.pdf.part").exists()
+
+
+def test_connections_are_reused_across_calls(kana_server):
+    async def run():
+        client = KanaHttpClient(kana_server)
+        await client.start()
+        try:
+            for _ in range(5):
+                response = await client.get("/health")
+                assert response.status_code == 200
+        finally:
+            await client.aclose()
+        assert not client.is_started
+
+    asyncio.run(run())
+    assert len(_StandInKana.connections) == 1
@@ -0,0 +1,101 @@
+"""Tests for the pooled, cached and CPU-budgeted upload PDF builder."""
+
+import asyncio
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from pypdf import PdfReader
+
+import users_micro.services.pdf_builder as pdf_builder_module
+from users_micro.services.pdf_builder import PageCache, PdfBuildBudgetExceeded, PdfBuilder
+
+
+def _photo(seed: int, size=(1200, 900), mode="RGB") -> bytes:
+    rng = random.Random(seed)
+    image = Image.new(mode, size, tuple(rng.randrange(256) for _ in mode) if len(mode) > 1 else rng.randrange(256))
+    image.paste(Image.effect_noise((size[0] // 3, size[1] // 3), 40).convert(mode), (size[0] // 4, size[1] // 4))
+    out = BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _counting_compressor(monkeypatch, cpu_seconds=None):
+    calls = []
+    compress = pdf_builder_module._compress_page
+
+    def counted(image_data, max_dimension, quality):
+        calls.append(max_dimension)
+        page, spent = compress(image_data, max_dimension, quality)
+        return page, spent if cpu_seconds is None else cpu_seconds
+
+    monkeypatch.setattr(pdf_builder_module, "_compress_page", counted)
+    return calls
+
+
+def _page_images(pdf_bytes):
+    return [page.images[0].data for page in PdfReader(BytesIO(pdf_bytes)).pages]
+
+
+def _build(builder, images, **kwargs):
+    return asyncio.run(builder.build(images, **kwargs))
+
+
+def test_reuploads_and_repeated_photos_are_compressed_once(monkeypatch):
+    calls = _counting_compressor(monkeypatch)
+    builder = PdfBuilder(workers=0, cache=PageCache())
+    first_photo, second_photo = _photo(1), _photo(2, mode="RGBA")
+
+    first = _build(builder, [first_photo, second_photo, first_photo])
+    assert len(PdfReader(BytesIO(first.pdf_bytes)).pages) == 3
+    assert (first.pages_compressed, len(calls)) == (2, 2)
+    assert first.target_size_achieved
+
+    again = _build(builder, [first_photo, second_photo, first_photo])
+    assert again.pdf_bytes == first.pdf_bytes
+    assert (again.pages_compressed, len(calls)) == (0, 2)
+
+
+def test_fallback_pass_runs_only_over_the_target(monkeypatch):
+    calls = _counting_compressor(monkeypatch)
+    builder = PdfBuilder(workers=0, cache=PageCache(max_bytes=0))
+    photos = [_photo(seed) for seed in range(3)]
+
+    small = _build(builder, photos)
+    assert calls == [1000, 1000, 1000]
+
+    calls.clear()
+    forced = _build(builder, photos, target_size=1)
+    assert calls == [1000, 1000, 1000, 800, 800, 800]
+    assert not forced.target_size_achieved
+    assert len(forced.pdf_bytes) < len(small.pdf_bytes)
+
+
+def test_cpu_budget_cancels_builds_and_skips_the_fallback(monkeypatch):
+    calls = _counting_compressor(monkeypatch, cpu_seconds=1.0)
+    builder = PdfBuilder(workers=0, cache=PageCache(max_bytes=0), cpu_budget_seconds=2.5)
+    photos = [_photo(seed) for seed in range(6)]
+
+    with pytest.raises(PdfBuildBudgetExceeded):
+        _build(builder, photos)
+    assert len(calls) == 3  # pages queued behind the overrun are never compressed
+
+    # Two pages fit the primary pass but not a second one: the primary PDF is kept
+    calls.clear()
+    kept = _build(builder, photos[:2], target_size=1)
+    assert calls == [1000, 1000]
+    assert kept.cpu_seconds >= 2.0 and not kept.target_size_achieved
+
+
+def test_process_pool_matches_in_thread_builds():
+    photos = [_photo(seed, size=(2400, 1800)) for seed in range(3)]
+    in_thread = _build(PdfBuilder(workers=0, cache=PageCache(max_bytes=0)), photos)
+
+    pooled_builder = PdfBuilder(workers=2, cache=PageCache(max_bytes=0))
+    try:
+        pooled = _build(pooled_builder, photos)
+    finally:
+        pooled_builder.shutdown()
+    assert _page_images(pooled.pdf_bytes) == _page_images(in_thread.pdf_bytes)
+    assert pooled.cpu_seconds > 0
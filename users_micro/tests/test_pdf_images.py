@@ -0,0 +1,105 @@
+"""Tests for the capped, deduplicated and cached PDF page image extraction."""
+
+import asyncio
+import random
+from io import BytesIO
+
+import img2pdf
+from PIL import Image, ImageDraw
+
+import users_micro.services.gemma_services.pdf_images as pdf_images
+from users_micro.services.gemma_services.pdf_images import PdfImageCache, PdfImageExtractor
+
+
+def _page(label: str, size=(400, 520)) -> bytes:
+    image = Image.new("L", size, 255)
+    ImageDraw.Draw(image).text((40, 40 + 7 * len(label)), label * 8, fill=0)
+    out = BytesIO()
+    image.save(out, format="PNG")
+    return out.getvalue()
+
+
+def _noise_page(seed: int, size=(2100, 2100)) -> bytes:
+    # Incompressible, so the PNG is over the 4MB pass-through limit
+    image = Image.frombytes("L", size, random.Random(seed).randbytes(size[0] * size[1]))
+    out = BytesIO()
+    image.save(out, format="PNG", compress_level=1)
+    return out.getvalue()
+
+
+def _pdf(tmp_path, pages, name="scan.pdf") -> str:
+    path = tmp_path / name
+    path.write_bytes(img2pdf.convert(pages))
+    return str(path)
+
+
+def _extract(extractor, path, limit):
+    return asyncio.run(extractor.extract(path, limit=limit, max_dimension=1800, jpeg_quality=85))
+
+
+def _counting_decoder(monkeypatch):
+    calls = []
+    decode = pdf_images._decode_image
+
+    def counted(path, checksum, page_index, image_id, max_dimension, jpeg_quality):
+        calls.append(page_index + 1)
+        return decode(path, checksum, page_index, image_id, max_dimension, jpeg_quality)
+
+    monkeypatch.setattr(pdf_images, "_decode_image", counted)
+    return calls
+
+
+def test_extraction_stops_at_the_cap(tmp_path, monkeypatch):
+    path = _pdf(tmp_path, [_page(f"page {n} ") for n in range(1, 11)])
+    calls = _counting_decoder(monkeypatch)
+
+    images = _extract(PdfImageExtractor(workers=0), path, limit=3)
+    assert [image["page_number"] for image in images] == [1, 2, 3]
+    assert {image["format"] for image in images} == {"png"}
+    assert sorted(calls) == [1, 2, 3]  # pages past the cap are never decoded
+
+
+def test_identical_page_images_are_skipped_before_decoding(tmp_path, monkeypatch):
+    repeated = _page("same page ")
+    path = _pdf(tmp_path, [repeated, repeated, _page("other "), repeated, _page("last ")])
+    calls = _counting_decoder(monkeypatch)
+
+    images = _extract(PdfImageExtractor(workers=0), path, limit=4)
+    assert [image["page_number"] for image in images] == [1, 3, 5]
+    assert sorted(calls) == [1, 3, 5]
+
+
+def test_cache_answers_repeat_and_smaller_requests(tmp_path, monkeypatch):
+    path = _pdf(tmp_path, [_page(f"page {n} ") for n in range(1, 7)])
+    calls = _counting_decoder(monkeypatch)
+    extractor = PdfImageExtractor(workers=0, cache=PdfImageCache())
+
+    first = _extract(extractor, path, limit=4)
+    assert _extract(extractor, path, limit=4) == first
+    assert _extract(extractor, path, limit=2) == first[:2]
+    assert len(calls) == 4
+
+    assert [image["page_number"] for image in _extract(extractor, path, limit=6)] == [1, 2, 3, 4, 5, 6]
+    assert len(calls) == 10  # a larger limit extracts again
+
+    # A PDF with fewer images than the limit is complete, so any limit hits
+    short = _pdf(tmp_path, [_page("only ")], name="short.pdf")
+    _extract(extractor, short, limit=2)
+    assert len(_extract(extractor, short, limit=12)) == 1
+    assert len(calls) == 11
+
+
+def test_process_pool_matches_in_thread_decoding(tmp_path):
+    # Large non-JPEG pages go through decode, resize and JPEG encode in the workers
+    path = _pdf(tmp_path, [_noise_page(n) for n in range(1, 5)])
+    in_thread = _extract(PdfImageExtractor(workers=0), path, limit=3)
+
+    pooled_extractor = PdfImageExtractor(workers=2)
+    try:
+        pooled = _extract(pooled_extractor, path, limit=3)
+    finally:
+        pooled_extractor.shutdown()
+    assert pooled == in_thread
+    assert [(image["page_number"], image["format"]) for image in pooled] == [(1, "jpeg"), (2, "jpeg"), (3, "jpeg")]
+    with Image.open(BytesIO(pooled[0]["bytes"])) as first:
+        assert max(first.size) == 1800
@@ -0,0 +1,57 @@
+"""Tests for the alignment-based reading scoring engine."""
+
+from users_micro.services.reading_alignment import (
+    align_words,
+    metaphone,
+    score_reading,
+    word_similarity,
+)
+
+
+def test_metaphone_codes():
+    assert metaphone("knight") == "NT"
+    assert metaphone("school") == "SKL"
+    assert metaphone("phone") == "FN"
+    assert metaphone("thumb") == "0M"
+    assert metaphone("meat") == metaphone("meet")
+
+
+def test_only_identical_words_score_full_credit():
+    assert word_similarity("cat", "cat") == 1.0
+    assert word_similarity("meat", "meet") < 1.0
+    assert word_similarity("biggest", "begist") > word_similarity("biggest", "table")
+
+
+def test_skipped_word_does_not_shift_the_rest():
+    result = score_reading("The big red dog ran home.", "the red dog ran home")
+    said = [(w["expected"], w["said"]) for w in result["word_feedback"]]
+    assert said == [
+        ("The", "the"), ("big", ""), ("red", "red"), ("dog", "dog"), ("ran", "ran"), ("home.", "home"),
+    ]
+    assert result["word_feedback"][1]["sound_errors"] == ["word_skipped"]
+    assert result["correct_count"] == 5
+
+
+def test_inserted_word_is_reported_separately():
+    result = score_reading("I like green apples", "I um like green apples")
+    assert result["inserted_words"] == ["um"]
+    assert result["accuracy_score"] == 1.0
+    assert len(result["word_feedback"]) == 4
+
+
+def test_misread_word_pairs_with_its_target():
+    result = score_reading("Dinosaurs are the biggest animals", "Winosores are the begist animals")
+    pairs = {w["expected"]: w["said"] for w in result["word_feedback"]}
+    assert pairs["Dinosaurs"] == "Winosores"
+    assert pairs["biggest"] == "begist"
+    assert result["correct_count"] == 3
+
+
+def test_banded_alignment_matches_full_alignment_on_long_passage():
+    words = ("the quick brown fox jumps over the lazy dog and then runs far away " * 40).split()
+    spoken = words[:100] + words[101:300] + ["um"] + words[300:]
+    banded = align_words(words, spoken, band=8)
+    full = align_words(words, spoken, band=len(words))
+    assert banded == full
+    skipped = [p.expected_index for p in banded if p.spoken_index is None]
+    assert len(skipped) == 1
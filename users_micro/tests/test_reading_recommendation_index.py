@@ -0,0 +1,65 @@
+"""Tests for the in-memory reading recommendation index."""
+
+from users_micro.services.reading_recommendation_index import ContentEntry, RecommendationIndex
+
+CURRENT = ("GRADE_1", "MIDDLE_SCHOOL")
+EASIER = ("GRADE_1", "ELEMENTARY")
+HARDER = ("GRADE_1", "HIGH_SCHOOL")
+
+
+def _index():
+    index = RecommendationIndex()
+    entries = []
+    for content_id in range(1, 13):
+        level, difficulty = (CURRENT, EASIER, HARDER)[content_id % 3]
+        entries.append(ContentEntry(
+            id=content_id,
+            title=f"Story {content_id}",
+            reading_level=level,
+            difficulty_level=difficulty,
+            word_count=60,
+            has_phonics=content_id in (7, 10),
+        ))
+    index.load_content(entries)
+    return index
+
+
+def test_rank_mixes_pools_and_skips_seen_content():
+    index = _index()
+    state = index.set_student(1, seen={3, 6}, struggle_areas=["general_practice"])
+
+    picked = index.rank(state, CURRENT, easier=EASIER, harder=HARDER, limit=5)
+
+    assert picked == [9, 12, 1, 2, 4]
+    assert not {3, 6} & set(picked)
+
+
+def test_struggle_areas_and_attempts_change_the_ranking():
+    index = _index()
+    state = index.set_student(1, seen=set(), struggle_areas=["pronunciation"])
+    assert index.rank(state, EASIER, limit=2) == [7, 10]
+
+    assert index.record_attempt(1, 7, ["general_practice"])
+    assert index.rank(state, EASIER, limit=2) == [1, 4]
+    assert not index.record_attempt(2, 7, [])
+
+
+def test_seen_content_only_fills_when_nothing_new_is_left():
+    index = _index()
+    state = index.set_student(1, seen={3, 6, 9}, struggle_areas=[])
+
+    assert index.rank(state, CURRENT, limit=5) == [12, 3, 6, 9]
+
+
+def test_ai_order_breaks_ties_and_invalidate_marks_pools_stale():
+    index = _index()
+    state = index.set_student(1, seen=set(), struggle_areas=[])
+    index.set_ai_order(1, [12, 999, 6], ttl_seconds=60)
+
+    # Unknown ids are dropped; among equally scored content the AI's picks win
+    assert state.ai_order == [12, 6]
+    assert index.rank(state, CURRENT, limit=3) == [12, 6, 3]
+
+    assert not index.needs_refresh()
+    index.invalidate()
+    assert index.needs_refresh()
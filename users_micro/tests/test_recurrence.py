@@ -0,0 +1,123 @@
+"""Tests for the recurrence engine, checked against dateutil's rrule."""
+
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.recurrence import (
+    FREQUENCIES, WEEKDAYS, OccurrenceCache, RecurrenceRule, expand_events, expand_series, occurrences_between,
+)
+
+rrule = pytest.importorskip("dateutil.rrule")
+
+DTSTART = datetime(2026, 1, 5, 9, 30)  # a Monday
+
+
+def _random_rule(rng: random.Random) -> str:
+    parts = [f"FREQ={rng.choice(FREQUENCIES)}"]
+    if rng.random() < 0.5:
+        parts.append(f"INTERVAL={rng.randint(2, 4)}")
+    if rng.random() < 0.3:
+        parts.append(f"COUNT={rng.randint(1, 40)}")
+    elif rng.random() < 0.4:
+        until = DTSTART + timedelta(days=rng.randint(0, 900), hours=rng.randint(-12, 12))
+        parts.append(f"UNTIL={until:%Y%m%dT%H%M%S}")
+    if rng.random() < 0.4:
+        parts.append("BYDAY=" + ",".join(rng.sample(WEEKDAYS, rng.randint(1, 3))))
+    if rng.random() < 0.3:
+        parts.append("BYMONTHDAY=" + ",".join(str(rng.choice([1, 2, 15, 28, 29, 30, 31, -1, -2]))
+                                              for _ in range(rng.randint(1, 2))))
+    if rng.random() < 0.2:
+        parts.append("BYMONTH=" + ",".join(str(rng.randint(1, 12)) for _ in range(rng.randint(1, 2))))
+    return ";".join(parts)
+
+
+def test_windows_match_dateutil_for_random_rules():
+    rng = random.Random(2026)
+    for _ in range(300):
+        rule_text = _random_rule(rng)
+        dtstart = DTSTART + timedelta(days=rng.randint(0, 400))
+        window_start = dtstart + timedelta(days=rng.randint(-30, 700), hours=rng.randint(0, 23))
+        window_end = window_start + timedelta(days=rng.randint(0, 200))
+
+        expected = rrule.rrulestr(rule_text, dtstart=dtstart).between(window_start, window_end, inc=True)
+        rule = RecurrenceRule.parse(rule_text)
+        assert occurrences_between(rule, dtstart, window_start, window_end) == expected, (rule_text, dtstart)
+        assert RecurrenceRule.parse(rule.to_string()) == rule
+
+
+def test_legacy_patterns_and_invalid_rules():
+    rule = RecurrenceRule.for_event("weekly", 2, datetime(2026, 2, 28))
+    assert rule == RecurrenceRule("WEEKLY", interval=2, until=datetime(2026, 2, 28))
+    assert occurrences_between(rule, DTSTART, DTSTART, datetime(2026, 12, 31)) == [
+        DTSTART + timedelta(weeks=weeks) for weeks in (0, 2, 4, 6)
+    ]
+    # The event's end date can only shorten a stored UNTIL
+    assert RecurrenceRule.for_event("FREQ=DAILY;UNTIL=20260110", 1, datetime(2026, 3, 1)).until == datetime(2026, 1, 10)
+
+    for bad in ("", "fortnightly", "FREQ=HOURLY", "FREQ=DAILY;INTERVAL=0", "FREQ=DAILY;COUNT=2;UNTIL=20260101",
+                "FREQ=WEEKLY;BYDAY=1MO", "FREQ=MONTHLY;BYMONTHDAY=0", "INTERVAL=2"):
+        with pytest.raises(ValueError):
+            RecurrenceRule.for_event(bad)
+
+
+def test_far_windows_skip_ahead_without_walking_the_series():
+    rule = RecurrenceRule.parse("FREQ=DAILY")
+    window = (datetime(2126, 1, 1), datetime(2126, 1, 3, 23, 59))
+    assert occurrences_between(rule, DTSTART, *window) == [datetime(2126, 1, day, 9, 30) for day in (1, 2, 3)]
+
+
+def test_exceptions_cancel_and_move_occurrences():
+    rule = RecurrenceRule.parse("FREQ=WEEKLY;BYDAY=MO,WE")
+    moved_in = SimpleNamespace(occurrence_start=datetime(2026, 1, 26, 9, 30), is_cancelled=False,
+                               start_date=datetime(2026, 1, 16, 14, 0), end_date=None, title="Moved")
+    cancelled = SimpleNamespace(occurrence_start=datetime(2026, 1, 12, 9, 30), is_cancelled=True)
+    moved_out = SimpleNamespace(occurrence_start=datetime(2026, 1, 14, 9, 30), is_cancelled=False,
+                                start_date=datetime(2026, 2, 20, 9, 30), end_date=None, status="cancelled")
+    not_an_occurrence = SimpleNamespace(occurrence_start=datetime(2026, 1, 13, 9, 30), is_cancelled=False)
+
+    occurrences = expand_series(1, rule, DTSTART, timedelta(hours=1), datetime(2026, 1, 10), datetime(2026, 1, 20),
+                                [moved_in, cancelled, moved_out, not_an_occurrence])
+    assert [(o.original_start, o.start, o.end) for o in occurrences] == [
+        (datetime(2026, 1, 26, 9, 30), datetime(2026, 1, 16, 14, 0), datetime(2026, 1, 16, 15, 0)),
+        (datetime(2026, 1, 19, 9, 30), datetime(2026, 1, 19, 9, 30), datetime(2026, 1, 19, 10, 30)),
+    ]
+    assert occurrences[0].overrides == {"title": "Moved"} and occurrences[0].is_exception
+    assert not occurrences[1].is_exception
+
+
+def test_expand_events_caches_by_version_and_batches_exceptions():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("""
+            CREATE TABLE calendar_event_exceptions (id INTEGER PRIMARY KEY, event_id INTEGER, occurrence_start TIMESTAMP,
+                is_cancelled BOOLEAN, title TEXT, description TEXT, status TEXT, start_date TIMESTAMP,
+                end_date TIMESTAMP, created_date TIMESTAMP)
+        """))
+    db = sessionmaker(bind=engine)()
+    series = [SimpleNamespace(id=event_id, updated_date=datetime(2026, 1, 1), start_date=DTSTART,
+                              end_date=DTSTART + timedelta(hours=1), recurrence_pattern=pattern,
+                              recurrence_interval=1, recurrence_end_date=None)
+              for event_id, pattern in ((1, "daily"), (2, "FREQ=WEEKLY;BYDAY=FR"), (3, "every other tuesday"))]
+    window = (datetime(2026, 1, 5), datetime(2026, 1, 11, 23, 59))
+    cache = OccurrenceCache(maxsize=16)
+
+    first = expand_events(db, series, *window, cache=cache)
+    assert (len(first[1]), len(first[2]), len(first[3])) == (7, 1, 1)  # an unparseable rule shows once
+    assert (cache.hits, cache.misses) == (0, 3)
+
+    db.execute(text("INSERT INTO calendar_event_exceptions (event_id, occurrence_start, is_cancelled) VALUES (1, :start, 1)"),
+               {"start": datetime(2026, 1, 6, 9, 30)})
+    assert len(expand_events(db, series, *window, cache=cache)[1]) == 7  # unchanged version: served from cache
+    assert cache.hits == 3
+
+    series[0].updated_date = datetime(2026, 1, 2)  # the exception write bumps the series version
+    assert len(expand_events(db, series, *window, cache=cache)[1]) == 6
+
+    cache.invalidate(2)
+    expand_events(db, series, *window, cache=cache)
+    assert (cache.hits, cache.misses) == (7, 5)
@@ -0,0 +1,149 @@
+"""Tests for the precomputed school analytics rollups."""
+
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.school_analytics import SchoolRollups, submission_rate
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+SCHEMA = [
+    "CREATE TABLE schools (id INTEGER PRIMARY KEY, is_active BOOLEAN)",
+    "CREATE TABLE students (id INTEGER PRIMARY KEY, school_id INTEGER, classroom_id INTEGER, enrollment_date TIMESTAMP, is_active BOOLEAN)",
+    "CREATE TABLE teachers (id INTEGER PRIMARY KEY, school_id INTEGER, hire_date TIMESTAMP, is_active BOOLEAN)",
+    "CREATE TABLE classrooms (id INTEGER PRIMARY KEY, name TEXT, school_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE subjects (id INTEGER PRIMARY KEY, name TEXT, school_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE assignments (id INTEGER PRIMARY KEY, subject_id INTEGER, max_points INTEGER, is_active BOOLEAN)",
+    """CREATE TABLE grades (id INTEGER PRIMARY KEY, assignment_id INTEGER, student_id INTEGER, points_earned INTEGER,
+                            graded_date TIMESTAMP, is_active BOOLEAN)""",
+    """CREATE TABLE school_daily_rollups (
+           school_id INTEGER, day DATE, students INTEGER, active_students INTEGER, recent_students INTEGER,
+           teachers INTEGER, recent_teachers INTEGER, classrooms INTEGER, subjects INTEGER, assignments INTEGER,
+           grades INTEGER, percent_total FLOAT, grade_a INTEGER, grade_b INTEGER, grade_c INTEGER, grade_d INTEGER,
+           grade_f INTEGER, computed_at TIMESTAMP, PRIMARY KEY (school_id, day))""",
+    """CREATE TABLE school_rollup_groups (
+           school_id INTEGER, day DATE, group_type TEXT, group_id INTEGER, name TEXT, students INTEGER,
+           grades INTEGER, percent_total FLOAT, recent_grades INTEGER, recent_percent_total FLOAT,
+           previous_grades INTEGER, previous_percent_total FLOAT, PRIMARY KEY (school_id, day, group_type, group_id))""",
+    """CREATE TABLE school_rollup_state (school_id INTEGER PRIMARY KEY, computed_at TIMESTAMP, dirty_since TIMESTAMP,
+                                         pending_events INTEGER NOT NULL DEFAULT 0)""",
+    "INSERT INTO schools VALUES (1, 1), (2, 1)",
+    "INSERT INTO classrooms VALUES (1, 'P5 Blue', 1, 1), (2, 'P5 Red', 1, 1), (3, 'Old', 1, 0)",
+    "INSERT INTO subjects VALUES (1, 'Maths', 1, 1), (2, 'English', 1, 1), (3, 'Other school', 2, 1)",
+    "INSERT INTO assignments VALUES (1, 1, 50, 1), (2, 2, 100, 1), (3, 3, 100, 1)",
+]
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+        connection.execute(text("INSERT INTO teachers VALUES (1, 1, :old, 1), (2, 1, :new, 1)"),
+                           {"old": NOW - timedelta(days=400), "new": NOW - timedelta(days=3)})
+        for student_id, classroom_id in ((1, 1), (2, 1), (3, 2), (4, None)):
+            connection.execute(text("INSERT INTO students VALUES (:id, 1, :classroom, :enrolled, 1)"), {
+                "id": student_id, "classroom": classroom_id, "enrolled": NOW - timedelta(days=100)
+            })
+        connection.execute(text("INSERT INTO students VALUES (9, 2, NULL, :enrolled, 1)"), {"enrolled": NOW})
+    return sessionmaker(bind=engine)()
+
+
+def _grade(db, grade_id, assignment_id, student_id, points, days_ago=1):
+    db.execute(text("INSERT INTO grades VALUES (:id, :assignment, :student, :points, :graded, 1)"), {
+        "id": grade_id, "assignment": assignment_id, "student": student_id, "points": points,
+        "graded": NOW - timedelta(days=days_ago)
+    })
+
+
+def test_rollup_matches_the_dashboard_numbers():
+    db, rollups = _db(), SchoolRollups(clock=Clock(NOW))
+    _grade(db, 1, 1, 1, 50)                 # Maths 100%, P5 Blue
+    _grade(db, 2, 1, 2, 35, days_ago=40)    # Maths 70%, P5 Blue, previous window
+    _grade(db, 3, 2, 3, 85)                 # English 85%, P5 Red
+    _grade(db, 4, 2, 4, 40)                 # English 40%, no classroom
+    _grade(db, 5, 3, 9, 100)                # another school
+    db.commit()
+
+    overview = rollups.overview(db, 1)
+    assert (overview["students"], overview["teachers"], overview["recent_teachers"]) == (4, 2, 1)
+    assert (overview["classrooms"], overview["subjects"], overview["assignments"]) == (2, 2, 2)
+    assert overview["grades"] == 4 and overview["overall_average"] == 73.8
+    assert [overview[bucket] for bucket in ("grade_a", "grade_b", "grade_c", "grade_d", "grade_f")] == [1, 1, 1, 0, 1]
+    assert overview["completion_rate"] == submission_rate(4, 2, 4) == 50.0
+    assert overview["freshness"]["stale"] is False
+
+    subjects = {row["name"]: row for row in rollups.groups(db, 1, "subject")}
+    assert subjects["Maths"]["average"] == 85.0
+    assert (subjects["Maths"]["recent_average"], subjects["Maths"]["previous_average"]) == (100.0, 70.0)
+    assert subjects["English"]["average"] == 62.5
+
+    classrooms = {row["name"]: row for row in rollups.groups(db, 1, "classroom")}
+    assert set(classrooms) == {"P5 Blue", "P5 Red"}
+    assert (classrooms["P5 Blue"]["students"], classrooms["P5 Blue"]["grades"]) == (2, 2)
+    assert classrooms["P5 Red"]["average"] == 85.0
+
+
+def test_events_mark_the_rollup_stale_until_refreshed():
+    db, clock = _db(), Clock(NOW)
+    rollups = SchoolRollups(clock=clock)
+    rollups.overview(db, 1)
+
+    _grade(db, 1, 1, 1, 50)
+    rollups.touch_assignment(db, 1)
+    rollups.touch(db, 2)  # no rollup yet for school 2: nothing to mark
+    db.commit()
+
+    clock.now = NOW + timedelta(minutes=2)
+    overview = rollups.overview(db, 1)
+    assert overview["grades"] == 0  # served from the rollup, not recounted
+    assert overview["freshness"]["pending_changes"] == 1 and overview["freshness"]["stale"]
+    assert overview["freshness"]["age_seconds"] == 120
+
+    assert rollups.refresh_dirty(db) == 1
+    overview = rollups.overview(db, 1)
+    assert overview["grades"] == 1 and not overview["freshness"]["stale"]
+    assert rollups.refresh_dirty(db) == 0
+
+
+def test_compaction_recomputes_and_keeps_one_row_per_month_past_retention():
+    db, clock = _db(), Clock(NOW)
+    rollups = SchoolRollups(clock=clock, retention_days=30)
+    for day in (date(2026, 6, 10), date(2026, 6, 30), date(2026, 7, 1), date(2026, 7, 15), date(2026, 10, 1)):
+        clock.now = datetime.combine(day, datetime.min.time())
+        rollups.refresh(db, 1)
+
+    clock.now = NOW
+    result = rollups.compact(db)
+    assert result == {"schools_refreshed": 2, "days_compacted": 2}
+    days = [row.day for row in db.execute(text("SELECT day FROM school_daily_rollups WHERE school_id = 1 ORDER BY day"))]
+    assert days == ["2026-06-30", "2026-07-15", "2026-10-01", "2026-10-18"]
+    assert rollups.completion_rate_on(db, 1, date(2026, 7, 20)) == 0.0
+
+
+def test_refreshing_again_the_same_day_updates_the_rows_in_place():
+    db, rollups = _db(), SchoolRollups(clock=Clock(NOW))
+    _grade(db, 1, 1, 1, 50)
+    _grade(db, 2, 2, 3, 85)
+    db.commit()
+    rollups.refresh(db, 1)
+
+    _grade(db, 3, 2, 4, 40)
+    db.execute(text("UPDATE subjects SET is_active = 0 WHERE id = 1"))
+    db.commit()
+    rollups.refresh(db, 1)
+
+    assert db.execute(text("SELECT COUNT(*) FROM school_daily_rollups WHERE school_id = 1")).scalar() == 1
+    assert rollups.overview(db, 1)["subjects"] == 1
+    subjects = rollups.groups(db, 1, "subject")
+    assert [(row["name"], row["grades"]) for row in subjects] == [("English", 2)]
@@ -0,0 +1,289 @@
+"""Tests for the shared conversation session store and the KANA services on top of it."""
+
+import asyncio
+import os
+import sys
+import types
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from users_micro.services.session_store import (
+    MemorySessionStore, RedisSessionStore, RespError, SessionConflict, SessionStore, SqlSessionStore, append_capped,
+    encode_command, read_reply,
+)
+
+SCHEMA = [
+    """CREATE TABLE conversation_sessions (namespace TEXT NOT NULL, session_id TEXT NOT NULL, user_id INTEGER,
+                                           data TEXT NOT NULL, version INTEGER NOT NULL, expires_at TIMESTAMP NOT NULL,
+                                           created_date TIMESTAMP, updated_date TIMESTAMP,
+                                           PRIMARY KEY (namespace, session_id))""",
+]
+TTL = timedelta(hours=1)
+
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2026, 10, 18, 12, 0)
+
+    def __call__(self):
+        return self.now
+
+
+def _sql_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    return engine
+
+
+@pytest.fixture()
+def kana_services(monkeypatch, app_import):
+    """KanaAgentService and KanaLearningService, imported against a stub ``services.gemini_service``"""
+    # The real module takes about a minute to import; every model call is replaced in these tests anyway
+    stub = types.ModuleType("services.gemini_service")
+    stub.gemini_service = types.SimpleNamespace()
+    monkeypatch.setitem(sys.modules, "services.gemini_service", stub)
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    # The KANA services import their siblings as top-level "services.*", like the app does
+    return (
+        app_import("services.agent_services").KanaAgentService,
+        app_import("services.kana_services").KanaLearningService,
+    )
+
+
+@pytest.fixture(params=["memory", "sql"])
+def store_and_clock(request, tmp_path):
+    clock = Clock()
+    if request.param == "memory":
+        return MemorySessionStore(clock=clock), clock
+    return SqlSessionStore(_sql_engine(tmp_path), clock=clock), clock
+
+
+def test_versions_ttl_and_datetimes_round_trip(store_and_clock):
+    store, clock = store_and_clock
+
+    async def scenario():
+        created = datetime(2026, 10, 1, 9, 30)
+        assert await store.write("chat", "s1", {"user_id": 7, "created_at": created, "history": []}, 0, TTL) == 1
+        with pytest.raises(SessionConflict):
+            await store.write("chat", "s1", {"user_id": 8}, 0, TTL)  # already exists
+
+        stored = await store.get("chat", "s1")
+        assert stored.version == 1 and stored.data["created_at"] == created
+        assert await store.get("other", "s1") is None  # namespaces are separate
+
+        stored.data["history"].append("hi")
+        assert await store.write("chat", "s1", stored.data, 1, TTL) == 2
+        with pytest.raises(SessionConflict):
+            await store.write("chat", "s1", stored.data, 1, TTL)  # stale version
+
+        clock.now += timedelta(minutes=59)
+        assert (await store.get("chat", "s1")).data["history"] == ["hi"]
+        clock.now += timedelta(minutes=2)
+        assert await store.get("chat", "s1") is None
+        # An expired session can be started again under the same id
+        assert await store.write("chat", "s1", {"user_id": 7}, 0, TTL) == 1
+
+        await store.delete("chat", "s1")
+        assert await store.get("chat", "s1") is None
+
+    asyncio.run(scenario())
+
+
+def test_update_retries_conflicting_appends_and_caps_history(store_and_clock):
+    store, _ = store_and_clock
+
+    async def scenario():
+        await store.write("chat", "s1", {"history": ["a"]}, 0, TTL)
+        original_write = store.write
+        raced = []
+
+        async def write_after_race(namespace, session_id, data, expected_version, ttl):
+            if not raced:
+                # Another worker appends between this read and its write
+                raced.append(True)
+                stored = await store.get("chat", "s1")
+                append_capped(stored.data["history"], ["c"], 3)
+                await original_write("chat", "s1", stored.data, stored.version, TTL)
+            return await original_write(namespace, session_id, data, expected_version, ttl)
+
+        store.write = write_after_race
+        session = await store.update("chat", "s1", lambda data: append_capped(data["history"], ["b"], 3), ttl=TTL)
+        assert session["history"] == ["a", "c", "b"]  # the retry re-read the racing append
+
+        session = await store.update("chat", "s1", lambda data: append_capped(data["history"], ["d", "e"], 3), ttl=TTL)
+        assert session["history"] == ["b", "d", "e"]
+        assert (await store.get("chat", "s1")).version == 4
+
+        with pytest.raises(KeyError):
+            await store.update("chat", "missing", lambda data: None, ttl=TTL)
+
+    asyncio.run(scenario())
+
+
+def test_two_app_instances_share_sessions_through_sql(tmp_path, kana_services):
+    KanaAgentService, KanaLearningService = kana_services
+    _sql_engine(tmp_path)
+
+    def worker():
+        # Each instance has its own engine, as separate uvicorn workers would
+        store = SqlSessionStore(create_engine(f"sqlite:///{tmp_path / 'sessions.db'}"))
+        agent, learning = KanaAgentService(store=store), KanaLearningService(store=store)
+        prompts = []
+
+        async def invoke_gemini(prompt, attachments=None):
+            prompts.append(prompt)
+            return f"reply {len(prompts)}", "test-model"
+
+        async def generate_steps(**kwargs):
+            return {"steps": [{"title": f"Step {n}", "explanation": f"Do part {n}"} for n in range(1, 5)]}
+
+        async def generate_clarification(**kwargs):
+            return f"clarified with {len(kwargs['clarify_history'])} earlier turns"
+
+        agent._invoke_gemini = invoke_gemini
+        learning._generate_steps = generate_steps
+        learning._generate_clarification = generate_clarification
+        return agent, learning, prompts
+
+    agent_a, learning_a, prompts_a = worker()
+    agent_b, learning_b, prompts_b = worker()
+
+    async def scenario():
+        first = await agent_a.chat(user_id=5, message="What is a fraction?")
+        second = await agent_b.chat(user_id=5, message="And a decimal?", session_id=first["session_id"])
+        assert [turn["content"] for turn in second["history"]] == [
+            "What is a fraction?", "reply 1", "And a decimal?", "reply 1",
+        ]
+        assert "User: What is a fraction?" in prompts_b[0]
+        with pytest.raises(PermissionError):
+            await agent_b.chat(user_id=6, message="hi", session_id=first["session_id"])
+
+        state = await learning_a.start_session(user_id=5, question="Solve 2x + 3 = 7", metadata={"expected_steps": 4})
+        session_id = state["session_id"]
+        assert (await learning_b.continue_step(user_id=5, session_id=session_id))["current_step_index"] == 1
+        await learning_a.clarify_current_step(user_id=5, session_id=session_id, message="Why subtract 3?")
+        clarified = await learning_b.clarify_current_step(user_id=5, session_id=session_id, message="And then?")
+        assert clarified["clarify_reply"] == "clarified with 2 earlier turns"
+        assert len(clarified["clarify_history"]) == 4
+
+        state = await learning_a.get_session(user_id=5, session_id=session_id)
+        assert state["current_step_index"] == 1 and state["current_step"]["title"] == "Step 2"
+        assert isinstance(state["updated_at"], str)
+
+    asyncio.run(scenario())
+
+
+def test_resp_encoding_and_replies():
+    assert encode_command("HMGET", "k", 1) == b"*3\r\n$5\r\nHMGET\r\n$1\r\nk\r\n$1\r\n1\r\n"
+
+    async def parse(raw):
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await read_reply(reader)
+
+    assert asyncio.run(parse(b"*2\r\n$7\r\n{\"a\":1}\r\n$-1\r\n")) == [b'{"a":1}', None]
+    assert asyncio.run(parse(b":-1\r\n")) == -1
+    assert asyncio.run(parse(b"+OK\r\n")) == "OK"
+    store = RedisSessionStore("redis://:p%40ss@cache:6380/2")
+    assert (store.host, store.port, store.password, store.db) == ("cache", 6380, "p@ss", 2)
+
+
+def test_stores_must_implement_the_whole_interface():
+    class GetOnly(SessionStore):
+        async def get(self, namespace, session_id):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+
+def test_redis_commands_share_a_bounded_pool_of_connections():
+    connections, in_flight, peak = [], [0], [0]
+
+    async def serve(reader, writer):
+        connections.append(writer)
+        try:
+            while True:
+                command = await read_reply(reader)
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+                await asyncio.sleep(0.01)
+                in_flight[0] -= 1
+                writer.write(b"$%d\r\n%s\r\n" % (len(command[-1]), command[-1]))
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    async def scenario():
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        store = RedisSessionStore(f"redis://127.0.0.1:{port}/0", pool_size=3)
+        async with server:
+            replies = await asyncio.gather(*(store.execute("ECHO", f"m{n}") for n in range(12)))
+            assert replies == [f"m{n}".encode() for n in range(12)]
+            assert len(connections) == 3 and peak[0] == 3  # commands overlapped, on at most three connections
+            assert await store.execute("ECHO", "again") == b"again" and len(connections) == 3
+            for _, writer in store._idle:
+                writer.close()
+
+    asyncio.run(scenario())
+
+
+def test_redis_store_replaces_pooled_connections_the_server_closed():
+    connections, closed = [], []
+
+    async def serve(reader, writer):
+        connections.append(writer)
+        try:
+            command = await read_reply(reader)
+            if command[0] == b"AUTH":
+                writer.write(b"-WRONGPASS invalid password\r\n")
+                await reader.read()  # until the client hangs up
+                closed.append(writer)
+                return
+            writer.write(b"$%d\r\n%s\r\n" % (len(command[-1]), command[-1]))
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        writer.close()  # one command per connection, like an idle timeout right after it
+
+    async def scenario():
+        server = await asyncio.start_server(serve, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            store = RedisSessionStore(f"redis://127.0.0.1:{port}/0", pool_size=1)
+            assert await store.execute("ECHO", "first") == b"first"
+            await asyncio.sleep(0.05)
+            assert await store.execute("ECHO", "second") == b"second"
+            assert len(connections) == 2
+            for _, writer in store._idle:
+                writer.close()
+
+            with pytest.raises(RespError):
+                await RedisSessionStore(f"redis://:secret@127.0.0.1:{port}/0")._connect()
+            await asyncio.sleep(0.05)
+            assert len(closed) == 1
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(not os.getenv("SESSION_STORE_TEST_REDIS_URL"), reason="set SESSION_STORE_TEST_REDIS_URL to run")
+def test_redis_store_against_a_live_server():
+    store = RedisSessionStore(os.environ["SESSION_STORE_TEST_REDIS_URL"], key_prefix="brainink:test:")
+
+    async def scenario():
+        await store.delete("chat", "s1")
+        assert await store.write("chat", "s1", {"history": ["a"], "at": datetime(2026, 1, 1)}, 0, TTL) == 1
+        with pytest.raises(SessionConflict):
+            await store.write("chat", "s1", {}, 0, TTL)
+        session = await store.update("chat", "s1", lambda data: append_capped(data["history"], ["b"], 10), ttl=TTL)
+        assert session["history"] == ["a", "b"] and session["at"] == datetime(2026, 1, 1)
+        assert (await store.get("chat", "s1")).version == 2
+        await store.delete("chat", "s1")
+
+    asyncio.run(scenario())
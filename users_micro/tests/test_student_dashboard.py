@@ -0,0 +1,128 @@
+"""Tests for the set-based student dashboard queries."""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from users_micro.services.student_dashboard import StudentDashboard
+
+NOW = datetime(2026, 10, 18, 12, 0)
+
+SCHEMA = [
+    "CREATE TABLE subjects (id INTEGER PRIMARY KEY, name TEXT, school_id INTEGER, is_active BOOLEAN)",
+    "CREATE TABLE subject_students (subject_id INTEGER, student_id INTEGER, PRIMARY KEY (subject_id, student_id))",
+    """CREATE TABLE assignments (id INTEGER PRIMARY KEY, title TEXT, description TEXT, subtopic TEXT, subject_id INTEGER,
+                                 teacher_id INTEGER, max_points INTEGER, due_date TIMESTAMP, created_date TIMESTAMP,
+                                 is_active BOOLEAN)""",
+    """CREATE TABLE grades (id INTEGER PRIMARY KEY, assignment_id INTEGER, student_id INTEGER, teacher_id INTEGER,
+                            points_earned INTEGER, feedback TEXT, graded_date TIMESTAMP, is_active BOOLEAN)""",
+    "INSERT INTO subjects VALUES (1, 'Maths', 1, 1), (2, 'English', 1, 1), (3, 'Art', 1, 1), (4, 'Closed', 1, 0)",
+    "INSERT INTO subject_students VALUES (1, 7), (2, 7), (3, 7), (4, 7), (1, 8)",
+]
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.execute(text(statement))
+    return sessionmaker(bind=engine)()
+
+
+def _assignment(db, assignment_id, subject_id, max_points=100, due_in_days=None, active=True):
+    db.execute(text("""
+        INSERT INTO assignments VALUES (:id, :title, 'desc', NULL, :subject, 1, :max_points, :due, :created, :active)
+    """), {
+        "id": assignment_id, "title": f"A{assignment_id}", "subject": subject_id, "max_points": max_points,
+        "due": NOW + timedelta(days=due_in_days) if due_in_days is not None else None,
+        "created": NOW - timedelta(days=60), "active": active,
+    })
+
+
+def _grade(db, grade_id, assignment_id, points, days_ago, student_id=7, active=True):
+    db.execute(text("INSERT INTO grades VALUES (:id, :assignment, :student, 1, :points, 'ok', :graded, :active)"), {
+        "id": grade_id, "assignment": assignment_id, "student": student_id, "points": points,
+        "graded": NOW - timedelta(days=days_ago), "active": active,
+    })
+
+
+def _seed(db):
+    _assignment(db, 1, 1, max_points=50)
+    _assignment(db, 2, 1, due_in_days=3)
+    _assignment(db, 3, 1, due_in_days=-2)          # overdue, not upcoming
+    _assignment(db, 4, 2, due_in_days=1)
+    _assignment(db, 5, 2)
+    _assignment(db, 6, 2, active=False)
+    _assignment(db, 7, 4)                           # inactive subject
+    _grade(db, 1, 1, 45, days_ago=2)                # Maths 90%
+    _grade(db, 2, 5, 60, days_ago=45)               # English 60%
+    _grade(db, 3, 4, 100, days_ago=1, active=False)  # withdrawn grade: still upcoming
+    _grade(db, 4, 1, 10, days_ago=1, student_id=8)  # another student
+    db.commit()
+
+
+def test_overview_matches_the_old_dashboard_numbers():
+    db = _db()
+    _seed(db)
+    dashboard = StudentDashboard(clock=lambda: NOW).overview(db, 7)
+
+    assert (dashboard["total_subjects"], dashboard["total_assignments"], dashboard["completed_assignments"]) == (3, 5, 2)
+    assert round(dashboard["average_grade"], 2) == round(105 / 150 * 100, 2)
+    assert dashboard["completion_rate"] == 40.0
+
+    subjects = {row["subject_name"]: row for row in dashboard["subject_performance"]}
+    assert (subjects["Maths"]["average_grade"], subjects["Maths"]["total_assignments"]) == (90.0, 3)
+    assert (subjects["English"]["average_grade"], subjects["English"]["completed_assignments"]) == (60.0, 1)
+    assert (subjects["Art"]["total_assignments"], subjects["Art"]["average_grade"]) == (0, 0)
+
+    assert [grade["assignment_id"] for grade in dashboard["recent_grades"]] == [1, 5]
+    assert dashboard["recent_grades"][0]["percentage"] == 90.0
+    assert [(item["id"], item["subject_name"]) for item in dashboard["upcoming_assignments"]] == [(4, "English"), (2, "Maths")]
+
+
+def test_recent_and_upcoming_lists_are_capped_in_sql():
+    db = _db()
+    for assignment_id in range(1, 41):
+        _assignment(db, assignment_id, 1 + assignment_id % 2, due_in_days=assignment_id)
+        if assignment_id % 4 == 0:
+            _grade(db, assignment_id, assignment_id, 70, days_ago=assignment_id)
+    db.commit()
+
+    dashboard = StudentDashboard(clock=lambda: NOW).overview(db, 7)
+    assert [grade["assignment_id"] for grade in dashboard["recent_grades"]] == [4, 8, 12, 16, 20]
+    assert [item["id"] for item in dashboard["upcoming_assignments"]] == [1, 2, 3, 5, 6]
+    assert dashboard["completed_assignments"] == 10
+
+
+def test_subject_performance_walks_one_query():
+    db = _db()
+    _seed(db)
+    performance = StudentDashboard(clock=lambda: NOW).subject_performance(db, 7, 1)
+
+    assert [item["assignment_id"] for item in performance["assignment_performance"]] == [1, 2, 3]
+    assert [item["completed"] for item in performance["assignment_performance"]] == [True, False, False]
+    assert performance["grade_distribution"] == {"A": 1, "B": 0, "C": 0, "D": 0, "F": 0}
+    assert (performance["total_points"], performance["max_points"], performance["overall_percentage"]) == (45, 50, 90.0)
+    assert [point["assignment_title"] for point in performance["performance_trends"]] == ["A1"]
+
+    english = StudentDashboard(clock=lambda: NOW).subject_performance(db, 7, 2)
+    assert english["performance_trends"] == []  # graded 45 days ago
+    assert english["grade_distribution"]["D"] == 1
+
+
+def test_an_assignment_graded_twice_counts_once_with_its_latest_grade():
+    db = _db()
+    _seed(db)
+    _grade(db, 5, 1, 25, days_ago=5)  # an older grade for the same Maths assignment
+    _grade(db, 6, 5, 90, days_ago=1)  # a regrade of the English one
+    db.commit()
+    dashboard = StudentDashboard(clock=lambda: NOW).overview(db, 7)
+
+    assert (dashboard["total_assignments"], dashboard["completed_assignments"]) == (5, 2)
+    assert round(dashboard["average_grade"], 2) == round(135 / 150 * 100, 2)
+    assert [grade["id"] for grade in dashboard["recent_grades"]] == [6, 1]
+
+    performance = StudentDashboard(clock=lambda: NOW).subject_performance(db, 7, 1)
+    assert [item["assignment_id"] for item in performance["assignment_performance"]] == [1, 2, 3]
+    assert performance["total_points"] == 45
@@ -0,0 +1,103 @@
+"""Tests for batched word pronunciation synthesis."""
+
+import asyncio
+import sys
+import types
+
+import pytest
+
+from users_micro.services.tts_cache import TTSAudioCache
+
+WORDS = [
+    {"word": "cat", "phonetic_hint": "k-a-t", "context": None},
+    {"word": "ship", "phonetic_hint": None, "context": "a big ship"},
+]
+
+
+@pytest.fixture()
+def tts_module(app_import):
+    # The TTS services import their siblings as top-level "services.*", like the app does
+    return app_import("services.tts_service")
+
+
+class FakeKokoro:
+    def __init__(self, cache):
+        self.cache = cache
+        self.calls = []
+
+    async def synthesize_batch(self, *, texts, voice=None, speed=1.0):
+        self.calls.append((list(texts), voice, speed))
+
+        async def produce():
+            return b"RIFFfake", "wav", {"duration_seconds": 0.4}
+
+        return [
+            await self.cache.get_or_create(self.cache.make_key(text, voice, speed, "kokoro"), produce)
+            for text in texts
+        ]
+
+
+def test_batch_uses_the_mapped_kokoro_voice_and_reports_it(tmp_path, tts_module):
+    service = tts_module.TTSService()
+    kokoro = FakeKokoro(TTSAudioCache(tmp_path, compress=False))
+    service._kokoro = kokoro
+
+    results = asyncio.run(service.generate_word_pronunciations_batch(WORDS, voice_type="teacher"))
+    assert kokoro.calls == [(
+        ["cat. k-a-t. cat.", "ship. As in a big ship. ship."],
+        tts_module.KOKORO_VOICE_MAP["teacher"],
+        tts_module.WORD_PRONUNCIATION_SPEED,
+    )]
+    assert [r["voice"] for r in results] == ["am_michael", "am_michael"]
+    assert all(r["success"] and r["provider"] == "kokoro" and not r["cached"] for r in results)
+
+    again = asyncio.run(service.generate_word_pronunciations_batch(WORDS[:1], voice_type="teacher"))
+    assert again[0]["cached"] and again[0]["audio_url"] == results[0]["audio_url"]
+
+
+def test_batch_without_kokoro_keeps_the_configured_engine(monkeypatch, tts_module):
+    service = tts_module.TTSService()
+    service._kokoro = None
+    requested = []
+
+    async def generate_pronunciation_audio(text, voice_type, speed):
+        requested.append((text, voice_type, speed))
+        return {"success": True, "text": text, "provider": service.tts_method}
+
+    monkeypatch.setattr(service, "generate_pronunciation_audio", generate_pronunciation_audio)
+    results = asyncio.run(service.generate_word_pronunciations_batch(WORDS, voice_type="clear"))
+    assert sorted(requested) == sorted([
+        ("cat. k-a-t. cat.", "clear", tts_module.WORD_PRONUNCIATION_SPEED),
+        ("ship. As in a big ship. ship.", "clear", tts_module.WORD_PRONUNCIATION_SPEED),
+    ])
+    assert [r["text"] for r in results] == ["cat. k-a-t. cat.", "ship. As in a big ship. ship."]
+
+
+def test_kokoro_batch_renders_misses_in_one_pipeline_call(tmp_path, monkeypatch, app_import):
+    np = pytest.importorskip("numpy")
+    pytest.importorskip("soundfile")
+    # The pipeline is replaced below, so the model package itself is not needed
+    if "kokoro" not in sys.modules:
+        monkeypatch.setitem(sys.modules, "kokoro", types.SimpleNamespace(KPipeline=object))
+    kokoro_module = app_import("services.kokoro_tts_service")
+
+    monkeypatch.setattr(kokoro_module, "tts_audio_cache", TTSAudioCache(tmp_path, compress=False))
+    pipeline_inputs = []
+
+    def pipeline(text, voice, speed, split_pattern):
+        pipeline_inputs.append(text)
+        for line in text.split("\n"):
+            yield line, None, np.zeros(240 * len(line), dtype=np.float32)
+
+    service = kokoro_module.KokoroTTSService()
+    service._pipelines["a"] = pipeline
+
+    first = asyncio.run(service.synthesize_batch(texts=["cat", "ship"], voice="af_bella"))
+    assert pipeline_inputs == ["cat\nship"]
+    assert [entry.cache_hit for entry in first] == [False, False]
+    assert first[1].metadata["duration_seconds"] == pytest.approx(0.04)
+
+    second = asyncio.run(service.synthesize_batch(texts=["ship", "dog"], voice="af_bella"))
+    assert pipeline_inputs == ["cat\nship", "dog"]  # only the miss is rendered
+    assert second[0].cache_hit and second[0].path == first[1].path
+    assert not second[1].cache_hit
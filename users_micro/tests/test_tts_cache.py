@@ -0,0 +1,71 @@
+"""Tests for the shared content-addressed TTS audio cache."""
+
+import asyncio
+import os
+import time
+
+from users_micro.services.tts_cache import TTSAudioCache
+
+
+def _producer(calls, payload=b"ID3fake-mp3-bytes", audio_format="mp3"):
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return payload, audio_format, {"duration_seconds": 0.5}
+    return produce
+
+
+def test_key_ignores_case_and_whitespace_but_not_voice_or_speed():
+    key = TTSAudioCache.make_key("The  Cat", "child_friendly", 1.0, "azure")
+    assert key == TTSAudioCache.make_key("the cat", "child_friendly", 1.0, "azure")
+    assert key != TTSAudioCache.make_key("the cat", "teacher", 1.0, "azure")
+    assert key != TTSAudioCache.make_key("the cat", "child_friendly", 0.8, "azure")
+    assert key != TTSAudioCache.make_key("the cat", "child_friendly", 1.0, "kokoro")
+
+
+def test_concurrent_requests_synthesize_once(tmp_path):
+    cache = TTSAudioCache(tmp_path, compress=False)
+    key = cache.make_key("apple", "child_friendly", 1.0, "azure")
+    calls = []
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_create(key, _producer(calls)) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert len(calls) == 1
+    assert {r.path for r in results} == {tmp_path / f"{key}.mp3"}
+    assert results[0].etag == f'"{key}"'
+
+    # A second cache instance (another worker) sees the same entry without synthesizing
+    other_worker = TTSAudioCache(tmp_path, compress=False)
+    hit = asyncio.run(other_worker.get_or_create(key, _producer(calls)))
+    assert hit.cache_hit and len(calls) == 1
+    assert hit.metadata["duration_seconds"] == 0.5
+
+
+def test_eviction_removes_least_recently_used_first(tmp_path):
+    cache = TTSAudioCache(tmp_path, compress=False)
+    keys = [cache.make_key(word, "v", 1.0, "e") for word in ("one", "two", "three")]
+    for index, key in enumerate(keys):
+        asyncio.run(cache.get_or_create(key, _producer([], payload=b"x" * 100)))
+        past = time.time() - 100 + index
+        os.utime(tmp_path / f"{key}.mp3", (past, past))
+
+    # Touching the oldest entry makes it the most recently used
+    assert cache.lookup(keys[0]) is not None
+
+    removed = cache.evict(max_bytes=200)
+    assert removed == 1
+    assert cache.lookup(keys[1]) is None
+    assert cache.lookup(keys[0]) is not None
+    assert cache.lookup(keys[2]) is not None
+
+
+def test_resolve_filename_only_accepts_cache_names(tmp_path):
+    cache = TTSAudioCache(tmp_path, compress=False)
+    key = cache.make_key("dog", "v", 1.0, "e")
+    asyncio.run(cache.get_or_create(key, _producer([])))
+
+    assert cache.resolve_filename(f"{key}.mp3").key == key
+    assert cache.resolve_filename("../../etc/passwd") is None
+    assert cache.resolve_filename("tts_1234.wav") is None
@@ -0,0 +1,151 @@
+"""Tests for streaming upload ingestion: limits, hashing and bounded memory."""
+
+import asyncio
+import hashlib
+import io
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import img2pdf
+import pytest
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+
+from users_micro.services.upload_ingest import (
+    AUDIO_UPLOAD, IMAGE_UPLOAD, PDF_UPLOAD, UploadLimits, UploadRejected, ingest_upload,
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+class CountingFile(io.BytesIO):
+    def __init__(self, data):
+        super().__init__(data)
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.bytes_read += len(chunk)
+        return chunk
+
+
+def _upload(data: bytes, filename: str, content_type="application/octet-stream", size=None):
+    return UploadFile(CountingFile(data), filename=filename, size=size,
+                      headers=Headers({"content-type": content_type}))
+
+
+def _ingest(upload, limits, **kwargs):
+    return asyncio.run(ingest_upload(upload, limits, **kwargs))
+
+
+def _png() -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 10, 10)).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_upload_is_spooled_and_hashed_in_chunks():
+    data = _png() + bytes(range(256)) * 4000
+    with _ingest(_upload(data, "page.PNG"), IMAGE_UPLOAD, chunk_size=4096) as upload:
+        assert (upload.size, upload.sha256) == (len(data), hashlib.sha256(data).hexdigest())
+        assert upload.read() == data
+        assert upload.read() == data  # re-readable from the start
+
+
+def test_limits_are_enforced_before_reading_everything():
+    limits = UploadLimits(kind="image", max_bytes=10_000, extensions=IMAGE_UPLOAD.extensions,
+                          signatures=IMAGE_UPLOAD.signatures)
+    png = _png()
+
+    declared = _upload(png + bytes(50_000), "big.png", size=60_000)
+    with pytest.raises(UploadRejected) as rejected:
+        _ingest(declared, limits)
+    assert rejected.value.status_code == 413 and declared.file.bytes_read == 0
+
+    undeclared = _upload(png + bytes(50_000), "big.png")
+    with pytest.raises(UploadRejected) as rejected:
+        _ingest(undeclared, limits, chunk_size=4096)
+    assert rejected.value.status_code == 413 and undeclared.file.bytes_read <= 10_000 + 4096
+
+    renamed = _upload(b"MZ\x90\x00" + bytes(5000), "photo.jpg")
+    with pytest.raises(UploadRejected) as rejected:
+        _ingest(renamed, limits, chunk_size=1024)
+    assert rejected.value.status_code == 400 and renamed.file.bytes_read == 1024
+
+    for upload, limit in ((_upload(png, "notes.txt"), limits), (_upload(b"RIFF", "a.wav", "text/plain"), AUDIO_UPLOAD),
+                          (_upload(b"", "empty.png"), limits)):
+        with pytest.raises(UploadRejected) as rejected:
+            _ingest(upload, limit)
+        assert rejected.value.status_code == 400
+
+
+def test_pdf_page_limit():
+    pdf = img2pdf.convert([_png()] * 3)
+    with _ingest(_upload(pdf, "scan.pdf"), PDF_UPLOAD) as upload:
+        assert upload.page_count == 3
+
+    two_pages = UploadLimits(kind="PDF", max_bytes=PDF_UPLOAD.max_bytes, extensions=PDF_UPLOAD.extensions,
+                             signatures=PDF_UPLOAD.signatures, max_pages=2)
+    with pytest.raises(UploadRejected) as rejected:
+        _ingest(_upload(pdf, "scan.pdf"), two_pages)
+    assert rejected.value.status_code == 413 and "3 pages" in str(rejected.value)
+
+
+MEMORY_PROBE = textwrap.dedent("""
+    import asyncio, json, os, tempfile
+    from starlette.datastructures import Headers, UploadFile
+    from users_micro.services.upload_ingest import UploadLimits, ingest_upload
+
+    def status_mb(field):
+        with open("/proc/self/status") as status:
+            line = next(line for line in status if line.startswith(field + ":"))
+        return int(line.split()[1]) / 1024
+
+    def reset_peak():
+        # Writing 5 to clear_refs resets VmHWM (peak RSS) to the current RSS
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return status_mb("VmRSS")
+
+    size = 100 * 1024 * 1024
+    workdir = tempfile.mkdtemp()
+    source = os.path.join(workdir, "upload.bin")
+    with open(source, "wb") as handle:
+        handle.write(b"%PDF-1.4\\n")
+        for _ in range(100):
+            handle.write(os.urandom(1024 * 1024))
+    limits = UploadLimits(kind="PDF", max_bytes=2 * size, signatures=(b"%PDF",))
+
+    def upload():
+        return UploadFile(open(source, "rb"), filename="upload.pdf", headers=Headers({"content-type": "application/pdf"}))
+
+    async def main():
+        await asyncio.to_thread(len, b"")  # start the default thread pool outside the measurement
+        before = reset_peak()
+        with await ingest_upload(upload(), limits) as ingested:
+            await ingested.save_to(os.path.join(workdir, "copy.pdf"))
+            size_seen = ingested.size
+        streamed = status_mb("VmHWM") - before
+
+        before = reset_peak()
+        data = await upload().read()  # the old path, for comparison
+        legacy = status_mb("VmHWM") - before
+        return {"streamed_mb": streamed, "legacy_mb": legacy, "size": size_seen, "legacy_size": len(data)}
+
+    print(json.dumps(asyncio.run(main())))
+""")
+
+
+@pytest.mark.skipif(not Path("/proc/self/clear_refs").exists(), reason="needs Linux peak RSS reset")
+def test_100mb_upload_keeps_peak_rss_bounded():
+    # A fresh interpreter, so the peak RSS only reflects this upload
+    probe = subprocess.run([sys.executable, "-c", MEMORY_PROBE], cwd=REPO_ROOT, capture_output=True, text=True,
+                           timeout=300)
+    assert probe.returncode == 0, probe.stderr
+    result = json.loads(probe.stdout.strip().splitlines()[-1])
+    assert result["size"] == result["legacy_size"] > 100 * 1024 * 1024
+    assert result["streamed_mb"] < 16
+    assert result["legacy_mb"] > 90  # reading the whole upload does show up in the same measurement